@@ -7,5 +7,6 @@ from .users import router as users_router
 from .audit import router as audit_router
 from .settings import router as settings_router
 from .logs import router as logs_router
+from .metrics import router as metrics_router
 
-__all__ = ["auth_router", "servers_router", "health_router", "stats_router", "users_router", "audit_router", "settings_router", "logs_router"]
+__all__ = ["auth_router", "servers_router", "health_router", "stats_router", "users_router", "audit_router", "settings_router", "logs_router", "metrics_router"]
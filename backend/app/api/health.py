@@ -5,7 +5,10 @@ from datetime import datetime, timezone
 import logging
 from app.models.user import User
 from app.auth import get_current_user
-from app.database import db_pool
+from app.database import db_pool, remote_pool
+from app.collector.scheduler import get_collector_status
+from app.collector.cluster import list_nodes
+from app.services.ssh_pool import ssh_pool
 
 logger = logging.getLogger(__name__)
 
@@ -14,7 +17,12 @@ router = APIRouter(tags=["health"])
 @router.get("/pools/status")
 async def get_pools_status(current_user: User = Depends(get_current_user)):
     """Получить статус всех пулов подключений"""
-    return db_pool.get_status()
+    return {"psycopg2": db_pool.get_status(), "asyncpg": remote_pool.get_status(), "ssh": ssh_pool.get_status()}
+
+@router.get("/collector/status")
+async def collector_status(current_user: User = Depends(get_current_user)):
+    """Состояние таймеров коллектора этого процесса + все живые узлы коллектора (nodes)"""
+    return {**get_collector_status(), "nodes": await list_nodes()}
 
 @router.get("/health")
 async def health_check():
@@ -22,7 +30,7 @@ async def health_check():
     return {
         "status": "ok",
         "timestamp": datetime.now(timezone.utc).isoformat(),
-        "pools_count": len(db_pool.pools),
+        "pools_count": len(db_pool.pools) + len(remote_pool.pools),
         "version": "3.0",
     }
 
@@ -0,0 +1,14 @@
+# app/api/metrics.py
+from fastapi import APIRouter, Request
+from fastapi.responses import Response
+from app.auth.dependencies import get_current_user, oauth2_scheme
+from app.metrics import registry, CONTENT_TYPE, token_valid
+
+router = APIRouter(tags=["metrics"])
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """Метрики процесса в формате Prometheus: скрейпер авторизуется METRICS_TOKEN, без него — JWT пользователя"""
+    if not token_valid(request.headers.get("authorization", "")):
+        await get_current_user(await oauth2_scheme(request))
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
@@ -7,11 +7,16 @@ import logging
 from app.models import Server
 from app.models.user import User
 from app.auth import get_current_user
-from app.services.server import load_servers, save_server, update_server_config, delete_server_config, connect_to_server
-from app.services import cache_manager, SSHKeyManager, audit_logger
-from app.services.ssh import is_host_reachable
+from app.services.server import load_servers, save_server, update_server_config, delete_server_config
+from app.services import cache_manager, audit_logger, remote_access
+from app.services.remote_access import RemoteDeadlineError
+from app.services.ssh_pool import ssh_pool
+from app.services.server_registry import server_registry
+from app.services.server_health import server_health
 from app.database import db_pool
+from app.database.remote_pool import remote_pool
 from app.database.local_db import delete_server_data
+from app.metrics import registry as metrics_registry
 
 logger = logging.getLogger(__name__)
 
@@ -21,13 +26,17 @@ router = APIRouter(prefix="/servers", tags=["servers"])
 async def get_servers(current_user: User = Depends(get_current_user)):
     """Get list of all servers with their status"""
     servers = await load_servers()
-    tasks = [asyncio.to_thread(connect_to_server, server) for server in servers]
+    tasks = [remote_access.server_status(server) for server in servers]
     results = await asyncio.gather(*tasks, return_exceptions=True)
     output = []
     for server, result in zip(servers, results):
         if isinstance(result, Exception):
             logger.error(f"Ошибка подключения к {server.name}: {result}")
-            output.append({"name": server.name, "host": server.host, "port": server.port, "status": "error"})
+            output.append({
+                "name": server.name, "host": server.host, "port": server.port,
+                "status": "timeout" if isinstance(result, RemoteDeadlineError) else "error",
+                "health": server_health.snapshot(server.name),
+            })
         else:
             output.append(result)
     return output
@@ -43,14 +52,13 @@ async def add_server(server: Server, request: Request, current_user: User = Depe
         if not server.host or server.host.lower() in ['test', 'localhost']:
             raise HTTPException(status_code=400, detail="Invalid host address")
 
-        servers = await load_servers()
-        if any(s.name == server.name for s in servers):
+        if await server_registry.get_info(server.name):
             logger.warning("Attempt to add existing server: {}".format(server.name))
             raise HTTPException(status_code=400, detail="Server with this name already exists")
 
         # Quick availability check
         logger.info("Checking server availability {} ({}:{})".format(server.name, server.host, server.port))
-        if not is_host_reachable(server.host, server.port):
+        if not await remote_access.host_reachable(server.host, server.port):
             logger.warning("Server {} unreachable at {}:{}".format(server.name, server.host, server.port))
             raise HTTPException(
                 status_code=400,
@@ -76,7 +84,7 @@ async def add_server(server: Server, request: Request, current_user: User = Depe
 
         # Return full server information
         try:
-            return await asyncio.to_thread(connect_to_server, server)
+            return await remote_access.server_status(server)
         except Exception as e:
             # If connection failed, return basic info
             logger.warning("Could not get full server info for {}: {}".format(server.name, e))
@@ -128,8 +136,7 @@ async def update_server(
 ):
     """Update server configuration"""
     try:
-        servers = await load_servers()
-        old_server = next((s for s in servers if s.name == server_name), None)
+        old_server = await server_registry.get(server_name)
         if old_server is None:
             raise HTTPException(status_code=404, detail="Server not found")
 
@@ -159,6 +166,10 @@ async def update_server(
             old_server.port != updated_server.port or
             old_server.user != updated_server.user):
             db_pool.close_pool(old_server)
+            await remote_pool.close_pool(old_server)
+
+        # SSH-сессия аутентифицирована старыми учётными данными — переподключимся при следующем опросе
+        await asyncio.to_thread(ssh_pool.close, old_server)
 
         await update_server_config(server_name, updated_server)
         logger.info("Updated server: {}".format(server_name))
@@ -167,7 +178,7 @@ async def update_server(
             details=f"Сервер {server_name}"
         )
 
-        return await asyncio.to_thread(connect_to_server, updated_server)
+        return await remote_access.server_status(updated_server)
 
     except HTTPException:
         raise
@@ -178,8 +189,7 @@ async def update_server(
 @router.delete("/{server_name}")
 async def delete_server(server_name: str, request: Request, current_user: User = Depends(get_current_user)):
     """Delete server from configuration"""
-    servers = await load_servers()
-    server_to_delete = next((s for s in servers if s.name == server_name), None)
+    server_to_delete = await server_registry.get(server_name)
 
     if not server_to_delete:
         raise HTTPException(status_code=404, detail="Server not found")
@@ -190,6 +200,8 @@ async def delete_server(server_name: str, request: Request, current_user: User =
 
     # Close pools for deleted server
     db_pool.close_pool(server_to_delete)
+    await remote_pool.close_pool(server_to_delete)
+    await asyncio.to_thread(ssh_pool.close, server_to_delete)
 
     # Delete historical data from local DB
     try:
@@ -198,6 +210,7 @@ async def delete_server(server_name: str, request: Request, current_user: User =
         logger.warning(f"Ошибка очистки local_db для {server_name}: {e}")
 
     await delete_server_config(server_name)
+    metrics_registry.forget("server", server_name)
     logger.info("Deleted server: {}".format(server_name))
     await audit_logger.log_event(
         "server_delete", current_user.login, request,
@@ -212,18 +225,21 @@ async def test_pg_connection(
     current_user: User = Depends(get_current_user)
 ):
     """Test PostgreSQL connection to server"""
-    servers = await load_servers()
-    server = next((s for s in servers if s.name == server_name), None)
+    server = await server_registry.get(server_name)
     if not server:
         raise HTTPException(status_code=404, detail="Server not found")
 
+    # Ручная проверка — всегда реальное подключение, даже если сервер помечен недоступным
+    server_health.pg.reset(server_name)
+
     try:
-        if not is_host_reachable(server.host, server.port):
+        if not await remote_access.host_reachable(server.host, server.port):
+            server_health.pg.record_failure(server_name, "host unreachable")
             return {"success": False, "message": f"Хост {server.host}:{server.port} недоступен"}
 
         import time
         start = time.time()
-        result = await asyncio.to_thread(connect_to_server, server)
+        result = await remote_access.server_status(server)
         elapsed = time.time() - start
 
         if result.get("status", "").startswith("ok"):
@@ -248,8 +264,7 @@ async def test_ssh_connection(
     current_user: User = Depends(get_current_user)
 ):
     """Test SSH connection to server"""
-    servers = await load_servers()
-    server = next((s for s in servers if s.name == server_name), None)
+    server = await server_registry.get(server_name)
     if not server:
         raise HTTPException(status_code=404, detail="Server not found")
 
@@ -265,20 +280,16 @@ async def test_ssh_connection(
                 passphrase
             )
 
-            success, message = SSHKeyManager.test_ssh_connection(
-                host=server.host,
-                port=server.ssh_port,
-                username=server.ssh_user,
+            success, message = await remote_access.test_ssh(
+                server,
                 private_key_content=private_key_content,
                 passphrase=key_passphrase
             )
         else:
-            success, message = SSHKeyManager.test_ssh_connection(
-                host=server.host,
-                port=server.ssh_port,
-                username=server.ssh_user,
-                password=server.ssh_password
-            )
+            success, message = await remote_access.test_ssh(server, password=server.ssh_password)
+
+        if success:
+            server_health.ssh.reset(server_name)
 
         return {
             "success": success,
@@ -6,6 +6,7 @@ from app.auth.dependencies import get_current_user
 from app.models.user import User, UserRole
 from app.database.repositories import settings_repo
 from app.services import audit_logger
+from app.services.settings_cache import settings_cache
 
 router = APIRouter(prefix="/settings", tags=["settings"])
 
@@ -14,7 +15,11 @@ VALIDATION_RULES = {
     "collect_interval":     {"min": 60,  "max": 86400, "label": "Интервал сбора статистики"},
     "size_update_interval": {"min": 300, "max": 86400, "label": "Интервал обновления размеров"},
     "db_check_interval":    {"min": 300, "max": 86400, "label": "Интервал проверки БД"},
-    "retention_months":     {"min": 1,   "max": 120,   "label": "Срок хранения данных"},
+    "raw_retention_days":   {"min": 7,   "max": 3650,  "label": "Срок хранения сырых сэмплов"},
+    "hourly_retention_months": {"min": 1, "max": 120,  "label": "Срок хранения часовых агрегатов"},
+    "daily_retention_months": {"min": 1,  "max": 120,  "label": "Срок хранения суточных агрегатов"},
+    "chunk_after_days":     {"min": 0,   "max": 3650,  "label": "Сжатие закрытых месяцев"},
+    "change_only_heartbeat": {"min": 0,  "max": 1000,  "label": "Хранение только изменений"},
     "audit_retention_days": {"min": 7,   "max": 3650,  "label": "Срок хранения аудита"},
     "logs_retention_days":  {"min": 7,   "max": 3650,  "label": "Срок хранения логов"},
 }
@@ -24,7 +29,11 @@ class SettingsUpdate(BaseModel):
     collect_interval: int | None = None
     size_update_interval: int | None = None
     db_check_interval: int | None = None
-    retention_months: int | None = None
+    raw_retention_days: int | None = None
+    hourly_retention_months: int | None = None
+    daily_retention_months: int | None = None
+    chunk_after_days: int | None = None
+    change_only_heartbeat: int | None = None
     audit_retention_days: int | None = None
     logs_retention_days: int | None = None
 
@@ -66,6 +75,8 @@ async def update_settings(
         raise HTTPException(status_code=400, detail="Нет данных для обновления")
 
     result = await settings_repo.update_settings(updates)
+    # Свой процесс обновляем сразу, остальные — по NOTIFY
+    settings_cache.apply(result)
 
     # Формируем детали аудита: что изменилось
     changes = []
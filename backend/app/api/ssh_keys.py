@@ -1,11 +1,12 @@
 # app/api/ssh_keys.py
+import asyncio
 from fastapi import APIRouter, HTTPException, Depends, status, UploadFile, File, Request
 import logging
 from app.models.ssh_key import SSHKeyCreate, SSHKeyImport, SSHKeyResponse
 from app.models.user import User, UserRole
 from app.auth.dependencies import get_current_user
 from app.services import ssh_key_storage, audit_logger
-from app.services.server import load_servers
+from app.services.server_registry import server_registry
 
 logger = logging.getLogger(__name__)
 
@@ -128,7 +129,8 @@ async def import_ssh_key(
 
         # Сначала валидируем ключ и получаем его fingerprint
         from app.services.ssh_key_manager import SSHKeyManager
-        is_valid, error_msg, fingerprint = SSHKeyManager.validate_private_key(
+        is_valid, error_msg, fingerprint = await asyncio.to_thread(
+            SSHKeyManager.validate_private_key,
             key_data.private_key,
             key_data.passphrase
         )
@@ -191,7 +193,8 @@ async def import_ssh_key_file(
 
         # Валидируем ключ и получаем fingerprint
         from app.services.ssh_key_manager import SSHKeyManager
-        is_valid, error_msg, fingerprint = SSHKeyManager.validate_private_key(
+        is_valid, error_msg, fingerprint = await asyncio.to_thread(
+            SSHKeyManager.validate_private_key,
             private_key,
             passphrase
         )
@@ -288,7 +291,7 @@ async def delete_ssh_key(
     """Удалить SSH-ключ"""
     try:
         # Проверяем, не используется ли ключ
-        servers = await load_servers()
+        servers = await server_registry.list_infos()
         servers_using_key = [
             s.name for s in servers
             if getattr(s, 'ssh_key_id', None) == key_id
@@ -331,7 +334,7 @@ async def get_key_servers(
     if not key:
         raise HTTPException(status_code=404, detail="SSH-ключ не найден")
 
-    servers = await load_servers()
+    servers = await server_registry.list_infos()
     servers_using_key = [
         {"name": s.name, "host": s.host}
         for s in servers
@@ -373,7 +376,7 @@ async def update_servers_count(
     current_user: User = Depends(get_current_user)
 ):
     """Обновить количество серверов, использующих ключ"""
-    servers = await load_servers()
+    servers = await server_registry.list_infos()
     count = len([s for s in servers if getattr(s, 'ssh_key_id', None) == key_id])
 
     return {"key_id": key_id, "servers_count": count}
@@ -2,11 +2,17 @@
 from fastapi import APIRouter, HTTPException, Depends
 from datetime import datetime, timedelta, timezone
 import logging
+import math
 from app.models.user import User
 from app.auth import get_current_user
-from app.services import load_servers
-from app.database import db_pool
+from app.services.server_registry import server_registry
+from app.services.server_health import ServerUnavailableError
+from app.services import remote_access
+from app.services.remote_access import RemoteDeadlineError
+from app.services.retention import retention_horizons
 from app.database.local_db import get_pool
+from app.database import chunks, steps
+from app.database.series import SERVER_SERIES, DB_SERIES
 
 logger = logging.getLogger(__name__)
 
@@ -25,29 +31,133 @@ def parse_date_param(value: str | None, default_offset_days: int | None = None)
         raise HTTPException(status_code=400, detail=f"Невалидный формат даты: {value}")
 
 
-# Белый список SQL-выражений для агрегации (защита от SQL injection)
+# Источники строк для агрегации: сырые сэмплы statistics или агрегаты
+# statistics_hourly/statistics_daily (rollups.py). Выражения дают одинаковый
+# результат: среднее по агрегатам — sum_backends / samples. range — условие
+# на период ({start}/{end} — номера параметров); бакет агрегата попадает в
+# период, если пересекается с ним.
+_SOURCES = {
+    "raw": {
+        "table": "statistics",
+        "ts": "ts",
+        "range": "ts BETWEEN {start} AND {end}",
+        "avg_connections": "AVG(numbackends)",
+        "sum_connections": "SUM(numbackends)",
+        "max_connections": "MAX(numbackends)",
+        "min_connections": "MIN(numbackends)",
+        "sum_commits": "SUM(xact_commit)",
+    },
+    "hourly": {
+        "table": "statistics_hourly",
+        "ts": "bucket",
+        "range": "bucket > {start}::timestamptz - interval '1 hour' AND bucket <= {end}",
+        "avg_connections": "SUM(sum_backends)::float8 / NULLIF(SUM(samples), 0)",
+        "sum_connections": "SUM(sum_backends)::bigint",
+        "max_connections": "MAX(max_backends)",
+        "min_connections": "MIN(min_backends)",
+        "sum_commits": "SUM(sum_xact_commit)",
+    },
+}
+_SOURCES["daily"] = {
+    **_SOURCES["hourly"],
+    "table": "statistics_daily",
+    "range": "bucket > {start}::timestamptz - interval '1 day' AND bucket <= {end}",
+}
+
+# Белый список SQL-выражений для агрегации (защита от SQL injection).
+# width — длина бакета: размер БД для точки timeline берётся из последнего
+# замера db_sizes не позже конца бакета. Часовой и 4-часовой уровни читают
+# часовые агрегаты, суточный — суточные.
 _AGG_LEVELS = {
     "raw": {
+        "source": "raw",
         "trunc": "ts",
         "group": "ts",
+        "width": "interval '0'",
     },
     "hour": {
-        "trunc": "date_trunc('hour', ts)",
-        "group": "date_trunc('hour', ts)",
+        "source": "hourly",
+        "trunc": "bucket",
+        "group": "bucket",
+        "width": "interval '1 hour'",
     },
     "4hour": {
-        "trunc": "to_timestamp(floor(extract(epoch from ts) / 14400) * 14400)",
-        "group": "floor(extract(epoch from ts) / 14400)",
+        "source": "hourly",
+        "trunc": "to_timestamp(floor(extract(epoch from bucket) / 14400) * 14400)",
+        "group": "floor(extract(epoch from bucket) / 14400)",
+        "width": "interval '4 hours'",
     },
     "day": {
-        "trunc": "date_trunc('day', ts)",
-        "group": "date_trunc('day', ts)",
+        "source": "daily",
+        "trunc": "bucket",
+        "group": "bucket",
+        "width": "interval '1 day'",
     },
 }
 
+# Бакет timeline метрик сервера (server_stats) для уровня get_aggregation_params.
+# Все уровни читают server_stats: строка на сэмпл сервера, а не на каждую БД
+_SERVER_TRUNC = {
+    "raw": "ts",
+    "hour": "date_trunc('hour', ts, 'UTC')",
+    "4hour": "to_timestamp(floor(extract(epoch from ts) / 14400) * 14400)",
+    "day": "date_trunc('day', ts, 'UTC')",
+}
+
+# Последний известный размер БД на момент бакета c.ts (c — подзапрос timeline).
+# Замеры db_sizes — ступенчатый ряд и в режиме хранения только изменений.
+_SIZE_AT_BUCKET = """
+    LEFT JOIN LATERAL (
+        SELECT d.db_size
+        FROM db_sizes d
+        WHERE d.server_name = $1 AND d.datname = c.datname AND d.ts <= c.ts + {width}
+        ORDER BY d.ts DESC
+        LIMIT 1
+    ) z ON true
+"""
+
+
+async def _raw_source(pool, src: dict, series_where: str, args: tuple, start_dt, end_dt) -> tuple[dict, list]:
+    """
+    Источник уровня raw: statistics вместе с сэмплами упакованных месяцев
+    (chunks.py) и массивы-параметры для них (идут после args, start_dt,
+    end_dt); если в периоде действовал режим хранения только изменений —
+    восстановленные ряды (steps.py). Для остальных уровней, без чанков и без
+    режима — (src, []). args[0] — имя сервера.
+    """
+    if src is not _SOURCES["raw"]:
+        return src, []
+    lookback = await steps.max_span(pool, "statistics", args[0], start_dt, end_dt)
+    table, packed = src["table"], []
+    # Точки восстановленного ряда — циклы всего сервера ($1 в обоих условиях)
+    chunk_where, chunk_args = (SERVER_SERIES, args[:1]) if lookback else (series_where, args)
+    columns = await chunks.fetch_columns(pool, chunk_where, chunk_args, start_dt - lookback, end_dt)
+    if columns[0]:
+        table, packed = chunks.union_source(first=len(args) + 3), columns
+    if lookback:
+        n = len(args)
+        table = steps.source(table, series_where, f"${n + 1}", f"${n + 2}", lookback, grid_where=SERVER_SERIES)
+    elif not packed:
+        return src, []
+    return {**src, "table": table}, packed
+
+
+async def _size_since(pool, param: str, server_name: str, start_dt, end_dt) -> str:
+    """
+    Начало поиска последнего замера db_sizes для периода с начала param: в
+    режиме хранения только изменений замер действует span своей эпохи после
+    записи (steps.max_span).
+    """
+    lookback = await steps.max_span(pool, "db_sizes", server_name, start_dt, end_dt)
+    return f"{param}::timestamptz - interval '{math.ceil(lookback.total_seconds())} seconds'"
+
 
 def get_aggregation_params(start_dt, end_dt):
-    """Определяет параметры агрегации SQL в зависимости от диапазона дат."""
+    """
+    Определяет уровень агрегации и таблицу-источник в зависимости от диапазона
+    дат. Если начало периода старше срока хранения уровня (retention.py),
+    берётся следующий, более грубый уровень, данные которого там ещё есть.
+    """
     delta_days = (end_dt - start_dt).total_seconds() / 86400
 
     if delta_days <= 2:
@@ -59,24 +169,37 @@ def get_aggregation_params(start_dt, end_dt):
     else:
         level = "day"
 
+    horizons = retention_horizons()
+    start_utc = start_dt if start_dt.tzinfo else start_dt.replace(tzinfo=timezone.utc)
+    if level == "raw" and start_utc < horizons["raw"]:
+        level = "hour"
+    if level in ("hour", "4hour") and start_utc < horizons["hourly"]:
+        level = "day"
+
     agg = _AGG_LEVELS[level]
-    return {"trunc": agg["trunc"], "group": agg["group"], "level": level}
+    return {
+        "trunc": agg["trunc"], "group": agg["group"], "width": agg["width"], "level": level,
+        "source": _SOURCES[agg["source"]],
+    }
 
 @router.get("/server_stats/{server_name}")
 async def get_server_stats(server_name: str, current_user: User = Depends(get_current_user)):
     """Получить текущую активность на сервере (live с удалённого сервера)"""
-    servers = await load_servers()
-    server = next((s for s in servers if s.name == server_name), None)
+    server = await server_registry.get(server_name)
     if not server:
         raise HTTPException(status_code=404, detail="Server not found")
 
     try:
-        with db_pool.get_connection(server) as conn:
-            with conn.cursor() as cur:
-                cur.execute("SELECT pid, usename, datname, query, state FROM pg_stat_activity WHERE state IS NOT NULL;")
-                queries = [{"pid": row[0], "usename": row[1], "datname": row[2], "query": row[3], "state": row[4]}
-                          for row in cur.fetchall()]
+        rows = await remote_access.fetch(
+            server, "SELECT pid, usename, datname, query, state FROM pg_stat_activity WHERE state IS NOT NULL;"
+        )
+        queries = [{"pid": row[0], "usename": row[1], "datname": row[2], "query": row[3], "state": row[4]}
+                  for row in rows]
         return {"queries": queries}
+    except ServerUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(int(e.retry_in) + 1)})
+    except RemoteDeadlineError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.error(f"Ошибка получения активности для {server_name}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -89,8 +212,7 @@ async def get_server_stats_details(
     current_user: User = Depends(get_current_user)
 ):
     """Получить детальную статистику сервера за период (из локальной pam_stats)"""
-    servers = await load_servers()
-    server = next((s for s in servers if s.name == server_name), None)
+    server = await server_registry.get(server_name)
     if not server:
         raise HTTPException(status_code=404, detail="Server not found")
 
@@ -107,32 +229,52 @@ async def get_server_stats_details(
         start_date_dt = parse_date_param(start_date, default_offset_days=7)
         end_date_dt = parse_date_param(end_date)
 
-        # Последнее обновление
+        # Последнее обновление (latest_sample, см. app/database/latest.py)
         last_update = await pool.fetchval(
-            "SELECT MAX(ts) FROM statistics WHERE server_name = $1;",
-            server_name
+            "SELECT MAX(ts) FROM latest_sample WHERE server_name = $1;", server_name
         )
         result["last_stat_update"] = last_update.isoformat() if last_update else None
 
+        # Длинные периоды читаются из агрегатов (см. get_aggregation_params)
+        agg = get_aggregation_params(start_date_dt, end_date_dt)
+        src, packed = await _raw_source(pool, agg["source"], SERVER_SERIES, (server_name,), start_date_dt, end_date_dt)
+        period = src["range"].format(start="$2", end="$3")
+
         # Агрегированные данные
-        stats = await pool.fetchrow(
-            """
-            SELECT SUM(numbackends), SUM(db_size::float / (1048576 * 1024))
-            FROM statistics
-            WHERE server_name = $1 AND ts BETWEEN $2 AND $3;
+        total_connections = await pool.fetchval(
+            f"""
+            SELECT {src['sum_connections']}
+            FROM {src['table']}
+            WHERE {SERVER_SERIES} AND {period};
+            """,
+            server_name, start_date_dt, end_date_dt, *packed
+        )
+        result["total_connections"] = total_connections or 0
+
+        # Суммарный размер: последний замер каждой БД за период
+        size_since = await _size_since(pool, "$2", server_name, start_date_dt, end_date_dt)
+        total_size = await pool.fetchval(
+            f"""
+            SELECT SUM(db_size::float / (1048576 * 1024))
+            FROM (
+                SELECT DISTINCT ON (datname) db_size
+                FROM db_sizes
+                WHERE server_name = $1 AND ts BETWEEN {size_since} AND $3
+                ORDER BY datname, ts DESC
+            ) last_sizes;
             """,
             server_name, start_date_dt, end_date_dt
         )
-        result["total_connections"] = stats[0] or 0 if stats else 0
-        result["total_size_gb"] = stats[1] or 0 if stats else 0
+        result["total_size_gb"] = total_size or 0
 
-        # Список БД
+        # Список БД: ряды, чьи сэмплы [first_ts, ts] пересекают период
         db_rows = await pool.fetch(
             """
-            SELECT DISTINCT s.datname, d.creation_time
-            FROM statistics s
-            LEFT JOIN db_info d ON s.server_name = d.server_name AND s.datname = d.datname
-            WHERE s.server_name = $1 AND s.ts BETWEEN $2 AND $3;
+            SELECT l.datname, d.creation_time, d.datname IS NOT NULL AS known
+            FROM latest_sample l
+            LEFT JOIN db_info d ON d.server_name = l.server_name AND d.datname = l.datname
+            WHERE l.server_name = $1 AND l.first_ts <= $3 AND l.ts >= $2
+            ORDER BY l.datname;
             """,
             server_name, start_date_dt, end_date_dt
         )
@@ -142,36 +284,44 @@ async def get_server_stats_details(
         ]
 
         # Timeline с адаптивной агрегацией
-        agg = get_aggregation_params(start_date_dt, end_date_dt)
         timeline_rows = await pool.fetch(
             f"""
-            SELECT {agg['trunc']} as ts, datname,
-                   AVG(numbackends) as avg_connections,
-                   MAX(db_size::float / (1048576 * 1024)) as max_size_gb
-            FROM statistics
-            WHERE server_name = $1 AND ts BETWEEN $2 AND $3
-            GROUP BY {agg['group']}, datname
+            SELECT c.ts, c.datname, c.avg_connections,
+                   z.db_size::float / (1048576 * 1024) as size_gb
+            FROM (
+                SELECT b.ts, r.datname, b.avg_connections
+                FROM (
+                    SELECT {agg['trunc']} as ts, series_id,
+                           {src['avg_connections']} as avg_connections
+                    FROM {src['table']}
+                    WHERE {SERVER_SERIES} AND {period}
+                    GROUP BY {agg['group']}, series_id
+                ) b
+                JOIN series r ON r.id = b.series_id
+            ) c
+            {_SIZE_AT_BUCKET.format(width=agg['width'])}
             ORDER BY 1;
             """,
-            server_name, start_date_dt, end_date_dt
+            server_name, start_date_dt, end_date_dt, *packed
         )
         timeline = [
             {
                 "ts": row["ts"].isoformat(),
                 "datname": row["datname"],
                 "connections": round(row["avg_connections"] or 0),
-                "size_gb": row["max_size_gb"] or 0
+                "size_gb": row["size_gb"] or 0
             }
             for row in timeline_rows
         ]
         result["connection_timeline"] = timeline
         result["aggregation"] = agg["level"]
 
-        # Проверяем существующие БД на удалённом сервере
-        with db_pool.get_connection(server) as conn:
-            with conn.cursor() as cur:
-                cur.execute("SELECT datname FROM pg_database WHERE datistemplate = false;")
-                active_dbs = [row[0] for row in cur.fetchall()]
+        # Проверяем существующие БД на удалённом сервере; если он недоступен или не ответил — по db_info
+        try:
+            active_rows = await remote_access.fetch(server, "SELECT datname FROM pg_database WHERE datistemplate = false;")
+            active_dbs = [row[0] for row in active_rows]
+        except (ServerUnavailableError, RemoteDeadlineError, OSError):
+            active_dbs = [row["datname"] for row in db_rows if row["known"]]
 
         result["databases"] = [
             {"name": db["name"], "exists": db["name"] in active_dbs, "creation_time": db["creation_time"]}
@@ -186,6 +336,67 @@ async def get_server_stats_details(
         logger.error(f"Ошибка получения статистики для {server_name}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/server/{server_name}/timeline")
+async def get_server_timeline(
+    server_name: str,
+    start_date: str | None = None,
+    end_date: str | None = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Timeline метрик сервера за период: диск, соединения, uptime, версия (из server_stats)"""
+    server = await server_registry.get(server_name)
+    if not server:
+        raise HTTPException(status_code=404, detail="Server not found")
+
+    try:
+        pool = get_pool()
+        start_date_dt = parse_date_param(start_date, default_offset_days=7)
+        end_date_dt = parse_date_param(end_date)
+        level = get_aggregation_params(start_date_dt, end_date_dt)["level"]
+
+        # Диск, время старта и версия — последний замер бакета, соединения — среднее и пик
+        rows = await pool.fetch(
+            f"""
+            SELECT {_SERVER_TRUNC[level]} AS bucket,
+                   AVG(connections) AS avg_connections,
+                   MAX(connections) AS max_connections,
+                   (array_agg(disk_free ORDER BY ts DESC) FILTER (WHERE disk_free IS NOT NULL))[1] AS disk_free,
+                   (array_agg(disk_total ORDER BY ts DESC) FILTER (WHERE disk_total IS NOT NULL))[1] AS disk_total,
+                   (array_agg(started_at ORDER BY ts DESC))[1] AS started_at,
+                   (array_agg(version ORDER BY ts DESC))[1] AS version,
+                   MAX(ts) AS last_ts
+            FROM server_stats
+            WHERE server_name = $1 AND ts BETWEEN $2 AND $3
+            GROUP BY 1
+            ORDER BY 1;
+            """,
+            server_name, start_date_dt, end_date_dt
+        )
+        # Строки, перенесённые из statistics (migrate_series.py), содержат только диск
+        gb = 1048576 * 1024
+        timeline = [
+            {
+                "ts": row["bucket"].isoformat(),
+                "connections": round(row["avg_connections"]) if row["avg_connections"] is not None else None,
+                "max_connections": row["max_connections"],
+                "disk_free_gb": row["disk_free"] / gb if row["disk_free"] is not None else None,
+                "disk_total_gb": row["disk_total"] / gb if row["disk_total"] is not None else None,
+                "uptime_hours": (
+                    round((row["last_ts"] - row["started_at"]).total_seconds() / 3600, 2)
+                    if row["started_at"] else None
+                ),
+                "version": row["version"],
+            }
+            for row in rows
+        ]
+        return {"aggregation": level, "timeline": timeline}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Ошибка получения timeline сервера {server_name}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/server/{server_name}/db/{db_name}")
 async def get_database_stats(
     server_name: str,
@@ -193,9 +404,7 @@ async def get_database_stats(
     current_user: User = Depends(get_current_user)
 ):
     """Получить краткую статистику по базе данных (из локальной pam_stats)"""
-    servers = await load_servers()
-    server = next((s for s in servers if s.name == server_name), None)
-    if not server:
+    if not await server_registry.get_info(server_name):
         raise HTTPException(status_code=404, detail="Server not found")
 
     result = {
@@ -208,14 +417,12 @@ async def get_database_stats(
     try:
         pool = get_pool()
 
-        # Последняя запись из локальной статистики
+        # Последние значения ряда и последний замер размера (latest_sample)
         stats = await pool.fetchrow(
             """
-            SELECT numbackends, db_size::float / 1048576, xact_commit, ts
-            FROM statistics
-            WHERE server_name = $1 AND datname = $2 AND db_size IS NOT NULL
-            ORDER BY ts DESC
-            LIMIT 1;
+            SELECT numbackends, db_size::float / 1048576 AS size_mb, xact_commit, ts
+            FROM latest_sample
+            WHERE server_name = $1 AND datname = $2;
             """,
             server_name, db_name
         )
@@ -225,14 +432,6 @@ async def get_database_stats(
             result["commits"] = stats[2] or 0
             result["last_update"] = stats[3].isoformat() if stats[3] else None
 
-        # Если размер не найден, получаем напрямую с удалённого сервера
-        if result["size_mb"] == 0:
-            with db_pool.get_connection(server) as conn:
-                with conn.cursor() as cur:
-                    cur.execute("SELECT pg_database_size(%s) / 1048576.0 AS size_mb;", (db_name,))
-                    real_size = cur.fetchone()[0]
-                    result["size_mb"] = real_size or 0
-
         return result
 
     except HTTPException:
@@ -250,9 +449,7 @@ async def get_database_stats_details(
     current_user: User = Depends(get_current_user)
 ):
     """Получить детальную статистику по базе данных за период (из локальной pam_stats)"""
-    servers = await load_servers()
-    server = next((s for s in servers if s.name == server_name), None)
-    if not server:
+    if not await server_registry.get_info(server_name):
         raise HTTPException(status_code=404, detail="Server not found")
 
     result = {
@@ -273,20 +470,30 @@ async def get_database_stats_details(
 
         # Последнее обновление
         last_update = await pool.fetchval(
-            "SELECT MAX(ts) FROM statistics WHERE server_name = $1 AND datname = $2;",
-            server_name, db_name
+            "SELECT ts FROM latest_sample WHERE server_name = $1 AND datname = $2;", server_name, db_name
         )
         result["last_stat_update"] = last_update.isoformat() if last_update else None
 
+        # Длинные периоды читаются из агрегатов (см. get_aggregation_params)
+        agg = get_aggregation_params(start_date_dt, end_date_dt)
+        src, packed = await _raw_source(pool, agg["source"], DB_SERIES, (server_name, db_name), start_date_dt, end_date_dt)
+        period = src["range"].format(start="$3", end="$4")
+        size_since = await _size_since(pool, "$3", server_name, start_date_dt, end_date_dt)
+
         # Агрегированные метрики
         stats = await pool.fetchrow(
-            """
-            SELECT SUM(numbackends), SUM(xact_commit), SUM(db_size::float / 1048576),
-                   MAX(numbackends), MIN(numbackends)
-            FROM statistics
-            WHERE server_name = $1 AND datname = $2 AND ts BETWEEN $3 AND $4;
+            f"""
+            SELECT {src['sum_connections']}, {src['sum_commits']},
+                   (SELECT db_size::float / 1048576
+                    FROM db_sizes
+                    WHERE server_name = $1 AND datname = $2 AND ts BETWEEN {size_since} AND $4
+                    ORDER BY ts DESC
+                    LIMIT 1),
+                   {src['max_connections']}, {src['min_connections']}
+            FROM {src['table']}
+            WHERE {DB_SERIES} AND {period};
             """,
-            server_name, db_name, start_date_dt, end_date_dt
+            server_name, db_name, start_date_dt, end_date_dt, *packed
         )
         if stats:
             result["total_connections"] = stats[0] or 0
@@ -303,25 +510,28 @@ async def get_database_stats_details(
         result["creation_time"] = creation_time.isoformat() if creation_time else None
 
         # Timeline с адаптивной агрегацией
-        agg = get_aggregation_params(start_date_dt, end_date_dt)
         timeline_rows = await pool.fetch(
             f"""
-            SELECT {agg['trunc']} as ts,
-                   AVG(numbackends) as avg_connections,
-                   MAX(db_size::float / 1048576) as max_size_mb,
-                   SUM(xact_commit) as total_commits
-            FROM statistics
-            WHERE server_name = $1 AND datname = $2 AND ts BETWEEN $3 AND $4
-            GROUP BY {agg['group']}
+            SELECT c.ts, c.avg_connections, c.total_commits,
+                   z.db_size::float / 1048576 as size_mb
+            FROM (
+                SELECT {agg['trunc']} as ts, $2::text as datname,
+                       {src['avg_connections']} as avg_connections,
+                       {src['sum_commits']} as total_commits
+                FROM {src['table']}
+                WHERE {DB_SERIES} AND {period}
+                GROUP BY {agg['group']}
+            ) c
+            {_SIZE_AT_BUCKET.format(width=agg['width'])}
             ORDER BY 1;
             """,
-            server_name, db_name, start_date_dt, end_date_dt
+            server_name, db_name, start_date_dt, end_date_dt, *packed
         )
         timeline = [
             {
                 "ts": row["ts"].isoformat(),
                 "connections": round(row["avg_connections"] or 0),
-                "size_mb": row["max_size_mb"] or 0,
+                "size_mb": row["size_mb"] or 0,
                 "commits": row["total_commits"] or 0
             }
             for row in timeline_rows
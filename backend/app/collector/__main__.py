@@ -0,0 +1,80 @@
+# app/collector/__main__.py
+"""
+Коллектор статистики как отдельный процесс:
+
+    python -m app.collector
+
+API при этом запускается с COLLECTOR_MODE=external и коллектор не стартует.
+Процессы не общаются напрямую — только через локальную БД pam_stats
+(серверы, настройки, статистика), поэтому число воркеров uvicorn и
+процессов коллектора масштабируется независимо.
+"""
+import asyncio
+import logging
+import signal
+
+from app.config import LOG_LEVEL, COLLECTOR_MODE, COLLECTOR_METRICS_PORT, COLLECTOR_METRICS_HOST, LOOP_BLOCK_WARN_MS
+from app.database import db_pool, remote_pool
+from app.database.local_db import init_pool, close_pool
+from app.services.ssh_pool import ssh_pool
+from app.database.notify import notify_listener
+from app.services.settings_cache import settings_cache
+from app.services.server_registry import server_registry
+from app.collector.scheduler import start_collector, stop_collector
+from app.metrics import start_http_server
+from app.loop_watchdog import LoopWatchdog
+
+logging.basicConfig(
+    level=getattr(logging, LOG_LEVEL),
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger("app.collector")
+
+
+async def main():
+    logger.info("=" * 60)
+    logger.info("PostgreSQL Activity Monitor — коллектор (отдельный процесс)")
+    logger.info(f"Уровень логирования: {LOG_LEVEL}")
+    logger.info("=" * 60)
+    if COLLECTOR_MODE == "embedded":
+        logger.warning(
+            "COLLECTOR_MODE=embedded: API тоже запускает коллектор, серверы будут опрашиваться дважды. "
+            "Для API задайте COLLECTOR_MODE=external"
+        )
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    watchdog = LoopWatchdog(LOOP_BLOCK_WARN_MS) if LOOP_BLOCK_WARN_MS else None
+    if watchdog:
+        watchdog.start()
+    await init_pool()
+    await notify_listener.start()
+    await settings_cache.start()
+    await server_registry.start()
+    tasks = await start_collector()
+    metrics_server = (
+        await start_http_server(COLLECTOR_METRICS_PORT, COLLECTOR_METRICS_HOST) if COLLECTOR_METRICS_PORT else None
+    )
+    try:
+        await stop.wait()
+    finally:
+        logger.info("Получен сигнал остановки")
+        if metrics_server is not None:
+            metrics_server.close()
+        await stop_collector(tasks)
+        await notify_listener.stop()
+        await close_pool()
+        db_pool.close_all()
+        await remote_pool.close_all()
+        ssh_pool.close_all()
+        if watchdog:
+            await watchdog.stop()
+        logger.info("Коллектор завершён")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
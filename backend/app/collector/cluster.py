@@ -0,0 +1,216 @@
+# app/collector/cluster.py
+"""
+Шардирование серверов между несколькими процессами коллектора.
+
+Каждый процесс коллектора — узел (collector_nodes) с heartbeat раз в
+COLLECTOR_HEARTBEAT_INTERVAL секунд. Узел без heartbeat дольше
+COLLECTOR_NODE_TTL считается мёртвым. Серверы распределяются между живыми
+узлами consistent hashing'ом: каждый узел сам вычисляет свою долю по одному
+и тому же списку узлов, поэтому при появлении/пропаже узла переезжает только
+~1/N серверов.
+
+Чтобы в момент перебалансировки (пока узлы видят разный состав кластера)
+сервер не опрашивался дважды, опрашивать можно только арендованный сервер
+(server_leases). Аренда продлевается каждым heartbeat и истекает через
+COLLECTOR_NODE_TTL; чужую живую аренду захватить нельзя — новый владелец
+получит сервер, когда прежний её отпустит или она истечёт.
+"""
+import asyncio
+import bisect
+import hashlib
+import json
+import logging
+import os
+import socket
+import time
+
+from app.config import COLLECTOR_NODE_ID, COLLECTOR_HEARTBEAT_INTERVAL, COLLECTOR_NODE_TTL
+from app.database.local_db import get_pool
+from app.services.server_registry import server_registry
+
+logger = logging.getLogger(__name__)
+
+VNODES = 64  # виртуальных точек на узел в кольце — равномернее распределение
+
+_HEARTBEAT = """
+    INSERT INTO collector_nodes (node_id, hostname, pid, started_at, heartbeat, status)
+    VALUES ($1, $2, $3, now(), now(), $4::jsonb)
+    ON CONFLICT (node_id) DO UPDATE SET heartbeat = now(), status = EXCLUDED.status
+"""
+
+# Захват свободных/истёкших аренд и продление своих; возвращает фактически арендованные
+_ACQUIRE_LEASES = """
+    INSERT INTO server_leases (server_name, node_id, acquired_at, expires_at)
+    SELECT u.name, $1, now(), now() + make_interval(secs => $3)
+    FROM unnest($2::text[]) AS u(name)
+    ON CONFLICT (server_name) DO UPDATE SET
+        node_id = EXCLUDED.node_id,
+        acquired_at = CASE WHEN server_leases.node_id = EXCLUDED.node_id
+                           THEN server_leases.acquired_at ELSE now() END,
+        expires_at = EXCLUDED.expires_at
+    WHERE server_leases.node_id = EXCLUDED.node_id OR server_leases.expires_at < now()
+    RETURNING server_name
+"""
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Кольцо consistent hashing с виртуальными узлами."""
+
+    def __init__(self, nodes: list[str], vnodes: int = VNODES):
+        self._ring = sorted((_hash(f"{node}#{i}"), node) for node in nodes for i in range(vnodes))
+        self._keys = [h for h, _ in self._ring]
+
+    def owner(self, key: str) -> str | None:
+        if not self._ring:
+            return None
+        i = bisect.bisect(self._keys, _hash(key)) % len(self._ring)
+        return self._ring[i][1]
+
+
+class CollectorCluster:
+    """Членство узла в кластере коллекторов и аренда его доли серверов."""
+
+    def __init__(self, node_id: str | None = None):
+        self.hostname = socket.gethostname()
+        self.node_id = node_id or f"{self.hostname}:{os.getpid()}"
+        self.owned: frozenset[str] = frozenset()
+        self.nodes: list[str] = []
+        self._leases_valid_until = 0.0  # monotonic: после этого момента аренды считаем потерянными
+        self._listeners: list[asyncio.Event] = []
+        self._status_provider = None
+
+    def owns(self, server_name: str) -> bool:
+        """Можно ли этому узлу опрашивать сервер прямо сейчас."""
+        return server_name in self.owned and time.monotonic() < self._leases_valid_until
+
+    def is_leader(self) -> bool:
+        """Лидер (узел с минимальным node_id) выполняет обслуживание БД."""
+        return bool(self.nodes) and self.nodes[0] == self.node_id
+
+    def subscribe(self) -> asyncio.Event:
+        """Событие, выставляемое при изменении набора арендованных серверов."""
+        event = asyncio.Event()
+        self._listeners.append(event)
+        return event
+
+    def set_status_provider(self, provider):
+        """Функция, возвращающая краткий статус узла для collector_nodes.status."""
+        self._status_provider = provider
+
+    def _set_owned(self, owned: frozenset[str]):
+        if owned == self.owned:
+            return
+        added, removed = owned - self.owned, self.owned - owned
+        self.owned = owned
+        logger.info(
+            f"[cluster] {self.node_id}: серверов {len(owned)} "
+            f"(+{len(added)} / -{len(removed)}), узлов в кластере: {len(self.nodes)}"
+        )
+        for event in self._listeners:
+            event.set()
+
+    async def heartbeat(self):
+        """Один такт: heartbeat, очистка мёртвых узлов, перерасчёт доли и аренда."""
+        # Отсчёт TTL — до записи heartbeat: аренда не может пережить узел в глазах других
+        started = time.monotonic()
+        status = self._status_provider() if self._status_provider else None
+        pool = get_pool()
+        async with pool.acquire() as conn:
+            await conn.execute(
+                _HEARTBEAT, self.node_id, self.hostname, os.getpid(),
+                None if status is None else json.dumps(status, ensure_ascii=False, default=str),
+            )
+            # Мёртвые узлы и их аренды — сразу освобождаем серверы
+            dead = await conn.fetch(
+                """
+                DELETE FROM collector_nodes
+                WHERE heartbeat < now() - make_interval(secs => $1)
+                RETURNING node_id
+                """,
+                COLLECTOR_NODE_TTL,
+            )
+            if dead:
+                dead_ids = [r["node_id"] for r in dead]
+                await conn.execute("DELETE FROM server_leases WHERE node_id = ANY($1::text[])", dead_ids)
+                logger.warning(f"[cluster] Узлы без heartbeat удалены: {', '.join(dead_ids)}")
+
+            self.nodes = [r["node_id"] for r in await conn.fetch(
+                "SELECT node_id FROM collector_nodes ORDER BY node_id"
+            )]
+            ring = HashRing(self.nodes)
+            wanted = [info.name for info in await server_registry.list_infos() if ring.owner(info.name) == self.node_id]
+
+            # Перестаём опрашивать отпускаемые серверы до фиксации release: после неё
+            # их может арендовать другой узел
+            self._set_owned(self.owned & frozenset(wanted))
+            async with conn.transaction():
+                # Отпускаем серверы, которые по кольцу теперь принадлежат другим узлам
+                await conn.execute(
+                    "DELETE FROM server_leases WHERE node_id = $1 AND server_name <> ALL($2::text[])",
+                    self.node_id, wanted,
+                )
+                rows = await conn.fetch(_ACQUIRE_LEASES, self.node_id, wanted, float(COLLECTOR_NODE_TTL))
+        self._leases_valid_until = started + COLLECTOR_NODE_TTL
+        self._set_owned(frozenset(r["server_name"] for r in rows))
+
+    async def run(self):
+        """Цикл heartbeat; при ошибках аренды считаются действующими до истечения TTL."""
+        logger.info(f"[cluster] Узел коллектора {self.node_id}")
+        while True:
+            try:
+                await self.heartbeat()
+            except Exception as e:
+                logger.error(f"[cluster] Ошибка heartbeat узла {self.node_id}: {e}")
+                if time.monotonic() >= self._leases_valid_until:
+                    self._set_owned(frozenset())
+            await asyncio.sleep(COLLECTOR_HEARTBEAT_INTERVAL)
+
+    async def leave(self):
+        """Выйти из кластера: удалить узел и отпустить аренды (серверы сразу переезжают)."""
+        self._set_owned(frozenset())
+        try:
+            pool = get_pool()
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    await conn.execute("DELETE FROM server_leases WHERE node_id = $1", self.node_id)
+                    await conn.execute("DELETE FROM collector_nodes WHERE node_id = $1", self.node_id)
+            logger.info(f"[cluster] Узел {self.node_id} вышел из кластера")
+        except Exception as e:
+            logger.warning(f"[cluster] Не удалось удалить узел {self.node_id}: {e}")
+
+
+async def list_nodes() -> list[dict]:
+    """Живые узлы коллектора с числом арендованных серверов (для API)."""
+    pool = get_pool()
+    rows = await pool.fetch(
+        """
+        SELECT n.node_id, n.hostname, n.pid, n.started_at, n.heartbeat, n.status,
+               COUNT(l.server_name) FILTER (WHERE l.expires_at > now()) AS servers
+        FROM collector_nodes n
+        LEFT JOIN server_leases l ON l.node_id = n.node_id
+        WHERE n.heartbeat > now() - make_interval(secs => $1)
+        GROUP BY n.node_id
+        ORDER BY n.node_id
+        """,
+        COLLECTOR_NODE_TTL,
+    )
+    return [
+        {
+            "node_id": r["node_id"],
+            "hostname": r["hostname"],
+            "pid": r["pid"],
+            "started_at": r["started_at"].isoformat(),
+            "heartbeat": r["heartbeat"].isoformat(),
+            "servers": r["servers"],
+            "status": json.loads(r["status"]) if r["status"] else None,
+        }
+        for r in rows
+    ]
+
+
+# Узел текущего процесса
+collector_cluster = CollectorCluster(COLLECTOR_NODE_ID)
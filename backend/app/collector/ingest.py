@@ -0,0 +1,722 @@
+# app/collector/ingest.py
+"""
+Пакетная запись собранных сэмплов в локальную БД pam_stats.
+
+Вместо отдельного INSERT на каждую БД все строки сервера (или целого цикла)
+передаются одним COPY через asyncpg copy_records_to_table. Если COPY
+отклонён целиком (например, битое значение в одной строке), пакет
+повторяется построчно — так в результате сохраняется поштучная
+диагностика ошибок, как и раньше.
+
+Задачи сбора не пишут в БД сами: они кладут строки в ограниченную очередь
+ingest_buffer, а отдельная задача-флашер пишет её пакетами — по
+INGEST_BATCH_SIZE строк или раз в INGEST_FLUSH_INTERVAL секунд. Медленная или
+недоступная локальная БД не задерживает опрос серверов, пока очередь не
+заполнена. В полной очереди задача сбора ждёт места до INGEST_PUT_TIMEOUT
+(backpressure), затем строки отбрасываются по INGEST_DROP_POLICY. Пакет,
+который не удалось записать из-за недоступности БД, дописывается в спул на
+диске (spool.py) и загружается оттуда, когда БД снова доступна; если и спул
+недоступен — возвращается в начало очереди.
+
+Загрузка из спула идемпотентна по (server_name, datname, ts) (для
+server_stats — по (server_name, ts)): строки, уже
+записанные в БД (например, сегмент загружен, но не успел удалиться),
+пропускаются.
+
+Часовые и суточные агрегаты statistics (rollups.py) и последние значения
+рядов (latest.py) обновляются в той же транзакции, что и вставка строк, —
+только по действительно вставленным.
+
+Записи очереди и спула содержат имена сервера и БД; statistics хранит вместо
+них series_id (series.py) — имена заменяются на id при записи.
+
+В режиме хранения только изменений (change_only_heartbeat, database/steps.py)
+put() пропускает неизменившиеся сэмплы (ChangeFilter): размеры БД не
+ставятся в очередь, а сэмплы statistics идут в очередь как SKIPPED — они
+сливаются в агрегаты, но в statistics не пишутся. В спул они попадают так же
+отдельно: загрузка спула сливает их в агрегаты и latest_sample только вместе с
+впервые вставленными строками их цикла (load_spool_frames).
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+import asyncpg
+
+from app.config import (
+    INGEST_QUEUE_MAX_RECORDS, INGEST_BATCH_SIZE, INGEST_FLUSH_INTERVAL, INGEST_PUT_TIMEOUT, INGEST_DROP_POLICY,
+    SPOOL_REPLAY_INTERVAL,
+)
+from app.collector.spool import SampleSpool, Frame, sample_spool
+from app.database import latest, rollups, series, steps
+from app.database.local_db import get_pool
+from app.metrics import INGEST_FLUSH_SECONDS
+from app.services.retention import change_only
+
+logger = logging.getLogger(__name__)
+
+STATS_COLUMNS = ("server_name", "ts", "datname", "numbackends", "xact_commit")
+
+SIZES_COLUMNS = ("server_name", "ts", "datname", "db_size")
+
+# Метрики сервера целиком — одна строка на цикл сбора, а не копия в каждой БД
+SERVER_COLUMNS = ("server_name", "ts", "disk_free", "disk_total", "connections", "started_at", "version")
+
+# Таблицы, которые пишутся через очередь, и колонки их записей
+TABLE_COLUMNS = {"statistics": STATS_COLUMNS, "db_sizes": SIZES_COLUMNS, "server_stats": SERVER_COLUMNS}
+
+# Колонки statistics: (server_name, datname) записи → series_id
+STATS_TABLE_COLUMNS = ("series_id", "ts", "numbackends", "xact_commit")
+
+# Колонки, в которых строки хранятся в таблице
+STORED_COLUMNS = {"statistics": STATS_TABLE_COLUMNS, "db_sizes": SIZES_COLUMNS, "server_stats": SERVER_COLUMNS}
+
+# Записи очереди: сэмплы statistics, пропущенные ChangeFilter (только в агрегаты)
+SKIPPED = "statistics:skipped"
+
+# Записи очереди одного цикла сервера statistics — пакет их не разделяет
+_CYCLE_TABLES = ("statistics", SKIPPED)
+
+# Индексы колонок записи, по которым сэмпл сравнивается с последним записанным.
+# server_stats пишется всегда: одна строка на сервер за цикл
+CHANGE_COLUMNS = {"statistics": (3, 4), "db_sizes": (3,)}
+
+# Локальная БД недоступна (соединение, перезапуск, таймаут) — в отличие от ошибки в данных
+_UNAVAILABLE_ERRORS = (
+    OSError,
+    asyncio.TimeoutError,
+    asyncpg.InterfaceError,
+    asyncpg.PostgresConnectionError,
+    asyncpg.OperatorInterventionError,
+)
+
+
+def is_unavailable_error(e: BaseException) -> bool:
+    return isinstance(e, _UNAVAILABLE_ERRORS)
+
+
+def build_stats_records(server_name: str, ts: datetime, rows: list[dict]) -> list[tuple]:
+    """Сформировать кортежи в порядке STATS_COLUMNS из строк pg_stat_database."""
+    return [(server_name, ts, row["datname"], row["numbackends"], row["xact_commit"]) for row in rows]
+
+
+def build_server_record(
+    server_name: str, ts: datetime, info: dict, disk_free: int | None, disk_total: int | None,
+) -> tuple:
+    """Сформировать кортеж в порядке SERVER_COLUMNS (info — сводка сервера, см. tasks.py)."""
+    return (
+        server_name, ts, disk_free, disk_total, info["connections"], info["started_at"], info["version"],
+    )
+
+
+def build_size_records(server_name: str, ts: datetime, sizes: list[dict]) -> list[tuple]:
+    """Сформировать кортежи в порядке SIZES_COLUMNS из результатов pg_database_size."""
+    return [(server_name, ts, entry["datname"], entry["db_size"]) for entry in sizes]
+
+
+async def to_series_rows(conn: asyncpg.Connection, records: list[tuple]) -> list[tuple]:
+    """
+    Записи STATS_COLUMNS → строки STATS_TABLE_COLUMNS. Вызывать вне транзакции
+    (см. series.resolve); запись с NULL в имени получает series_id NULL и
+    будет отклонена при вставке.
+    """
+    ids = await series.resolve(conn, ((r[0], r[2]) for r in records))
+    return [(ids.get((r[0], r[2])), r[1], *r[3:]) for r in records]
+
+
+async def _copy_records(
+    conn: asyncpg.Connection, table: str, columns: tuple, records: list[tuple], skipped: list[tuple] = (),
+) -> tuple[int, list[str]]:
+    """
+    Записать пакет строк в таблицу одним COPY.
+
+    Возвращает (inserted, errors). При сбое COPY откатывается и выполняется
+    построчная вставка; ошибки формата "<server>/<datname>: <ошибка>"
+    ("<server>: <ошибка>" для server_stats). Первые колонки записи всегда
+    server_name, ts и (кроме server_stats) datname; в statistics строки
+    пишутся с series_id (to_series_rows). skipped — пропущенные сэмплы
+    statistics (SKIPPED): сливаются только в агрегаты, при построчной
+    вставке пишутся обычными строками.
+    """
+    if not records and not skipped:
+        return 0, []
+    rollup = table == rollups.SOURCE_TABLE
+    rows = records
+    if rollup:
+        columns, rows = STATS_TABLE_COLUMNS, await to_series_rows(conn, records)
+        skipped_rows = await to_series_rows(conn, skipped) if skipped else []
+
+    try:
+        async with conn.transaction():
+            if rows:
+                await conn.copy_records_to_table(table, records=rows, columns=columns)
+            if rollup:
+                await rollups.merge_records(conn, rows + skipped_rows)
+            await latest.merge_records(conn, table, records + list(skipped))
+        return len(records), []
+    except Exception as e:
+        if is_unavailable_error(e):
+            raise
+        logger.warning(f"COPY {table} ({len(records)} строк) не удался, построчная вставка: {e}")
+    if skipped:
+        records, rows = records + list(skipped), rows + skipped_rows
+
+    insert_sql = (
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"VALUES ({', '.join(f'${i}' for i in range(1, len(columns) + 1))})"
+    )
+    per_db = "datname" in columns
+    inserted = 0
+    errors = []
+    for record, row in zip(records, rows):
+        try:
+            async with conn.transaction():
+                await conn.execute(insert_sql, *row)
+                if rollup:
+                    await rollups.merge_records(conn, [row])
+                await latest.merge_records(conn, table, [record])
+            inserted += 1
+        except Exception as e:
+            if is_unavailable_error(e):
+                raise
+            label = f"{record[0]}/{record[2]}" if per_db else record[0]
+            errors.append(f"{label}: {e}")
+            logger.error(f"Ошибка INSERT {table} для {label}: {e}")
+    return inserted, errors
+
+
+async def write_stats_records(conn: asyncpg.Connection, records: list[tuple]) -> tuple[int, list[str]]:
+    """Записать пакет строк в statistics (см. _copy_records)."""
+    return await _copy_records(conn, "statistics", STATS_COLUMNS, records)
+
+
+async def write_size_records(conn: asyncpg.Connection, records: list[tuple]) -> tuple[int, list[str]]:
+    """Дописать пакет размеров БД в db_sizes (см. _copy_records)."""
+    return await _copy_records(conn, "db_sizes", SIZES_COLUMNS, records)
+
+
+async def write_server_records(conn: asyncpg.Connection, records: list[tuple]) -> tuple[int, list[str]]:
+    """Дописать пакет метрик серверов в server_stats (см. _copy_records)."""
+    return await _copy_records(conn, "server_stats", SERVER_COLUMNS, records)
+
+
+# Временная таблица загрузки спула: колонки записей TABLE_COLUMNS с типами таблицы
+_STAGE = {
+    "statistics": """
+        CREATE TEMP TABLE {stage} ON COMMIT DROP AS
+        SELECT r.server_name, t.ts, r.datname, t.numbackends, t.xact_commit
+        FROM statistics t, series r WITH NO DATA
+    """,
+    "db_sizes": """
+        CREATE TEMP TABLE {stage} ON COMMIT DROP AS
+        SELECT server_name, ts, datname, db_size FROM db_sizes WITH NO DATA
+    """,
+    "server_stats": f"""
+        CREATE TEMP TABLE {{stage}} ON COMMIT DROP AS
+        SELECT {', '.join(SERVER_COLUMNS)} FROM server_stats WITH NO DATA
+    """,
+}
+
+# Пропущенные сэмплы спула тех циклов сервера (server_name, ts), записанные
+# строки которых вставлены этой загрузкой ({cycles}), в колонках statistics
+_NEW_SKIPPED = """
+    CREATE TEMP TABLE {new} ON COMMIT DROP AS
+    SELECT DISTINCT ON (r.id, s.ts)
+           r.id AS series_id, s.ts, s.numbackends, s.xact_commit
+    FROM {stage} s
+    JOIN series r ON r.server_name = s.server_name AND r.datname = s.datname
+    WHERE (s.server_name, s.ts) IN (
+        SELECT c.server_name, n.ts FROM {cycles} n JOIN series c ON c.id = n.series_id
+    )
+"""
+
+# Строки спула, которых ещё нет в таблице (по естественному ключу), в колонках таблицы
+_NEW_FROM_STAGE = {
+    "statistics": """
+        INSERT INTO series (server_name, datname)
+        SELECT DISTINCT server_name, datname FROM {stage}
+        ON CONFLICT (server_name, datname) DO NOTHING;
+
+        CREATE TEMP TABLE {new} ON COMMIT DROP AS
+        SELECT DISTINCT ON (r.id, s.ts)
+               r.id AS series_id, s.ts, s.numbackends, s.xact_commit
+        FROM {stage} s
+        JOIN series r ON r.server_name = s.server_name AND r.datname = s.datname
+        WHERE NOT EXISTS (
+            SELECT 1 FROM statistics t WHERE t.series_id = r.id AND t.ts = s.ts
+        );
+    """,
+    "db_sizes": """
+        CREATE TEMP TABLE {new} ON COMMIT DROP AS
+        SELECT DISTINCT ON (server_name, datname, ts) server_name, ts, datname, db_size
+        FROM {stage} s
+        WHERE NOT EXISTS (
+            SELECT 1 FROM db_sizes t
+            WHERE t.server_name = s.server_name AND t.datname = s.datname AND t.ts = s.ts
+        );
+    """,
+    "server_stats": f"""
+        CREATE TEMP TABLE {{new}} ON COMMIT DROP AS
+        SELECT DISTINCT ON (server_name, ts) {', '.join(SERVER_COLUMNS)}
+        FROM {{stage}} s
+        WHERE NOT EXISTS (
+            SELECT 1 FROM server_stats t WHERE t.server_name = s.server_name AND t.ts = s.ts
+        );
+    """,
+}
+
+
+async def _load_skipped(conn: asyncpg.Connection, records: list[tuple], cycles: str) -> int:
+    """
+    Слить пропущенные сэмплы спула в агрегаты и latest_sample — только циклов,
+    строки которых вставлены этой загрузкой (временная таблица cycles). Цикл
+    не делится между пакетами (_flush_batch), поэтому его пропущенные сэмплы
+    лежат в том же сегменте; при повторной загрузке сегмента строки цикла уже
+    есть в statistics, и сэмплы не сливаются дважды. Возвращает число слитых.
+    """
+    stage, new = "spool_skipped", "spool_new_skipped"
+    await conn.execute(_STAGE[rollups.SOURCE_TABLE].format(stage=stage))
+    await conn.copy_records_to_table(stage, records=records, columns=STATS_COLUMNS)
+    status = await conn.execute(_NEW_SKIPPED.format(stage=stage, new=new, cycles=cycles))
+    await rollups.merge_table(conn, new)
+    await latest.merge_table(conn, rollups.SOURCE_TABLE, new)
+    return int(status.split()[-1])
+
+
+async def load_spool_frames(frames: list[Frame]) -> tuple[int, int]:
+    """
+    Загрузить кадры спула одной транзакцией: COPY во временную таблицу и
+    INSERT только отсутствующих строк (по ним же обновляются агрегаты).
+    Пропущенные сэмплы (SKIPPED) в statistics не пишутся — см. _load_skipped.
+    Возвращает (inserted, duplicates); пропущенные считаются вставленными,
+    если слиты в агрегаты.
+    """
+    by_table: dict[str, list[tuple]] = {}
+    for table, records in frames:
+        by_table.setdefault(table, []).extend(records)
+    skipped = by_table.pop(SKIPPED, [])
+    if skipped:
+        by_table.setdefault(rollups.SOURCE_TABLE, [])
+
+    inserted = total = 0
+    async with get_pool().acquire() as conn:
+        async with conn.transaction():
+            for table, records in by_table.items():
+                stage, new = f"spool_{table}", f"spool_new_{table}"
+                await conn.execute(_STAGE[table].format(stage=stage))
+                await conn.copy_records_to_table(stage, records=records, columns=TABLE_COLUMNS[table])
+                await conn.execute(_NEW_FROM_STAGE[table].format(stage=stage, new=new))
+                status = await conn.execute(
+                    f"INSERT INTO {table} ({', '.join(STORED_COLUMNS[table])}) SELECT * FROM {new}"
+                )
+                if table == rollups.SOURCE_TABLE:
+                    await rollups.merge_table(conn, new)
+                    if skipped:
+                        inserted += await _load_skipped(conn, skipped, new)
+                        total += len(skipped)
+                await latest.merge_table(conn, table, new)
+                inserted += int(status.split()[-1])
+                total += len(records)
+    return inserted, total - inserted
+
+
+class ChangeFilter:
+    """
+    Пропуск неизменившихся сэмплов (режим change_only_heartbeat): сэмпл
+    пропускается, если значения CHANGE_COLUMNS равны последнему записанному
+    сэмплу того же ряда и тот записан менее steps.span() назад. Сравнение —
+    с последней записываемой строкой, поставленной в очередь, а не дошедшей
+    до БД: пока строка в очереди, ряд мог вернуться к прежнему значению.
+    Последние значения — в памяти процесса; после перезапуска первый сэмпл
+    каждого ряда пишется. Строка, потерянная после split (отброшенная при
+    переполнении очереди или отклонённая БД), не служит основанием пропуска:
+    ряд забывается (discard), см. также IngestBuffer._discard.
+
+    Параметры режима, с которыми записан цикл сервера, становятся эпохой
+    (steps.record_epochs): при их смене ряды сервера забываются, и первый
+    цикл с новыми параметрами пишется целиком — пропуск не опирается на строку,
+    записанную с другими. Эпохи копятся в pending_epochs до записи флашером.
+    """
+
+    def __init__(self):
+        # (table, server_name, datname) → (значения CHANGE_COLUMNS, ts)
+        self._last: dict[tuple[str, str, str], tuple[tuple, datetime]] = {}
+        # (table, server_name) → ((интервал, heartbeat), начало эпохи) последнего цикла;
+        # (0, 0) — режим выключен
+        self._modes: dict[tuple[str, str], tuple[tuple[int, int], datetime]] = {}
+        # (table, server_name, since, интервал, heartbeat) — ещё не записанные эпохи
+        self.pending_epochs: list[tuple[str, str, datetime, int, int]] = []
+
+    def _check_mode(self, table: str, records: list[tuple], fill: tuple[int, int] | None):
+        """Новые параметры режима для сервера цикла — эпоха с ts цикла, ряды сервера забываются."""
+        server_name = records[0][0]
+        mode = fill or (0, 0)
+        current = self._modes.get((table, server_name))
+        if current is not None and current[0] == mode:
+            return
+        since = min(r[1] for r in records)
+        self._modes[(table, server_name)] = (mode, since)
+        self._last = {key: value for key, value in self._last.items() if key[:2] != (table, server_name)}
+        self.pending_epochs.append((table, server_name, since, *mode))
+
+    def split(self, table: str, records: list[tuple]) -> tuple[list[tuple], list[tuple]]:
+        """
+        Разделить записи одного цикла сервера на (записываемые, пропущенные).
+        Из цикла statistics пишется хотя бы одна строка — её ts становится
+        точкой восстановленных рядов сервера (steps.py).
+        """
+        columns = CHANGE_COLUMNS.get(table)
+        if columns is None:
+            return records, []
+        fill = change_only(table)
+        self._check_mode(table, records, fill)
+        stored, skipped = [], []
+        if fill is None:
+            stored = records
+        else:
+            window = steps.span(fill)
+            for record in records:
+                last = self._last.get((table, record[0], record[2]))
+                if (
+                    last is not None and last[0] == tuple(record[i] for i in columns)
+                    and timedelta(0) < record[1] - last[1] < window
+                ):
+                    skipped.append(record)
+                else:
+                    stored.append(record)
+            if table == rollups.SOURCE_TABLE and skipped and not stored:
+                # Дольше всех не записанный ряд — заодно его heartbeat
+                oldest = min(skipped, key=lambda r: self._last[(table, r[0], r[2])][1])
+                skipped.remove(oldest)
+                stored.append(oldest)
+            for record in stored:
+                self._last[(table, record[0], record[2])] = (tuple(record[i] for i in columns), record[1])
+        return stored, skipped
+
+    def forget(self, server_name: str, datnames: list[str]):
+        """Забыть последние записанные сэмплы БД сервера (удалённых или пересозданных)."""
+        names = set(datnames)
+        self._last = {
+            key: value for key, value in self._last.items() if key[1] != server_name or key[2] not in names
+        }
+
+    def discard(self, items: list[tuple[str, tuple]]):
+        """
+        Записываемые строки (table, record) потеряны после split. Ряды, у
+        которых такая строка — последняя записываемая, забываются: следующий
+        сэмпл ряда запишется.
+        """
+        for table, record in items:
+            key = (table, record[0], record[2])
+            last = self._last.get(key)
+            if last is not None and last[1] == record[1]:
+                del self._last[key]
+
+
+def _same_cycle(a: tuple[str, tuple], b: tuple[str, tuple]) -> bool:
+    """Записи очереди (table, record) из одного цикла сервера statistics — записанные и пропущенные."""
+    return a[0] in _CYCLE_TABLES and b[0] in _CYCLE_TABLES and a[1][:2] == b[1][:2]
+
+
+class IngestBuffer:
+    """Ограниченная очередь строк (table, record) и флашер, пишущий её пакетами."""
+
+    def __init__(
+        self,
+        max_records: int = INGEST_QUEUE_MAX_RECORDS,
+        batch_size: int = INGEST_BATCH_SIZE,
+        flush_interval: float = INGEST_FLUSH_INTERVAL,
+        drop_policy: str = INGEST_DROP_POLICY,
+        spool: SampleSpool | None = None,
+    ):
+        self.max_records = max_records
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.drop_policy = drop_policy
+        self.spool = spool
+        self.changes = ChangeFilter()
+        self._queue: deque[tuple[str, tuple]] = deque()
+        self._space = asyncio.Condition()
+        self._wake = asyncio.Event()
+        self.metrics = {
+            "enqueued": 0,
+            "written": 0,
+            "skipped": 0,         # неизменившиеся сэмплы, не записанные в режиме change_only_heartbeat
+            "rejected": 0,        # строки, отклонённые БД (ошибка в данных)
+            "dropped": 0,         # строки, отброшенные из-за переполнения очереди
+            "backpressure_waits": 0,
+            "flushes": 0,
+            "flush_errors": 0,
+            "max_depth": 0,
+            "flush_seconds_total": 0.0,
+            "flush_seconds_max": 0.0,
+            "last_flush_seconds": None,
+            "last_flush_at": None,
+            "last_error": None,
+        }
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def _evict(self, n: int) -> list[tuple[str, tuple]]:
+        """
+        Освободить до n мест по политике; drop_newest отбрасывает самые новые
+        строки очереди. Возвращает отброшенные (не больше длины очереди).
+        """
+        pop = self._queue.pop if self.drop_policy == "drop_newest" else self._queue.popleft
+        dropped = [pop() for _ in range(min(n, len(self._queue)))]
+        self.metrics["dropped"] += len(dropped)
+        return dropped
+
+    def _discard(self, items: list[tuple[str, tuple]]):
+        """
+        Строки items потеряны после put (отброшены или отклонены БД). Сэмплы
+        statistics, пропущенные после потерянной строки своего ряда, опирались
+        на неё: первый такой сэмпл в очереди становится записываемым (значения
+        у него те же), остальные опираются уже на него.
+        """
+        self.changes.discard(items)
+        lost: dict[tuple[str, str], list[datetime]] = {}
+        for table, record in items:
+            if table == rollups.SOURCE_TABLE:
+                lost.setdefault((record[0], record[2]), []).append(record[1])
+        for times in lost.values():
+            times.sort()
+        # Ряды, следующая запись которых в очереди опирается на потерянную строку
+        waiting = set()
+        promoted = []
+        for i, (table, record) in enumerate(self._queue):
+            if not lost and not waiting:
+                break
+            if table not in _CYCLE_TABLES:
+                continue
+            key = (record[0], record[2])
+            times = lost.get(key)
+            if times:
+                while times and times[0] < record[1]:
+                    times.pop(0)
+                    waiting.add(key)
+                if not times:
+                    del lost[key]
+            if key in waiting:
+                waiting.discard(key)
+                if table == SKIPPED:
+                    promoted.append(i)
+        for i in promoted:
+            self._queue[i] = (rollups.SOURCE_TABLE, self._queue[i][1])
+        self.metrics["skipped"] -= len(promoted)
+
+    async def put(self, table: str, records: list[tuple]) -> int:
+        """
+        Поставить строки одного цикла сервера в очередь. Если места нет — ждать
+        до INGEST_PUT_TIMEOUT, затем отбросить лишнее по drop_policy. Возвращает
+        число принятых строк (вместе с пропущенными ChangeFilter).
+        """
+        if not records:
+            return 0
+        stored, skipped = self.changes.split(table, records)
+        self.metrics["skipped"] += len(skipped)
+        if table == rollups.SOURCE_TABLE:
+            records = [(table, r) for r in stored] + [(SKIPPED, r) for r in skipped]
+        else:
+            records = [(table, r) for r in stored]
+        n = len(records)
+        async with self._space:
+            if self.depth + n > self.max_records:
+                self.metrics["backpressure_waits"] += 1
+                try:
+                    await asyncio.wait_for(
+                        self._space.wait_for(lambda: self.depth + n <= self.max_records), INGEST_PUT_TIMEOUT,
+                    )
+                except asyncio.TimeoutError:
+                    pass
+            overflow = self.depth + n - self.max_records
+            lost = []
+            if overflow > 0:
+                logger.warning(
+                    f"[ingest] Очередь записи заполнена ({self.depth} строк), {self.drop_policy}: "
+                    f"отброшено строк: {overflow}"
+                )
+                if self.drop_policy == "drop_newest":
+                    self.metrics["dropped"] += overflow
+                    lost = records[n - overflow:]
+                    records = records[:n - overflow]
+                else:
+                    # Строк цикла больше ёмкости — отбрасываются и старшие из них
+                    lost = self._evict(overflow)
+                    rest = overflow - len(lost)
+                    if rest > 0:
+                        self.metrics["dropped"] += rest
+                        lost += records[:rest]
+                        records = records[rest:]
+            self._queue.extend(records)
+            self._discard(lost)
+        self.metrics["enqueued"] += len(records)
+        self.metrics["max_depth"] = max(self.metrics["max_depth"], self.depth)
+        if self.depth >= self.batch_size:
+            self._wake.set()
+        return len(records)
+
+    def _requeue(self, items: list[tuple[str, tuple]]):
+        """Вернуть незаписанный пакет в начало очереди (он старше всего, что в ней)."""
+        overflow = self.depth + len(items) - self.max_records
+        lost = []
+        if overflow > 0:
+            if self.drop_policy == "drop_newest":
+                lost = self._evict(overflow)
+                rest = overflow - len(lost)
+                if rest > 0:
+                    self.metrics["dropped"] += rest
+                    lost += items[len(items) - rest:]
+                    items = items[:len(items) - rest]
+            else:
+                lost = items[:overflow]
+                items = items[overflow:]
+                self.metrics["dropped"] += overflow
+        self._queue.extendleft(reversed(items))
+        self._discard(lost)
+
+    async def _flush_batch(self) -> bool:
+        """Записать один пакет. False — БД недоступна, незаписанное возвращено в очередь."""
+        items = [self._queue.popleft() for _ in range(min(self.batch_size, self.depth))]
+        # Цикл statistics целиком: его пропущенные сэмплы записываются или уходят
+        # в спул вместе с его строками (см. _load_skipped)
+        while self._queue and _same_cycle(items[-1], self._queue[0]):
+            items.append(self._queue.popleft())
+        async with self._space:
+            self._space.notify_all()
+
+        by_table: dict[str, list[tuple]] = {}
+        for table, record in items:
+            by_table.setdefault(table, []).append(record)
+        skipped = by_table.pop(SKIPPED, [])
+        if skipped:
+            by_table.setdefault(rollups.SOURCE_TABLE, [])
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        written_tables = set()
+        epochs, self.changes.pending_epochs = self.changes.pending_epochs, []
+        try:
+            async with get_pool().acquire() as conn:
+                # Эпохи режима — раньше строк, записанных с их параметрами
+                await steps.record_epochs(conn, epochs)
+                epochs = []
+                for table, records in by_table.items():
+                    inserted, errors = await _copy_records(
+                        conn, table, TABLE_COLUMNS[table], records,
+                        skipped if table == rollups.SOURCE_TABLE else (),
+                    )
+                    written_tables.add(table)
+                    self.metrics["written"] += inserted
+                    self.metrics["rejected"] += len(errors)
+                    if errors:
+                        # Какие строки отклонены, неизвестно — не опираемся ни на одну
+                        self._discard([(table, r) for r in records])
+        except Exception as e:
+            self.metrics["flush_errors"] += 1
+            self.metrics["last_error"] = str(e)[:500]
+            self.changes.pending_epochs[:0] = epochs
+            pending = [
+                item for item in items
+                if (rollups.SOURCE_TABLE if item[0] == SKIPPED else item[0]) not in written_tables
+            ]
+            if not is_unavailable_error(e):
+                # Ошибка не в доступности БД — повтор не поможет
+                self.metrics["rejected"] += len(pending)
+                logger.error(f"[ingest] Ошибка записи пакета, строк потеряно: {len(pending)}: {e}")
+                self._discard(pending)
+                return True
+            # Уже записанные таблицы пакета повторно не пишем
+            if self.spool is not None and await self.spool.append(pending):
+                logger.warning(f"[ingest] Локальная БД недоступна, в спул записано строк: {len(pending)}: {e}")
+            else:
+                self._requeue(pending)
+                logger.warning(f"[ingest] Локальная БД недоступна, в очереди строк: {self.depth}: {e}")
+            return False
+
+        elapsed = loop.time() - started
+        INGEST_FLUSH_SECONDS.observe(elapsed)
+        m = self.metrics
+        m["flushes"] += 1
+        m["flush_seconds_total"] += elapsed
+        m["flush_seconds_max"] = max(m["flush_seconds_max"], elapsed)
+        m["last_flush_seconds"] = round(elapsed, 4)
+        m["last_flush_at"] = datetime.now(timezone.utc).isoformat()
+        m["last_error"] = None
+        return True
+
+    async def flush(self) -> bool:
+        """Записать всё, что есть в очереди. False — БД недоступна."""
+        while self._queue:
+            if not await self._flush_batch():
+                return False
+        return True
+
+    async def run(self):
+        """Флашер: пакет по размеру (put будит) или по времени."""
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if not await self.flush():
+                # БД недоступна — повтор не раньше следующего интервала
+                await asyncio.sleep(self.flush_interval)
+
+    async def replay_loop(self):
+        """Загрузка спула, когда локальная БД доступна (сразу при старте — остатки прошлого запуска)."""
+        if self.spool is None:
+            return
+        while True:
+            try:
+                if await asyncio.to_thread(self.spool.has_pending):
+                    # Дешёвая проверка доступности до закрытия текущего сегмента
+                    await get_pool().fetchval("SELECT 1")
+                    await self.spool.replay(load_spool_frames)
+            except Exception as e:
+                if is_unavailable_error(e):
+                    logger.debug(f"[spool] Локальная БД недоступна, загрузка спула отложена: {e}")
+                else:
+                    self.spool.metrics["last_error"] = str(e)[:500]
+                    logger.error(f"[spool] Ошибка загрузки спула: {e}")
+            await asyncio.sleep(SPOOL_REPLAY_INTERVAL)
+
+    async def close(self, timeout: float = 10):
+        """Дописать очередь при остановке (не дольше timeout), остаток — в спул."""
+        if self._queue:
+            try:
+                await asyncio.wait_for(self.flush(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        if self._queue and self.spool is not None:
+            items = list(self._queue)
+            if await self.spool.append(items):
+                self._queue.clear()
+                logger.warning(f"[ingest] При остановке в спул записано строк: {len(items)}")
+        if self._queue:
+            logger.error(f"[ingest] При остановке не записано строк: {self.depth}")
+        if self.spool is not None:
+            await asyncio.to_thread(self.spool.close)
+
+    def get_status(self) -> dict:
+        m = self.metrics
+        oldest = self._queue[0][1][1] if self._queue else None
+        return {
+            "depth": self.depth,
+            "capacity": self.max_records,
+            "drop_policy": self.drop_policy,
+            "oldest_age": round(time.time() - oldest.timestamp(), 1) if oldest else None,
+            **{k: v for k, v in m.items() if k not in ("flush_seconds_total", "flush_seconds_max")},
+            "flush_seconds_avg": round(m["flush_seconds_total"] / m["flushes"], 4) if m["flushes"] else None,
+            "flush_seconds_max": round(m["flush_seconds_max"], 4),
+            "spool": self.spool.get_status() if self.spool is not None else None,
+        }
+
+
+# Очередь записи сэмплов коллектора
+ingest_buffer = IngestBuffer(spool=sample_spool)
@@ -1,147 +1,424 @@
 # app/collector/scheduler.py
-"""Планировщик сбора статистики."""
+"""
+Планировщик сбора статистики.
+
+Каждый цикл (stats, sizes, db_info) — это FleetJob: у каждого сервера свой
+таймер с фиксированной частотой (fixed rate), стартовые моменты разнесены
+случайным сдвигом по интервалу, а общее число одновременных опросов
+ограничено глобальным семафором COLLECTOR_MAX_CONCURRENCY. Медленный сервер
+задерживает только себя: если опрос не уложился в интервал, пропущенные
+такты засчитываются как skipped, а не накапливаются.
+
+Коллектор запускается либо в процессе API (COLLECTOR_MODE=embedded), либо
+отдельным процессом (python -m app.collector). Процессы общаются только через
+локальную БД pam_stats: список серверов перечитывается каждые
+RECONCILE_INTERVAL секунд, изменённые серверы получают новые подключения.
+Если процессов коллектора несколько, каждый опрашивает только серверы,
+арендованные им в кластере (см. cluster.py).
+"""
 import asyncio
 import logging
+import random
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable
 
-from app.config import COLLECT_INTERVAL, SIZE_UPDATE_INTERVAL, DB_CHECK_INTERVAL
+from app.config import (
+    COLLECT_INTERVAL, SIZE_UPDATE_INTERVAL, DB_CHECK_INTERVAL, COLLECTOR_MAX_CONCURRENCY, COLLECTOR_MODE,
+    COLLECTOR_NODE_TTL,
+)
 from app.collector.tasks import collect_server_stats, collect_server_sizes, sync_server_db_info
-from app.database.local_db import ensure_partitions, cleanup_old_partitions
-from app.database.repositories import settings_repo
-from app.services.server import load_servers  # async
+from app.collector.cluster import collector_cluster
+from app.collector.ingest import ingest_buffer
+from app.database.local_db import ensure_partitions, cleanup_old_partitions, get_pool
+from app.database.remote_pool import remote_pool
+from app.metrics import COLLECTOR_RUN_SECONDS, COLLECTOR_RUNS, COLLECTOR_ROWS
+from app.models import Server
+from app.services.server_registry import server_registry
 from app.services import system_logger
+from app.services.ssh_pool import ssh_pool
+from app.services.settings_cache import settings_cache
+from app.services.retention import retention_horizons
+from app.services.server_health import server_health, ServerUnavailableError
 
 logger = logging.getLogger(__name__)
 
 DAILY = 86400  # 24 часа в секундах
+STARTUP_DELAY = 10  # секунд до первого запуска после старта
+RECONCILE_INTERVAL = 60  # как часто перечитывать список серверов
+MAINTENANCE_CHECK_INTERVAL = COLLECTOR_NODE_TTL  # как часто проверять лидерство и срок обслуживания
+# Ключ pg_advisory_lock обслуживания: выполняется одним процессом на всю pam_stats
+MAINTENANCE_LOCK = 7364973
 
+# Глобальный лимит одновременных опросов серверов (на все FleetJob)
+_semaphore: asyncio.Semaphore | None = None
+# Зарегистрированные циклы для отчёта о состоянии
+_jobs: dict[str, "FleetJob"] = {}
 
-async def _get_interval(key: str, default: int) -> int:
-    """Получить интервал из БД с fallback на default из config."""
+
+async def _close_connections(server: Server):
+    """Закрыть asyncpg пул и SSH-сессию сервера (повторный вызов безопасен)."""
     try:
-        return await settings_repo.get_int_setting(key, default)
-    except Exception:
-        return default
+        await remote_pool.close_pool(server)
+        await asyncio.to_thread(ssh_pool.close, server)
+    except Exception as e:
+        logger.warning(f"Ошибка закрытия подключений к {server.name}: {e}")
 
 
-async def stats_loop():
-    """Основной цикл сбора статистики (каждые COLLECT_INTERVAL секунд)."""
-    await asyncio.sleep(10)
-    while True:
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(COLLECTOR_MAX_CONCURRENCY)
+    return _semaphore
+
+
+def _iso(ts: float | None) -> str | None:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat() if ts else None
+
+
+class FleetJob:
+    """Периодическая задача по всем серверам с отдельным таймером на сервер."""
+
+    def __init__(
+        self,
+        name: str,
+        source: str,
+        title: str,
+        func: Callable[[Server], Awaitable[dict]],
+        setting_key: str,
+        default_interval: int,
+    ):
+        self.name = name                    # короткое имя для логов: stats, sizes, db_info
+        self.source = source                # source для system_log
+        self.title = title                  # человекочитаемое название для system_log
+        self.func = func
+        self.setting_key = setting_key
+        self.default_interval = default_interval
+
+        self.servers: dict[str, Server] = {}
+        self.workers: dict[str, asyncio.Task] = {}
+        self.status: dict[str, dict] = {}
+        # Выставляется кластером при перераспределении серверов между узлами
+        self._rebalanced = collector_cluster.subscribe()
+        # Итоги за окно между сводками в system_log
+        self._window = {"ok": 0, "errors": 0, "skipped": 0, "unavailable": 0, "details": []}
+
+    def interval(self) -> int:
+        """Текущий интервал из кэша настроек (без обращения к БД)."""
+        return settings_cache.get_int(self.setting_key, self.default_interval)
+
+    async def run(self):
+        """Супервизор: синхронизирует список серверов и пишет сводку раз в интервал."""
+        await asyncio.sleep(STARTUP_DELAY)
+        loop = asyncio.get_running_loop()
+        last_summary = loop.time()
         try:
-            servers = await load_servers()
-            logger.info(f"[stats] Запуск сбора статистики для {len(servers)} серверов")
-            tasks = [collect_server_stats(s) for s in servers]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-
-            ok = sum(1 for r in results if not isinstance(r, Exception))
-            errors = sum(1 for r in results if isinstance(r, Exception))
-            error_details = []
-            for i, r in enumerate(results):
-                if isinstance(r, Exception):
-                    logger.error(f"[stats] Ошибка для {servers[i].name}: {r}")
-                    error_details.append(f"{servers[i].name}: {r}")
-            logger.info(f"[stats] Завершено: {ok} успешно, {errors} ошибок")
-            if errors > 0:
-                await system_logger.error("collector_stats", f"Сбор статистики: {errors} ошибок из {len(servers)} серверов", "; ".join(error_details))
-            else:
-                await system_logger.info("collector_stats", f"Сбор статистики: {ok} серверов ОК")
-        except Exception as e:
-            logger.error(f"[stats] Критическая ошибка в цикле: {e}")
-            await system_logger.error("collector_stats", f"Критическая ошибка: {e}")
-        interval = await _get_interval("collect_interval", COLLECT_INTERVAL)
-        await asyncio.sleep(interval)
+            while True:
+                try:
+                    self._rebalanced.clear()
+                    servers_changed = server_registry.changed_event()
+                    # Расшифровываются учётные данные только своих серверов
+                    owned = [info.name for info in await server_registry.list_infos() if collector_cluster.owns(info.name)]
+                    await self._reconcile(await server_registry.list_servers(owned))
+                except Exception as e:
+                    logger.error(f"[{self.name}] Критическая ошибка в цикле: {e}")
+                    await system_logger.error(self.source, f"Критическая ошибка: {e}")
+                interval = self.interval()
+                # Просыпаемся раньше при перебалансировке или изменении серверов через API
+                waiters = [asyncio.ensure_future(self._rebalanced.wait()), asyncio.ensure_future(servers_changed.wait())]
+                try:
+                    await asyncio.wait(waiters, timeout=min(RECONCILE_INTERVAL, interval), return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    for waiter in waiters:
+                        waiter.cancel()
+                if loop.time() - last_summary >= interval:
+                    last_summary = loop.time()
+                    await self._flush_summary()
+        finally:
+            workers = list(self.workers.values())
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self.workers.clear()
 
+    async def _reconcile(self, servers: list[Server]):
+        """Запустить таймеры для новых серверов и остановить для удалённых."""
+        old_servers, self.servers = self.servers, {s.name: s for s in servers}
+        # Сервер изменён или удалён (возможно, другим процессом через API) —
+        # подключения со старыми параметрами больше не используем
+        for name, old in old_servers.items():
+            if self.servers.get(name) != old:
+                await _close_connections(old)
+        for name in list(self.workers):
+            if name not in self.servers:
+                self.workers.pop(name).cancel()
+                self.status.pop(name, None)
+                COLLECTOR_RUN_SECONDS.forget("server", name)
+                logger.info(f"[{self.name}] Сервер {name} удалён из расписания")
+        added = [name for name in self.servers if name not in self.workers]
+        for name in added:
+            self.workers[name] = asyncio.create_task(
+                self._server_loop(name), name=f"collector-{self.name}-{name}"
+            )
+        if added:
+            logger.info(f"[{self.name}] Запланировано серверов: {len(added)} (всего {len(self.workers)})")
 
-async def sizes_loop():
-    """Цикл обновления размеров БД (каждые SIZE_UPDATE_INTERVAL секунд)."""
-    await asyncio.sleep(10)
-    while True:
+    async def _server_loop(self, name: str):
+        """Таймер одного сервера: fixed rate со случайной начальной фазой."""
+        loop = asyncio.get_running_loop()
+        interval = self.interval()
+        next_run = loop.time() + random.uniform(0, interval)
+        st = self.status.setdefault(name, {
+            "runs": 0, "errors": 0, "skipped_ticks": 0, "unavailable": 0,
+            "last_started": None, "last_duration": None,
+            "last_lateness": None, "max_lateness": 0.0, "last_error": None,
+        })
+        st["next_run"] = _iso(time.time() + (next_run - loop.time()))
+
+        while True:
+            next_run, interval = await self._sleep_until(name, st, next_run, interval)
+            async with _get_semaphore():
+                started = loop.time()
+                lateness = started - next_run
+                st["last_started"] = _iso(time.time())
+                st["last_lateness"] = round(lateness, 3)
+                st["max_lateness"] = round(max(st["max_lateness"], lateness), 3)
+                if lateness > max(5.0, interval * 0.1):
+                    logger.warning(f"[{self.name}] {name}: запуск с опозданием {lateness:.1f}с")
+                await self._run_once(name, st)
+                st["last_duration"] = round(loop.time() - started, 3)
+
+            interval = self.interval()
+            next_run += interval
+            now = loop.time()
+            if now > next_run:
+                # Опрос не уложился в интервал — пропускаем такты, а не догоняем их
+                missed = int((now - next_run) // interval) + 1
+                next_run += missed * interval
+                st["skipped_ticks"] += missed
+                self._window["skipped"] += missed
+                logger.warning(
+                    f"[{self.name}] {name}: пропущено тактов: {missed} "
+                    f"(опрос длился {st['last_duration']}с при интервале {interval}с)"
+                )
+            st["next_run"] = _iso(time.time() + (next_run - now))
+
+    async def _sleep_until(self, name: str, st: dict, next_run: float, interval: int) -> tuple[float, int]:
+        """
+        Дождаться next_run. Если интервал в настройках изменился во время
+        ожидания, следующий такт сразу переносится: отсчёт от предыдущего
+        такта (next_run - interval) по новому интервалу.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            changed = settings_cache.changed_event()
+            delay = next_run - loop.time()
+            if delay <= 0:
+                return next_run, interval
+            try:
+                await asyncio.wait_for(changed.wait(), delay)
+            except asyncio.TimeoutError:
+                return next_run, interval
+            new_interval = self.interval()
+            if new_interval != interval:
+                next_run = max(loop.time(), next_run - interval + new_interval)
+                logger.debug(f"[{self.name}] {name}: интервал {interval}с → {new_interval}с, такт перенесён")
+                interval = new_interval
+                st["next_run"] = _iso(time.time() + (next_run - loop.time()))
+
+    async def _run_once(self, name: str, st: dict):
+        server = self.servers.get(name)
+        # Аренда могла перейти к другому узлу — до reconcile не опрашиваем
+        if server is None or not collector_cluster.owns(name):
+            return
+        st["runs"] += 1
+        started = time.perf_counter()
         try:
-            servers = await load_servers()
-            logger.info(f"[sizes] Запуск обновления размеров для {len(servers)} серверов")
-            tasks = [collect_server_sizes(s) for s in servers]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-
-            ok = sum(1 for r in results if not isinstance(r, Exception))
-            errors = sum(1 for r in results if isinstance(r, Exception))
-            error_details = []
-            for i, r in enumerate(results):
-                if isinstance(r, Exception):
-                    logger.error(f"[sizes] Ошибка для {servers[i].name}: {r}")
-                    error_details.append(f"{servers[i].name}: {r}")
-            logger.info(f"[sizes] Завершено: {ok} успешно, {errors} ошибок")
-            if errors > 0:
-                await system_logger.error("collector_sizes", f"Обновление размеров: {errors} ошибок из {len(servers)} серверов", "; ".join(error_details))
-            else:
-                await system_logger.info("collector_sizes", f"Обновление размеров: {ok} серверов ОК")
+            result = await self.func(server)
+            errors = result.get("errors") if isinstance(result, dict) else None
+        except ServerUnavailableError as e:
+            # Circuit breaker разомкнут — опрос отклонён без сетевой попытки
+            st["unavailable"] += 1
+            st["last_error"] = str(e)
+            self._window["unavailable"] += 1
+            COLLECTOR_RUNS.inc(self.name, "unavailable")
+            logger.debug(f"[{self.name}] {e}")
+            return
         except Exception as e:
-            logger.error(f"[sizes] Критическая ошибка в цикле: {e}")
-            await system_logger.error("collector_sizes", f"Критическая ошибка: {e}")
-        interval = await _get_interval("size_update_interval", SIZE_UPDATE_INTERVAL)
-        await asyncio.sleep(interval)
+            result = None
+            errors = [str(e)]
+        COLLECTOR_RUN_SECONDS.observe(time.perf_counter() - started, self.name, name)
+        COLLECTOR_RUNS.inc(self.name, "error" if errors else "ok")
+        if isinstance(result, dict) and "queued" in result:
+            COLLECTOR_ROWS.observe(result["queued"], self.name)
+        if errors:
+            st["errors"] += 1
+            st["last_error"] = "; ".join(errors)[:500]
+            self._window["errors"] += 1
+            self._window["details"].append(f"{name}: {st['last_error']}")
+            logger.error(f"[{self.name}] Ошибка для {name}: {st['last_error']}")
+        else:
+            st["last_error"] = None
+            self._window["ok"] += 1
 
+    async def _flush_summary(self):
+        """Записать в system_log итоги за прошедший интервал."""
+        w, self._window = self._window, {"ok": 0, "errors": 0, "skipped": 0, "unavailable": 0, "details": []}
+        total = w["ok"] + w["errors"]
+        if total == 0 and w["skipped"] == 0 and w["unavailable"] == 0:
+            return
+        logger.info(
+            f"[{self.name}] За интервал: {w['ok']} успешно, {w['errors']} ошибок, "
+            f"{w['skipped']} пропущенных тактов, {w['unavailable']} отклонено (сервер недоступен)"
+        )
+        skipped = f", пропущено тактов: {w['skipped']}" if w["skipped"] else ""
+        if w["unavailable"]:
+            skipped += f", отклонено (сервер недоступен): {w['unavailable']}"
+        if w["errors"] > 0:
+            await system_logger.error(
+                self.source,
+                f"{self.title}: {w['errors']} ошибок из {total} опросов{skipped}",
+                "; ".join(w["details"]),
+            )
+        elif w["skipped"] > 0 or w["unavailable"] > 0:
+            await system_logger.warning(self.source, f"{self.title}: {w['ok']} опросов ОК{skipped}")
+        else:
+            await system_logger.info(self.source, f"{self.title}: {w['ok']} опросов ОК")
 
-async def db_info_loop():
-    """Цикл синхронизации информации о БД (каждые DB_CHECK_INTERVAL секунд)."""
-    await asyncio.sleep(10)
-    while True:
+    def get_status(self) -> dict:
+        return {
+            "servers": len(self.workers),
+            "per_server": {name: dict(st) for name, st in self.status.items()},
+        }
+
+
+async def run_maintenance():
+    """Обслуживание: создание партиций, уровни хранения статистики, очистка логов."""
+    try:
+        logger.info("[maintenance] Запуск обслуживания партиций")
+        await ensure_partitions()
+        logger.info("[maintenance] Партиции на будущие месяцы созданы")
+        await cleanup_old_partitions(retention_horizons())
+        logger.info("[maintenance] Старые партиции уплотнены и очищены")
+
+        # Очистка системных логов
+        logs_days = settings_cache.get_int("logs_retention_days", 30)
+        removed = await system_logger.cleanup(logs_days)
+
+        await system_logger.info("maintenance", f"Обслуживание завершено. Логов очищено: {removed}")
+    except Exception as e:
+        logger.error(f"[maintenance] Ошибка обслуживания: {e}")
+        await system_logger.error("maintenance", f"Ошибка обслуживания: {e}")
+
+
+async def _maintain_if_due():
+    """
+    Выполнить обслуживание, если с прошлого запуска (любым узлом) прошли сутки.
+    Запуск — под pg_try_advisory_lock на отдельном соединении: два узла,
+    одновременно считающие себя лидерами (смена состава кластера, старт),
+    не выполняют его параллельно, а второй видит запись первого в
+    maintenance_runs и не повторяет его.
+    """
+    async with get_pool().acquire() as conn:
+        if not await conn.fetchval("SELECT pg_try_advisory_lock($1)", MAINTENANCE_LOCK):
+            logger.info("[maintenance] Обслуживание выполняет другой процесс")
+            return
         try:
-            servers = await load_servers()
-            logger.info(f"[db_info] Запуск синхронизации БД для {len(servers)} серверов")
-            tasks = [sync_server_db_info(s) for s in servers]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-
-            ok = sum(1 for r in results if not isinstance(r, Exception))
-            errors = sum(1 for r in results if isinstance(r, Exception))
-            error_details = []
-            for i, r in enumerate(results):
-                if isinstance(r, Exception):
-                    logger.error(f"[db_info] Ошибка для {servers[i].name}: {r}")
-                    error_details.append(f"{servers[i].name}: {r}")
-            logger.info(f"[db_info] Завершено: {ok} успешно, {errors} ошибок")
-            if errors > 0:
-                await system_logger.error("collector_db_info", f"Синхронизация БД: {errors} ошибок из {len(servers)} серверов", "; ".join(error_details))
-            else:
-                await system_logger.info("collector_db_info", f"Синхронизация БД: {ok} серверов ОК")
-        except Exception as e:
-            logger.error(f"[db_info] Критическая ошибка в цикле: {e}")
-            await system_logger.error("collector_db_info", f"Критическая ошибка: {e}")
-        interval = await _get_interval("db_check_interval", DB_CHECK_INTERVAL)
-        await asyncio.sleep(interval)
+            due = await conn.fetchval(
+                """
+                SELECT NOT EXISTS (
+                    SELECT 1 FROM maintenance_runs
+                    WHERE name = 'daily' AND started_at > now() - make_interval(secs => $1)
+                )
+                """,
+                DAILY,
+            )
+            if not due:
+                return
+            # Отметка до запуска: ошибка обслуживания не повторяется каждые
+            # MAINTENANCE_CHECK_INTERVAL, следующая попытка — через сутки
+            await conn.execute(
+                """
+                INSERT INTO maintenance_runs (name, node_id, started_at) VALUES ('daily', $1, now())
+                ON CONFLICT (name) DO UPDATE
+                SET node_id = EXCLUDED.node_id, started_at = EXCLUDED.started_at, finished_at = NULL
+                """,
+                collector_cluster.node_id,
+            )
+            await run_maintenance()
+            await conn.execute("UPDATE maintenance_runs SET finished_at = now() WHERE name = 'daily'")
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock($1)", MAINTENANCE_LOCK)
 
 
 async def maintenance_loop():
-    """Ежедневное обслуживание: создание/удаление партиций + очистка логов."""
-    await asyncio.sleep(10)
+    """
+    Ежедневное обслуживание на узле-лидере. Лидерство проверяется каждые
+    MAINTENANCE_CHECK_INTERVAL (TTL узла), поэтому после смены лидера
+    обслуживание не откладывается на сутки; срок считается от последнего
+    запуска в maintenance_runs.
+    """
+    await asyncio.sleep(STARTUP_DELAY)
     while True:
-        try:
-            logger.info("[maintenance] Запуск обслуживания партиций")
-            await ensure_partitions()
-            logger.info("[maintenance] Партиции на будущие месяцы созданы")
-            await cleanup_old_partitions()
-            logger.info("[maintenance] Старые партиции очищены")
+        if collector_cluster.is_leader():
+            try:
+                await _maintain_if_due()
+            except Exception as e:
+                logger.error(f"[maintenance] Ошибка запуска обслуживания: {e}")
+        else:
+            # Обслуживание выполняет один узел кластера
+            logger.debug("[maintenance] Узел не лидер кластера, обслуживание пропущено")
+        await asyncio.sleep(MAINTENANCE_CHECK_INTERVAL)
 
-            # Очистка системных логов
-            logs_days = await _get_interval("logs_retention_days", 30)
-            removed = await system_logger.cleanup(logs_days)
 
-            await system_logger.info("maintenance", f"Обслуживание завершено. Логов очищено: {removed}")
-        except Exception as e:
-            logger.error(f"[maintenance] Ошибка обслуживания: {e}")
-            await system_logger.error("maintenance", f"Ошибка обслуживания: {e}")
-        await asyncio.sleep(DAILY)
+def get_collector_status() -> dict:
+    """Состояние таймеров коллектора: опоздания, пропущенные такты, ошибки."""
+    return {
+        "mode": COLLECTOR_MODE,
+        "node_id": collector_cluster.node_id,
+        "owned_servers": len(collector_cluster.owned),
+        "unavailable_servers": {"pg": server_health.pg.open_names(), "ssh": server_health.ssh.open_names()},
+        "max_concurrency": COLLECTOR_MAX_CONCURRENCY,
+        "ingest": ingest_buffer.get_status(),
+        "jobs": {name: job.get_status() for name, job in _jobs.items()},
+    }
+
+
+def _node_summary() -> dict:
+    """Краткий статус узла для collector_nodes.status (виден другим процессам)."""
+    return {
+        name: {
+            "servers": len(job.workers),
+            "errors": sum(1 for st in job.status.values() if st.get("last_error")),
+            "skipped_ticks": sum(st.get("skipped_ticks", 0) for st in job.status.values()),
+            "unavailable": sum(st.get("unavailable", 0) for st in job.status.values()),
+        }
+        for name, job in _jobs.items()
+    }
 
 
 async def start_collector() -> list[asyncio.Task]:
     """Запуск всех циклов коллектора как asyncio-задач."""
     logger.info("Запуск коллектора статистики...")
+    jobs = [
+        FleetJob("stats", "collector_stats", "Сбор статистики",
+                 collect_server_stats, "collect_interval", COLLECT_INTERVAL),
+        FleetJob("sizes", "collector_sizes", "Обновление размеров",
+                 collect_server_sizes, "size_update_interval", SIZE_UPDATE_INTERVAL),
+        FleetJob("db_info", "collector_db_info", "Синхронизация БД",
+                 sync_server_db_info, "db_check_interval", DB_CHECK_INTERVAL),
+    ]
+    _jobs.clear()
+    _jobs.update({job.name: job for job in jobs})
+    collector_cluster.set_status_provider(_node_summary)
     tasks = [
-        asyncio.create_task(stats_loop(), name="collector-stats"),
-        asyncio.create_task(sizes_loop(), name="collector-sizes"),
-        asyncio.create_task(db_info_loop(), name="collector-db-info"),
-        asyncio.create_task(maintenance_loop(), name="collector-maintenance"),
+        asyncio.create_task(collector_cluster.run(), name="collector-cluster"),
+        asyncio.create_task(ingest_buffer.run(), name="collector-ingest"),
+        asyncio.create_task(ingest_buffer.replay_loop(), name="collector-spool"),
     ]
-    logger.info(f"Коллектор запущен: {len(tasks)} задач")
+    tasks += [asyncio.create_task(job.run(), name=f"collector-{job.name}") for job in jobs]
+    tasks.append(asyncio.create_task(maintenance_loop(), name="collector-maintenance"))
+    logger.info(f"Коллектор запущен: {len(tasks)} задач, до {COLLECTOR_MAX_CONCURRENCY} опросов одновременно")
     await system_logger.info("system", f"Коллектор запущен: {len(tasks)} задач")
     return tasks
 
@@ -157,4 +434,9 @@ async def stop_collector(tasks: list[asyncio.Task]):
             logger.debug(f"Задача {task.get_name()} отменена")
         elif isinstance(result, Exception):
             logger.error(f"Задача {task.get_name()} завершилась с ошибкой: {result}")
+    if tasks:
+        # Опросы остановлены — дописываем очередь до закрытия пула pam_stats
+        await ingest_buffer.close()
+        await collector_cluster.leave()
+    _jobs.clear()
     logger.info("Коллектор остановлен")
@@ -0,0 +1,259 @@
+# app/collector/spool.py
+"""
+Спул сэмплов на диске на время недоступности pam_stats.
+
+Пакет, который флашер очереди записи не смог записать из-за недоступности
+локальной БД, дописывается в сегмент спула, а не теряется. Сегмент — файл
+только на дозапись из кадров:
+
+    magic b"PAMS" | длина payload (uint32 LE) | crc32 payload (uint32 LE) | payload
+
+payload — JSON {"t": таблица, "r": строки, "d": номера колонок времени};
+время (ts и другие колонки timestamptz) — микросекунды от epoch. Запись каждого пакета завершается fsync. Оборванный последний кадр
+(процесс упал во время записи) или кадр с неверной контрольной суммой
+останавливают чтение сегмента: всё до него загружается, сам сегмент
+переименовывается в *.bad для разбора.
+
+Текущий сегмент процесса называется *.open и держит flock; после
+SPOOL_SEGMENT_BYTES или перед загрузкой он закрывается и переименовывается в
+*.seg. Загрузку выполняет любой процесс коллектора на этой машине: сегмент
+берётся под flock, загружается и удаляется. *.open без блокировки (процесс
+упал) тоже загружается. Повторная загрузка сегмента безопасна —
+идемпотентность обеспечивает загрузчик ingest.load_spool_frames, который
+IngestBuffer.replay_loop передаёт в SampleSpool.replay.
+"""
+import asyncio
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from app.config import SPOOL_DIR, SPOOL_MAX_BYTES, SPOOL_SEGMENT_BYTES
+
+logger = logging.getLogger(__name__)
+
+_FRAME = struct.Struct("<4sII")
+_MAGIC = b"PAMS"
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_US = timedelta(microseconds=1)
+ORPHAN_AGE = 60  # секунд: *.open без блокировки старше — сегмент упавшего процесса
+
+Frame = tuple[str, list[tuple]]
+
+
+def encode_frame(table: str, records: list[tuple]) -> bytes:
+    """Кадр сегмента. Колонки времени записи (ts и др.) хранятся в микросекундах от epoch."""
+    times = sorted({i for r in records for i, v in enumerate(r) if isinstance(v, datetime)})
+    rows = [
+        [(v - _EPOCH) // _US if i in times and v is not None else v for i, v in enumerate(r)]
+        for r in records
+    ]
+    payload = json.dumps({"t": table, "r": rows, "d": times}, separators=(",", ":")).encode()
+    return _FRAME.pack(_MAGIC, len(payload), zlib.crc32(payload)) + payload
+
+
+def _decode_payload(payload: bytes) -> Frame:
+    data = json.loads(payload)
+    times = set(data["d"])
+    return data["t"], [
+        tuple(_EPOCH + v * _US if i in times and v is not None else v for i, v in enumerate(r))
+        for r in data["r"]
+    ]
+
+
+def read_segment(path: Path) -> tuple[list[Frame], bool]:
+    """Прочитать кадры сегмента через mmap. Возвращает (кадры, повреждён ли хвост)."""
+    size = path.stat().st_size
+    if size == 0:
+        return [], False
+    frames = []
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        pos = 0
+        while pos + _FRAME.size <= size:
+            magic, length, crc = _FRAME.unpack_from(m, pos)
+            start = pos + _FRAME.size
+            if magic != _MAGIC or start + length > size or zlib.crc32(m[start:start + length]) != crc:
+                break
+            frames.append(_decode_payload(m[start:start + length]))
+            pos = start + length
+    return frames, pos != size
+
+
+class SampleSpool:
+    def __init__(self, directory: Path = SPOOL_DIR, max_bytes: int = SPOOL_MAX_BYTES,
+                 segment_bytes: int = SPOOL_SEGMENT_BYTES):
+        self.dir = Path(directory)
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self._lock = threading.Lock()
+        self._file = None
+        self._path: Path | None = None
+        self._bytes: int | None = None  # занято спулом на диске (оценка процесса)
+        self.metrics = {
+            "spooled_rows": 0,
+            "spooled_batches": 0,
+            "replayed_rows": 0,
+            "duplicate_rows": 0,
+            "bad_segments": 0,
+            "errors": 0,
+            "last_replay_at": None,
+            "last_error": None,
+        }
+
+    def _disk_bytes(self) -> int:
+        if not self.dir.exists():
+            return 0
+        return sum(p.stat().st_size for p in self.dir.iterdir() if p.suffix in (".seg", ".open"))
+
+    def _open_segment(self):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        path = self.dir / f"{time.time_ns():020d}-{os.getpid()}.open"
+        f = open(path, "ab")
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self._file, self._path = f, path
+
+    def _close_segment(self):
+        """Закрыть текущий сегмент и отдать его на загрузку (*.open → *.seg)."""
+        if self._file is None:
+            return
+        f, path = self._file, self._path
+        self._file = self._path = None
+        # Переименовываем под блокировкой: *.open без flock считался бы брошенным
+        if f.tell() == 0:
+            path.unlink(missing_ok=True)
+        else:
+            path.rename(path.with_suffix(".seg"))
+        f.close()
+
+    def _append_sync(self, frames: list[bytes]) -> bool:
+        data = b"".join(frames)
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = self._disk_bytes()
+            if self._bytes + len(data) > self.max_bytes:
+                return False
+            if self._file is None:
+                self._open_segment()
+            self._file.write(data)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._bytes += len(data)
+            if self._file.tell() >= self.segment_bytes:
+                self._close_segment()
+        return True
+
+    async def append(self, items: list[tuple[str, tuple]]) -> bool:
+        """Дописать строки (table, record) в спул. False — спул переполнен или недоступен."""
+        by_table: dict[str, list[tuple]] = {}
+        for table, record in items:
+            by_table.setdefault(table, []).append(record)
+        frames = [encode_frame(table, records) for table, records in by_table.items()]
+        try:
+            ok = await asyncio.to_thread(self._append_sync, frames)
+        except Exception as e:
+            self.metrics["errors"] += 1
+            self.metrics["last_error"] = str(e)[:500]
+            logger.error(f"[spool] Ошибка записи в {self.dir}: {e}")
+            return False
+        if not ok:
+            logger.error(f"[spool] Спул заполнен (SPOOL_MAX_BYTES={self.max_bytes}), пакет не сохранён")
+            return False
+        self.metrics["spooled_rows"] += len(items)
+        self.metrics["spooled_batches"] += 1
+        return True
+
+    def _pending(self) -> list[Path]:
+        """Сегменты на загрузку: закрытые и брошенные упавшими процессами."""
+        if not self.dir.exists():
+            return []
+        now = time.time()
+        paths = []
+        for path in sorted(self.dir.iterdir()):
+            if path.suffix == ".seg":
+                paths.append(path)
+            elif path.suffix == ".open" and path != self._path and now - path.stat().st_mtime > ORPHAN_AGE:
+                paths.append(path)
+        return paths
+
+    def _claim(self, path: Path):
+        """Открыть сегмент под эксклюзивной блокировкой; None — занят другим процессом или уже удалён."""
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            return None
+        if not path.exists():
+            # Пока ждали, сегмент загрузил и удалил другой процесс
+            f.close()
+            return None
+        return f
+
+    async def replay(self, load: Callable[[list[Frame]], Awaitable[tuple[int, int]]]) -> int:
+        """
+        Загрузить все сегменты через load(frames) -> (inserted, duplicates).
+        Ошибка load (БД снова недоступна) прерывает загрузку, сегмент остаётся.
+        """
+        def _rotate():
+            with self._lock:
+                self._close_segment()
+        await asyncio.to_thread(_rotate)
+
+        total = 0
+        for path in await asyncio.to_thread(self._pending):
+            f = await asyncio.to_thread(self._claim, path)
+            if f is None:
+                continue
+            try:
+                frames, damaged = await asyncio.to_thread(read_segment, path)
+                if frames:
+                    inserted, duplicates = await load(frames)
+                    total += inserted
+                    self.metrics["replayed_rows"] += inserted
+                    self.metrics["duplicate_rows"] += duplicates
+                if damaged:
+                    self.metrics["bad_segments"] += 1
+                    logger.error(f"[spool] Сегмент {path.name} повреждён, загружено кадров: {len(frames)}")
+                    await asyncio.to_thread(path.rename, path.with_suffix(".bad"))
+                else:
+                    await asyncio.to_thread(path.unlink)
+                with self._lock:
+                    self._bytes = None
+            finally:
+                f.close()
+        self.metrics["last_replay_at"] = datetime.now(timezone.utc).isoformat()
+        if total:
+            logger.info(f"[spool] Из спула загружено строк: {total}")
+        return total
+
+    def has_pending(self) -> bool:
+        return self._file is not None or bool(self._pending())
+
+    def close(self):
+        """Закрыть текущий сегмент (при остановке; загрузится при следующем запуске)."""
+        with self._lock:
+            self._close_segment()
+
+    def get_status(self) -> dict:
+        """Без обращения к диску: bytes — оценка на момент последней записи."""
+        return {
+            "dir": str(self.dir),
+            "open_segment": self._path.name if self._path else None,
+            "bytes": self._bytes or 0,
+            **self.metrics,
+        }
+
+
+# Спул процесса коллектора
+sample_spool = SampleSpool()
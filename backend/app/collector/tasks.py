@@ -3,154 +3,136 @@
 Модуль сбора статистики с удалённых PostgreSQL серверов.
 Собранные данные записываются в локальную БД pam_stats через asyncpg.
 
-Все синхронные операции (psycopg2, paramiko) выполняются в thread executor,
-чтобы не блокировать asyncio event loop.
+Запросы к удалённым серверам выполняются через asyncpg (remote_pool) прямо
+в event loop. Синхронный paramiko (SSH df) выполняется в thread executor,
+чтобы не блокировать event loop.
 """
 import asyncio
-import re
 import logging
 from datetime import datetime, timezone
 
+import asyncpg
+
 from app.models import Server
-from app.database.pool import db_pool
+from app.database.remote_pool import remote_pool
+from app.database import series
 from app.database.local_db import get_pool
-from app.services.ssh import get_ssh_client
+from app.services.ssh import ssh_df
+from app.services.server_health import ServerUnavailableError
+from app.collector.ingest import build_stats_records, build_size_records, build_server_record, ingest_buffer
 
 logger = logging.getLogger(__name__)
 
 # --------------------------------------------------------------------------- #
-#  Вспомогательные синхронные функции (выполняются в executor)
+#  Запросы к удалённым серверам (asyncpg)
 # --------------------------------------------------------------------------- #
 
-def _fetch_pg_stat_database(server: Server) -> list[dict]:
-    """Получить pg_stat_database + data_directory с удалённого сервера (sync)."""
-    rows = []
-    with db_pool.get_connection(server) as conn:
-        with conn.cursor() as cur:
-            cur.execute("SHOW data_directory;")
-            data_dir = cur.fetchone()[0]
-
-            cur.execute("""
-                SELECT s.datname, s.numbackends, s.xact_commit
-                FROM pg_stat_database s
-                JOIN pg_database d ON s.datid = d.oid
-                WHERE NOT d.datistemplate AND d.datname != 'postgres'
-                ORDER BY s.datname;
-            """)
-            for row in cur.fetchall():
-                rows.append({
-                    "datname": row[0],
-                    "numbackends": row[1],
-                    "xact_commit": row[2],
-                    "data_dir": data_dir,
-                })
-    return rows
-
-
-def _fetch_db_sizes(server: Server) -> list[dict]:
-    """Получить размеры баз данных с удалённого сервера (sync).
+# Сводка сервера целиком (server_stats): соединения — по всем БД, включая postgres
+_SERVER_INFO_SQL = """
+    SELECT current_setting('data_directory')  AS data_dir,
+           current_setting('server_version')  AS version,
+           pg_postmaster_start_time()         AS started_at,
+           (SELECT SUM(numbackends) FROM pg_stat_database)::integer AS connections;
+"""
+
+
+async def _fetch_pg_stat_database(server: Server) -> tuple[list[dict], dict]:
+    """Получить pg_stat_database и сводку сервера (data_directory, версия, старт, соединения)."""
+    async with remote_pool.acquire(server) as conn:
+        info = dict(await conn.fetchrow(_SERVER_INFO_SQL))
+        records = await conn.fetch("""
+            SELECT s.datname, s.numbackends, s.xact_commit
+            FROM pg_stat_database s
+            JOIN pg_database d ON s.datid = d.oid
+            WHERE NOT d.datistemplate AND d.datname != 'postgres'
+            ORDER BY s.datname;
+        """)
+    rows = [
+        {
+            "datname": row["datname"],
+            "numbackends": row["numbackends"],
+            "xact_commit": row["xact_commit"],
+        }
+        for row in records
+    ]
+    return rows, info
+
+
+async def _fetch_db_sizes(server: Server) -> list[dict]:
+    """Получить размеры баз данных с удалённого сервера.
     Запрашиваем размер каждой БД отдельно, чтобы не словить общий таймаут
     на серверах с большим количеством баз (80+).
     """
     sizes = []
-    with db_pool.get_connection(server) as conn:
-        with conn.cursor() as cur:
-            # Сначала получаем список БД
-            cur.execute("""
+    async with remote_pool.acquire(server) as conn:
+        # Сначала получаем список БД
+        db_names = [
+            row["datname"]
+            for row in await conn.fetch("""
                 SELECT datname FROM pg_database
                 WHERE NOT datistemplate AND datname != 'postgres'
                 ORDER BY datname;
             """)
-            db_names = [row[0] for row in cur.fetchall()]
+        ]
 
-            # Запрашиваем размер каждой БД отдельно с таймаутом на каждый запрос
+        # Запрашиваем размер каждой БД отдельно с таймаутом на каждый запрос
+        await conn.execute("SET statement_timeout = '600s'")
+        try:
             for dbname in db_names:
                 try:
-                    cur.execute("SET statement_timeout = '600s'")
-                    cur.execute("SELECT pg_database_size(%s)", (dbname,))
-                    row = cur.fetchone()
-                    if row:
-                        sizes.append({"datname": dbname, "db_size": row[0]})
-                except Exception as e:
+                    size = await conn.fetchval("SELECT pg_database_size($1::name)", dbname, timeout=610)
+                    if size is not None:
+                        sizes.append({"datname": dbname, "db_size": size})
+                except (asyncpg.PostgresError, asyncio.TimeoutError) as e:
                     logger.warning(f"Таймаут pg_database_size для {server.name}/{dbname}: {e}")
-                    # Сброс состояния после ошибки
-                    conn.rollback()
-            cur.execute("SET statement_timeout = '5s'")
+        finally:
+            if not conn.is_closed():
+                await conn.execute("RESET statement_timeout")
     return sizes
 
 
-def _fetch_remote_databases(server: Server) -> list[dict]:
-    """Получить список баз данных (datname, oid) с удалённого сервера (sync)."""
-    databases = []
-    with db_pool.get_connection(server) as conn:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT datname, oid
-                FROM pg_database
-                WHERE NOT datistemplate AND datname != 'postgres'
-                ORDER BY datname;
-            """)
-            for row in cur.fetchall():
-                databases.append({"datname": row[0], "oid": int(row[1])})
-    return databases
+_REMOTE_DATABASES_SQL = """
+    SELECT datname, oid{creation}
+    FROM pg_database
+    WHERE NOT datistemplate AND datname != 'postgres'
+    ORDER BY datname;
+"""
+# Время создания БД — mtime файла PG_VERSION; missing_ok: у БД в другом tablespace его нет
+_CREATION_TIME_SQL = ",\n           (pg_stat_file('base/' || oid || '/PG_VERSION', true)).modification AS creation_time"
 
 
-def _ssh_df(server: Server, data_dir: str) -> tuple[int | None, int | None]:
-    """Выполнить df -B1 через SSH и вернуть (disk_free, disk_total)."""
-    # Определяем точку монтирования и валидируем
-    mount_point = data_dir.split("/DB")[0] if "/DB" in data_dir else data_dir
-    if not mount_point or not mount_point.startswith("/") or ".." in mount_point:
-        logger.warning(f"Невалидный mount_point для {server.name}: {mount_point}")
-        return None, None
-    if not re.match(r"^[a-zA-Z0-9/_.-]+$", mount_point):
-        logger.warning(f"Подозрительный mount_point для {server.name}: {mount_point}")
-        return None, None
+async def _fetch_remote_databases(server: Server) -> list[dict]:
+    """
+    Получить список баз данных (datname, oid, creation_time) одним запросом.
 
-    ssh = None
+    Без прав на pg_stat_file (нужен суперпользователь или pg_read_server_files)
+    запрос повторяется без времени создания — creation_time будет None.
+    """
     try:
-        ssh = get_ssh_client(server)
-        cmd = f"df -B1 {mount_point}"
-        _stdin, stdout, stderr = ssh.exec_command(cmd, timeout=10)
-        output = stdout.read().decode().strip().splitlines()
-        err = stderr.read().decode().strip()
-
-        if err:
-            logger.warning(f"df stderr для {server.name}: {err}")
-            return None, None
-
-        if len(output) > 1:
-            cols = output[1].split()
-            if len(cols) >= 4:
-                total = int(cols[1])
-                free = int(cols[3])
-                return free, total
-
-        logger.warning(f"Неожиданный вывод df для {server.name}: {output}")
-        return None, None
-    except Exception as e:
-        logger.error(f"SSH df ошибка для {server.name}: {e}")
-        return None, None
-    finally:
-        if ssh:
-            ssh.close()
+        records = await remote_pool.fetch(server, _REMOTE_DATABASES_SQL.format(creation=_CREATION_TIME_SQL))
+    except asyncpg.InsufficientPrivilegeError as e:
+        logger.warning(f"pg_stat_file недоступен на {server.name}, время создания БД не определяется: {e}")
+        records = await remote_pool.fetch(server, _REMOTE_DATABASES_SQL.format(creation=""))
+    return [
+        {
+            "datname": row["datname"],
+            "oid": int(row["oid"]),
+            "creation_time": row.get("creation_time"),
+        }
+        for row in records
+    ]
 
 
-def _pg_stat_file_via_sql(server: Server, oid: int) -> datetime | None:
-    """Получить время создания БД через pg_stat_file по SQL-соединению."""
-    try:
-        with db_pool.get_connection(server) as conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    "SELECT (pg_stat_file('base/' || %s || '/PG_VERSION')).modification",
-                    (str(oid),)
-                )
-                row = cur.fetchone()
-                if row and row[0]:
-                    return row[0]
-        return None
-    except Exception as e:
-        logger.warning(f"pg_stat_file SQL ошибка для {server.name} OID {oid}: {e}")
-        return None
+# --------------------------------------------------------------------------- #
+#  Синхронный SSH (выполняется в executor)
+# --------------------------------------------------------------------------- #
+
+def _ssh_df(server: Server, data_dir: str) -> tuple[int | None, int | None]:
+    """Выполнить df -B1 по постоянной SSH-сессии и вернуть (disk_free, disk_total)."""
+    free, total, status = ssh_df(server, data_dir, timeout=10)
+    if status != "ok":
+        logger.warning(f"SSH df для {server.name}: {status}")
+    return free, total
 
 
 # --------------------------------------------------------------------------- #
@@ -167,69 +149,37 @@ async def _get_disk_usage_ssh(server: Server, data_dir: str) -> tuple[int | None
         return None, None
 
 
-async def _get_db_creation_time(server: Server, oid: int) -> datetime | None:
-    """Получить время создания БД через pg_stat_file (async-обёртка)."""
-    loop = asyncio.get_event_loop()
-    try:
-        return await loop.run_in_executor(None, _pg_stat_file_via_sql, server, oid)
-    except Exception as e:
-        logger.error(f"Ошибка получения creation_time для {server.name} OID {oid}: {e}")
-        return None
-
-
 async def collect_server_stats(server: Server) -> dict:
     """
     Собрать статистику pg_stat_database и информацию о диске с одного сервера.
-    Записать результаты в локальную таблицу statistics.
+    Поставить строки БД в очередь записи в statistics, а метрики сервера
+    (диск, соединения, время старта, версия) — одной строкой в server_stats.
 
-    Возвращает dict с итогами: inserted, errors, server_name.
+    Возвращает dict с итогами: queued, errors, server_name.
     """
-    result = {"server_name": server.name, "inserted": 0, "errors": []}
-    loop = asyncio.get_event_loop()
-
+    result = {"server_name": server.name, "queued": 0, "errors": []}
     try:
-        # 1. Получаем pg_stat_database с удалённого сервера (sync -> executor)
-        rows = await loop.run_in_executor(None, _fetch_pg_stat_database, server)
+        # 1. Получаем pg_stat_database с удалённого сервера
+        rows, info = await _fetch_pg_stat_database(server)
         if not rows:
             result["errors"].append("Нет баз данных в pg_stat_database")
             return result
 
         # 2. Получаем disk usage через SSH
-        data_dir = rows[0]["data_dir"]
-        disk_free, disk_total = await _get_disk_usage_ssh(server, data_dir)
+        disk_free, disk_total = await _get_disk_usage_ssh(server, info["data_dir"])
 
-        # 3. Вставляем в локальную БД через asyncpg
-        pool = get_pool()
+        # 3. Ставим в очередь записи (пишет флашер ingest_buffer)
         now = datetime.now(timezone.utc)
-
-        async with pool.acquire() as conn:
-            for row in rows:
-                try:
-                    await conn.execute(
-                        """
-                        INSERT INTO statistics
-                            (server_name, ts, datname, numbackends, xact_commit, disk_free, disk_total)
-                        VALUES ($1, $2, $3, $4, $5, $6, $7)
-                        """,
-                        server.name,
-                        now,
-                        row["datname"],
-                        row["numbackends"],
-                        row["xact_commit"],
-                        disk_free,
-                        disk_total,
-                    )
-                    result["inserted"] += 1
-                except Exception as e:
-                    result["errors"].append(f"{row['datname']}: {e}")
-                    logger.error(
-                        f"Ошибка INSERT statistics для {server.name}/{row['datname']}: {e}"
-                    )
+        records = build_stats_records(server.name, now, rows)
+        result["queued"] = await ingest_buffer.put("statistics", records)
+        await ingest_buffer.put("server_stats", [build_server_record(server.name, now, info, disk_free, disk_total)])
 
         logger.info(
-            f"[collect] {server.name}: вставлено {result['inserted']} строк, "
+            f"[collect] {server.name}: в очередь записи {result['queued']} строк, "
             f"disk_free={disk_free}, disk_total={disk_total}"
         )
+    except ServerUnavailableError:
+        raise
     except Exception as e:
         msg = f"Ошибка сбора статистики с {server.name}: {e}"
         result["errors"].append(msg)
@@ -241,47 +191,27 @@ async def collect_server_stats(server: Server) -> dict:
 async def collect_server_sizes(server: Server) -> dict:
     """
     Собрать размеры баз данных с одного сервера.
-    Обновляет поле db_size в последней записи statistics для каждой БД
-    или сохраняет для вставки при следующем сборе.
+    Ставит по строке на БД в очередь записи в append-only таблицу db_sizes
+    (строки statistics не обновляются).
 
-    Возвращает dict с итогами: updated, errors, server_name.
+    Возвращает dict с итогами: queued, errors, server_name.
     """
-    result = {"server_name": server.name, "updated": 0, "errors": []}
-    loop = asyncio.get_event_loop()
-
+    result = {"server_name": server.name, "queued": 0, "errors": []}
     try:
         # 1. Получаем размеры с удалённого сервера
-        sizes = await loop.run_in_executor(None, _fetch_db_sizes, server)
+        sizes = await _fetch_db_sizes(server)
         if not sizes:
             result["errors"].append("Нет баз данных для получения размеров")
             return result
 
-        # 2. Обновляем последние записи в statistics
-        pool = get_pool()
-        async with pool.acquire() as conn:
-            for entry in sizes:
-                try:
-                    # Обновляем ВСЕ записи с NULL db_size для данной БД
-                    tag = await conn.execute(
-                        """
-                        UPDATE statistics
-                        SET db_size = $1
-                        WHERE server_name = $2 AND datname = $3 AND db_size IS NULL
-                        """,
-                        entry["db_size"],
-                        server.name,
-                        entry["datname"],
-                    )
-                    # asyncpg возвращает строку вида "UPDATE N"
-                    updated_count = int(tag.split()[-1])
-                    result["updated"] += updated_count
-                except Exception as e:
-                    result["errors"].append(f"{entry['datname']}: {e}")
-                    logger.error(
-                        f"Ошибка UPDATE db_size для {server.name}/{entry['datname']}: {e}"
-                    )
+        # 2. Ставим сэмплы размеров в очередь записи
+        now = datetime.now(timezone.utc)
+        records = build_size_records(server.name, now, sizes)
+        result["queued"] = await ingest_buffer.put("db_sizes", records)
 
-        logger.info(f"[sizes] {server.name}: обновлено {result['updated']} записей")
+        logger.info(f"[sizes] {server.name}: в очередь записи {result['queued']} размеров")
+    except ServerUnavailableError:
+        raise
     except Exception as e:
         msg = f"Ошибка сбора размеров с {server.name}: {e}"
         result["errors"].append(msg)
@@ -290,11 +220,31 @@ async def collect_server_sizes(server: Server) -> dict:
     return result
 
 
+_UPSERT_DB_INFO = """
+    INSERT INTO db_info (server_name, datname, oid, creation_time, first_seen, last_seen)
+    SELECT $1, u.datname, u.oid, u.creation_time, now(), now()
+    FROM unnest($2::text[], $3::bigint[], $4::timestamptz[]) AS u(datname, oid, creation_time)
+    ON CONFLICT (server_name, datname) DO UPDATE SET
+        oid = EXCLUDED.oid,
+        -- Пересозданная БД (новый OID) начинает историю заново
+        creation_time = CASE
+            WHEN db_info.oid = EXCLUDED.oid
+            THEN COALESCE(db_info.creation_time, EXCLUDED.creation_time)
+            ELSE EXCLUDED.creation_time
+        END,
+        first_seen = CASE WHEN db_info.oid = EXCLUDED.oid THEN db_info.first_seen ELSE now() END,
+        last_seen = now()
+"""
+
+
 async def sync_server_db_info(server: Server) -> dict:
     """
     Синхронизация таблицы db_info для одного сервера.
     Обнаруживает новые, удалённые и пересозданные (изменённый OID) базы данных.
 
+    Один запрос к удалённому серверу и одна локальная транзакция независимо
+    от числа баз: изменения применяются через unnest/ANY по массивам.
+
     Возвращает dict с итогами: added, deleted, recreated, errors, server_name.
     """
     result = {
@@ -304,157 +254,83 @@ async def sync_server_db_info(server: Server) -> dict:
         "recreated": 0,
         "errors": [],
     }
-    loop = asyncio.get_event_loop()
-
     try:
-        # 1. Получаем текущий список БД с удалённого сервера
-        remote_dbs = await loop.run_in_executor(None, _fetch_remote_databases, server)
+        # 1. Получаем текущий список БД с удалённого сервера (вместе с creation_time)
+        remote_dbs = await _fetch_remote_databases(server)
         remote_map = {db["datname"]: db["oid"] for db in remote_dbs}
 
-        # 2. Получаем текущее состояние из локальной db_info
         pool = get_pool()
         async with pool.acquire() as conn:
-            local_rows = await conn.fetch(
-                "SELECT datname, oid FROM db_info WHERE server_name = $1",
-                server.name,
-            )
-        local_map = {row["datname"]: row["oid"] for row in local_rows}
-
-        local_names = set(local_map.keys())
-        remote_names = set(remote_map.keys())
-
-        new_dbs = remote_names - local_names
-        deleted_dbs = local_names - remote_names
-        common_dbs = local_names & remote_names
-
-        # 3. Обработка пересозданных БД (OID изменился)
-        recreated_dbs = set()
-        for dbname in common_dbs:
-            if remote_map[dbname] != local_map[dbname]:
-                recreated_dbs.add(dbname)
-
-        # 4. Обновляем last_seen для всех существующих
-        if common_dbs - recreated_dbs:
-            pool = get_pool()
-            async with pool.acquire() as conn:
-                await conn.execute(
-                    """
-                    UPDATE db_info
-                    SET last_seen = now()
-                    WHERE server_name = $1 AND datname = ANY($2::text[])
-                    """,
+            async with conn.transaction():
+                # 2. Текущее состояние из локальной db_info (блокируем строки сервера,
+                #    чтобы параллельная синхронизация не посчитала изменения дважды)
+                local_rows = await conn.fetch(
+                    "SELECT datname, oid FROM db_info WHERE server_name = $1 FOR UPDATE",
                     server.name,
-                    list(common_dbs - recreated_dbs),
                 )
+                local_map = {row["datname"]: row["oid"] for row in local_rows}
 
-        # 4b. Backfill: заполняем creation_time для записей где он NULL
-        pool = get_pool()
-        async with pool.acquire() as conn:
-            null_rows = await conn.fetch(
-                "SELECT datname, oid FROM db_info WHERE server_name = $1 AND creation_time IS NULL",
-                server.name,
-            )
-        for nr in null_rows:
-            try:
-                ct = await _get_db_creation_time(server, nr["oid"])
-                if ct:
-                    pool = get_pool()
-                    async with pool.acquire() as conn:
+                new_dbs = sorted(remote_map.keys() - local_map.keys())
+                deleted_dbs = sorted(local_map.keys() - remote_map.keys())
+                recreated_dbs = sorted(
+                    name for name in remote_map.keys() & local_map.keys()
+                    if remote_map[name] != local_map[name]
+                )
+
+                # 3. Старая история пересозданных и удалённых БД больше не относится к ним
+                purge = recreated_dbs + deleted_dbs
+                if purge:
+                    for table in series.SERIES_TABLES:
                         await conn.execute(
-                            "UPDATE db_info SET creation_time = $1 WHERE server_name = $2 AND datname = $3",
-                            ct, server.name, nr["datname"],
+                            f"DELETE FROM {table} WHERE series_id IN "
+                            f"(SELECT id FROM series WHERE server_name = $1 AND datname = ANY($2::text[]))",
+                            server.name, purge,
                         )
-            except Exception:
-                pass
-
-        # 5. Обработка новых БД
-        for dbname in new_dbs:
-            try:
-                oid = remote_map[dbname]
-                creation_time = await _get_db_creation_time(server, oid)
-
-                pool = get_pool()
-                async with pool.acquire() as conn:
+                    for table in ("db_sizes", "latest_sample"):
+                        await conn.execute(
+                            f"DELETE FROM {table} WHERE server_name = $1 AND datname = ANY($2::text[])",
+                            server.name, purge,
+                        )
+                if deleted_dbs:
                     await conn.execute(
-                        """
-                        INSERT INTO db_info (server_name, datname, oid, creation_time, first_seen, last_seen)
-                        VALUES ($1, $2, $3, $4, now(), now())
-                        """,
-                        server.name,
-                        dbname,
-                        oid,
-                        creation_time,
+                        "DELETE FROM db_info WHERE server_name = $1 AND datname = ANY($2::text[])",
+                        server.name, deleted_dbs,
                     )
-                result["added"] += 1
-                logger.info(f"[db_info] {server.name}: новая БД '{dbname}' (OID {oid})")
-            except Exception as e:
-                result["errors"].append(f"add {dbname}: {e}")
-                logger.error(f"Ошибка добавления db_info для {server.name}/{dbname}: {e}")
 
-        # 6. Обработка пересозданных БД
-        for dbname in recreated_dbs:
-            try:
-                new_oid = remote_map[dbname]
-                creation_time = await _get_db_creation_time(server, new_oid)
-
-                pool = get_pool()
-                async with pool.acquire() as conn:
-                    # Удаляем старую статистику
+                # 4. Новые, пересозданные и существующие БД — одним upsert
+                #    (last_seen, backfill пустого creation_time)
+                if remote_dbs:
                     await conn.execute(
-                        "DELETE FROM statistics WHERE server_name = $1 AND datname = $2",
+                        _UPSERT_DB_INFO,
                         server.name,
-                        dbname,
+                        [db["datname"] for db in remote_dbs],
+                        [db["oid"] for db in remote_dbs],
+                        [db["creation_time"] for db in remote_dbs],
                     )
-                    # Обновляем db_info с новым OID
-                    await conn.execute(
-                        """
-                        UPDATE db_info
-                        SET oid = $1, creation_time = $2, first_seen = now(), last_seen = now()
-                        WHERE server_name = $3 AND datname = $4
-                        """,
-                        new_oid,
-                        creation_time,
-                        server.name,
-                        dbname,
-                    )
-                result["recreated"] += 1
-                logger.info(
-                    f"[db_info] {server.name}: БД '{dbname}' пересоздана "
-                    f"(OID {local_map[dbname]} -> {new_oid})"
-                )
-            except Exception as e:
-                result["errors"].append(f"recreate {dbname}: {e}")
-                logger.error(
-                    f"Ошибка обновления db_info для пересозданной {server.name}/{dbname}: {e}"
-                )
 
-        # 7. Обработка удалённых БД
+        if purge:
+            # Новая БД с тем же именем не должна пропускать сэмплы по значениям старой
+            ingest_buffer.changes.forget(server.name, purge)
+
+        result["added"] = len(new_dbs)
+        result["deleted"] = len(deleted_dbs)
+        result["recreated"] = len(recreated_dbs)
+        for dbname in new_dbs:
+            logger.info(f"[db_info] {server.name}: новая БД '{dbname}' (OID {remote_map[dbname]})")
+        for dbname in recreated_dbs:
+            logger.info(
+                f"[db_info] {server.name}: БД '{dbname}' пересоздана "
+                f"(OID {local_map[dbname]} -> {remote_map[dbname]})"
+            )
         for dbname in deleted_dbs:
-            try:
-                pool = get_pool()
-                async with pool.acquire() as conn:
-                    await conn.execute(
-                        "DELETE FROM statistics WHERE server_name = $1 AND datname = $2",
-                        server.name,
-                        dbname,
-                    )
-                    await conn.execute(
-                        "DELETE FROM db_info WHERE server_name = $1 AND datname = $2",
-                        server.name,
-                        dbname,
-                    )
-                result["deleted"] += 1
-                logger.info(f"[db_info] {server.name}: БД '{dbname}' удалена")
-            except Exception as e:
-                result["errors"].append(f"delete {dbname}: {e}")
-                logger.error(
-                    f"Ошибка удаления db_info для {server.name}/{dbname}: {e}"
-                )
+            logger.info(f"[db_info] {server.name}: БД '{dbname}' удалена")
 
         logger.info(
             f"[db_info] {server.name}: +{result['added']} новых, "
             f"-{result['deleted']} удалённых, ~{result['recreated']} пересозданных"
         )
+    except ServerUnavailableError:
+        raise
     except Exception as e:
         msg = f"Ошибка синхронизации db_info для {server.name}: {e}"
         result["errors"].append(msg)
@@ -34,8 +34,47 @@ COLLECT_INTERVAL = int(os.getenv("COLLECT_INTERVAL", "600"))           # 10 ми
 SIZE_UPDATE_INTERVAL = int(os.getenv("SIZE_UPDATE_INTERVAL", "1800"))  # 30 минут — размеры БД
 DB_CHECK_INTERVAL = int(os.getenv("DB_CHECK_INTERVAL", "1800"))       # 30 минут — новые/удалённые БД
 
-# Retention
-RETENTION_MONTHS = int(os.getenv("RETENTION_MONTHS", "12"))
+# Режим коллектора:
+#   embedded — коллектор работает в процессе API (по умолчанию);
+#   external — API коллектор не запускает, он работает отдельным процессом (python -m app.collector)
+COLLECTOR_MODE = os.getenv("COLLECTOR_MODE", "embedded")
+if COLLECTOR_MODE not in ("embedded", "external"):
+    raise RuntimeError(f"Недопустимый COLLECTOR_MODE={COLLECTOR_MODE!r}: ожидается embedded или external")
+
+# Планировщик коллектора
+COLLECTOR_MAX_CONCURRENCY = int(os.getenv("COLLECTOR_MAX_CONCURRENCY", "20"))  # одновременных опросов на все циклы
+
+# Несколько процессов коллектора: серверы делятся между живыми узлами (consistent hashing)
+COLLECTOR_NODE_ID = os.getenv("COLLECTOR_NODE_ID")  # по умолчанию <hostname>:<pid>
+COLLECTOR_HEARTBEAT_INTERVAL = 10  # секунд между heartbeat узла и продлением аренды серверов
+COLLECTOR_NODE_TTL = int(os.getenv("COLLECTOR_NODE_TTL", "30"))  # узел без heartbeat дольше — мёртв, аренда истекает
+
+# Очередь записи сэмплов в pam_stats (write-behind): опрос серверов не ждёт локальную БД
+INGEST_QUEUE_MAX_RECORDS = int(os.getenv("INGEST_QUEUE_MAX_RECORDS", "200000"))  # строк в очереди, не больше
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "5000"))  # строк в одном пакете записи
+INGEST_FLUSH_INTERVAL = int(os.getenv("INGEST_FLUSH_INTERVAL", "2"))  # секунд: неполный пакет пишется не позже
+INGEST_PUT_TIMEOUT = 10  # секунд: сколько задача сбора ждёт места в полной очереди
+# Что отбрасывать, если очередь так и не освободилась: drop_oldest — старые строки, drop_newest — новые
+INGEST_DROP_POLICY = os.getenv("INGEST_DROP_POLICY", "drop_oldest")
+if INGEST_DROP_POLICY not in ("drop_oldest", "drop_newest"):
+    raise RuntimeError(f"Недопустимый INGEST_DROP_POLICY={INGEST_DROP_POLICY!r}: ожидается drop_oldest или drop_newest")
+
+# Спул на диске: пакеты, которые не удалось записать в pam_stats, дописываются туда до её восстановления
+SPOOL_DIR = Path(os.getenv("SPOOL_DIR", "/var/lib/pg_activity_monitor/spool"))
+SPOOL_MAX_BYTES = int(os.getenv("SPOOL_MAX_BYTES", str(1024 ** 3)))  # больше — новые пакеты не спулятся
+SPOOL_SEGMENT_BYTES = 16 * 1024 ** 2  # размер сегмента, после которого открывается следующий
+SPOOL_REPLAY_INTERVAL = 30  # секунд между попытками загрузить спул в pam_stats
+
+# Retention (уровни хранения statistics; значения по умолчанию для настроек из таблицы settings):
+# сырые сэмплы — дней, часовые агрегаты — месяцев, суточные агрегаты и db_sizes — месяцев
+RAW_RETENTION_DAYS = int(os.getenv("RAW_RETENTION_DAYS", "90"))
+HOURLY_RETENTION_MONTHS = int(os.getenv("HOURLY_RETENTION_MONTHS", "12"))
+DAILY_RETENTION_MONTHS = int(os.getenv("DAILY_RETENTION_MONTHS", "60"))
+CHUNK_AFTER_DAYS = int(os.getenv("CHUNK_AFTER_DAYS", "7"))  # через N дней после конца месяца сырые сэмплы сжимаются в чанки, 0 — нет
+
+# Хранение только изменений: неизменившийся сэмпл statistics/db_sizes не пишется,
+# но не реже чем раз в N интервалов сбора (heartbeat); 0 — писать каждый сэмпл
+CHANGE_ONLY_HEARTBEAT = int(os.getenv("CHANGE_ONLY_HEARTBEAT", "0"))
 
 # Настройки пулов подключений
 POOL_CONFIGS = {
@@ -47,6 +86,32 @@ POOL_CONFIGS = {
 SERVER_STATUS_CACHE_TTL = 5  # секунд
 SSH_CACHE_TTL = 30  # секунд
 
+# Пул постоянных SSH-сессий
+SSH_POOL_MAX_SESSIONS = int(os.getenv("SSH_POOL_MAX_SESSIONS", "200"))
+SSH_POOL_IDLE_TIMEOUT = int(os.getenv("SSH_POOL_IDLE_TIMEOUT", "900"))  # секунд без команд до закрытия
+SSH_KEEPALIVE_INTERVAL = 30  # секунд
+
+# Circuit breaker недоступных серверов (PostgreSQL и SSH отдельно)
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "3"))  # ошибок подряд до размыкания
+BREAKER_BASE_BACKOFF = int(os.getenv("BREAKER_BASE_BACKOFF", "30"))  # секунд до первой пробы
+BREAKER_MAX_BACKOFF = int(os.getenv("BREAKER_MAX_BACKOFF", "1800"))  # потолок экспоненциальной паузы
+BREAKER_PROBE_TIMEOUT = 60  # секунд: зависшая проба не блокирует следующую
+
+# Дедлайны обращений к удалённым серверам из обработчиков API (секунды, см. services/remote_access.py)
+REMOTE_QUERY_DEADLINE = int(os.getenv("REMOTE_QUERY_DEADLINE", "5"))     # запрос через asyncpg
+REMOTE_CONNECT_DEADLINE = int(os.getenv("REMOTE_CONNECT_DEADLINE", "3"))  # проверка доступности порта
+REMOTE_STATUS_DEADLINE = int(os.getenv("REMOTE_STATUS_DEADLINE", "15"))   # статус сервера: PostgreSQL + SSH df
+REMOTE_SSH_DEADLINE = int(os.getenv("REMOTE_SSH_DEADLINE", "20"))         # тест SSH-подключения
+REMOTE_CALL_THREADS = int(os.getenv("REMOTE_CALL_THREADS", "32"))         # потоки синхронных вызовов (psycopg2, paramiko)
+
+# Сторож event loop: блокировка дольше порога пишется в лог со стеком; 0 — выключен
+LOOP_BLOCK_WARN_MS = int(os.getenv("LOOP_BLOCK_WARN_MS", "0"))
+
+# Метрики Prometheus (/api/metrics)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # скрейп с Authorization: Bearer <token>; без токена /api/metrics — по JWT
+COLLECTOR_METRICS_PORT = int(os.getenv("COLLECTOR_METRICS_PORT", "0"))  # порт /metrics отдельного коллектора, 0 — выключено
+COLLECTOR_METRICS_HOST = os.getenv("COLLECTOR_METRICS_HOST", "127.0.0.1")  # адрес /metrics отдельного коллектора
+
 # Логирование
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 
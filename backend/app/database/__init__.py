@@ -1,5 +1,6 @@
 # app/database/__init__.py
 from .pool import DatabasePool, db_pool
+from .remote_pool import RemotePool, remote_pool
 from . import local_db
 
-__all__ = ["DatabasePool", "db_pool", "local_db"]
+__all__ = ["DatabasePool", "db_pool", "RemotePool", "remote_pool", "local_db"]
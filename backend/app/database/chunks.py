@@ -0,0 +1,293 @@
+# app/database/chunks.py
+"""
+Сжатое хранение сырых сэмплов закрытых месяцев.
+
+Партиция statistics закрытого месяца (см. retention_horizons()["chunks"])
+упаковывается в statistics_chunks: один bytea-чанк на (series_id, сутки UTC).
+Время кодируется delta-of-delta от предыдущих сэмплов, значения — разностью
+с предыдущим значением; всё пишется zigzag-varint. Метрики целочисленные,
+поэтому достаточно разностей: счётчик xact_commit растёт монотонно,
+numbackends меняется редко — на сэмпл уходит несколько байт вместо строки
+heap и записи индекса.
+
+Партиция после упаковки остаётся пустой и принимает опоздавшие строки
+(спул); следующая упаковка сливает их с чанками. Запросы сырого уровня
+(api/stats.py) читают statistics вместе с раскодированными чанками —
+см. fetch_columns() и union_source().
+"""
+import itertools
+import logging
+from datetime import datetime, timedelta, timezone
+
+import asyncpg
+
+from app.database import rollups
+
+logger = logging.getLogger(__name__)
+
+CHUNK_TABLE = "statistics_chunks"
+
+# Колонки сэмпла внутри чанка (series_id — ключ чанка)
+CHUNK_COLUMNS = ("ts", "numbackends", "xact_commit")
+
+# Отметка упакованной партиции statistics (комментарий таблицы): агрегаты
+# месяца пересчитаны при первой упаковке, повторно не пересчитываются
+CHUNKED_MARK = "pam:chunked"
+
+# Версия формата — первый байт чанка
+_VERSION = 1
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_US = timedelta(microseconds=1)
+
+# Флаг колонки значений: без NULL, все NULL, битовая карта заполненных
+_DENSE, _ALL_NULL, _BITMAP = 0, 1, 2
+
+_UPSERT = f"""
+    INSERT INTO {CHUNK_TABLE} (series_id, day, samples, first_ts, last_ts, data)
+    VALUES ($1, $2, $3, $4, $5, $6)
+    ON CONFLICT (series_id, day) DO UPDATE SET
+        samples = EXCLUDED.samples, first_ts = EXCLUDED.first_ts,
+        last_ts = EXCLUDED.last_ts, data = EXCLUDED.data
+"""
+
+# Пакет строк чанков на один executemany при упаковке
+_WRITE_BATCH = 1000
+
+# Ожидание эксклюзивной блокировки для TRUNCATE упакованной партиции
+_TRUNCATE_LOCK_TIMEOUT = "5s"
+
+
+def _put(buf: bytearray, value: int):
+    """zigzag + varint (7 бит на байт, старший бит — продолжение)."""
+    value = value << 1 if value >= 0 else ((-value) << 1) - 1
+    while value >= 0x80:
+        buf.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+
+def _get(data: bytes, pos: int, count: int) -> tuple[list[int], int]:
+    """Прочитать count zigzag-varint начиная с pos. Возвращает (значения, новая позиция)."""
+    out = []
+    append = out.append
+    for _ in range(count):
+        shift = value = 0
+        while True:
+            byte = data[pos]
+            pos += 1
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+        append(value >> 1 if not value & 1 else -((value + 1) >> 1))
+    return out, pos
+
+
+def encode(rows: list[tuple]) -> bytes:
+    """Упаковать сэмплы (кортежи CHUNK_COLUMNS, по возрастанию ts) в чанк."""
+    buf = bytearray((_VERSION,))
+    _put(buf, len(rows))
+
+    # Время: первое значение, затем первая разность, затем разности разностей
+    prev = prev_delta = 0
+    for i, row in enumerate(rows):
+        us = (row[0] - _EPOCH) // _US
+        delta = us - prev
+        _put(buf, delta - prev_delta)
+        prev, prev_delta = us, (delta if i else 0)
+
+    for col in range(1, len(CHUNK_COLUMNS)):
+        values = [row[col] for row in rows]
+        present = [v for v in values if v is not None]
+        if len(present) == len(values):
+            buf.append(_DENSE)
+        elif not present:
+            buf.append(_ALL_NULL)
+            continue
+        else:
+            buf.append(_BITMAP)
+            bitmap = bytearray((len(values) + 7) // 8)
+            for i, v in enumerate(values):
+                if v is not None:
+                    bitmap[i >> 3] |= 1 << (i & 7)
+            buf += bitmap
+        prev = 0
+        for v in present:
+            _put(buf, v - prev)
+            prev = v
+    return bytes(buf)
+
+
+def decode(data: bytes) -> list[tuple]:
+    """Распаковать чанк в кортежи CHUNK_COLUMNS."""
+    if data[0] != _VERSION:
+        raise ValueError(f"Неизвестная версия чанка: {data[0]}")
+    (n,), pos = _get(data, 1, 1)
+    raw, pos = _get(data, pos, n)
+
+    timestamps = []
+    prev = delta = 0
+    for i, value in enumerate(raw):
+        delta = value if i < 2 else delta + value
+        prev = value if i == 0 else prev + delta
+        timestamps.append(_EPOCH + prev * _US)
+
+    columns = [timestamps]
+    for _ in range(1, len(CHUNK_COLUMNS)):
+        flag = data[pos]
+        pos += 1
+        if flag == _ALL_NULL:
+            columns.append([None] * n)
+            continue
+        if flag == _DENSE:
+            mask = None
+            count = n
+        else:
+            size = (n + 7) // 8
+            bitmap = data[pos:pos + size]
+            pos += size
+            mask = [bool(bitmap[i >> 3] & (1 << (i & 7))) for i in range(n)]
+            count = sum(mask)
+        deltas, pos = _get(data, pos, count)
+        values = list(itertools.accumulate(deltas))
+        if mask is None:
+            columns.append(values)
+        else:
+            it = iter(values)
+            columns.append([next(it) if m else None for m in mask])
+    return list(zip(*columns))
+
+
+def _day(ts: datetime):
+    return ts.astimezone(timezone.utc).date()
+
+
+async def compress_partition(
+    conn: asyncpg.Connection, name: str, start: datetime, end: datetime, rebuild: bool,
+) -> tuple[int, int]:
+    """
+    Упаковать строки партиции statistics в чанки и удалить их из партиции.
+
+    Одна транзакция: запись в партицию ждёт (SHARE ROW EXCLUSIVE), чтение
+    видит либо строки, либо чанки. rebuild — сначала пересчитать агрегаты
+    месяца из сырых строк (первая упаковка; см. cleanup_old_partitions).
+    Строки читаются курсором по (series_id, ts), чанки пишутся пакетами.
+    Возвращает (чанков, строк).
+    """
+    chunks = rows = 0
+    async with conn.transaction():
+        await conn.execute(f"LOCK TABLE {name} IN SHARE ROW EXCLUSIVE MODE")
+        if rebuild:
+            await rollups.rebuild(conn, start, end)
+        # Повторная упаковка (опоздавшие строки) сливается с существующими чанками
+        merge = await conn.fetchval(
+            f"SELECT EXISTS (SELECT 1 FROM {CHUNK_TABLE} WHERE day >= $1 AND day < $2)",
+            start.date(), end.date(),
+        )
+        cursor = conn.cursor(
+            f"SELECT series_id, {', '.join(CHUNK_COLUMNS)} FROM {name} ORDER BY series_id, ts",
+            prefetch=10000,
+        )
+        batch = []
+        async for (series_id, day), group in _groupby_async(cursor):
+            samples = [tuple(r)[1:] for r in group]
+            rows += len(samples)
+            if merge:
+                data = await conn.fetchval(
+                    f"SELECT data FROM {CHUNK_TABLE} WHERE series_id = $1 AND day = $2", series_id, day,
+                )
+                if data is not None:
+                    by_ts = {s[0]: s for s in decode(data)}
+                    by_ts.update((s[0], s) for s in samples)
+                    samples = sorted(by_ts.values())
+            batch.append((series_id, day, len(samples), samples[0][0], samples[-1][0], encode(samples)))
+            if len(batch) >= _WRITE_BATCH:
+                await conn.executemany(_UPSERT, batch)
+                chunks += len(batch)
+                batch = []
+        if batch:
+            await conn.executemany(_UPSERT, batch)
+            chunks += len(batch)
+        await conn.execute(f"DELETE FROM {name}")
+        await conn.execute(f"COMMENT ON TABLE {name} IS '{CHUNKED_MARK}'")
+    await _truncate_empty(conn, name)
+    return chunks, rows
+
+
+async def _truncate_empty(conn: asyncpg.Connection, name: str):
+    """
+    Вернуть место опустевшей партиции: VACUUM не уменьшает файлы индексов,
+    TRUNCATE — да. Нужна короткая эксклюзивная блокировка; если партиция
+    занята, место освободит autovacuum (кроме индексов) или следующая упаковка.
+    """
+    try:
+        async with conn.transaction():
+            await conn.execute(f"SET LOCAL lock_timeout = '{_TRUNCATE_LOCK_TIMEOUT}'")
+            await conn.execute(f"LOCK TABLE {name} IN ACCESS EXCLUSIVE MODE")
+            # Опоздавшие строки, пришедшие после упаковки, остаются до следующей
+            if not await conn.fetchval(f"SELECT EXISTS (SELECT 1 FROM {name})"):
+                await conn.execute(f"TRUNCATE {name}")
+    except asyncpg.LockNotAvailableError:
+        logger.warning(f"Партиция {name} занята, TRUNCATE после упаковки пропущен")
+
+
+async def _groupby_async(cursor):
+    """Группы строк курсора по (series_id, сутки UTC); строки идут по (series_id, ts)."""
+    key = None
+    group = []
+    async for row in cursor:
+        row_key = (row["series_id"], _day(row["ts"]))
+        if row_key != key and group:
+            yield key, group
+            group = []
+        key = row_key
+        group.append(row)
+    if group:
+        yield key, group
+
+
+async def fetch_columns(
+    conn, series_where: str, args: tuple, start: datetime, end: datetime,
+) -> list[list]:
+    """
+    Сэмплы из чанков за [start, end] для рядов по условию series_where
+    (параметры args, см. series.SERVER_SERIES/DB_SERIES) — колонками
+    rollups.SOURCE_COLUMNS для union_source(). conn — соединение или пул.
+    """
+    start = start if start.tzinfo else start.replace(tzinfo=timezone.utc)
+    end = end if end.tzinfo else end.replace(tzinfo=timezone.utc)
+    n = len(args)
+    records = await conn.fetch(
+        f"""
+        SELECT series_id, data FROM {CHUNK_TABLE}
+        WHERE {series_where} AND day >= ${n + 1} AND day <= ${n + 2}
+          AND last_ts >= ${n + 3} AND first_ts <= ${n + 4}
+        """,
+        *args, _day(start), _day(end), start, end,
+    )
+    columns = [[] for _ in rollups.SOURCE_COLUMNS]
+    for record in records:
+        for ts, numbackends, xact_commit in decode(record["data"]):
+            if start <= ts <= end:
+                columns[0].append(record["series_id"])
+                columns[1].append(ts)
+                columns[2].append(numbackends)
+                columns[3].append(xact_commit)
+    return columns
+
+
+def union_source(first: int) -> str:
+    """
+    Источник сырых строк: statistics и сэмплы чанков, переданные массивами
+    fetch_columns() в параметрах с номерами first..first+3.
+    """
+    return (
+        f"(SELECT {', '.join(rollups.SOURCE_COLUMNS)} FROM {rollups.SOURCE_TABLE} "
+        f"UNION ALL SELECT * FROM unnest(${first}::integer[], ${first + 1}::timestamptz[], "
+        f"${first + 2}::integer[], ${first + 3}::bigint[])) s"
+    )
+
+
+async def drop_range(conn: asyncpg.Connection, start: datetime, end: datetime):
+    """Удалить чанки за [start, end) — вместе с партицией statistics месяца."""
+    await conn.execute(f"DELETE FROM {CHUNK_TABLE} WHERE day >= $1 AND day < $2", start.date(), end.date())
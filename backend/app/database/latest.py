@@ -0,0 +1,164 @@
+# app/database/latest.py
+"""
+Последние значения рядов: строка на (server_name, datname) в latest_sample.
+
+ts, numbackends, xact_commit — последний сэмпл statistics (в режиме хранения
+только изменений — и пропущенный), size_ts, db_size — последний замер
+db_sizes, first_ts — самый ранний сэмпл statistics. Таблица обновляется в
+той же транзакции, что и запись сэмплов (ingest._copy_records, загрузка
+спула); значения меняются, только если сэмпл новее записанного, поэтому
+загрузка старого спула их не откатывает.
+
+Текущие значения, «последнее обновление» и список БД сервера (api/stats.py)
+читаются отсюда по ключу — без поиска последней строки по партициям и чанкам.
+rebuild() заполняет таблицу из накопленных данных (первый запуск, загрузка
+истории мимо ingest).
+"""
+import asyncpg
+
+from app.database import chunks
+
+# Таблицы сэмплов → (колонки значений, колонка времени, типы колонок записи)
+_TABLES = {
+    "statistics": (("numbackends", "xact_commit"), "ts", ("integer", "bigint")),
+    "db_sizes": (("db_size",), "size_ts", ("bigint",)),
+}
+
+# Слияние строк source (server_name, ts, datname, значения...): из пакета —
+# последняя строка ключа; прежние значения заменяются, только если она новее
+_MERGE = """
+    INSERT INTO latest_sample AS l (server_name, datname, {first}{ts}, {columns})
+    SELECT DISTINCT ON (server_name, datname) server_name, datname, {first_value}ts, {columns}
+    FROM (
+        SELECT *, min(ts) OVER (PARTITION BY server_name, datname) AS first_ts
+        FROM {source}
+        WHERE server_name IS NOT NULL AND datname IS NOT NULL AND ts IS NOT NULL
+    ) u
+    ORDER BY server_name, datname, ts DESC
+    ON CONFLICT (server_name, datname) DO UPDATE SET
+        {first_update}{ts} = GREATEST(l.{ts}, EXCLUDED.{ts}),
+        {updates}
+"""
+
+# Последний сэмпл ряда — самый новый из statistics и последних замеров агрегатов
+# (агрегаты включают упакованные в чанки и пропущенные ChangeFilter сэмплы).
+# Первый сэмпл — из сырых строк и чанков; начало бакета агрегата берётся, только
+# если агрегат начинается раньше более точного уровня (сырые строки удалены)
+_REBUILD_STATS = f"""
+    INSERT INTO latest_sample (server_name, datname, first_ts, ts, numbackends, xact_commit)
+    SELECT r.server_name, r.datname,
+           CASE
+               WHEN f.daily < date_trunc('day', COALESCE(f.hourly, f.raw), 'UTC')
+                    OR COALESCE(f.hourly, f.raw) IS NULL THEN f.daily
+               WHEN f.hourly < date_trunc('hour', f.raw, 'UTC') OR f.raw IS NULL THEN f.hourly
+               ELSE f.raw
+           END,
+           l.ts, l.numbackends, l.xact_commit
+    FROM series r
+    JOIN LATERAL (
+        SELECT * FROM (
+            (SELECT ts, numbackends, xact_commit FROM statistics
+             WHERE series_id = r.id ORDER BY ts DESC LIMIT 1)
+            UNION ALL
+            (SELECT last_ts, last_backends, last_xact_commit FROM statistics_hourly
+             WHERE series_id = r.id ORDER BY bucket DESC LIMIT 1)
+            UNION ALL
+            (SELECT last_ts, last_backends, last_xact_commit FROM statistics_daily
+             WHERE series_id = r.id ORDER BY bucket DESC LIMIT 1)
+        ) x
+        ORDER BY ts DESC
+        LIMIT 1
+    ) l ON true
+    CROSS JOIN LATERAL (
+        SELECT LEAST(
+                   (SELECT ts FROM statistics WHERE series_id = r.id ORDER BY ts LIMIT 1),
+                   (SELECT MIN(first_ts) FROM {chunks.CHUNK_TABLE} WHERE series_id = r.id)
+               ) AS raw,
+               (SELECT MIN(bucket) FROM statistics_hourly WHERE series_id = r.id) AS hourly,
+               (SELECT MIN(bucket) FROM statistics_daily WHERE series_id = r.id) AS daily
+    ) f
+    WHERE $1::text IS NULL OR r.server_name = $1
+"""
+
+_REBUILD_SIZES = """
+    INSERT INTO latest_sample (server_name, datname, size_ts, db_size)
+    SELECT k.server_name, k.datname, z.ts, z.db_size
+    FROM (
+        SELECT server_name, datname FROM series
+        UNION
+        SELECT server_name, datname FROM db_info
+    ) k
+    JOIN LATERAL (
+        SELECT ts, db_size FROM db_sizes
+        WHERE server_name = k.server_name AND datname = k.datname
+        ORDER BY ts DESC LIMIT 1
+    ) z ON true
+    WHERE $1::text IS NULL OR k.server_name = $1
+    ON CONFLICT (server_name, datname) DO UPDATE SET
+        size_ts = EXCLUDED.size_ts, db_size = EXCLUDED.db_size
+"""
+
+
+def _merge_sql(table: str, source: str) -> str:
+    columns, ts, _ = _TABLES[table]
+    stats = table == "statistics"
+    return _MERGE.format(
+        source=source, ts=ts, columns=", ".join(columns),
+        first="first_ts, " if stats else "",
+        first_value="first_ts, " if stats else "",
+        first_update="first_ts = LEAST(l.first_ts, EXCLUDED.first_ts),\n        " if stats else "",
+        updates=",\n        ".join(
+            f"{c} = CASE WHEN l.{ts} >= EXCLUDED.{ts} THEN l.{c} ELSE EXCLUDED.{c} END" for c in columns
+        ),
+    )
+
+
+async def merge_records(conn: asyncpg.Connection, table: str, records: list[tuple]):
+    """
+    Обновить последние значения по записям statistics или db_sizes
+    (кортежи server_name, ts, datname, значения — как в очереди ingest).
+    """
+    if not records or table not in _TABLES:
+        return
+    columns, _, types = _TABLES[table]
+    arrays = list(zip(*records))[:3 + len(columns)]
+    source = (
+        f"unnest($1::text[], $2::timestamptz[], $3::text[], "
+        f"{', '.join(f'${i + 4}::{t}[]' for i, t in enumerate(types))}) "
+        f"AS s(server_name, ts, datname, {', '.join(columns)})"
+    )
+    await conn.execute(_merge_sql(table, source), *arrays)
+
+
+async def merge_table(conn: asyncpg.Connection, table: str, relation: str):
+    """
+    Обновить последние значения по строкам relation в колонках хранения
+    table (загрузка спула): у statistics — series_id вместо имён.
+    """
+    if table not in _TABLES:
+        return
+    columns, _, _ = _TABLES[table]
+    if table == "statistics":
+        source = (
+            f"(SELECT r.server_name, n.ts, r.datname, {', '.join('n.' + c for c in columns)} "
+            f"FROM {relation} n JOIN series r ON r.id = n.series_id) s"
+        )
+    else:
+        source = f"{relation} s"
+    await conn.execute(_merge_sql(table, source))
+
+
+async def rebuild(conn: asyncpg.Connection, server_name: str | None = None) -> int:
+    """
+    Заполнить latest_sample заново из statistics, агрегатов и db_sizes — для
+    всех серверов или одного. Возвращает число строк.
+    """
+    async with conn.transaction():
+        await conn.execute(
+            "DELETE FROM latest_sample WHERE $1::text IS NULL OR server_name = $1", server_name,
+        )
+        await conn.execute(_REBUILD_STATS, server_name)
+        await conn.execute(_REBUILD_SIZES, server_name)
+        return await conn.fetchval(
+            "SELECT COUNT(*) FROM latest_sample WHERE $1::text IS NULL OR server_name = $1", server_name,
+        )
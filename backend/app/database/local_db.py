@@ -7,7 +7,8 @@ import asyncio
 import asyncpg
 import logging
 from datetime import datetime, timedelta, timezone
-from app.config import LOCAL_DB_DSN, RETENTION_MONTHS
+from app.config import LOCAL_DB_DSN
+from app.database import chunks, latest, rollups, series
 
 logger = logging.getLogger(__name__)
 
@@ -61,23 +62,133 @@ def get_pool() -> asyncpg.Pool:
     return _pool
 
 
+async def create_series_tables(conn):
+    """
+    Создать series, server_stats и db_sizes с индексами, если их нет. Это
+    таблицы, в которые переносят историю scripts/migrate_db_sizes.py и
+    scripts/migrate_series.py: они вызывают функцию сами, на базе, где схема
+    ещё не инициализирована.
+    """
+    # Словарь рядов (server_name, datname) → id (см. series.py)
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS series (
+            id          serial PRIMARY KEY,
+            server_name text   NOT NULL,
+            datname     text   NOT NULL,
+            UNIQUE (server_name, datname)
+        );
+    """)
+
+    # Метрики сервера целиком: строка на сервер за цикл сбора
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS server_stats (
+            server_name text        NOT NULL,
+            ts          timestamptz NOT NULL,
+            disk_free   bigint,
+            disk_total  bigint,
+            connections integer,
+            started_at  timestamptz,
+            version     text
+        ) PARTITION BY RANGE (ts);
+    """)
+
+    # Размеры БД: отдельный append-only ряд (раньше UPDATE statistics SET db_size)
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS db_sizes (
+            server_name text        NOT NULL,
+            ts          timestamptz NOT NULL DEFAULT now(),
+            datname     text        NOT NULL,
+            db_size     bigint      NOT NULL
+        ) PARTITION BY RANGE (ts);
+    """)
+
+    await conn.execute("""
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_indexes WHERE indexname = 'idx_db_sizes_server_db_ts') THEN
+                CREATE INDEX idx_db_sizes_server_db_ts ON db_sizes (server_name, datname, ts DESC);
+            END IF;
+            IF NOT EXISTS (SELECT 1 FROM pg_indexes WHERE indexname = 'idx_server_stats_server_ts') THEN
+                CREATE INDEX idx_server_stats_server_ts ON server_stats (server_name, ts DESC);
+            END IF;
+        END $$;
+    """)
+
+
 async def _init_schema():
     """Создание таблиц и индексов если не существуют."""
     async with _pool.acquire() as conn:
+        # До проверки формата statistics: скрипты миграции переносят историю в эти таблицы
+        await create_series_tables(conn)
+
+        # statistics и агрегаты до словаря рядов хранили server_name/datname в каждой строке
+        legacy = await conn.fetchval("""
+            SELECT EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_schema = current_schema() AND column_name = 'server_name'
+                  AND table_name IN ('statistics', 'statistics_hourly', 'statistics_daily')
+            )
+        """)
+        if legacy:
+            raise RuntimeError(
+                "Таблицы statistics в формате без series_id: остановите сервисы и выполните "
+                "scripts/migrate_db_sizes.py, затем scripts/migrate_series.py"
+            )
+
         await conn.execute("""
             CREATE TABLE IF NOT EXISTS statistics (
-                id          bigserial,
-                server_name text        NOT NULL,
                 ts          timestamptz NOT NULL DEFAULT now(),
-                datname     text        NOT NULL,
+                series_id   integer     NOT NULL,
                 numbackends integer,
-                xact_commit bigint,
-                db_size     bigint,
-                disk_free   bigint,
-                disk_total  bigint
+                xact_commit bigint
             ) PARTITION BY RANGE (ts);
         """)
 
+        # Часовые и суточные агрегаты statistics (см. rollups.py)
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS statistics_hourly (
+                bucket           timestamptz NOT NULL,
+                series_id        integer     NOT NULL,
+                samples          integer     NOT NULL,
+                sum_backends     bigint      NOT NULL,
+                min_backends     integer,
+                max_backends     integer,
+                sum_xact_commit  bigint      NOT NULL,
+                last_ts          timestamptz NOT NULL,
+                last_backends    integer,
+                last_xact_commit bigint,
+                PRIMARY KEY (series_id, bucket)
+            ) PARTITION BY RANGE (bucket);
+        """)
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS statistics_daily (
+                bucket           timestamptz NOT NULL,
+                series_id        integer     NOT NULL,
+                samples          integer     NOT NULL,
+                sum_backends     bigint      NOT NULL,
+                min_backends     integer,
+                max_backends     integer,
+                sum_xact_commit  bigint      NOT NULL,
+                last_ts          timestamptz NOT NULL,
+                last_backends    integer,
+                last_xact_commit bigint,
+                PRIMARY KEY (series_id, bucket)
+            );
+        """)
+
+        # Сырые сэмплы закрытых месяцев: чанк на ряд и сутки UTC (см. chunks.py)
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS statistics_chunks (
+                series_id integer     NOT NULL,
+                day       date        NOT NULL,
+                samples   integer     NOT NULL,
+                first_ts  timestamptz NOT NULL,
+                last_ts   timestamptz NOT NULL,
+                data      bytea       NOT NULL,
+                PRIMARY KEY (series_id, day)
+            );
+        """)
+
         await conn.execute("""
             CREATE TABLE IF NOT EXISTS db_info (
                 server_name   text        NOT NULL,
@@ -90,15 +201,32 @@ async def _init_schema():
             );
         """)
 
+        # Последние значения рядов (см. latest.py). Строка обновляется на каждом
+        # цикле сбора: запас места на странице — под HOT-обновления без роста индекса
+        created = not await conn.fetchval("SELECT to_regclass('latest_sample') IS NOT NULL")
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS latest_sample (
+                server_name text        NOT NULL,
+                datname     text        NOT NULL,
+                first_ts    timestamptz,
+                ts          timestamptz,
+                numbackends integer,
+                xact_commit bigint,
+                size_ts     timestamptz,
+                db_size     bigint,
+                PRIMARY KEY (server_name, datname)
+            ) WITH (fillfactor = 50);
+        """)
+        if created:
+            rows = await latest.rebuild(conn)
+            logger.info(f"latest_sample заполнена из накопленной статистики: {rows} рядов")
+
         # Индексы на партицированной таблице (создаются автоматически на партициях)
         await conn.execute("""
             DO $$
             BEGIN
-                IF NOT EXISTS (SELECT 1 FROM pg_indexes WHERE indexname = 'idx_stats_server_ts') THEN
-                    CREATE INDEX idx_stats_server_ts ON statistics (server_name, ts DESC);
-                END IF;
-                IF NOT EXISTS (SELECT 1 FROM pg_indexes WHERE indexname = 'idx_stats_server_db_ts') THEN
-                    CREATE INDEX idx_stats_server_db_ts ON statistics (server_name, datname, ts DESC);
+                IF NOT EXISTS (SELECT 1 FROM pg_indexes WHERE indexname = 'idx_stats_series_ts') THEN
+                    CREATE INDEX idx_stats_series_ts ON statistics (series_id, ts DESC);
                 END IF;
             END $$;
         """)
@@ -155,6 +283,30 @@ async def _init_schema():
             );
         """)
 
+        # NOTIFY при любом изменении servers — реестры серверов всех процессов обновляются
+        await conn.execute("""
+            CREATE OR REPLACE FUNCTION pam_notify_servers() RETURNS trigger
+            LANGUAGE plpgsql AS $$
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    PERFORM pg_notify('pam_servers', OLD.name);
+                ELSE
+                    PERFORM pg_notify('pam_servers', NEW.name);
+                END IF;
+                RETURN NULL;
+            END $$;
+        """)
+        await conn.execute("""
+            DO $$
+            BEGIN
+                IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trg_servers_notify') THEN
+                    CREATE TRIGGER trg_servers_notify
+                    AFTER INSERT OR UPDATE OR DELETE ON servers
+                    FOR EACH ROW EXECUTE PROCEDURE pam_notify_servers();
+                END IF;
+            END $$;
+        """)
+
         # Таблица аудита сессий
         await conn.execute("""
             CREATE TABLE IF NOT EXISTS audit_sessions (
@@ -221,82 +373,279 @@ async def _init_schema():
                 ('collect_interval', '600', 'int', 'Интервал сбора статистики (сек)'),
                 ('size_update_interval', '1800', 'int', 'Интервал обновления размеров БД (сек)'),
                 ('db_check_interval', '1800', 'int', 'Интервал проверки новых/удалённых БД (сек)'),
-                ('retention_months', '12', 'int', 'Срок хранения данных (месяцев)'),
+                ('raw_retention_days', '90', 'int', 'Срок хранения сырых сэмплов статистики (дней)'),
+                ('hourly_retention_months', '12', 'int', 'Срок хранения часовых агрегатов (месяцев)'),
+                ('daily_retention_months', '60', 'int', 'Срок хранения суточных агрегатов и размеров БД (месяцев)'),
+                ('chunk_after_days', '7', 'int', 'Сжатие сырых сэмплов закрытого месяца через N дней (0 — не сжимать)'),
+                ('change_only_heartbeat', '0', 'int', 'Хранение только изменений: неизменившийся сэмпл пишется раз в N интервалов (0 — каждый)'),
                 ('audit_retention_days', '90', 'int', 'Срок хранения аудита (дней)'),
                 ('logs_retention_days', '30', 'int', 'Срок хранения логов (дней)')
             ON CONFLICT (key) DO NOTHING;
         """)
+        # retention_months до уровней хранения был сроком сырой статистики (по умолчанию 12);
+        # его заменили raw_retention_days и daily_retention_months
+        await conn.execute("DELETE FROM settings WHERE key = 'retention_months';")
+
+        # Эпохи режима хранения только изменений (см. steps.py). Уже записанная
+        # история считается записанной с текущими параметрами
+        created = not await conn.fetchval("SELECT to_regclass('change_only_epochs') IS NOT NULL")
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS change_only_epochs (
+                sample_table     TEXT        NOT NULL,
+                server_name      TEXT        NOT NULL,
+                since            TIMESTAMPTZ NOT NULL,
+                collect_interval INTEGER     NOT NULL,
+                heartbeat        INTEGER     NOT NULL,
+                PRIMARY KEY (sample_table, server_name, since)
+            );
+        """)
+        if created:
+            await conn.execute("""
+                INSERT INTO change_only_epochs (sample_table, server_name, since, collect_interval, heartbeat)
+                SELECT t.sample_table, s.server_name, '-infinity', i.value::int, h.value::int
+                FROM (VALUES ('statistics', 'collect_interval'), ('db_sizes', 'size_update_interval'))
+                     AS t(sample_table, interval_key)
+                JOIN settings i ON i.key = t.interval_key
+                JOIN settings h ON h.key = 'change_only_heartbeat'
+                CROSS JOIN (SELECT server_name FROM series UNION SELECT server_name FROM db_info) s
+                WHERE h.value::int > 1;
+            """)
+
+        # Узлы коллектора и аренда серверов (шардирование между процессами коллектора)
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS collector_nodes (
+                node_id    TEXT PRIMARY KEY,
+                hostname   TEXT        NOT NULL,
+                pid        INTEGER     NOT NULL,
+                started_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                heartbeat  TIMESTAMPTZ NOT NULL DEFAULT now(),
+                status     JSONB
+            );
+        """)
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS server_leases (
+                server_name TEXT PRIMARY KEY,
+                node_id     TEXT        NOT NULL,
+                acquired_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                expires_at  TIMESTAMPTZ NOT NULL
+            );
+        """)
+        # Последний запуск ежедневного обслуживания (общий для узлов: новый лидер
+        # не повторяет и не откладывает обслуживание прежнего)
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS maintenance_runs (
+                name        TEXT PRIMARY KEY,
+                node_id     TEXT        NOT NULL,
+                started_at  TIMESTAMPTZ NOT NULL,
+                finished_at TIMESTAMPTZ
+            );
+        """)
 
         logger.info("Схема БД проверена/создана")
 
 
-async def ensure_partitions():
-    """Создать партиции на текущий + 2 следующих месяца."""
-    now = datetime.now(timezone.utc)
-    async with _pool.acquire() as conn:
-        for offset in range(3):
-            dt = now + timedelta(days=offset * 31)
-            year = dt.year
-            month = dt.month
-            part_name = f"statistics_{year}_{month:02d}"
-
-            # Начало и конец месяца
-            start = datetime(year, month, 1, tzinfo=timezone.utc)
-            if month == 12:
-                end = datetime(year + 1, 1, 1, tzinfo=timezone.utc)
-            else:
-                end = datetime(year, month + 1, 1, tzinfo=timezone.utc)
-
-            exists = await conn.fetchval(
-                "SELECT EXISTS(SELECT 1 FROM pg_class WHERE relname = $1)",
-                part_name
-            )
-            if not exists:
-                await conn.execute(f"""
-                    CREATE TABLE {part_name} PARTITION OF statistics
-                    FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}');
-                """)
-                logger.info(f"Создана партиция {part_name}")
+# Таблицы, партиционированные по месяцам: <table>_YYYY_MM
+PARTITIONED_TABLES = ("statistics", "db_sizes", "statistics_hourly", "server_stats")
 
 
-async def cleanup_old_partitions():
-    """Удалить партиции старше RETENTION_MONTHS."""
-    cutoff = datetime.now(timezone.utc) - timedelta(days=RETENTION_MONTHS * 31)
-    cutoff_year = cutoff.year
-    cutoff_month = cutoff.month
+async def ensure_partition(conn, table: str, year: int, month: int) -> bool:
+    """Создать месячную партицию таблицы, если её нет. Возвращает True если создана."""
+    part_name = f"{table}_{year}_{month:02d}"
 
+    # Начало и конец месяца
+    start = datetime(year, month, 1, tzinfo=timezone.utc)
+    if month == 12:
+        end = datetime(year + 1, 1, 1, tzinfo=timezone.utc)
+    else:
+        end = datetime(year, month + 1, 1, tzinfo=timezone.utc)
+
+    exists = await conn.fetchval(
+        "SELECT EXISTS(SELECT 1 FROM pg_class WHERE relname = $1)",
+        part_name
+    )
+    if exists:
+        return False
+    await conn.execute(f"""
+        CREATE TABLE {part_name} PARTITION OF {table}
+        FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}');
+    """)
+    logger.info(f"Создана партиция {part_name}")
+    return True
+
+
+async def ensure_partitions(since: datetime | None = None):
+    """
+    Создать партиции на текущий + 2 следующих месяца.
+    since — начать с его месяца (загрузка истории за прошлые месяцы).
+    """
+    now = datetime.now(timezone.utc)
+    last = now + timedelta(days=2 * 31)
+    year, month = (since or now).year, (since or now).month
     async with _pool.acquire() as conn:
-        # Находим все партиции statistics_YYYY_MM
-        rows = await conn.fetch("""
-            SELECT relname FROM pg_class
-            WHERE relname ~ '^statistics_\\d{4}_\\d{2}$'
-              AND relkind = 'r';
+        while (year, month) <= (last.year, last.month):
+            for table in PARTITIONED_TABLES:
+                await ensure_partition(conn, table, year, month)
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def _month_bounds(name: str) -> tuple[str, datetime, datetime] | None:
+    """Таблица и границы месячной партиции <table>_YYYY_MM."""
+    table, _, suffix = name.rpartition("_")
+    table, _, year = table.rpartition("_")
+    try:
+        start = datetime(int(year), int(suffix), 1, tzinfo=timezone.utc)
+    except ValueError:
+        return None
+    end = datetime(start.year + start.month // 12, start.month % 12 + 1, 1, tzinfo=timezone.utc)
+    return table, start, end
+
+
+async def _drop_partition(conn, table: str, name: str):
+    """
+    Отсоединить партицию и удалить её. На PostgreSQL 14+ — CONCURRENTLY, без
+    блокировки записи; на более ранних версиях — обычный DETACH.
+    """
+    if conn.get_server_version().major >= 14:
+        pending = await conn.fetchval(
+            "SELECT inhdetachpending FROM pg_inherits WHERE inhrelid = $1::regclass", name
+        )
+        if pending is not None:
+            # FINALIZE — если прошлое отсоединение прервалось
+            mode = "FINALIZE" if pending else "CONCURRENTLY"
+            await conn.execute(f"ALTER TABLE {table} DETACH PARTITION {name} {mode};")
+    elif await conn.fetchval("SELECT EXISTS (SELECT 1 FROM pg_inherits WHERE inhrelid = $1::regclass)", name):
+        await conn.execute(f"ALTER TABLE {table} DETACH PARTITION {name};")
+    await conn.execute(f"DROP TABLE IF EXISTS {name};")
+    logger.info(f"Удалена старая партиция {name}")
+
+
+# Отметка уплотнённой партиции db_sizes/server_stats (комментарий таблицы)
+_COMPACTED_MARK = "pam:compacted:day"
+
+# Ключ ряда уплотняемых таблиц: замеры сохраняются по последнему за сутки на ряд
+_COMPACT_KEYS = {"db_sizes": "server_name, datname", "server_stats": "server_name"}
+
+
+async def _compact_partition(conn, table: str, name: str, start: datetime, end: datetime):
+    """
+    Уплотнить партицию db_sizes или server_stats до последнего замера ряда за
+    сутки (UTC): данные переписываются в новую таблицу, которая подменяет
+    партицию одной транзакцией.
+    """
+    key = _COMPACT_KEYS[table]
+    async with conn.transaction():
+        await conn.execute(f"CREATE TABLE {name}_compact (LIKE {name} INCLUDING ALL);")
+        await conn.execute(f"""
+            INSERT INTO {name}_compact
+            SELECT DISTINCT ON ({key}, date_trunc('day', ts, 'UTC')) *
+            FROM {name}
+            ORDER BY {key}, date_trunc('day', ts, 'UTC'), ts DESC;
         """)
+        await conn.execute(f"ALTER TABLE {table} DETACH PARTITION {name};")
+        await conn.execute(f"DROP TABLE {name};")
+        await conn.execute(f"ALTER TABLE {name}_compact RENAME TO {name};")
+        await conn.execute(f"""
+            ALTER TABLE {table} ATTACH PARTITION {name}
+            FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}');
+        """)
+        await conn.execute(f"COMMENT ON TABLE {name} IS '{_COMPACTED_MARK}';")
+    logger.info(f"Партиция {name} уплотнена до суточных замеров")
+
+
+async def cleanup_old_partitions(horizons: dict[str, datetime]):
+    """
+    Уровни хранения (см. services/retention.py): партиции удаляются, когда
+    целиком старше границы уровня.
+
+    - statistics старше chunks: строки упаковываются в statistics_chunks
+      (chunks.compress_partition), при первой упаковке агрегаты месяца
+      пересчитываются из сырых строк;
+    - statistics старше raw: агрегаты за месяц пересчитываются из сырых строк
+      (rollups.rebuild), если месяц не упакован, затем партиция отсоединяется
+      и удаляется вместе с чанками месяца;
+    - statistics_hourly старше hourly — удаляется (суточные агрегаты к этому
+      моменту уже пересчитаны из сырых строк);
+    - db_sizes и server_stats старше hourly уплотняются до суточных замеров,
+      старше daily — удаляются; суточные агрегаты старше daily удаляются.
+    """
+    async with _pool.acquire() as conn:
+        # Находим все партиции <table>_YYYY_MM (в том числе отсоединённые, но не удалённые)
+        rows = await conn.fetch(
+            """
+            SELECT relname, obj_description(oid, 'pg_class') AS mark FROM pg_class
+            WHERE relname ~ ('^(' || array_to_string($1::text[], '|') || ')_\\d{4}_\\d{2}$')
+              AND relkind = 'r'
+            ORDER BY relname;
+            """,
+            list(PARTITIONED_TABLES),
+        )
         for row in rows:
             name = row["relname"]
-            try:
-                parts = name.split("_")
-                y, m = int(parts[1]), int(parts[2])
-                if y < cutoff_year or (y == cutoff_year and m < cutoff_month):
-                    await conn.execute(f"DROP TABLE IF EXISTS {name};")
-                    logger.info(f"Удалена старая партиция {name}")
-            except (IndexError, ValueError):
+            bounds = _month_bounds(name)
+            if bounds is None:
                 continue
+            table, start, end = bounds
+
+            if table == "statistics" and end <= horizons["raw"]:
+                attached = await conn.fetchval(
+                    "SELECT NOT inhdetachpending FROM pg_inherits WHERE inhrelid = $1::regclass", name
+                )
+                # Отсоединённая партиция уже не видна через statistics — её агрегаты пересчитаны раньше;
+                # упакованная — пересчитаны при упаковке. Пустая (создана заранее под загрузку
+                # истории) не должна стирать агрегаты месяца.
+                if (
+                    attached and row["mark"] != chunks.CHUNKED_MARK
+                    and await conn.fetchval(f"SELECT EXISTS (SELECT 1 FROM {name})")
+                ):
+                    await ensure_partition(conn, "statistics_hourly", start.year, start.month)
+                    buckets = await rollups.rebuild(conn, start, end)
+                    logger.info(f"Партиция {name} уплотнена в агрегаты: часовых бакетов {buckets}")
+                await _drop_partition(conn, table, name)
+                await chunks.drop_range(conn, start, end)
+            elif (
+                table == "statistics" and horizons["chunks"] and end <= horizons["chunks"]
+                and await conn.fetchval(f"SELECT EXISTS (SELECT 1 FROM {name})")
+            ):
+                await ensure_partition(conn, "statistics_hourly", start.year, start.month)
+                packed, rows = await chunks.compress_partition(
+                    conn, name, start, end, rebuild=row["mark"] != chunks.CHUNKED_MARK,
+                )
+                logger.info(f"Партиция {name} упакована: строк {rows}, чанков {packed}")
+            elif table == "statistics_hourly" and end <= horizons["hourly"]:
+                await _drop_partition(conn, table, name)
+            elif table in _COMPACT_KEYS and end <= horizons["daily"]:
+                await _drop_partition(conn, table, name)
+            elif table in _COMPACT_KEYS and end <= horizons["hourly"] and row["mark"] != _COMPACTED_MARK:
+                await _compact_partition(conn, table, name, start, end)
+
+        await conn.execute("DELETE FROM statistics_daily WHERE bucket < $1", horizons["daily"])
 
 
 async def delete_server_data(server_name: str):
     """Удалить все данные сервера (при удалении сервера)."""
     async with _pool.acquire() as conn:
-        await conn.execute("DELETE FROM statistics WHERE server_name = $1", server_name)
+        for table in series.SERIES_TABLES:
+            await conn.execute(f"DELETE FROM {table} WHERE {series.SERVER_SERIES}", server_name)
+        await conn.execute("DELETE FROM db_sizes WHERE server_name = $1", server_name)
+        await conn.execute("DELETE FROM server_stats WHERE server_name = $1", server_name)
+        await conn.execute("DELETE FROM latest_sample WHERE server_name = $1", server_name)
+        await conn.execute("DELETE FROM change_only_epochs WHERE server_name = $1", server_name)
         await conn.execute("DELETE FROM db_info WHERE server_name = $1", server_name)
+        await conn.execute("DELETE FROM server_leases WHERE server_name = $1", server_name)
         logger.info(f"Данные сервера {server_name} удалены из локальной БД")
 
 
 async def delete_database_data(server_name: str, datname: str):
     """Удалить данные конкретной БД (при удалении/пересоздании)."""
     async with _pool.acquire() as conn:
+        for table in series.SERIES_TABLES:
+            await conn.execute(f"DELETE FROM {table} WHERE {series.DB_SERIES}", server_name, datname)
+        await conn.execute(
+            "DELETE FROM db_sizes WHERE server_name = $1 AND datname = $2",
+            server_name, datname
+        )
         await conn.execute(
-            "DELETE FROM statistics WHERE server_name = $1 AND datname = $2",
+            "DELETE FROM latest_sample WHERE server_name = $1 AND datname = $2",
             server_name, datname
         )
         await conn.execute(
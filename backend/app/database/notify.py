@@ -0,0 +1,102 @@
+# app/database/notify.py
+"""
+Одно LISTEN-соединение к локальной БД на процесс.
+
+Кэши в памяти (настройки, реестр серверов) подписываются на свои каналы
+NOTIFY. Если соединение потеряно, оно переустанавливается, и подписчики
+получают on_reconnect — уведомления за время разрыва могли быть пропущены,
+поэтому кэш надо перечитать целиком.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+import asyncpg
+
+from app.config import LOCAL_DB_DSN
+
+logger = logging.getLogger(__name__)
+
+LISTEN_CHECK_INTERVAL = 30  # секунд между проверками LISTEN-соединения
+
+
+class NotifyListener:
+    def __init__(self):
+        self._handlers: dict[str, Callable[[str], Awaitable[None]]] = {}
+        self._reconnect_handlers: list[Callable[[], Awaitable[None]]] = []
+        self._conn: asyncpg.Connection | None = None
+        self._task: asyncio.Task | None = None
+        self._pending: set[asyncio.Task] = set()
+
+    def subscribe(
+        self,
+        channel: str,
+        handler: Callable[[str], Awaitable[None]],
+        on_reconnect: Callable[[], Awaitable[None]] | None = None,
+    ):
+        """Подписать async-обработчик handler(payload) на канал (до start())."""
+        self._handlers[channel] = handler
+        if on_reconnect is not None:
+            self._reconnect_handlers.append(on_reconnect)
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _dispatch(self, channel: str, payload: str):
+        try:
+            await self._handlers[channel](payload)
+        except Exception as e:
+            logger.error(f"Ошибка обработки NOTIFY {channel} ({payload}): {e}")
+
+    def _on_notify(self, conn, pid, channel, payload):
+        if channel in self._handlers:
+            self._spawn(self._dispatch(channel, payload))
+
+    async def _connect(self):
+        if self._conn is not None:
+            try:
+                await self._conn.close(timeout=5)
+            except Exception:
+                pass
+        self._conn = await asyncpg.connect(LOCAL_DB_DSN)
+        for channel in self._handlers:
+            await self._conn.add_listener(channel, self._on_notify)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(LISTEN_CHECK_INTERVAL)
+            if self._conn is not None and not self._conn.is_closed():
+                continue
+            try:
+                await self._connect()
+                logger.info(f"LISTEN восстановлен: {', '.join(self._handlers)}")
+            except Exception as e:
+                logger.warning(f"Не удалось восстановить LISTEN: {e}")
+                continue
+            for handler in self._reconnect_handlers:
+                try:
+                    await handler()
+                except Exception as e:
+                    logger.error(f"Ошибка перечитывания после восстановления LISTEN: {e}")
+
+    async def start(self):
+        try:
+            await self._connect()
+        except Exception as e:
+            logger.error(f"Не удалось установить LISTEN, повтор через {LISTEN_CHECK_INTERVAL}с: {e}")
+        self._task = asyncio.create_task(self._run(), name="notify-listener")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._conn is not None and not self._conn.is_closed():
+            await self._conn.close()
+        self._conn = None
+
+
+# LISTEN-соединение процесса
+notify_listener = NotifyListener()
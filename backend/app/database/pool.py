@@ -2,17 +2,33 @@
 import psycopg2
 from psycopg2 import pool
 import threading
+import time
 import logging
 from contextlib import contextmanager
 from app.models import Server
 from app.config import POOL_CONFIGS
+from app.metrics import POOL_WAIT_SECONDS
 
 logger = logging.getLogger(__name__)
 
+
+def is_connection_error(e: Exception) -> bool:
+    """Ошибка уровня соединения (разрыв, таймаут сети), а не ошибка SQL-запроса.
+    У ошибок сервера (включая statement timeout) есть pgcode, у сетевых — нет."""
+    return isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError)) and e.pgcode is None
+
+
 class DatabasePool:
     def __init__(self):
         self.pools: dict[str, psycopg2.pool.ThreadedConnectionPool] = {}
         self.lock = threading.Lock()
+        # Блокировки создаваемых пулов: параллельные вызовы ждут одно создание
+        self._creating: dict[str, threading.Lock] = {}
+        # Сервер и БД пула по ключу — метки метрик без host и user
+        self.names: dict[str, tuple[str, str]] = {}
+        # Выданные соединения пула по ключу: у ThreadedConnectionPool нет публичных
+        # счётчиков. Свободные не считаются — их число зависит от правил самого пула
+        self.busy: dict[str, int] = {}
         
     def get_pool_key(self, server: Server, db_name: str = None) -> str:
         """Генерация уникального ключа для пула"""
@@ -24,77 +40,113 @@ class DatabasePool:
         return POOL_CONFIGS["default"]
 
     def get_pool(self, server: Server, db_name: str = None) -> psycopg2.pool.ThreadedConnectionPool:
-        """Получить или создать пул для сервера"""
+        """Получить или создать пул для сервера.
+
+        Пул создаётся (подключение до connect_timeout) под блокировкой своего
+        ключа, а не общей: get_status, close_pool и пулы других серверов — в
+        том числе из event loop (/api/health, /api/metrics) — не ждут
+        медленный хост.
+        """
         pool_key = self.get_pool_key(server, db_name)
 
         with self.lock:
-            if pool_key not in self.pools:
-                config = self.get_pool_config(server)
-                database = db_name or "postgres"
-                
-                logger.info(f"Создание пула подключений для {server.name} ({database})")
-                try:
-                    self.pools[pool_key] = psycopg2.pool.ThreadedConnectionPool(
-                        config["minconn"],
-                        config["maxconn"],
-                        host=server.host,
-                        database=database,
-                        user=server.user,
-                        password=server.password,
-                        port=server.port,
-                        connect_timeout=5,
-                        options='-c statement_timeout=5000 -c tcp_user_timeout=5000',
-                        keepalives=1,
-                        keepalives_idle=30,
-                        keepalives_interval=5,
-                        keepalives_count=5
-                    )
-                except Exception as e:
-                    logger.error(f"Ошибка создания пула для {server.name}: {e}")
-                    raise
-                    
-            return self.pools[pool_key]
+            pool_obj = self.pools.get(pool_key)
+            if pool_obj is not None:
+                return pool_obj
+            creating = self._creating.setdefault(pool_key, threading.Lock())
+
+        with creating:
+            with self.lock:
+                pool_obj = self.pools.get(pool_key)
+            if pool_obj is not None:
+                return pool_obj
+
+            config = self.get_pool_config(server)
+            database = db_name or "postgres"
+
+            logger.info(f"Создание пула подключений для {server.name} ({database})")
+            try:
+                pool_obj = psycopg2.pool.ThreadedConnectionPool(
+                    config["minconn"],
+                    config["maxconn"],
+                    host=server.host,
+                    database=database,
+                    user=server.user,
+                    password=server.password,
+                    port=server.port,
+                    connect_timeout=5,
+                    options='-c statement_timeout=5000 -c tcp_user_timeout=5000',
+                    keepalives=1,
+                    keepalives_idle=30,
+                    keepalives_interval=5,
+                    keepalives_count=5
+                )
+            except Exception as e:
+                logger.error(f"Ошибка создания пула для {server.name}: {e}")
+                with self.lock:
+                    self._creating.pop(pool_key, None)
+                raise
+
+            with self.lock:
+                self.pools[pool_key] = pool_obj
+                self.names[pool_key] = (server.name, database)
+                self.busy[pool_key] = 0
+                self._creating.pop(pool_key, None)
+            return pool_obj
     
     @contextmanager
     def get_connection(self, server: Server, db_name: str = None):
-        """Контекстный менеджер для безопасной работы с подключением"""
+        """Контекстный менеджер для безопасной работы с подключением.
+
+        Без проверочного SELECT 1 при выдаче: он стоил лишний round trip на
+        каждый запрос. Разорванное соединение обнаруживается по ошибке самого
+        запроса и закрывается, а не возвращается в пул. Соединения работают в
+        autocommit — запросы мониторинга только читают, а неявные BEGIN/COMMIT
+        добавляли бы ещё два round trip.
+        """
         pool = self.get_pool(server, db_name)
+        pool_key = self.get_pool_key(server, db_name)
         conn = None
         try:
-            conn = pool.getconn()
-            
-            # Проверяем, что соединение живое
-            try:
-                with conn.cursor() as cur:
-                    cur.execute("SELECT 1")
-                    cur.fetchone()
-            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            started = time.perf_counter()
+            conn = self._checkout(pool_key, pool)
+            POOL_WAIT_SECONDS.observe(time.perf_counter() - started, "psycopg2")
+            if conn.closed:
+                # Закрыто на стороне клиента — сразу берём новое, без обращения к серверу
                 logger.warning(f"Мёртвое соединение обнаружено для {server.name}, переподключение...")
-                if conn:
-                    try:
-                        pool.putconn(conn, close=True)
-                    except Exception:
-                        pass
-                # Получаем новое соединение
-                conn = pool.getconn()
-                # Проверяем новое соединение
-                with conn.cursor() as cur:
-                    cur.execute("SELECT 1")
-                    cur.fetchone()
-            
+                self._return(pool_key, pool, conn, close=True)
+                conn = self._checkout(pool_key, pool)
+            if not conn.autocommit:
+                conn.autocommit = True
+
             logger.debug(f"Получено соединение из пула для {server.name}")
             yield conn
-            conn.commit()
         except Exception as e:
-            if conn:
-                conn.rollback()
             logger.error(f"Ошибка при работе с БД {server.name}: {e}")
+            if conn is not None and (conn.closed or is_connection_error(e)):
+                self._return(pool_key, pool, conn, close=True)
+                conn = None
             raise
         finally:
             if conn:
-                pool.putconn(conn)
+                self._return(pool_key, pool, conn)
                 logger.debug(f"Соединение возвращено в пул для {server.name}")
     
+    def _checkout(self, pool_key: str, pool_obj: pool.ThreadedConnectionPool):
+        """getconn с учётом в busy."""
+        conn = pool_obj.getconn()
+        with self.lock:
+            if pool_key in self.busy:
+                self.busy[pool_key] += 1
+        return conn
+
+    def _return(self, pool_key: str, pool_obj: pool.ThreadedConnectionPool, conn, close: bool = False):
+        """putconn с учётом в busy."""
+        pool_obj.putconn(conn, close=close)
+        with self.lock:
+            if pool_key in self.busy:
+                self.busy[pool_key] = max(self.busy[pool_key] - 1, 0)
+
     def close_pool(self, server: Server, db_name: str = None):
         """Закрыть конкретный пул"""
         pool_key = self.get_pool_key(server, db_name)
@@ -103,6 +155,8 @@ class DatabasePool:
                 logger.info(f"Закрытие пула для {server.name}")
                 self.pools[pool_key].closeall()
                 del self.pools[pool_key]
+                self.names.pop(pool_key, None)
+                self.busy.pop(pool_key, None)
     
     def close_all(self):
         """Закрыть все пулы"""
@@ -111,6 +165,8 @@ class DatabasePool:
             for pool_key, pool_obj in self.pools.items():
                 pool_obj.closeall()
             self.pools.clear()
+            self.names.clear()
+            self.busy.clear()
     
     def get_status(self) -> dict:
         """Получить статус всех пулов"""
@@ -120,6 +176,7 @@ class DatabasePool:
                 status[pool_key] = {
                     "minconn": pool_obj.minconn,
                     "maxconn": pool_obj.maxconn,
+                    "busy": self.busy.get(pool_key, 0),
                     "closed": pool_obj.closed
                 }
             return status
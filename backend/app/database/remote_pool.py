@@ -0,0 +1,171 @@
+# app/database/remote_pool.py
+"""
+Асинхронные пулы подключений к удалённым (мониторируемым) PostgreSQL серверам.
+
+В отличие от DatabasePool (psycopg2 + thread executor), работает на asyncpg
+прямо в event loop: опрос сотен серверов не упирается в размер пула потоков.
+Ключ пула совпадает с DatabasePool.get_pool_key: host:port:user:database.
+
+Все обращения проходят через circuit breaker (server_health.pg): к серверу,
+помеченному недоступным, запрос не отправляется — сразу
+ServerUnavailableError.
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
+import asyncpg
+
+from app.models import Server
+from app.config import POOL_CONFIGS
+from app.services.server_health import server_health
+from app.metrics import POOL_WAIT_SECONDS, REMOTE_QUERY_SECONDS
+
+# Ошибки недоступности сервера (в отличие от ошибок SQL, на которые сервер ответил)
+_UNAVAILABLE_ERRORS = (
+    OSError,
+    asyncio.TimeoutError,
+    asyncpg.ConnectionDoesNotExistError,
+    asyncpg.CannotConnectNowError,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RemotePool:
+    def __init__(self):
+        self.pools: dict[str, asyncpg.Pool] = {}
+        # Пулы в процессе создания: параллельные вызовы ждут один и тот же Task
+        self._pending: dict[str, asyncio.Task] = {}
+        # Сервер и БД пула по ключу — метки метрик без host и user
+        self.names: dict[str, tuple[str, str]] = {}
+
+    def get_pool_key(self, server: Server, db_name: str = None) -> str:
+        """Генерация уникального ключа для пула (как в DatabasePool)"""
+        database = db_name or "postgres"
+        return f"{server.host}:{server.port}:{server.user}:{database}"
+
+    def get_pool_config(self, server: Server) -> dict:
+        """Получить конфигурацию пула для сервера"""
+        return POOL_CONFIGS["default"]
+
+    async def _create_pool(self, server: Server, database: str) -> asyncpg.Pool:
+        config = self.get_pool_config(server)
+        logger.info(f"Создание asyncpg пула для {server.name} ({database})")
+        try:
+            return await asyncpg.create_pool(
+                host=server.host,
+                port=server.port,
+                user=server.user,
+                password=server.password,
+                database=database,
+                min_size=config["minconn"],
+                max_size=config["maxconn"],
+                timeout=5,            # таймаут установки соединения
+                command_timeout=10,   # таймаут ответа по умолчанию на клиенте
+                server_settings={
+                    "statement_timeout": "5000",
+                    "tcp_user_timeout": "5000",
+                    "tcp_keepalives_idle": "30",
+                    "tcp_keepalives_interval": "5",
+                    "tcp_keepalives_count": "5",
+                    "application_name": "pg_activity_monitor",
+                },
+            )
+        except Exception as e:
+            logger.error(f"Ошибка создания asyncpg пула для {server.name}: {e}")
+            raise
+
+    async def get_pool(self, server: Server, db_name: str = None) -> asyncpg.Pool:
+        """Получить или создать пул для сервера"""
+        pool_key = self.get_pool_key(server, db_name)
+        pool = self.pools.get(pool_key)
+        if pool is not None:
+            return pool
+
+        task = self._pending.get(pool_key)
+        if task is None:
+            task = asyncio.create_task(self._create_pool(server, db_name or "postgres"))
+            self._pending[pool_key] = task
+
+            def _done(t: asyncio.Task, key=pool_key):
+                self._pending.pop(key, None)
+                if not t.cancelled() and t.exception() is None:
+                    self.pools[key] = t.result()
+                    self.names[key] = (server.name, db_name or "postgres")
+
+            task.add_done_callback(_done)
+
+        # shield: отмена одного ожидающего не должна отменять создание пула для остальных
+        return await asyncio.shield(task)
+
+    @asynccontextmanager
+    async def acquire(self, server: Server, db_name: str = None):
+        """Контекстный менеджер: соединение из пула сервера (через circuit breaker)"""
+        server_health.pg.check(server.name)
+        started = time.perf_counter()
+        try:
+            pool = await self.get_pool(server, db_name)
+            async with pool.acquire() as conn:
+                acquired = time.perf_counter()
+                POOL_WAIT_SECONDS.observe(acquired - started, "remote")
+                try:
+                    yield conn
+                finally:
+                    REMOTE_QUERY_SECONDS.observe(time.perf_counter() - acquired, server.name)
+        except _UNAVAILABLE_ERRORS as e:
+            server_health.pg.record_failure(server.name, str(e) or type(e).__name__)
+            raise
+        except asyncpg.PostgresError:
+            # Ответ сервера с ошибкой SQL/аутентификации — хост доступен. Прочие
+            # исключения (в том числе из кода внутри async with) breaker не трогают
+            server_health.pg.record_success(server.name)
+            raise
+        server_health.pg.record_success(server.name)
+
+    async def fetch(self, server: Server, query: str, *args, db_name: str = None, timeout: float = None):
+        async with self.acquire(server, db_name) as conn:
+            return await conn.fetch(query, *args, timeout=timeout)
+
+    async def fetchrow(self, server: Server, query: str, *args, db_name: str = None, timeout: float = None):
+        async with self.acquire(server, db_name) as conn:
+            return await conn.fetchrow(query, *args, timeout=timeout)
+
+    async def fetchval(self, server: Server, query: str, *args, db_name: str = None, timeout: float = None):
+        async with self.acquire(server, db_name) as conn:
+            return await conn.fetchval(query, *args, timeout=timeout)
+
+    async def close_pool(self, server: Server, db_name: str = None):
+        """Закрыть конкретный пул"""
+        pool_key = self.get_pool_key(server, db_name)
+        pool = self.pools.pop(pool_key, None)
+        self.names.pop(pool_key, None)
+        if pool is not None:
+            logger.info(f"Закрытие asyncpg пула для {server.name}")
+            await pool.close()
+
+    async def close_all(self):
+        """Закрыть все пулы"""
+        logger.info(f"Закрытие всех asyncpg пулов ({len(self.pools)} пулов)")
+        pools = list(self.pools.values())
+        self.pools.clear()
+        self.names.clear()
+        await asyncio.gather(*(p.close() for p in pools), return_exceptions=True)
+
+    def get_status(self) -> dict:
+        """Получить статус всех пулов"""
+        status = {}
+        for pool_key, pool_obj in self.pools.items():
+            status[pool_key] = {
+                "minconn": pool_obj.get_min_size(),
+                "maxconn": pool_obj.get_max_size(),
+                "size": pool_obj.get_size(),
+                "idle": pool_obj.get_idle_size(),
+                "closed": pool_obj.is_closing(),
+            }
+        return status
+
+
+# Глобальный менеджер асинхронных пулов
+remote_pool = RemotePool()
@@ -7,6 +7,26 @@ from app.config import ENCRYPTION_KEY
 
 logger = logging.getLogger(__name__)
 
+# Канал NOTIFY об изменении таблицы servers (триггер trg_servers_notify), payload — имя сервера
+SERVERS_CHANNEL = "pam_servers"
+
+# Проекция без учётных данных — без pgp_sym_decrypt
+_SELECT_INFO = """
+    SELECT
+        name,
+        host,
+        port,
+        pg_user,
+        ssh_user,
+        ssh_port,
+        ssh_auth_type,
+        ssh_key_id,
+        password_enc IS NOT NULL AS has_password,
+        ssh_password_enc IS NOT NULL AS has_ssh_password,
+        created_at,
+        updated_at
+"""
+
 # SQL-фрагмент для SELECT с расшифровкой паролей
 _SELECT_DECRYPTED = """
     SELECT
@@ -56,13 +76,29 @@ async def get_server(name: str) -> dict | None:
     return _row_to_dict(row) if row else None
 
 
-async def list_servers() -> list[dict]:
-    """Список всех серверов с расшифрованными паролями."""
+async def list_servers(names: list[str] | None = None) -> list[dict]:
+    """Список серверов (всех или только names) с расшифрованными паролями."""
     pool = _get_pool()
-    rows = await pool.fetch(
-        _SELECT_DECRYPTED + " FROM servers ORDER BY name",
-        ENCRYPTION_KEY,
-    )
+    if names is None:
+        rows = await pool.fetch(
+            _SELECT_DECRYPTED + " FROM servers ORDER BY name",
+            ENCRYPTION_KEY,
+        )
+    else:
+        rows = await pool.fetch(
+            _SELECT_DECRYPTED + " FROM servers WHERE name = ANY($2::text[]) ORDER BY name",
+            ENCRYPTION_KEY, names,
+        )
+    return [_row_to_dict(r) for r in rows]
+
+
+async def list_server_infos(name: str | None = None) -> list[dict]:
+    """Серверы без учётных данных (все или один по имени)."""
+    pool = _get_pool()
+    if name is None:
+        rows = await pool.fetch(_SELECT_INFO + " FROM servers ORDER BY name")
+    else:
+        rows = await pool.fetch(_SELECT_INFO + " FROM servers WHERE name = $1", name)
     return [_row_to_dict(r) for r in rows]
 
 
@@ -4,6 +4,9 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Канал NOTIFY: payload — изменённые ключи через запятую
+SETTINGS_CHANNEL = "pam_settings"
+
 
 def _get_pool():
     """Ленивый импорт пула — избегаем циклических зависимостей при старте."""
@@ -37,13 +40,27 @@ async def get_int_setting(key: str, default: int) -> int:
 
 
 async def update_settings(updates: dict[str, str]) -> dict[str, dict]:
-    """Обновить несколько настроек. updates = {key: value_str}."""
+    """
+    Обновить несколько настроек одним запросом. updates = {key: value_str}.
+
+    Если значения действительно изменились, в той же транзакции отправляется
+    NOTIFY SETTINGS_CHANNEL — кэши настроек всех процессов перечитываются.
+    """
     pool = _get_pool()
-    async with pool.acquire() as conn:
-        for key, value in updates.items():
-            await conn.execute(
-                "UPDATE settings SET value = $1, updated_at = now() WHERE key = $2",
-                str(value), key,
-            )
+    await pool.execute(
+        """
+        WITH upd AS (
+            UPDATE settings s
+            SET value = u.value, updated_at = now()
+            FROM unnest($1::text[], $2::text[]) AS u(key, value)
+            WHERE s.key = u.key AND s.value IS DISTINCT FROM u.value
+            RETURNING s.key
+        )
+        SELECT pg_notify($3, keys)
+        FROM (SELECT string_agg(key, ',') AS keys FROM upd) changed
+        WHERE keys IS NOT NULL
+        """,
+        list(updates.keys()), [str(v) for v in updates.values()], SETTINGS_CHANNEL,
+    )
     logger.info(f"Обновлены настройки: {', '.join(updates.keys())}")
     return await get_all_settings()
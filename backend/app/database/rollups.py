@@ -0,0 +1,120 @@
+# app/database/rollups.py
+"""
+Часовые и суточные агрегаты statistics для длинных диапазонов timeline.
+
+statistics_hourly и statistics_daily хранят на (series_id, бакет)
+число замеров, сумму/минимум/максимум numbackends, сумму xact_commit и
+последний замер. Среднее считается как sum_backends / samples — агрегаты
+сливаются без потерь: 4-часовой бакет собирается из часовых, повторное
+слияние пакета прибавляет его замеры к уже накопленным.
+
+Агрегаты обновляются инкрементально в той же транзакции, что и вставка строк
+statistics (ingest._copy_records, загрузка спула), поэтому всегда совпадают с
+сырыми данными. Бакеты — по UTC. rebuild() пересчитывает диапазон заново из
+statistics (заполнение истории, см. scripts/migrate_rollups.py); в режиме
+хранения только изменений — из восстановленных рядов (steps.py).
+"""
+from datetime import datetime, timedelta, timezone
+
+import asyncpg
+
+from app.database import steps
+
+# Таблица сырых сэмплов и её колонки, из которых строятся агрегаты.
+# Записи для merge_records начинаются с этих колонок в этом порядке.
+SOURCE_TABLE = "statistics"
+SOURCE_COLUMNS = ("series_id", "ts", "numbackends", "xact_commit")
+
+# Таблица агрегатов → единица date_trunc
+ROLLUP_TABLES = {"statistics_hourly": "hour", "statistics_daily": "day"}
+
+_MERGE = """
+    INSERT INTO {table} AS r (
+        series_id, bucket, samples, sum_backends, min_backends, max_backends,
+        sum_xact_commit, last_ts, last_backends, last_xact_commit
+    )
+    SELECT series_id, date_trunc('{unit}', ts, 'UTC'),
+           count(numbackends), COALESCE(sum(numbackends), 0), min(numbackends), max(numbackends),
+           COALESCE(sum(xact_commit), 0), max(ts),
+           (array_agg(numbackends ORDER BY ts DESC))[1],
+           (array_agg(xact_commit ORDER BY ts DESC))[1]
+    FROM {source}
+    {where}
+    GROUP BY 1, 2
+    ORDER BY 1, 2
+    ON CONFLICT (series_id, bucket) DO UPDATE SET
+        samples = r.samples + EXCLUDED.samples,
+        sum_backends = r.sum_backends + EXCLUDED.sum_backends,
+        min_backends = LEAST(r.min_backends, EXCLUDED.min_backends),
+        max_backends = GREATEST(r.max_backends, EXCLUDED.max_backends),
+        sum_xact_commit = r.sum_xact_commit + EXCLUDED.sum_xact_commit,
+        last_ts = GREATEST(r.last_ts, EXCLUDED.last_ts),
+        last_backends = CASE WHEN EXCLUDED.last_ts >= r.last_ts
+                             THEN EXCLUDED.last_backends ELSE r.last_backends END,
+        last_xact_commit = CASE WHEN EXCLUDED.last_ts >= r.last_ts
+                                THEN EXCLUDED.last_xact_commit ELSE r.last_xact_commit END
+"""
+
+_UNNEST = (
+    "unnest($1::integer[], $2::timestamptz[], $3::integer[], $4::bigint[]) "
+    f"AS s({', '.join(SOURCE_COLUMNS)})"
+)
+
+
+async def merge_table(conn: asyncpg.Connection, relation: str):
+    """Добавить в агрегаты строки таблицы relation (колонки SOURCE_COLUMNS)."""
+    for table, unit in ROLLUP_TABLES.items():
+        await conn.execute(_MERGE.format(table=table, unit=unit, source=relation, where=""))
+
+
+async def merge_records(conn: asyncpg.Connection, records: list[tuple]):
+    """Добавить в агрегаты вставленные строки statistics (кортежи, начинающиеся с SOURCE_COLUMNS)."""
+    if not records:
+        return
+    columns = list(zip(*records))[:len(SOURCE_COLUMNS)]
+    for table, unit in ROLLUP_TABLES.items():
+        await conn.execute(_MERGE.format(table=table, unit=unit, source=_UNNEST, where=""), *columns)
+
+
+def day_bounds(start: datetime, end: datetime) -> tuple[datetime, datetime]:
+    """Расширить [start, end) до целых суток UTC — границ и часовых, и суточных бакетов."""
+    start = start.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    end_utc = end.astimezone(timezone.utc)
+    end_day = end_utc.replace(hour=0, minute=0, second=0, microsecond=0)
+    return start, end_day if end_day == end_utc else end_day + timedelta(days=1)
+
+
+async def rebuild(
+    conn: asyncpg.Connection, start: datetime, end: datetime, server_name: str | None = None,
+) -> int:
+    """
+    Пересчитать агрегаты за [start, end) (до целых суток UTC) из statistics.
+
+    Таблицы агрегатов блокируются на время пересчёта: параллельная запись
+    ingest ждёт, иначе её слияние потерялось бы при замене бакетов.
+    Сэмплы, пропущенные в режиме хранения только изменений, восстанавливаются
+    так же, как при чтении, — по эпохам режима (steps.py). Возвращает число
+    часовых бакетов.
+    """
+    start, end = day_bounds(start, end)
+    server = "($3::text IS NULL OR series_id IN (SELECT id FROM series WHERE server_name = $3))"
+    lookback = await steps.max_span(conn, SOURCE_TABLE, server_name, start, end)
+    if not lookback:
+        source, where = SOURCE_TABLE, f"WHERE ts >= $1 AND ts < $2 AND {server}"
+    else:
+        source, where = steps.source(SOURCE_TABLE, server, "$1", "$2", lookback), "WHERE ts >= $1 AND ts < $2"
+    hourly = 0
+    async with conn.transaction():
+        await conn.execute(f"LOCK TABLE {', '.join(ROLLUP_TABLES)} IN SHARE ROW EXCLUSIVE MODE")
+        for table, unit in ROLLUP_TABLES.items():
+            await conn.execute(
+                f"DELETE FROM {table} WHERE bucket >= $1 AND bucket < $2 AND {server}",
+                start, end, server_name,
+            )
+            tag = await conn.execute(
+                _MERGE.format(table=table, unit=unit, source=source, where=where),
+                start, end, server_name,
+            )
+            if unit == "hour":
+                hourly = int(tag.split()[-1])
+    return hourly
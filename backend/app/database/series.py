@@ -0,0 +1,54 @@
+# app/database/series.py
+"""
+Словарь рядов статистики: (server_name, datname) → целочисленный series_id.
+
+statistics и агрегаты (rollups.py) хранят series_id вместо двух строк: строка
+и индекс короче, а диапазонные выборки и удаления идут по одному int-ключу.
+Ряды не удаляются — при удалении сервера или БД удаляются только их сэмплы,
+а тот же (server_name, datname) позже получит прежний id. Поэтому кэш процесса
+никогда не устаревает.
+"""
+from collections.abc import Iterable
+
+import asyncpg
+
+# Кэш процесса: (server_name, datname) → id
+_ids: dict[tuple[str, str], int] = {}
+
+_ENSURE = """
+    INSERT INTO series (server_name, datname)
+    SELECT * FROM unnest($1::text[], $2::text[])
+    ON CONFLICT (server_name, datname) DO NOTHING
+"""
+
+_LOOKUP = """
+    SELECT s.id, s.server_name, s.datname
+    FROM series s
+    JOIN unnest($1::text[], $2::text[]) AS k(server_name, datname)
+      ON s.server_name = k.server_name AND s.datname = k.datname
+"""
+
+# Таблицы, строки которых ключуются series_id (удаление данных сервера или БД)
+SERIES_TABLES = ("statistics", "statistics_hourly", "statistics_daily", "statistics_chunks")
+
+# Ряды сервера и одной БД — для условий по statistics и агрегатам ($1 — сервер, $2 — БД)
+SERVER_SERIES = "series_id IN (SELECT id FROM series WHERE server_name = $1)"
+DB_SERIES = "series_id = (SELECT id FROM series WHERE server_name = $1 AND datname = $2)"
+
+
+async def resolve(conn: asyncpg.Connection, pairs: Iterable[tuple[str, str]]) -> dict[tuple[str, str], int]:
+    """
+    id рядов для пар (server_name, datname); недостающие ряды создаются.
+    Пары с NULL в результат не попадают.
+    Вызывать вне транзакции записи сэмплов: откат не должен отменить ряд,
+    id которого уже в кэше.
+    """
+    # Пара с NULL не станет рядом — такая строка будет отклонена при записи
+    pairs = {pair for pair in pairs if None not in pair}
+    missing = [pair for pair in pairs if pair not in _ids]
+    if missing:
+        servers, datnames = [p[0] for p in missing], [p[1] for p in missing]
+        await conn.execute(_ENSURE, servers, datnames)
+        for row in await conn.fetch(_LOOKUP, servers, datnames):
+            _ids[(row["server_name"], row["datname"])] = row["id"]
+    return {pair: _ids[pair] for pair in pairs}
@@ -0,0 +1,157 @@
+# app/database/steps.py
+"""
+Хранение только изменений (change_only_heartbeat) и восстановление рядов.
+
+В этом режиме коллектор (ingest.ChangeFilter) не пишет сэмпл, если значения
+не изменились с последнего записанного, — но не реже чем раз в heartbeat
+интервалов сбора. Пропущенные сэмплы statistics всё равно сливаются в
+агрегаты (rollups.py), поэтому часовые и суточные уровни точны; сырой
+уровень восстанавливается при чтении как ступенчатая функция.
+
+Точки восстановленного ряда — моменты циклов опроса его сервера: из каждого
+цикла сервера записывается хотя бы одна строка, а строки одного цикла имеют
+одинаковый ts. Значение ряда в точке — последняя записанная строка ряда не
+старше её span(): дальше ряд обрывается (БД удалена или сбор прекращён).
+
+Параметры режима хранятся вместе с данными — эпохами в change_only_epochs:
+(таблица, сервер, since, интервал сбора, heartbeat). Эпоху пишет коллектор
+(record_epochs), когда первый цикл сервера проходит с новыми параметрами;
+since — ts этого цикла. span записанной строки берётся из эпохи её ts, а не
+из текущих настроек: выключение режима или смена интервала не меняют
+восстановление уже записанной истории.
+"""
+import math
+from datetime import datetime, timedelta
+
+# Срок действия строки эпохи (колонки collect_interval, heartbeat), секунды
+_SPAN_SECONDS = "CASE WHEN {p}heartbeat > 1 THEN {p}collect_interval * ({p}heartbeat - 0.5) ELSE 0 END"
+
+# Эпохи таблицы: [since, until) и span записанной строки в них
+_EPOCHS = f"""
+    SELECT server_name, since,
+           lead(since, 1, 'infinity') OVER (PARTITION BY server_name ORDER BY since) AS until,
+           make_interval(secs => {_SPAN_SECONDS.format(p="")}) AS span
+    FROM change_only_epochs
+    WHERE sample_table = '{{table}}'
+"""
+
+# Наибольший span эпох сервера ($1, NULL — все), действующих в [$2, $3] или
+# чьи строки до $2 ещё действуют в периоде
+_MAX_SPAN = f"""
+    SELECT COALESCE(max(span), interval '0')
+    FROM ({_EPOCHS}) e
+    WHERE ($1::text IS NULL OR server_name = $1) AND since <= $3 AND until + span > $2
+"""
+
+# Новые эпохи: только если span отличается от эпохи, действующей на since
+# (без эпох — режим выключен). Предыдущей может быть и эпоха того же пакета:
+# пока БД недоступна, смены режима копятся (ChangeFilter.pending_epochs)
+_RECORD_EPOCHS = f"""
+    WITH n AS (
+        SELECT *
+        FROM unnest($1::text[], $2::text[], $3::timestamptz[], $4::integer[], $5::integer[])
+             AS n(sample_table, server_name, since, collect_interval, heartbeat)
+    )
+    INSERT INTO change_only_epochs (sample_table, server_name, since, collect_interval, heartbeat)
+    SELECT n.*
+    FROM n
+    WHERE {_SPAN_SECONDS.format(p="n.")} <> COALESCE((
+        SELECT {_SPAN_SECONDS.format(p="e.")}
+        FROM (
+            SELECT since, collect_interval, heartbeat FROM change_only_epochs
+            WHERE sample_table = n.sample_table AND server_name = n.server_name AND since <= n.since
+            UNION ALL
+            SELECT since, collect_interval, heartbeat FROM n p
+            WHERE p.sample_table = n.sample_table AND p.server_name = n.server_name AND p.since < n.since
+        ) e
+        ORDER BY e.since DESC
+        LIMIT 1
+    ), 0)
+    ON CONFLICT (sample_table, server_name, since) DO UPDATE
+    SET collect_interval = EXCLUDED.collect_interval, heartbeat = EXCLUDED.heartbeat
+"""
+
+# Колонки восстановленного источника — как у rollups.SOURCE_COLUMNS.
+# u: записанные строки рядов (со span их эпохи) и точки сетки (циклы сервера)
+# без значений; grp — номер последней записанной строки ряда, точка получает
+# её значения. Записанная строка идёт раньше точки с тем же ts и сама в
+# результат не попадает.
+_SOURCE = """(
+    WITH e AS ({epochs}), t AS (
+        SELECT series_id, r.server_name, ts, numbackends, xact_commit
+        FROM {base}
+        JOIN series r ON r.id = series_id
+        WHERE {grid_where} AND ts >= {start}::timestamptz - {lookback} AND ts <= {end}
+    ), b AS (
+        SELECT * FROM t WHERE {where}
+    )
+    SELECT series_id, ts, numbackends, xact_commit
+    FROM (
+        SELECT series_id, ts, stored, grp,
+               first_value(ts) OVER w AS stored_ts,
+               first_value(span) OVER w AS span,
+               first_value(numbackends) OVER w AS numbackends,
+               first_value(xact_commit) OVER w AS xact_commit
+        FROM (
+            SELECT u.*,
+                   count(*) FILTER (WHERE stored) OVER (PARTITION BY series_id ORDER BY ts, stored DESC) AS grp
+            FROM (
+                SELECT b.series_id, b.ts, b.numbackends, b.xact_commit,
+                       COALESCE(e.span, interval '0') AS span, true AS stored
+                FROM b
+                LEFT JOIN e ON e.server_name = b.server_name AND b.ts >= e.since AND b.ts < e.until
+                UNION ALL
+                SELECT k.series_id, g.ts, NULL, NULL, NULL, false
+                FROM (SELECT DISTINCT series_id, server_name FROM b) k
+                JOIN (SELECT DISTINCT server_name, ts FROM t) g USING (server_name)
+            ) u
+        ) c
+        WINDOW w AS (PARTITION BY series_id, grp ORDER BY ts, stored DESC)
+    ) f
+    WHERE NOT stored AND grp > 0 AND ts <= stored_ts + span
+) s"""
+
+
+def span(fill: tuple[int, int] | None) -> timedelta:
+    """
+    Сколько действует записанный сэмпл: пропускаются только сэмплы моложе
+    (heartbeat - 0.5) интервалов от последнего записанного. fill —
+    retention.change_only(); без режима — 0. Та же формула — в _SPAN_SECONDS.
+    """
+    if fill is None:
+        return timedelta(0)
+    interval, heartbeat = fill
+    return timedelta(seconds=interval * (heartbeat - 0.5))
+
+
+async def max_span(conn, table: str, server_name: str | None, start: datetime, end: datetime) -> timedelta:
+    """
+    Наибольший span строк table (statistics/db_sizes), действующих в [start,
+    end], по эпохам сервера (None — всех серверов). 0 — в периоде режим не
+    включался, восстановление не нужно.
+    """
+    return await conn.fetchval(_MAX_SPAN.format(table=table), server_name, start, end)
+
+
+async def record_epochs(conn, epochs: list[tuple[str, str, datetime, int, int]]):
+    """Записать эпохи (table, server_name, since, collect_interval, heartbeat), см. ChangeFilter."""
+    if epochs:
+        await conn.execute(_RECORD_EPOCHS, *(list(column) for column in zip(*epochs)))
+
+
+def source(
+    base: str, where: str, start: str, end: str, lookback: timedelta, grid_where: str | None = None,
+) -> str:
+    """
+    Восстановленные сэмплы рядов по условию where за [start, end] (номера
+    параметров) из base — statistics или chunks.union_source(). Точки ряда
+    берутся из строк рядов по условию grid_where (по умолчанию where) — оно
+    должно покрывать все ряды сервера, например series.SERVER_SERIES.
+    lookback — max_span() периода: насколько раньше start искать строки,
+    действующие в нём; span каждой строки — из эпохи её ts.
+    """
+    seconds = math.ceil(lookback.total_seconds())
+    return _SOURCE.format(
+        epochs=_EPOCHS.format(table="statistics"), base=base, where=where, grid_where=grid_where or where,
+        start=start, end=end, lookback=f"interval '{seconds} seconds'",
+    )
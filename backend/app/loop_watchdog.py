@@ -0,0 +1,92 @@
+# app/loop_watchdog.py
+"""
+Сторож event loop: находит синхронные вызовы, блокирующие корутины.
+
+Задача в loop засыпает на interval и измеряет, насколько позже положенного
+проснулась, — это время, пока loop был занят чужим кодом. Отдельный поток
+следит за той же отметкой: если loop не просыпается дольше порога, поток
+снимает стек потока loop (sys._current_frames), то есть стек самого
+блокирующего вызова. Когда loop возобновляется, блокировка пишется в лог
+вместе со стеком и в метрику pam_event_loop_block_seconds.
+
+В API и коллекторе включается LOOP_BLOCK_WARN_MS. В строгом режиме
+(strict=True, см. scripts/check_loop_blocking.py) блокировки ещё и
+копятся в violations — проверка завершается ошибкой, если список не пуст.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from app.metrics import EVENT_LOOP_BLOCK_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Кадров стека в отчёте (от блокирующего вызова наружу)
+_STACK_LIMIT = 25
+
+
+class LoopWatchdog:
+    def __init__(self, threshold_ms: float, strict: bool = False):
+        self.threshold = threshold_ms / 1000
+        self.interval = min(self.threshold / 2, 0.1)
+        self.strict = strict
+        self.violations: list[dict] = []
+        self._beat = 0.0
+        self._stack: str | None = None
+        self._loop_thread: int | None = None
+        self._task: asyncio.Task | None = None
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """Запустить в работающем loop (из корутины)."""
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info(f"Сторож event loop: порог {self.threshold * 1000:.0f} мс")
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._thread is not None:
+            self._thread.join()
+
+    async def _heartbeat(self):
+        while True:
+            self._beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            blocked = time.monotonic() - self._beat - self.interval
+            if blocked > self.threshold:
+                self._record(blocked)
+            else:
+                self._stack = None
+
+    def _watch(self):
+        while not self._stop.wait(self.interval / 2):
+            if self._stack is not None:
+                continue
+            if time.monotonic() - self._beat - self.interval > self.threshold:
+                frame = sys._current_frames().get(self._loop_thread)
+                if frame is not None:
+                    self._stack = "".join(traceback.format_stack(frame, limit=_STACK_LIMIT))
+
+    def _record(self, blocked: float):
+        stack, self._stack = self._stack, None
+        EVENT_LOOP_BLOCK_SECONDS.observe(blocked)
+        if self.strict:
+            self.violations.append({"blocked_ms": round(blocked * 1000, 1), "stack": stack})
+        logger.warning(
+            f"Event loop заблокирован на {blocked * 1000:.0f} мс (порог {self.threshold * 1000:.0f} мс)"
+            + (f", стек:\n{stack}" if stack else "")
+        )
@@ -0,0 +1,355 @@
+# app/metrics.py
+"""
+Внутренние метрики процесса в текстовом формате Prometheus (exposition 0.0.4).
+
+Без внешних зависимостей: счётчики и гистограммы с фиксированными метками.
+Обновление на горячем пути (опрос серверов, запросы API) — bisect по
+границам бакетов и несколько сложений под блокировкой семейства, без
+аллокаций для уже встречавшейся комбинации меток. Блокировка нужна, потому
+что часть наблюдений приходит из потоков (paramiko, psycopg2, кэш).
+
+Значения, которые уже хранятся в других объектах (пулы, очередь записи,
+спул, кэши, circuit breaker), не дублируются: их читает collect_runtime()
+только при выдаче /metrics.
+"""
+import asyncio
+import bisect
+import hmac
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from app.config import METRICS_TOKEN
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Границы бакетов (секунды)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RUN_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+ROWS_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Family:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: dict[tuple, object] = {}
+
+    def _header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+
+    def forget(self, label: str, value: str):
+        """Удалить серии с меткой label=value (например, сервер больше не опрашивается)."""
+        i = self.labelnames.index(label)
+        with self._lock:
+            for key in [k for k in self._children if k[i] == value]:
+                del self._children[key]
+
+
+class Counter(_Family):
+    type = "counter"
+
+    def inc(self, *labels, value: float = 1):
+        with self._lock:
+            self._children[labels] = self._children.get(labels, 0) + value
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._children.items())
+        return self._header() + [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in items]
+
+
+class Histogram(_Family):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            child = self._children.get(labels)
+            if child is None:
+                # [счётчики по бакетам (последний — +Inf), сумма]
+                child = self._children[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            child[0][i] += 1
+            child[1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted((k, (list(c[0]), c[1])) for k, c in self._children.items())
+        lines = self._header()
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._families: list[_Family] = []
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        family = Counter(name, documentation, labelnames)
+        self._families.append(family)
+        return family
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        family = Histogram(name, documentation, labelnames, buckets)
+        self._families.append(family)
+        return family
+
+    def forget(self, label: str, value: str):
+        """Удалить серии с меткой label=value во всех семействах (сервер удалён)."""
+        for family in self._families:
+            if label in family.labelnames:
+                family.forget(label, value)
+
+    def render(self) -> str:
+        lines = []
+        for family in self._families:
+            lines.extend(family.render())
+        lines.extend(collect_runtime())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# --------------------------------------------------------------------------- #
+#  Метрики горячего пути
+# --------------------------------------------------------------------------- #
+
+COLLECTOR_RUN_SECONDS = registry.histogram(
+    "pam_collector_run_seconds", "Длительность опроса одного сервера циклом коллектора",
+    ("job", "server"), RUN_BUCKETS,
+)
+COLLECTOR_RUNS = registry.counter(
+    "pam_collector_runs_total", "Опросы серверов по результату (ok, error, unavailable)", ("job", "result"),
+)
+COLLECTOR_ROWS = registry.histogram(
+    "pam_collector_rows", "Строк поставлено в очередь записи за один опрос сервера", ("job",), ROWS_BUCKETS,
+)
+REMOTE_QUERY_SECONDS = registry.histogram(
+    "pam_remote_query_seconds", "Время работы с соединением asyncpg к удалённому серверу", ("server",),
+)
+SSH_COMMAND_SECONDS = registry.histogram(
+    "pam_ssh_command_seconds", "Время выполнения команды по SSH (включая получение сессии)", ("server",),
+)
+POOL_WAIT_SECONDS = registry.histogram(
+    "pam_pool_wait_seconds", "Ожидание соединения из пула (asyncpg remote, psycopg2)", ("pool",),
+)
+INGEST_FLUSH_SECONDS = registry.histogram(
+    "pam_ingest_flush_seconds", "Запись одного пакета очереди в pam_stats",
+)
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "pam_http_request_seconds", "Длительность HTTP-запросов к API по маршруту", ("method", "route", "status"),
+)
+REMOTE_DEADLINE_EXCEEDED = registry.counter(
+    "pam_remote_deadline_exceeded_total", "Обращения к удалённым серверам из API, не уложившиеся в дедлайн", ("call",),
+)
+EVENT_LOOP_BLOCK_SECONDS = registry.histogram(
+    "pam_event_loop_block_seconds", "Блокировки event loop дольше порога LOOP_BLOCK_WARN_MS",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+
+
+# --------------------------------------------------------------------------- #
+#  Значения, читаемые при выдаче
+# --------------------------------------------------------------------------- #
+
+def _gauge(name: str, documentation: str, samples: list[tuple[dict, float]], kind: str = "gauge") -> list[str]:
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        if value is None:
+            continue
+        lines.append(f"{name}{_labels(tuple(labels), tuple(labels.values()))} {_number(value)}")
+    return lines
+
+
+def _pool_labels(names: dict[str, tuple[str, str]], key: str) -> dict:
+    server, database = names.get(key, ("", ""))
+    return {"server": server, "database": database}
+
+
+def collect_runtime() -> list[str]:
+    """Состояние пулов, очереди записи, спула, кэшей и circuit breaker на момент выдачи."""
+    # Импорт здесь: metrics импортируется из этих модулей
+    from app.database import db_pool, remote_pool
+    from app.database import local_db
+    from app.services.cache import cache_manager
+    from app.services.ssh_pool import ssh_pool
+    from app.services.server_health import server_health
+    from app.collector.ingest import ingest_buffer
+
+    lines = []
+
+    # Пулы помечаются сервером и БД, а не ключом пула: host и пользователь в метрики не попадают
+    remote = [
+        (_pool_labels(remote_pool.names, key), p) for key, p in list(remote_pool.pools.items())
+    ]
+    lines += _gauge("pam_remote_pool_connections", "Соединения asyncpg-пулов к удалённым серверам", [
+        ({**labels, "state": state}, value)
+        for labels, p in remote
+        for state, value in (("busy", p.get_size() - p.get_idle_size()), ("idle", p.get_idle_size()))
+    ])
+    lines += _gauge("pam_remote_pool_max", "Максимум соединений asyncpg-пула",
+                    [(labels, p.get_max_size()) for labels, p in remote])
+
+    with db_pool.lock:
+        sync_pools = [
+            (_pool_labels(db_pool.names, key), db_pool.busy.get(key, 0), p.maxconn)
+            for key, p in db_pool.pools.items()
+        ]
+    # Свободные соединения psycopg2 не считаются (см. DatabasePool.busy) — только занятые
+    lines += _gauge("pam_psycopg2_pool_connections", "Занятые соединения psycopg2-пулов к удалённым серверам", [
+        ({**labels, "state": "busy"}, busy) for labels, busy, _ in sync_pools
+    ])
+    lines += _gauge("pam_psycopg2_pool_max", "Максимум соединений psycopg2-пула",
+                    [(labels, maxconn) for labels, _, maxconn in sync_pools])
+
+    local = local_db._pool
+    if local is not None:
+        lines += _gauge("pam_local_pool_connections", "Соединения asyncpg-пула к pam_stats", [
+            ({"state": "busy"}, local.get_size() - local.get_idle_size()),
+            ({"state": "idle"}, local.get_idle_size()),
+        ])
+        lines += _gauge("pam_local_pool_max", "Максимум соединений пула pam_stats", [({}, local.get_max_size())])
+
+    with ssh_pool.lock:
+        sessions = list(ssh_pool.sessions.values())
+    lines += _gauge("pam_ssh_sessions", "Постоянные SSH-сессии", [
+        ({"state": "busy"}, sum(1 for s in sessions if s.in_use)),
+        ({"state": "idle"}, sum(1 for s in sessions if not s.in_use)),
+    ])
+
+    cache_stats = cache_manager.get_stats()
+    lines += _gauge("pam_cache_requests_total", "Обращения к кэшам CacheManager", [
+        ({"cache": cache, "result": result}, st[result])
+        for cache, st in cache_stats.items() for result in ("hit", "miss")
+    ], kind="counter")
+    lines += _gauge("pam_cache_hit_ratio", "Доля попаданий в кэш с запуска процесса", [
+        ({"cache": cache}, st["hit"] / (st["hit"] + st["miss"]) if st["hit"] + st["miss"] else None)
+        for cache, st in cache_stats.items()
+    ])
+    lines += _gauge("pam_cache_entries", "Записей в кэше", [
+        ({"cache": cache}, st["entries"]) for cache, st in cache_stats.items()
+    ])
+
+    lines += _gauge("pam_breaker_open_servers", "Серверы с разомкнутым circuit breaker", [
+        ({"kind": "pg"}, len(server_health.pg.open_names())),
+        ({"kind": "ssh"}, len(server_health.ssh.open_names())),
+    ])
+
+    m = ingest_buffer.metrics
+    oldest = ingest_buffer._queue[0][1][1] if ingest_buffer._queue else None
+    lines += _gauge("pam_ingest_queue_rows", "Строк в очереди записи", [({}, ingest_buffer.depth)])
+    lines += _gauge("pam_ingest_queue_capacity", "Ёмкость очереди записи", [({}, ingest_buffer.max_records)])
+    lines += _gauge("pam_ingest_queue_oldest_age_seconds", "Возраст самой старой строки в очереди",
+                    [({}, time.time() - oldest.timestamp() if oldest else 0)])
+    lines += _gauge("pam_ingest_rows_total", "Строки очереди записи по результату", [
+        ({"result": key}, m[key]) for key in ("enqueued", "written", "rejected", "dropped")
+    ], kind="counter")
+    lines += _gauge("pam_ingest_backpressure_waits_total", "Ожидания места в полной очереди",
+                    [({}, m["backpressure_waits"])], kind="counter")
+    lines += _gauge("pam_ingest_flush_errors_total", "Ошибки записи пакетов", [({}, m["flush_errors"])], kind="counter")
+
+    spool = ingest_buffer.spool
+    if spool is not None:
+        sm = spool.metrics
+        lines += _gauge("pam_spool_rows_total", "Строки спула на диске по результату", [
+            ({"result": "spooled"}, sm["spooled_rows"]),
+            ({"result": "replayed"}, sm["replayed_rows"]),
+            ({"result": "duplicate"}, sm["duplicate_rows"]),
+        ], kind="counter")
+        lines += _gauge("pam_spool_bytes", "Занято спулом на диске (оценка)", [({}, spool._bytes or 0)])
+    return lines
+
+
+# --------------------------------------------------------------------------- #
+#  HTTP-сервер метрик для отдельного процесса коллектора
+# --------------------------------------------------------------------------- #
+
+def token_valid(authorization: str) -> bool:
+    """Заголовок Authorization совпадает с Bearer METRICS_TOKEN (токен задан)."""
+    if not METRICS_TOKEN:
+        return False
+    return hmac.compare_digest(authorization.encode(), f"Bearer {METRICS_TOKEN}".encode())
+
+
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), 5)
+        authorization = ""
+        while (line := await asyncio.wait_for(reader.readline(), 5)) not in (b"\r\n", b"\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.strip().lower() == "authorization":
+                authorization = value.strip()
+        if request_line.split(b" ")[:2] != [b"GET", b"/metrics"]:
+            status, body, ctype = "404 Not Found", b"not found\n", "text/plain"
+        elif METRICS_TOKEN and not token_valid(authorization):
+            status, body, ctype = "401 Unauthorized", b"invalid metrics token\n", "text/plain"
+        else:
+            status, body, ctype = "200 OK", registry.render().encode(), CONTENT_TYPE
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {ctype}\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    except Exception as e:
+        logger.error(f"[metrics] Ошибка выдачи метрик: {e}")
+    finally:
+        writer.close()
+
+
+async def start_http_server(port: int, host: str = "127.0.0.1") -> asyncio.AbstractServer:
+    """
+    GET /metrics на отдельном порту (процесс коллектора не поднимает API).
+    JWT здесь нет: по умолчанию слушается только localhost, при заданном
+    METRICS_TOKEN запрос без него отклоняется.
+    """
+    server = await asyncio.start_server(_handle, host, port)
+    logger.info(f"[metrics] Метрики коллектора: http://{host}:{port}/metrics")
+    return server
@@ -1,9 +1,9 @@
-from .server import Server
+from .server import Server, ServerInfo
 from .user import User, UserRole, UserCreate, UserUpdate, UserResponse
 from .ssh_key import SSHKey, SSHKeyType, SSHKeyCreate, SSHKeyImport, SSHKeyResponse
 
 __all__ = [
-    "Server", 
+    "Server", "ServerInfo",
     "User", "UserRole", "UserCreate", "UserUpdate", "UserResponse",
     "SSHKey", "SSHKeyType", "SSHKeyCreate", "SSHKeyImport", "SSHKeyResponse"
 ]
@@ -15,3 +15,17 @@ class Server(BaseModel):
     ssh_auth_type: str | None = "password"  # "password" или "key"
     ssh_key_id: str | None = None  # ID ключа из системы управления ключами
     ssh_key_passphrase: str | None = None  # зашифрованный passphrase для ключа
+
+
+class ServerInfo(BaseModel):
+    """Проекция сервера без учётных данных (реестр серверов, проверки существования)."""
+    name: str
+    host: str
+    port: int
+    user: str
+    ssh_user: str
+    ssh_port: int = 22
+    ssh_auth_type: str | None = "password"
+    ssh_key_id: str | None = None
+    has_password: bool = False
+    has_ssh_password: bool = False
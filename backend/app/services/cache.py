@@ -15,6 +15,8 @@ class CacheManager:
         self.ssh_cache_lock = threading.Lock()
         self.server_status_cache = {}
         self.server_status_cache_lock = threading.Lock()
+        # Попадания/промахи (меняются под блокировкой своего кэша)
+        self.stats = {"ssh": {"hit": 0, "miss": 0}, "server_status": {"hit": 0, "miss": 0}}
     
     def clear_cache(self, cache, lock, ttl):
         """Universal cache cleanup function with size limit"""
@@ -35,7 +37,9 @@ class CacheManager:
         """Get data from SSH cache"""
         with self.ssh_cache_lock:
             if key in self.ssh_cache:
+                self.stats["ssh"]["hit"] += 1
                 return self.ssh_cache[key].copy()
+            self.stats["ssh"]["miss"] += 1
         return None
     
     def set_ssh_cache(self, key, data):
@@ -50,7 +54,9 @@ class CacheManager:
         """Get data from server cache"""
         with self.server_status_cache_lock:
             if key in self.server_status_cache:
+                self.stats["server_status"]["hit"] += 1
                 return self.server_status_cache[key].copy()
+            self.stats["server_status"]["miss"] += 1
         return None
     
     def set_server_cache(self, key, data):
@@ -67,5 +73,13 @@ class CacheManager:
             if key in self.server_status_cache:
                 del self.server_status_cache[key]
 
+    def get_stats(self) -> dict:
+        """Попадания, промахи и число записей по кэшам"""
+        with self.ssh_cache_lock:
+            ssh = {**self.stats["ssh"], "entries": len(self.ssh_cache)}
+        with self.server_status_cache_lock:
+            server_status = {**self.stats["server_status"], "entries": len(self.server_status_cache)}
+        return {"ssh": ssh, "server_status": server_status}
+
 # Global cache manager
 cache_manager = CacheManager()
@@ -0,0 +1,119 @@
+# app/services/remote_access.py
+"""
+Обращения к удалённым серверам из обработчиков API — без блокировки event loop.
+
+Обработчик `async def` выполняется в event loop процесса: синхронный сетевой
+вызов в нём (socket, psycopg2, paramiko) останавливает все запросы API и
+embedded-коллектор, пока медленный хост не ответит. Поэтому обработчики
+обращаются к серверам только через этот модуль, и у каждого вызова есть
+дедлайн (REMOTE_*_DEADLINE):
+
+    host_reachable  — проверка порта на asyncio (DNS — в executor loop);
+    fetch           — запрос через remote_pool (asyncpg);
+    server_status   — connect_to_server (psycopg2 + SSH df) в потоке;
+    test_ssh        — SSHKeyManager.test_ssh_connection в потоке.
+
+Синхронные вызовы выполняются в отдельном пуле потоков (REMOTE_CALL_THREADS),
+а не в пуле по умолчанию: зависшие на сетевых таймаутах потоки не
+задерживают asyncio.to_thread остального кода (спул, SSH-сессии). По
+дедлайну обработчик получает RemoteDeadlineError; поток дорабатывает до
+собственного таймаута подключения и результат отбрасывается.
+"""
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from app.models import Server
+from app.config import (
+    REMOTE_QUERY_DEADLINE,
+    REMOTE_CONNECT_DEADLINE,
+    REMOTE_STATUS_DEADLINE,
+    REMOTE_SSH_DEADLINE,
+    REMOTE_CALL_THREADS,
+)
+from app.database.remote_pool import remote_pool
+from app.services.server import connect_to_server
+from app.services.server_health import server_health
+from app.services.ssh_key_manager import SSHKeyManager
+from app.metrics import REMOTE_DEADLINE_EXCEEDED
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=REMOTE_CALL_THREADS, thread_name_prefix="remote")
+
+
+class RemoteDeadlineError(Exception):
+    """Удалённый вызов не завершился за отведённое время."""
+
+    def __init__(self, call: str, target: str, deadline: float):
+        self.call = call
+        self.target = target
+        self.deadline = deadline
+        super().__init__(f"{target}: {call} — нет ответа за {deadline:g}с")
+
+
+async def run(call: str, target: str, deadline: float, func, *args, **kwargs):
+    """Синхронный func(*args, **kwargs) в пуле потоков с дедлайном (call, target — для ошибки и метрики)."""
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+    try:
+        return await asyncio.wait_for(future, deadline)
+    except asyncio.TimeoutError:
+        REMOTE_DEADLINE_EXCEEDED.inc(call)
+        logger.warning(f"{target}: {call} не уложился в {deadline:g}с")
+        raise RemoteDeadlineError(call, target, deadline) from None
+
+
+async def host_reachable(host: str, port: int, deadline: float = REMOTE_CONNECT_DEADLINE) -> bool:
+    """Асинхронный аналог ssh.is_host_reachable: принимает ли host:port TCP-подключения."""
+    if not host or host.lower() in ['test', 'localhost', '127.0.0.1']:
+        logger.debug(f"Невалидный хост: {host}")
+        return False
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), deadline)
+    except asyncio.TimeoutError:
+        REMOTE_DEADLINE_EXCEEDED.inc("host_reachable")
+        logger.warning(f"Хост {host}:{port} не ответил за {deadline:g}с")
+        return False
+    except OSError as e:
+        logger.warning(f"Хост {host}:{port} недоступен: {e}")
+        return False
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True
+
+
+async def fetch(server: Server, query: str, *args, db_name: str = None, deadline: float = REMOTE_QUERY_DEADLINE):
+    """
+    remote_pool.fetch с дедлайном на весь вызов: создание пула, ожидание
+    соединения и запрос. Нарушение дедлайна — ошибка доступности для
+    circuit breaker (прерванный вызов remote_pool её не записывает).
+    """
+    try:
+        return await asyncio.wait_for(remote_pool.fetch(server, query, *args, db_name=db_name), deadline)
+    except asyncio.TimeoutError:
+        REMOTE_DEADLINE_EXCEEDED.inc("query")
+        server_health.pg.record_failure(server.name, f"нет ответа за {deadline:g}с")
+        raise RemoteDeadlineError("query", server.name, deadline) from None
+
+
+async def server_status(server: Server, deadline: float = REMOTE_STATUS_DEADLINE) -> dict:
+    """Статус сервера (connect_to_server: PostgreSQL, SSH df, кэш) с дедлайном."""
+    return await run("server_status", server.name, deadline, connect_to_server, server)
+
+
+async def test_ssh(server: Server, deadline: float = REMOTE_SSH_DEADLINE, **credentials) -> tuple[bool, str]:
+    """SSHKeyManager.test_ssh_connection к серверу с дедлайном; credentials — ключ или пароль."""
+    return await run(
+        "test_ssh", server.name, deadline, SSHKeyManager.test_ssh_connection,
+        host=server.host, port=server.ssh_port, username=server.ssh_user, **credentials,
+    )
+
+
+def shutdown():
+    """Не ждать зависшие вызовы при остановке процесса."""
+    _executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,56 @@
+# app/services/retention.py
+"""
+Уровни хранения статистики: сырые сэмплы → часовые → суточные агрегаты.
+
+Сроки берутся из настроек (raw_retention_days, hourly_retention_months,
+daily_retention_months) с fallback на config. Каждый следующий уровень хранится не
+меньше предыдущего — иначе при удалении партиции данным некуда было бы
+уплотниться. Граница уровня — момент, начиная с которого его данные заведомо
+есть: партиции удаляются только целиком старше границы.
+
+Граница chunks — сырые сэмплы месяцев, закончившихся раньше неё, хранятся
+сжатыми (chunk_after_days, 0 — не сжимать; см. database/chunks.py).
+
+change_only() — параметры режима хранения только изменений
+(change_only_heartbeat; см. database/steps.py).
+"""
+from datetime import datetime, timedelta, timezone
+
+from app.config import (
+    RAW_RETENTION_DAYS, HOURLY_RETENTION_MONTHS, DAILY_RETENTION_MONTHS, CHUNK_AFTER_DAYS, CHANGE_ONLY_HEARTBEAT,
+    COLLECT_INTERVAL, SIZE_UPDATE_INTERVAL,
+)
+from app.services.settings_cache import settings_cache
+
+# Интервал сбора таблицы сэмплов: настройка и значение по умолчанию
+_INTERVALS = {
+    "statistics": ("collect_interval", COLLECT_INTERVAL),
+    "db_sizes": ("size_update_interval", SIZE_UPDATE_INTERVAL),
+}
+
+
+def retention_horizons(now: datetime | None = None) -> dict[str, datetime | None]:
+    """Границы уровней: {"raw": ..., "hourly": ..., "daily": ..., "chunks": ... или None}."""
+    now = now or datetime.now(timezone.utc)
+    raw_days = settings_cache.get_int("raw_retention_days", RAW_RETENTION_DAYS)
+    hourly_days = max(raw_days, settings_cache.get_int("hourly_retention_months", HOURLY_RETENTION_MONTHS) * 31)
+    daily_days = max(hourly_days, settings_cache.get_int("daily_retention_months", DAILY_RETENTION_MONTHS) * 31)
+    chunk_days = settings_cache.get_int("chunk_after_days", CHUNK_AFTER_DAYS)
+    return {
+        "chunks": now - timedelta(days=chunk_days) if chunk_days > 0 else None,
+        "raw": now - timedelta(days=raw_days),
+        "hourly": now - timedelta(days=hourly_days),
+        "daily": now - timedelta(days=daily_days),
+    }
+
+
+def change_only(table: str) -> tuple[int, int] | None:
+    """
+    Режим хранения только изменений для statistics/db_sizes: (интервал сбора
+    таблицы в секундах, heartbeat в интервалах) или None, если режим выключен.
+    """
+    heartbeat = settings_cache.get_int("change_only_heartbeat", CHANGE_ONLY_HEARTBEAT)
+    if heartbeat <= 1:
+        return None
+    key, default = _INTERVALS[table]
+    return settings_cache.get_int(key, default), heartbeat
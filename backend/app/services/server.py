@@ -6,30 +6,25 @@ from datetime import datetime, timezone
 from app.models import Server
 from app.config import SERVER_STATUS_CACHE_TTL
 from app.database import db_pool
+from app.database.pool import is_connection_error
 from app.services.cache import cache_manager
-from app.services.ssh import get_ssh_disk_usage, is_host_reachable
+from app.services.ssh import get_ssh_disk_usage
 from app.database.repositories import server_repo
+from app.services.server_registry import server_registry
+from app.services.server_health import server_health
 import time
 
 logger = logging.getLogger(__name__)
 
 
 async def load_servers() -> list[Server]:
-    """Загрузка списка серверов из БД."""
-    rows = await server_repo.list_servers()
-    servers = []
-    for r in rows:
-        # Убираем поля, которых нет в модели Server
-        r.pop("created_at", None)
-        r.pop("updated_at", None)
-        servers.append(Server(**r))
-    logger.debug(f"Загружено {len(servers)} серверов")
-    return servers
+    """Список серверов с учётными данными (из реестра, расшифровка — один раз на сервер)."""
+    return await server_registry.list_servers()
 
 
 async def save_server(server: Server) -> dict:
     """Создать новый сервер в БД."""
-    return await server_repo.create_server(
+    result = await server_repo.create_server(
         name=server.name,
         host=server.host,
         port=server.port,
@@ -42,11 +37,13 @@ async def save_server(server: Server) -> dict:
         ssh_key_id=getattr(server, "ssh_key_id", None),
         ssh_key_passphrase=getattr(server, "ssh_key_passphrase", None),
     )
+    await server_registry.refresh(server.name)
+    return result
 
 
 async def update_server_config(name: str, server: Server) -> dict | None:
     """Обновить сервер в БД."""
-    return await server_repo.update_server(
+    result = await server_repo.update_server(
         name,
         host=server.host,
         port=server.port,
@@ -59,11 +56,59 @@ async def update_server_config(name: str, server: Server) -> dict | None:
         ssh_key_id=getattr(server, "ssh_key_id", None),
         ssh_key_passphrase=getattr(server, "ssh_key_passphrase", None),
     )
+    await server_registry.refresh(name)
+    return result
 
 
 async def delete_server_config(name: str) -> bool:
     """Удалить сервер из БД."""
-    return await server_repo.delete_server(name)
+    deleted = await server_repo.delete_server(name)
+    await server_registry.refresh(name)
+    return deleted
+
+
+# Статус сервера одним запросом — один сетевой round trip.
+# statement_timeout (5 с) задан в параметрах подключения пула.
+_PROBE_SQL = """
+    SELECT current_setting('server_version')  AS version,
+           pg_postmaster_start_time()          AS start_time,
+           current_setting('data_directory')   AS data_dir,
+           a.states,
+           a.counts
+    FROM (
+        SELECT array_agg(state) AS states, array_agg(cnt) AS counts
+        FROM (SELECT state, COUNT(*) AS cnt FROM pg_stat_activity GROUP BY state) s
+    ) a;
+"""
+
+
+def probe_postgres(server: Server) -> dict[str, Any]:
+    """Версия, соединения по state, uptime и data_directory одним запросом (SYNC).
+
+    Если соединение из пула оказалось разорванным, запрос повторяется один раз
+    на новом соединении. Создание пула (первое подключение) не повторяется:
+    недоступный хост стоит одной попытки до connect_timeout.
+    """
+    db_pool.get_pool(server)
+    for attempt in (1, 2):
+        try:
+            with db_pool.get_connection(server) as conn:
+                with conn.cursor() as cur:
+                    cur.execute(_PROBE_SQL)
+                    version, start_time_pg, data_dir, states, counts = cur.fetchone()
+            break
+        except Exception as e:
+            if attempt == 2 or not is_connection_error(e):
+                raise
+            logger.info(f"Повтор проверки {server.name} на новом соединении: {e}")
+
+    now_utc = datetime.now(timezone.utc)
+    return {
+        "version": version,
+        "connections": dict(zip(states or [], counts or [])),
+        "uptime_hours": round((now_utc - start_time_pg).total_seconds() / 3600, 2),
+        "data_dir": data_dir,
+    }
 
 
 def connect_to_server(server: Server) -> dict[str, Any]:
@@ -87,6 +132,7 @@ def connect_to_server(server: Server) -> dict[str, Any]:
             cached["total_space"] = total_space
             if ssh_status != "ok" and ssh_status != "cached":
                 cached["status"] = f"{cached['status']} (SSH: {ssh_status})"
+        cached["health"] = server_health.snapshot(server.name)
         return cached
 
     # Базовая информация
@@ -110,36 +156,21 @@ def connect_to_server(server: Server) -> dict[str, Any]:
         "data_dir": None
     }
 
-    # Проверка PostgreSQL с таймаутом
-    if not is_host_reachable(server.host, server.port):
-        logger.warning(f"PostgreSQL недоступен для {server.name}")
-        result["status"] = "PostgreSQL: host unreachable"
+    # Проверка PostgreSQL с таймаутом (connect_timeout пула, без отдельной проверки порта);
+    # недоступный сервер не проверяется до следующей пробы
+    if not server_health.pg.allow(server.name):
+        result["status"] = f"PostgreSQL: unavailable (retry in {server_health.pg.retry_in(server.name):.0f}s)"
     else:
         start_time = time.time()
         try:
-            with db_pool.get_connection(server) as conn:
-                with conn.cursor() as cur:
-                    cur.execute("SET statement_timeout = 5000;")  # 5 секунд
-
-                    cur.execute("SHOW server_version;")
-                    result["version"] = cur.fetchone()[0]
-
-                    cur.execute("SELECT state, COUNT(*) FROM pg_stat_activity GROUP BY state;")
-                    result["connections"] = dict(cur.fetchall())
-
-                    cur.execute("SELECT pg_postmaster_start_time();")
-                    start_time_pg = cur.fetchone()[0]
-                    now_utc = datetime.now(timezone.utc)
-                    result["uptime_hours"] = round((now_utc - start_time_pg).total_seconds() / 3600, 2)
-
-                    cur.execute("SHOW data_directory;")
-                    result["data_dir"] = cur.fetchone()[0]
-
+            result.update(probe_postgres(server))
             result["status"] = "ok"
+            server_health.pg.record_success(server.name)
             logger.info(f"Сервер {server.name} доступен (время: {time.time() - start_time:.2f}с)")
 
         except socket.timeout:
             result["status"] = "PostgreSQL: socket timeout"
+            server_health.pg.record_failure(server.name, "socket timeout")
             logger.error(f"PostgreSQL socket таймаут для {server.name}")
         except Exception as e:
             error_msg = str(e)
@@ -147,6 +178,10 @@ def connect_to_server(server: Server) -> dict[str, Any]:
                 result["status"] = "PostgreSQL: operation timeout"
             else:
                 result["status"] = f"PostgreSQL: {error_msg[:50]}"
+            if is_connection_error(e) or "timeout" in error_msg.lower():
+                server_health.pg.record_failure(server.name, error_msg)
+            else:
+                server_health.pg.record_success(server.name)
             logger.error(f"PostgreSQL ошибка для {server.name}: {e}")
 
     # Получение SSH данных если есть data_dir
@@ -161,4 +196,5 @@ def connect_to_server(server: Server) -> dict[str, Any]:
     if result["status"] == "ok" or result["status"].startswith("ok (SSH:"):
         cache_manager.set_server_cache(cache_key, result)
 
+    result["health"] = server_health.snapshot(server.name)
     return result
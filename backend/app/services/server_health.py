@@ -0,0 +1,159 @@
+# app/services/server_health.py
+"""
+Circuit breaker на сервер: не тратить таймауты подключения на недоступные хосты.
+
+Отдельные автоматы для PostgreSQL (server_health.pg) и SSH (server_health.ssh),
+общие для коллектора, connect_to_server и stats API в пределах процесса:
+
+    closed     — обычная работа; BREAKER_FAILURE_THRESHOLD ошибок подряд → open
+    open       — обращения отклоняются сразу, без сетевых попыток, до retry_at
+    half_open  — после паузы пропускается одна проба: успех → closed,
+                 ошибка → open с удвоенной паузой (до BREAKER_MAX_BACKOFF)
+
+Ошибкой считается только недоступность (соединение, таймаут сети). Ответ
+сервера с ошибкой SQL или аутентификации означает, что хост жив.
+
+Методы синхронные и потокобезопасные: вызываются и из event loop
+(remote_pool), и из потоков (psycopg2, paramiko).
+"""
+import random
+import threading
+import time
+import logging
+
+from app.config import BREAKER_FAILURE_THRESHOLD, BREAKER_BASE_BACKOFF, BREAKER_MAX_BACKOFF, BREAKER_PROBE_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class ServerUnavailableError(Exception):
+    """Сервер помечен недоступным, обращение отклонено без сетевой попытки."""
+
+    def __init__(self, server_name: str, kind: str, retry_in: float):
+        self.server_name = server_name
+        self.kind = kind
+        self.retry_in = retry_in
+        super().__init__(f"{server_name}: {kind} недоступен, повтор через {retry_in:.0f}с")
+
+
+class CircuitBreaker:
+    """Автоматы состояний одного вида подключений (pg или ssh) для всех серверов."""
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.lock = threading.Lock()
+        self.states: dict[str, dict] = {}
+
+    def _state(self, name: str) -> dict:
+        st = self.states.get(name)
+        if st is None:
+            st = self.states[name] = {
+                "state": CLOSED, "failures": 0, "backoff": 0.0,
+                "retry_at": 0.0, "probe_started": 0.0, "last_error": None,
+            }
+        return st
+
+    def allow(self, name: str) -> bool:
+        """Можно ли обращаться к серверу сейчас (в half_open — только одна проба)."""
+        now = time.monotonic()
+        with self.lock:
+            st = self.states.get(name)
+            if st is None or st["state"] == CLOSED:
+                return True
+            if st["state"] == OPEN:
+                if now < st["retry_at"]:
+                    return False
+                st["state"] = HALF_OPEN
+                st["probe_started"] = now
+                logger.info(f"[breaker] {name} ({self.kind}): пробное подключение")
+                return True
+            # half_open: проба уже идёт; зависшую пробу заменяем новой
+            if now - st["probe_started"] < BREAKER_PROBE_TIMEOUT:
+                return False
+            st["probe_started"] = now
+            return True
+
+    def check(self, name: str):
+        """allow() или ServerUnavailableError."""
+        if not self.allow(name):
+            raise ServerUnavailableError(name, self.kind, self.retry_in(name))
+
+    def record_success(self, name: str):
+        with self.lock:
+            st = self.states.get(name)
+            if st is None or (st["state"] == CLOSED and st["failures"] == 0):
+                return
+            if st["state"] != CLOSED:
+                logger.info(f"[breaker] {name} ({self.kind}): снова доступен")
+            del self.states[name]
+
+    def record_failure(self, name: str, error: str):
+        now = time.monotonic()
+        with self.lock:
+            st = self._state(name)
+            st["failures"] += 1
+            st["last_error"] = error[:200]
+            if st["state"] == HALF_OPEN:
+                st["backoff"] = min(st["backoff"] * 2, BREAKER_MAX_BACKOFF)
+            elif st["state"] == CLOSED and st["failures"] >= BREAKER_FAILURE_THRESHOLD:
+                st["backoff"] = BREAKER_BASE_BACKOFF
+            else:
+                return
+            st["state"] = OPEN
+            # Разброс ±10%: пробы к упавшим вместе серверам не совпадают по времени
+            st["retry_at"] = now + st["backoff"] * random.uniform(0.9, 1.1)
+            logger.warning(
+                f"[breaker] {name} ({self.kind}): недоступен ({st['failures']} ошибок подряд), "
+                f"следующая проба через {st['backoff']:.0f}с: {st['last_error']}"
+            )
+
+    def retry_in(self, name: str) -> float:
+        with self.lock:
+            st = self.states.get(name)
+            if st is None or st["state"] != OPEN:
+                return 0.0
+            return max(0.0, st["retry_at"] - time.monotonic())
+
+    def snapshot(self, name: str) -> dict:
+        """Состояние для API."""
+        now = time.monotonic()
+        with self.lock:
+            st = self.states.get(name)
+            if st is None:
+                return {"state": CLOSED, "failures": 0, "retry_in": None, "last_error": None}
+            return {
+                "state": st["state"],
+                "failures": st["failures"],
+                "retry_in": round(max(0.0, st["retry_at"] - now), 1) if st["state"] == OPEN else None,
+                "last_error": st["last_error"],
+            }
+
+    def open_names(self) -> list[str]:
+        with self.lock:
+            return sorted(name for name, st in self.states.items() if st["state"] != CLOSED)
+
+    def reset(self, name: str):
+        with self.lock:
+            self.states.pop(name, None)
+
+
+class ServerHealth:
+    def __init__(self):
+        self.pg = CircuitBreaker("pg")
+        self.ssh = CircuitBreaker("ssh")
+
+    def snapshot(self, name: str) -> dict:
+        return {"pg": self.pg.snapshot(name), "ssh": self.ssh.snapshot(name)}
+
+    def reset(self, name: str):
+        """Сбросить состояние (сервер изменён или удалён)."""
+        self.pg.reset(name)
+        self.ssh.reset(name)
+
+
+# Глобальное состояние доступности серверов
+server_health = ServerHealth()
@@ -0,0 +1,140 @@
+# app/services/server_registry.py
+"""
+Реестр серверов в памяти процесса.
+
+Проекция без учётных данных (ServerInfo) загружается целиком при старте и
+обновляется по строке при записи через API и по NOTIFY pam_servers (триггер
+на таблице servers), поэтому проверка существования и host/port — поиск в
+dict без обращения к БД. Пароли (pgp_sym_decrypt) расшифровываются лениво,
+при первом запросе сервера с учётными данными, и кэшируются до изменения
+строки.
+
+Расшифрованный Server кэшируется, только если его updated_at совпадает с
+текущей версией в реестре: данные, прочитанные до изменения строки, не
+переживут обновление, пришедшее во время расшифровки.
+"""
+import asyncio
+import logging
+
+from app.models import Server, ServerInfo
+from app.database.notify import notify_listener
+from app.database.repositories import server_repo
+from app.services.server_health import server_health
+
+logger = logging.getLogger(__name__)
+
+
+def _split(row: dict) -> tuple[dict, object]:
+    """Строка из server_repo -> (поля модели, версия строки)."""
+    row.pop("created_at", None)
+    return row, row.pop("updated_at", None)
+
+
+class ServerRegistry:
+    def __init__(self):
+        self._infos: dict[str, ServerInfo] = {}
+        self._versions: dict[str, object] = {}
+        self._servers: dict[str, Server] = {}
+        self._loaded = False
+        self._changed = asyncio.Event()
+        self._decrypt_lock = asyncio.Lock()
+        self._reload_lock = asyncio.Lock()
+        notify_listener.subscribe(server_repo.SERVERS_CHANNEL, self.refresh, on_reconnect=self.reload)
+
+    def names(self) -> list[str]:
+        return sorted(self._infos)
+
+    def changed_event(self) -> asyncio.Event:
+        """Событие, которое будет выставлено при следующем изменении списка серверов."""
+        return self._changed
+
+    def _notify(self):
+        event, self._changed = self._changed, asyncio.Event()
+        event.set()
+
+    async def _ensure_loaded(self):
+        if not self._loaded:
+            await self.reload()
+
+    async def reload(self):
+        """Перечитать проекцию всех серверов; расшифрованные данные изменённых строк сбрасываются."""
+        async with self._reload_lock:
+            infos, versions = {}, {}
+            for row in await server_repo.list_server_infos():
+                fields, version = _split(row)
+                infos[fields["name"]] = ServerInfo(**fields)
+                versions[fields["name"]] = version
+            self._servers = {
+                name: server for name, server in self._servers.items()
+                if name in versions and versions[name] == self._versions.get(name)
+            }
+            changed = infos != self._infos
+            self._infos, self._versions = infos, versions
+            self._loaded = True
+        if changed:
+            self._notify()
+
+    async def refresh(self, name: str):
+        """Перечитать один сервер (после записи или по NOTIFY)."""
+        if not self._loaded:
+            await self.reload()
+            return
+        rows = await server_repo.list_server_infos(name)
+        self._servers.pop(name, None)
+        # Изменённый сервер проверяется заново, без накопленной паузы
+        server_health.reset(name)
+        if rows:
+            fields, version = _split(rows[0])
+            self._infos[name] = ServerInfo(**fields)
+            self._versions[name] = version
+        else:
+            self._infos.pop(name, None)
+            self._versions.pop(name, None)
+        self._notify()
+
+    async def get_info(self, name: str) -> ServerInfo | None:
+        """Сервер без учётных данных (O(1), без обращения к БД)."""
+        await self._ensure_loaded()
+        return self._infos.get(name)
+
+    async def list_infos(self) -> list[ServerInfo]:
+        await self._ensure_loaded()
+        return [self._infos[name] for name in sorted(self._infos)]
+
+    async def get(self, name: str) -> Server | None:
+        """Сервер с расшифрованными учётными данными."""
+        servers = await self.list_servers([name])
+        return servers[0] if servers else None
+
+    async def list_servers(self, names: list[str] | None = None) -> list[Server]:
+        """Серверы (все или только names) с учётными данными; расшифровываются только отсутствующие в кэше."""
+        await self._ensure_loaded()
+        wanted = sorted(self._infos) if names is None else [n for n in names if n in self._infos]
+        found = {n: self._servers[n] for n in wanted if n in self._servers}
+        missing = [n for n in wanted if n not in found]
+        if missing:
+            async with self._decrypt_lock:
+                # Повторная проверка: пока ждали блокировку, их мог расшифровать другой запрос
+                found.update((n, self._servers[n]) for n in missing if n in self._servers)
+                missing = [n for n in missing if n not in found]
+                if missing:
+                    for row in await server_repo.list_servers(missing):
+                        fields, version = _split(row)
+                        server = Server(**fields)
+                        found[server.name] = server
+                        # Строка изменилась во время расшифровки — отдаём, но не кэшируем
+                        if version == self._versions.get(server.name):
+                            self._servers[server.name] = server
+        return [found[n] for n in wanted if n in found]
+
+    async def start(self):
+        """Начальная загрузка (после notify_listener.start())."""
+        try:
+            await self.reload()
+            logger.info(f"Реестр серверов загружен: {len(self._infos)}")
+        except Exception as e:
+            logger.error(f"Реестр серверов: ошибка начальной загрузки, повтор при первом обращении: {e}")
+
+
+# Глобальный реестр серверов
+server_registry = ServerRegistry()
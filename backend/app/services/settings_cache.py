@@ -0,0 +1,80 @@
+# app/services/settings_cache.py
+"""
+Кэш настроек из таблицы settings в памяти процесса.
+
+Чтение (get / get_int) не обращается к БД. Кэш перечитывается целиком по
+NOTIFY, который update_settings отправляет при изменении значений, — так
+изменения из API доходят и до отдельного процесса коллектора. Если
+LISTEN-соединение (notify_listener) было потеряно, кэш перечитывается после
+его восстановления.
+
+version увеличивается при каждом изменении; changed_event() возвращает
+событие, которое выставится при следующем изменении (планировщик по нему
+перепланирует ожидание при смене интервала).
+"""
+import asyncio
+import logging
+
+from app.database.notify import notify_listener
+from app.database.repositories import settings_repo
+
+logger = logging.getLogger(__name__)
+
+
+class SettingsCache:
+    def __init__(self):
+        self.values: dict[str, str] = {}
+        self.version = 0
+        self._changed = asyncio.Event()
+        self._reload_lock = asyncio.Lock()
+        notify_listener.subscribe(settings_repo.SETTINGS_CHANNEL, self._on_notify, on_reconnect=self.reload)
+
+    def get(self, key: str, default: str | None = None) -> str | None:
+        return self.values.get(key, default)
+
+    def get_int(self, key: str, default: int) -> int:
+        """Целочисленная настройка с fallback на default (как settings_repo.get_int_setting)."""
+        val = self.values.get(key)
+        if val is None:
+            return default
+        try:
+            return int(val)
+        except (ValueError, TypeError):
+            return default
+
+    def changed_event(self) -> asyncio.Event:
+        """Событие, которое будет выставлено при следующем изменении настроек."""
+        return self._changed
+
+    def apply(self, settings: dict[str, dict]):
+        """Применить снимок настроек ({key: {value, ...}} из settings_repo)."""
+        values = {key: row["value"] for key, row in settings.items()}
+        if values == self.values:
+            return
+        changed = sorted(k for k in values.keys() | self.values.keys() if values.get(k) != self.values.get(k))
+        self.values = values
+        self.version += 1
+        if self.version > 1:
+            logger.info(f"Настройки изменены (версия {self.version}): {', '.join(changed)}")
+        # Будим всех ожидающих и заводим событие для следующего изменения
+        event, self._changed = self._changed, asyncio.Event()
+        event.set()
+
+    async def reload(self):
+        async with self._reload_lock:
+            self.apply(await settings_repo.get_all_settings())
+
+    async def _on_notify(self, payload: str):
+        await self.reload()
+
+    async def start(self):
+        """Начальная загрузка (после notify_listener.start())."""
+        try:
+            await self.reload()
+            logger.info(f"Кэш настроек загружен: {len(self.values)} ключей")
+        except Exception as e:
+            logger.error(f"Кэш настроек: ошибка начальной загрузки, используются значения по умолчанию: {e}")
+
+
+# Глобальный кэш настроек
+settings_cache = SettingsCache()
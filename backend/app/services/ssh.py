@@ -8,6 +8,7 @@ import os
 import asyncio
 from app.models import Server
 from app.services.cache import cache_manager
+from app.services.server_health import server_health
 from app.config import SSH_CACHE_TTL
 
 logger = logging.getLogger(__name__)
@@ -112,42 +113,43 @@ def get_ssh_client(server: Server) -> paramiko.SSHClient:
     ssh.connect(**connect_kwargs)
     return ssh
 
-def get_ssh_disk_usage(server: Server, data_dir: str) -> tuple[int | None, int | None, str]:
-    """Получение информации о диске через SSH"""
-    cache_key = f"{server.host}:{server.ssh_port}"
-    
-    # Проверяем кэш
-    cache_manager.clear_cache(cache_manager.ssh_cache, cache_manager.ssh_cache_lock, SSH_CACHE_TTL)
-    
-    cached_data = cache_manager.get_ssh_cache(cache_key)
-    if cached_data:
-        logger.debug(f"Использование SSH кэша для {server.name}")
-        return cached_data["free_space"], cached_data["total_space"], "cached"
-    
-    # Если не в кэше, получаем данные
-    if not is_host_reachable(server.host, server.ssh_port):
-        logger.warning(f"SSH недоступен для {server.name}")
-        return None, None, "unreachable"
-    
-    ssh = None
+def _get_mount_point(data_dir: str) -> tuple[str | None, str | None]:
+    """Точка монтирования из data_directory с валидацией (защита от command injection).
+    Возвращает (mount_point, None) или (None, причина_ошибки)."""
+    mount_point = data_dir.split('/DB')[0] if '/DB' in data_dir else data_dir
+    if not mount_point or not mount_point.startswith('/') or '..' in mount_point:
+        return None, "invalid mount point"
+    if not re.match(r'^[a-zA-Z0-9/_.-]+$', mount_point):
+        return None, "invalid mount point characters"
+    return mount_point, None
+
+
+def _unavailable_status(server: Server) -> str:
+    return f"unavailable (retry in {server_health.ssh.retry_in(server.name):.0f}s)"
+
+
+def ssh_df(server: Server, data_dir: str, timeout: float = 10) -> tuple[int | None, int | None, str]:
+    """Выполнить df -B1 по постоянной SSH-сессии и вернуть (free, total, status)."""
+    if not server_health.ssh.allow(server.name):
+        return None, None, _unavailable_status(server)
+    return _ssh_df(server, data_dir, timeout)
+
+
+def _ssh_df(server: Server, data_dir: str, timeout: float) -> tuple[int | None, int | None, str]:
+    """df без проверки circuit breaker (вызывающий уже получил allow())."""
+    # Ленивый импорт: ssh_pool импортирует get_ssh_client из этого модуля
+    from app.services.ssh_pool import ssh_pool
+
+    mount_point, error = _get_mount_point(data_dir)
+    if error:
+        logger.warning(f"Невалидный mount_point для {server.name}: {data_dir}")
+        return None, None, error
+
     try:
-        logger.debug(f"SSH подключение к {server.name}")
-        ssh = get_ssh_client(server)
-
-        # Извлекаем точку монтирования и валидируем (защита от command injection)
-        mount_point = data_dir.split('/DB')[0] if '/DB' in data_dir else data_dir
-        if not mount_point or not mount_point.startswith('/') or '..' in mount_point:
-            logger.warning(f"Невалидный mount_point для {server.name}: {mount_point}")
-            return None, None, "invalid mount point"
-        # Удаляем опасные символы
-        if not re.match(r'^[a-zA-Z0-9/_.-]+$', mount_point):
-            logger.warning(f"Подозрительный mount_point для {server.name}: {mount_point}")
-            return None, None, "invalid mount point characters"
-
-        cmd = f"df -B1 {mount_point}"
-        stdin, stdout, stderr = ssh.exec_command(cmd, timeout=5)
-        df_output = stdout.read().decode().strip().splitlines()
-        error_output = stderr.read().decode().strip()
+        _exit_status, stdout, stderr = ssh_pool.exec_command(server, f"df -B1 {mount_point}", timeout=timeout)
+        server_health.ssh.record_success(server.name)
+        df_output = stdout.strip().splitlines()
+        error_output = stderr.strip()
 
         if error_output:
             logger.warning(f"Ошибка df для {server.name}: {error_output}")
@@ -158,27 +160,54 @@ def get_ssh_disk_usage(server: Server, data_dir: str) -> tuple[int | None, int |
             if len(columns) >= 4:
                 total_space = int(columns[1])
                 free_space = int(columns[3])
-
-                # Сохраняем в кэш
-                cache_manager.set_ssh_cache(cache_key, {
-                    "free_space": free_space,
-                    "total_space": total_space
-                })
-
-                logger.debug(f"SSH данные получены для {server.name}")
                 return free_space, total_space, "ok"
 
+        logger.warning(f"Неожиданный вывод df для {server.name}: {df_output}")
         return None, None, "invalid df output"
 
     except socket.timeout:
         logger.error(f"SSH таймаут для {server.name}")
+        server_health.ssh.record_failure(server.name, "timeout")
         return None, None, "timeout"
     except paramiko.AuthenticationException:
         logger.error(f"SSH ошибка аутентификации для {server.name}")
+        server_health.ssh.record_success(server.name)
         return None, None, "authentication failed"
     except Exception as e:
         logger.error(f"SSH ошибка для {server.name}: {e}")
+        if isinstance(e, (OSError, EOFError, paramiko.SSHException)):
+            server_health.ssh.record_failure(server.name, str(e) or type(e).__name__)
         return None, None, str(e)
-    finally:
-        if ssh:
-            ssh.close()
+
+
+def get_ssh_disk_usage(server: Server, data_dir: str) -> tuple[int | None, int | None, str]:
+    """Получение информации о диске через SSH"""
+    from app.services.ssh_pool import ssh_pool
+
+    cache_key = f"{server.host}:{server.ssh_port}"
+    
+    # Проверяем кэш
+    cache_manager.clear_cache(cache_manager.ssh_cache, cache_manager.ssh_cache_lock, SSH_CACHE_TTL)
+    
+    cached_data = cache_manager.get_ssh_cache(cache_key)
+    if cached_data:
+        logger.debug(f"Использование SSH кэша для {server.name}")
+        return cached_data["free_space"], cached_data["total_space"], "cached"
+    
+    if not server_health.ssh.allow(server.name):
+        return None, None, _unavailable_status(server)
+
+    # Если не в кэше и нет живой сессии — быстрая проверка доступности перед подключением
+    if not ssh_pool.has_session(server) and not is_host_reachable(server.host, server.ssh_port):
+        logger.warning(f"SSH недоступен для {server.name}")
+        server_health.ssh.record_failure(server.name, "unreachable")
+        return None, None, "unreachable"
+
+    free_space, total_space, status = _ssh_df(server, data_dir, timeout=5)
+    if status == "ok":
+        cache_manager.set_ssh_cache(cache_key, {
+            "free_space": free_space,
+            "total_space": total_space
+        })
+        logger.debug(f"SSH данные получены для {server.name}")
+    return free_space, total_space, status
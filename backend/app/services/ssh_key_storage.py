@@ -1,5 +1,6 @@
 # app/services/ssh_key_storage.py
 """Управление SSH-ключами через PostgreSQL."""
+import asyncio
 import uuid
 import logging
 from datetime import datetime, timezone
@@ -42,14 +43,15 @@ async def create_key(key_create: SSHKeyCreate, created_by: str) -> SSHKey:
     """Сгенерировать новый SSH-ключ."""
     key_id = str(uuid.uuid4())
 
-    # Generate key pair
+    # Generate key pair (генерация RSA — до секунд CPU, вне event loop)
     if key_create.key_type == SSHKeyType.RSA:
-        private_key_pem, public_key_str, fingerprint = SSHKeyManager.generate_ssh_key_pair(
+        private_key_pem, public_key_str, fingerprint = await asyncio.to_thread(
+            SSHKeyManager.generate_ssh_key_pair,
             key_type="rsa", key_size=key_create.key_size or 2048, passphrase=key_create.passphrase
         )
     else:
-        private_key_pem, public_key_str, fingerprint = SSHKeyManager.generate_ssh_key_pair(
-            key_type="ed25519", passphrase=key_create.passphrase
+        private_key_pem, public_key_str, fingerprint = await asyncio.to_thread(
+            SSHKeyManager.generate_ssh_key_pair, key_type="ed25519", passphrase=key_create.passphrase
         )
 
     data = await ssh_key_repo.create_key(
@@ -64,9 +66,9 @@ async def create_key(key_create: SSHKeyCreate, created_by: str) -> SSHKey:
 
 async def import_key(key_import: SSHKeyImport, created_by: str) -> SSHKey:
     """Импортировать существующий SSH-ключ."""
-    # Validate key
-    is_valid, error_msg, fingerprint = SSHKeyManager.validate_private_key(
-        key_import.private_key, key_import.passphrase
+    # Validate key (расшифровка ключа с passphrase — bcrypt KDF, вне event loop)
+    is_valid, error_msg, fingerprint = await asyncio.to_thread(
+        SSHKeyManager.validate_private_key, key_import.private_key, key_import.passphrase
     )
     if not is_valid:
         raise ValueError(f"Невалидный приватный ключ: {error_msg}")
@@ -75,8 +77,8 @@ async def import_key(key_import: SSHKeyImport, created_by: str) -> SSHKey:
     key_type = _detect_key_type(key_import.private_key)
 
     # Get public key
-    public_key = SSHKeyManager.get_public_key_from_private(
-        key_import.private_key, key_import.passphrase
+    public_key = await asyncio.to_thread(
+        SSHKeyManager.get_public_key_from_private, key_import.private_key, key_import.passphrase
     )
     if not public_key:
         raise ValueError("Не удалось извлечь публичный ключ")
@@ -0,0 +1,225 @@
+# app/services/ssh_pool.py
+"""
+Пул постоянных SSH-сессий к мониторируемым серверам.
+
+Раньше каждый df -B1 открывал новый SSHClient (TCP + key exchange + auth)
+и сразу его закрывал. Теперь на ключ (host, ssh_port, ssh_user) держится одна
+живая paramiko.Transport с keepalive, а команды выполняются в новых каналах
+поверх неё. Неиспользуемые сессии закрываются по idle-таймауту, число сессий
+ограничено SSH_POOL_MAX_SESSIONS.
+
+Все методы синхронные и потокобезопасные — вызываются из thread executor.
+"""
+import socket
+import threading
+import time
+import logging
+
+import paramiko
+
+from app.models import Server
+from app.config import SSH_POOL_MAX_SESSIONS, SSH_POOL_IDLE_TIMEOUT, SSH_KEEPALIVE_INTERVAL
+from app.services.ssh import get_ssh_client
+from app.metrics import SSH_COMMAND_SECONDS
+
+logger = logging.getLogger(__name__)
+
+REAP_INTERVAL = 60  # как часто (не чаще) проверять idle-сессии при обращении к пулу
+
+# Ошибки, после которых сессию считаем мёртвой и переподключаемся
+_SESSION_ERRORS = (paramiko.SSHException, EOFError, socket.error)
+
+
+class SSHPoolExhausted(Exception):
+    """Достигнут лимит сессий, и все они заняты выполнением команд."""
+
+
+class _Session:
+    def __init__(self, client: paramiko.SSHClient):
+        self.client = client
+        self.transport: paramiko.Transport = client.get_transport()
+        self.created = time.time()
+        self.last_used = self.created
+        self.in_use = 0
+
+    def is_healthy(self) -> bool:
+        t = self.transport
+        return t is not None and t.is_active() and t.is_authenticated()
+
+    def close(self):
+        try:
+            self.client.close()
+        except Exception:
+            pass
+
+
+class SSHSessionPool:
+    def __init__(
+        self,
+        max_sessions: int = SSH_POOL_MAX_SESSIONS,
+        idle_timeout: int = SSH_POOL_IDLE_TIMEOUT,
+        keepalive: int = SSH_KEEPALIVE_INTERVAL,
+    ):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.keepalive = keepalive
+        self.sessions: dict[tuple, _Session] = {}
+        self.lock = threading.Lock()
+        # Блокировки на ключ: параллельные запросы к одному серверу не открывают две сессии
+        self._connect_locks: dict[tuple, threading.Lock] = {}
+        self._last_reap = time.time()
+
+    @staticmethod
+    def get_key(server: Server) -> tuple:
+        return (server.host, server.ssh_port, server.ssh_user)
+
+    def has_session(self, server: Server) -> bool:
+        """Есть ли живая сессия к серверу."""
+        with self.lock:
+            session = self.sessions.get(self.get_key(server))
+            return session is not None and session.is_healthy()
+
+    def _acquire(self, server: Server) -> _Session:
+        """Получить живую сессию для сервера (создать при необходимости) и пометить занятой."""
+        key = self.get_key(server)
+        if time.time() - self._last_reap > REAP_INTERVAL:
+            self.reap_idle()
+        with self.lock:
+            connect_lock = self._connect_locks.setdefault(key, threading.Lock())
+
+        with connect_lock:
+            with self.lock:
+                session = self.sessions.get(key)
+                if session is not None and session.is_healthy():
+                    session.in_use += 1
+                    session.last_used = time.time()
+                    return session
+                if session is not None:
+                    logger.info(f"SSH сессия к {server.name} неактивна, переподключение")
+                    del self.sessions[key]
+                stale = [session] if session is not None else []
+                stale += self._evict_for_new_locked()
+
+            for s in stale:
+                s.close()
+
+            logger.debug(f"Новая SSH сессия к {server.name} ({key[0]}:{key[1]})")
+            client = get_ssh_client(server)
+            session = _Session(client)
+            session.transport.set_keepalive(self.keepalive)
+            with self.lock:
+                self.sessions[key] = session
+                session.in_use += 1
+            return session
+
+    def _evict_for_new_locked(self) -> list[_Session]:
+        """Освободить место под новую сессию: закрыть самую давно неиспользуемую свободную."""
+        if len(self.sessions) < self.max_sessions:
+            return []
+        idle = [(s.last_used, k) for k, s in self.sessions.items() if s.in_use == 0]
+        if not idle:
+            raise SSHPoolExhausted(f"Достигнут лимит SSH-сессий ({self.max_sessions})")
+        _, key = min(idle)
+        return [self.sessions.pop(key)]
+
+    def _release(self, session: _Session):
+        with self.lock:
+            session.in_use -= 1
+            session.last_used = time.time()
+
+    def _discard(self, server: Server, session: _Session):
+        key = self.get_key(server)
+        with self.lock:
+            if self.sessions.get(key) is session:
+                del self.sessions[key]
+        session.close()
+
+    def exec_command(self, server: Server, command: str, timeout: float = 10) -> tuple[int, str, str]:
+        """
+        Выполнить команду в новом канале поверх постоянной сессии.
+
+        Возвращает (exit_status, stdout, stderr). Если сессия оказалась
+        мёртвой, выполняется одна повторная попытка на свежем подключении.
+        """
+        with SSH_COMMAND_SECONDS.time(server.name):
+            return self._exec_command(server, command, timeout)
+
+    def _exec_command(self, server: Server, command: str, timeout: float) -> tuple[int, str, str]:
+        for attempt in (1, 2):
+            session = self._acquire(server)
+            try:
+                channel = session.transport.open_session(timeout=timeout)
+            except _SESSION_ERRORS as e:
+                self._release(session)
+                self._discard(server, session)
+                if attempt == 2:
+                    raise
+                logger.info(f"SSH канал к {server.name} не открылся ({e}), новая сессия")
+                continue
+
+            try:
+                channel.settimeout(timeout)
+                channel.exec_command(command)
+                stdout = channel.makefile("rb").read().decode()
+                stderr = channel.makefile_stderr("rb").read().decode()
+                exit_status = channel.recv_exit_status()
+                return exit_status, stdout, stderr
+            except _SESSION_ERRORS:
+                # Команда могла зависнуть на полпути — сессию не переиспользуем
+                self._release(session)
+                self._discard(server, session)
+                session = None
+                raise
+            finally:
+                channel.close()
+                if session is not None:
+                    self._release(session)
+        raise RuntimeError("unreachable")
+
+    def reap_idle(self) -> int:
+        """Закрыть сессии, не использовавшиеся дольше idle_timeout, и мёртвые."""
+        now = time.time()
+        self._last_reap = now
+        with self.lock:
+            expired = [
+                k for k, s in self.sessions.items()
+                if s.in_use == 0 and (now - s.last_used > self.idle_timeout or not s.is_healthy())
+            ]
+            sessions = [self.sessions.pop(k) for k in expired]
+        for s in sessions:
+            s.close()
+        if sessions:
+            logger.info(f"Закрыто неактивных SSH-сессий: {len(sessions)}")
+        return len(sessions)
+
+    def close(self, server: Server):
+        """Закрыть сессию сервера (при изменении или удалении сервера)."""
+        with self.lock:
+            session = self.sessions.pop(self.get_key(server), None)
+        if session is not None:
+            session.close()
+
+    def close_all(self):
+        with self.lock:
+            sessions = list(self.sessions.values())
+            self.sessions.clear()
+        logger.info(f"Закрытие всех SSH-сессий ({len(sessions)})")
+        for s in sessions:
+            s.close()
+
+    def get_status(self) -> dict:
+        now = time.time()
+        with self.lock:
+            return {
+                f"{k[2]}@{k[0]}:{k[1]}": {
+                    "active": s.is_healthy(),
+                    "in_use": s.in_use,
+                    "age": round(now - s.created),
+                    "idle": round(now - s.last_used),
+                }
+                for k, s in self.sessions.items()
+            }
+
+
+# Глобальный пул SSH-сессий
+ssh_pool = SSHSessionPool()
@@ -8,18 +8,25 @@ from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 import asyncio
 import logging
+import time
 import uvicorn
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
-from app.config import ALLOWED_ORIGINS, LOG_LEVEL
-from app.api import auth_router, servers_router, health_router, stats_router, users_router, audit_router, settings_router, logs_router
-from app.database import db_pool
+from app.config import ALLOWED_ORIGINS, LOG_LEVEL, COLLECTOR_MODE, LOOP_BLOCK_WARN_MS
+from app.api import auth_router, servers_router, health_router, stats_router, users_router, audit_router, settings_router, logs_router, metrics_router
+from app.database import db_pool, remote_pool
 from app.database.local_db import init_pool, close_pool
 from app.api.ssh_keys import router as ssh_keys_router
 from app.auth.blacklist import token_blacklist
-from app.services import audit_logger
+from app.services import audit_logger, remote_access
+from app.services.ssh_pool import ssh_pool
+from app.database.notify import notify_listener
+from app.services.settings_cache import settings_cache
+from app.services.server_registry import server_registry
 from app.collector.scheduler import start_collector, stop_collector
+from app.metrics import HTTP_REQUEST_SECONDS
+from app.loop_watchdog import LoopWatchdog
 
 # Rate limiter
 limiter = Limiter(key_func=get_remote_address)
@@ -47,16 +54,32 @@ async def lifespan(app: FastAPI):
     logger.info("PostgreSQL Activity Monitor API v3.0")
     logger.info(f"Уровень логирования: {LOG_LEVEL}")
     logger.info("=" * 60)
+    watchdog = LoopWatchdog(LOOP_BLOCK_WARN_MS) if LOOP_BLOCK_WARN_MS else None
+    if watchdog:
+        watchdog.start()
     await init_pool()
-    collector_tasks = await start_collector()
+    await notify_listener.start()
+    await settings_cache.start()
+    await server_registry.start()
+    if COLLECTOR_MODE == "embedded":
+        collector_tasks = await start_collector()
+    else:
+        collector_tasks = []
+        logger.info("COLLECTOR_MODE=external: коллектор работает отдельным процессом (python -m app.collector)")
     cleanup_task = asyncio.create_task(cleanup_blacklist())
     yield
     # Shutdown
     cleanup_task.cancel()
     await stop_collector(collector_tasks)
     logger.info("Завершение работы PostgreSQL Activity Monitor API...")
+    await notify_listener.stop()
     await close_pool()
     db_pool.close_all()
+    await remote_pool.close_all()
+    ssh_pool.close_all()
+    remote_access.shutdown()
+    if watchdog:
+        await watchdog.stop()
     logger.info("Все ресурсы освобождены. До свидания!")
 
 # Создание приложения
@@ -77,6 +100,23 @@ async def rate_limit_handler(request: Request, exc: RateLimitExceeded):
         content={"detail": "Слишком много запросов. Попробуйте позже."}
     )
 
+# Латентность запросов по шаблону маршрута (/api/server/{server_name}/stats), а не по URL
+@app.middleware("http")
+async def http_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status = "500"
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+        return response
+    finally:
+        route = request.scope.get("route")
+        path = route.path if route else "unmatched"
+        # Новые версии FastAPI отдают путь маршрута без префикса включающего роутера
+        if route and request.url.path.startswith(api_router.prefix + "/") and not path.startswith(api_router.prefix):
+            path = api_router.prefix + path
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, request.method, path, status)
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -97,6 +137,7 @@ api_router.include_router(ssh_keys_router, tags=["ssh-keys"])
 api_router.include_router(audit_router, tags=["audit"])
 api_router.include_router(settings_router, tags=["settings"])
 api_router.include_router(logs_router, tags=["logs"])
+api_router.include_router(metrics_router)
 app.include_router(api_router)
 
 # Корневой маршрут
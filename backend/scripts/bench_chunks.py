@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк сжатого хранения закрытых месяцев: партиция statistics (heap +
+индекс) против чанков statistics_chunks (см. app/database/chunks.py).
+
+Для партиции закрытого месяца (по умолчанию — последней непустой) измеряет
+размер и чтение сырых сэмплов одного ряда за сутки и за месяц, затем
+упаковывает партицию и повторяет замеры по чанкам (выборка + декодирование).
+Всё выполняется в одной транзакции, которая откатывается — данные не
+меняются, но партиция на время замера заблокирована для записи.
+
+Использование:
+    cd /home/pgmonitor/pg_activity_monitor/backend
+    source venv/bin/activate
+    python scripts/bench_chunks.py [--partition statistics_2025_09] [--iterations 20] \\
+        [--output chunks.json]
+"""
+import sys
+import os
+import argparse
+import asyncio
+import json
+import logging
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+# Добавляем путь к backend
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import local_db, chunks
+
+logging.basicConfig(
+    stream=sys.stderr,
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+_HEAP_READ = """
+    SELECT ts, numbackends, xact_commit FROM statistics
+    WHERE series_id = $1 AND ts BETWEEN $2 AND $3
+"""
+
+
+async def _pick_partition(conn, name: str | None) -> str | None:
+    if name:
+        return name
+    now = datetime.now(timezone.utc)
+    current = f"statistics_{now.year}_{now.month:02d}"
+    for row in await conn.fetch("""
+        SELECT relname FROM pg_class
+        WHERE relname ~ '^statistics_\\d{4}_\\d{2}$' AND relkind = 'r'
+        ORDER BY relname DESC;
+    """):
+        if row["relname"] < current and await conn.fetchval(f"SELECT EXISTS (SELECT 1 FROM {row['relname']})"):
+            return row["relname"]
+    return None
+
+
+def _percentiles(timings: list[float]) -> dict:
+    timings = sorted(timings)
+    return {
+        "p50_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(timings[max(0, int(len(timings) * 0.95) - 1)], 2),
+    }
+
+
+async def _reads(windows: list[tuple], read) -> dict:
+    """Прогнать чтения окон (series_id, start, end); число строк и p50/p95."""
+    timings = []
+    rows = 0
+    for series_id, start, end in windows:
+        started = time.perf_counter()
+        rows += await read(series_id, start, end)
+        timings.append((time.perf_counter() - started) * 1000)
+    return {"rows": rows, **_percentiles(timings)}
+
+
+async def bench(args) -> dict:
+    await local_db.init_pool()
+    pool = local_db.get_pool()
+    rng = random.Random(args.seed)
+    async with pool.acquire() as conn:
+        name = await _pick_partition(conn, args.partition)
+        if not name:
+            raise SystemExit("Нет непустой партиции statistics закрытого месяца (см. scripts/gen_history.py)")
+        _, year, month = name.split("_")
+        start = datetime(int(year), int(month), 1, tzinfo=timezone.utc)
+        end = datetime(start.year + start.month // 12, start.month % 12 + 1, 1, tzinfo=timezone.utc)
+        days = (end - start).days
+
+        tr = conn.transaction()
+        await tr.start()
+        try:
+            series_ids = [r[0] for r in await conn.fetch(f"SELECT DISTINCT series_id FROM {name}")]
+            rows = await conn.fetchval(f"SELECT COUNT(*) FROM {name}")
+            heap_bytes = await conn.fetchval(f"SELECT pg_total_relation_size('{name}')")
+            windows = {
+                "day": [
+                    (sid, start + timedelta(days=d), start + timedelta(days=d + 1))
+                    for sid, d in ((rng.choice(series_ids), rng.randrange(days)) for _ in range(args.iterations))
+                ],
+                "month": [(rng.choice(series_ids), start, end) for _ in range(args.iterations)],
+            }
+            logger.info("=" * 60)
+            logger.info(f"Партиция {name}: {rows:,} строк, {len(series_ids)} рядов, {heap_bytes / 1048576:.1f} МБ")
+            logger.info("=" * 60)
+
+            async def heap_read(series_id, lo, hi):
+                return len(await conn.fetch(_HEAP_READ, series_id, lo, hi))
+
+            async def chunk_read(series_id, lo, hi):
+                columns = await chunks.fetch_columns(conn, "series_id = $1", (series_id,), lo, hi)
+                return len(columns[0])
+
+            heap = {window: await _reads(w, heap_read) for window, w in windows.items()}
+
+            chunk_bytes_before = await conn.fetchval(f"SELECT pg_total_relation_size('{chunks.CHUNK_TABLE}')")
+            started = time.perf_counter()
+            packed, _ = await chunks.compress_partition(conn, name, start, end, rebuild=False)
+            encode_s = time.perf_counter() - started
+            chunk_bytes = await conn.fetchval(f"SELECT pg_total_relation_size('{chunks.CHUNK_TABLE}')") - chunk_bytes_before
+            payload = await conn.fetchval(
+                f"SELECT SUM(pg_column_size(data)) FROM {chunks.CHUNK_TABLE} WHERE day >= $1 AND day < $2",
+                start.date(), end.date(),
+            )
+
+            chunked = {window: await _reads(w, chunk_read) for window, w in windows.items()}
+        finally:
+            await tr.rollback()
+    await local_db.close_pool()
+
+    report = {
+        "partition": name,
+        "rows": rows,
+        "series": len(series_ids),
+        "heap_bytes": heap_bytes,
+        "chunk_bytes": chunk_bytes,
+        "chunk_payload_bytes": payload,
+        "chunks": packed,
+        "bytes_per_row": {"heap": round(heap_bytes / rows, 1), "chunks": round(chunk_bytes / rows, 1)},
+        "ratio": round(heap_bytes / chunk_bytes, 1) if chunk_bytes else None,
+        "pack_rows_per_s": round(rows / encode_s),
+        "reads": {window: {"heap": heap[window], "chunks": chunked[window]} for window in windows},
+    }
+    logger.info(
+        f"  Размер: heap {heap_bytes / 1048576:.1f} МБ ({report['bytes_per_row']['heap']} Б/строку), "
+        f"чанки {chunk_bytes / 1048576:.2f} МБ ({report['bytes_per_row']['chunks']} Б/строку), x{report['ratio']}"
+    )
+    logger.info(f"  Упаковка: {rows:,} строк за {encode_s:.1f} с ({report['pack_rows_per_s']:,} строк/с)")
+    for window in windows:
+        h, c = heap[window], chunked[window]
+        logger.info(
+            f"  Ряд за {window:<5}  heap p50 {h['p50_ms']:7.2f} мс  чанки p50 {c['p50_ms']:7.2f} мс  "
+            f"(строк {h['rows']:,} / {c['rows']:,})"
+        )
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк чанков закрытых месяцев против heap-партиций")
+    parser.add_argument("--partition", help="Партиция statistics_YYYY_MM (по умолчанию последняя закрытая непустая)")
+    parser.add_argument("--iterations", type=int, default=20, help="Чтений на окно")
+    parser.add_argument("--seed", type=int, default=1, help="Seed выбора рядов и суток")
+    parser.add_argument("--output", help="Файл для JSON-отчёта (по умолчанию stdout)")
+    args = parser.parse_args()
+
+    report = asyncio.run(bench(args))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        logger.info(f"Отчёт: {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный прогон коллектора на симулированном парке серверов.
+
+Удалённые серверы заменяются фейковым драйвером: RemotePool.get_pool отдаёт
+пул фейковых соединений, SSHSessionPool.exec_command — фейковый df. Задержка,
+разброс и доля отказов задаются параметрами. Всё остальное настоящее:
+circuit breaker, remote_pool.acquire, thread executor для SSH, очередь
+записи и COPY в локальную pam_stats.
+
+Прогоняются sync_server_db_info, collect_server_stats и collect_server_sizes
+по всем серверам с ограничением параллельности, как у планировщика. На
+каждую задачу замеряются время цикла (и дозаписи очереди), длительность
+опроса сервера, пиковое число потоков, соединений и RSS, максимальная
+задержка event loop. Отчёт — JSON (stdout или --output), логи — в stderr.
+
+Данные серверов bench_fleet_* удаляются из pam_stats после прогона.
+
+Использование:
+    cd /home/pgmonitor/pg_activity_monitor/backend
+    source venv/bin/activate
+    python scripts/bench_fleet.py [--servers 500] [--databases 100] [--latency-ms 5] [--jitter-ms 2] \\
+        [--failure-rate 0.01] [--ssh-latency-ms 20] [--cycles 1] [--output fleet.json]
+"""
+import sys
+import os
+import argparse
+import asyncio
+import json
+import logging
+import random
+import resource
+import statistics
+import threading
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+# Добавляем путь к backend
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import COLLECTOR_MAX_CONCURRENCY, POOL_CONFIGS
+from app.models import Server
+from app.database import local_db, series
+from app.database.remote_pool import remote_pool
+from app.services.ssh_pool import ssh_pool
+from app.services.server_health import ServerUnavailableError
+from app.collector.ingest import ingest_buffer
+from app.collector.tasks import collect_server_stats, collect_server_sizes, sync_server_db_info
+
+logging.basicConfig(
+    stream=sys.stderr,
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+SERVER_PREFIX = "bench_fleet_"
+DATA_DIR = "/var/lib/pgsql/data"
+DF_OUTPUT = (
+    "Filesystem     1B-blocks         Used    Available Use% Mounted on\n"
+    "/dev/sdb1  536870912000 107374182400 429496729600  20% /var/lib/pgsql\n"
+)
+
+TASKS = {
+    "db_info": sync_server_db_info,
+    "stats": collect_server_stats,
+    "sizes": collect_server_sizes,
+}
+
+
+# --------------------------------------------------------------------------- #
+#  Фейковый драйвер
+# --------------------------------------------------------------------------- #
+
+class FakeFleet:
+    """Парк серверов: задержки, отказы и учёт одновременных соединений."""
+
+    def __init__(self, args):
+        self.databases = [f"db_{d:03d}" for d in range(args.databases)]
+        self.latency = args.latency_ms / 1000
+        self.jitter = args.jitter_ms / 1000
+        self.failure_rate = args.failure_rate
+        self.ssh_latency = args.ssh_latency_ms / 1000
+        self.ssh_failure_rate = args.ssh_failure_rate
+        self.pools: dict[str, "FakePool"] = {}
+        self.connections = 0
+        self.ssh_commands = 0
+        self.queries = 0
+        self.lock = threading.Lock()  # счётчики SSH меняются из потоков executor
+        self.reset_peaks()
+
+    def reset_peaks(self):
+        self.peak_connections = self.connections
+        self.peak_ssh = self.ssh_commands
+
+    def delay(self, base: float) -> float:
+        return max(0.0, base + random.uniform(-self.jitter, self.jitter))
+
+    async def get_pool(self, server: Server, db_name: str = None) -> "FakePool":
+        key = remote_pool.get_pool_key(server, db_name)
+        pool = self.pools.get(key)
+        if pool is None:
+            pool = self.pools[key] = FakePool(self, POOL_CONFIGS["default"]["maxconn"])
+        return pool
+
+    def exec_command(self, server: Server, command: str, timeout: float = 10) -> tuple[int, str, str]:
+        with self.lock:
+            self.ssh_commands += 1
+            self.peak_ssh = max(self.peak_ssh, self.ssh_commands)
+        try:
+            time.sleep(self.delay(self.ssh_latency))
+            if random.random() < self.ssh_failure_rate:
+                raise OSError("simulated ssh failure")
+            return 0, DF_OUTPUT, ""
+        finally:
+            with self.lock:
+                self.ssh_commands -= 1
+
+
+class FakePool:
+    def __init__(self, fleet: FakeFleet, size: int):
+        self.fleet = fleet
+        self._slots = asyncio.Semaphore(size)
+
+    @asynccontextmanager
+    async def acquire(self):
+        async with self._slots:
+            fleet = self.fleet
+            if random.random() < fleet.failure_rate:
+                await asyncio.sleep(fleet.delay(fleet.latency))
+                raise ConnectionRefusedError("simulated connection failure")
+            fleet.connections += 1
+            fleet.peak_connections = max(fleet.peak_connections, fleet.connections)
+            try:
+                yield FakeConnection(fleet)
+            finally:
+                fleet.connections -= 1
+
+
+class FakeConnection:
+    """Ответы на запросы app.collector.tasks по тексту запроса."""
+
+    def __init__(self, fleet: FakeFleet):
+        self.fleet = fleet
+
+    async def _round_trip(self):
+        self.fleet.queries += 1
+        await asyncio.sleep(self.fleet.delay(self.fleet.latency))
+
+    def is_closed(self) -> bool:
+        return False
+
+    async def execute(self, query: str, *args, timeout: float = None) -> str:
+        await self._round_trip()
+        return "SET"
+
+    async def fetchval(self, query: str, *args, timeout: float = None):
+        await self._round_trip()
+        if "data_directory" in query:
+            return DATA_DIR
+        if "pg_database_size" in query:
+            return 10 ** 9 + self.fleet.databases.index(args[0]) * 4096
+        return 1
+
+    async def fetch(self, query: str, *args, timeout: float = None) -> list[dict]:
+        await self._round_trip()
+        dbs = self.fleet.databases
+        if "pg_stat_database" in query:
+            now = int(time.time())
+            return [{"datname": d, "numbackends": i % 17, "xact_commit": now + i} for i, d in enumerate(dbs)]
+        if "oid" in query:
+            return [{"datname": d, "oid": 16384 + i, "creation_time": None} for i, d in enumerate(dbs)]
+        return [{"datname": d} for d in dbs]
+
+
+# --------------------------------------------------------------------------- #
+#  Замеры
+# --------------------------------------------------------------------------- #
+
+def _rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+
+
+class Sampler:
+    """Пиковые потоки и RSS (отдельный поток) и задержка event loop (задача в loop)."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._lag_task = None
+        self.reset()
+
+    def reset(self):
+        self.peak_threads = threading.active_count() - 1
+        self.peak_rss_mb = _rss_mb()
+        self.max_loop_lag = 0.0
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            # Сам сэмплер не считаем
+            self.peak_threads = max(self.peak_threads, threading.active_count() - 1)
+            self.peak_rss_mb = max(self.peak_rss_mb, _rss_mb())
+
+    async def _lag(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.max_loop_lag = max(self.max_loop_lag, loop.time() - expected)
+
+    def start(self):
+        self._thread.start()
+        self._lag_task = asyncio.create_task(self._lag())
+
+    async def stop(self):
+        self._stop.set()
+        self._lag_task.cancel()
+        await asyncio.gather(self._lag_task, return_exceptions=True)
+
+
+def _percentiles(values: list[float]) -> dict:
+    if not values:
+        return {"p50": None, "p95": None, "max": None}
+    values = sorted(values)
+    return {
+        "p50": round(statistics.median(values), 4),
+        "p95": round(values[max(0, int(len(values) * 0.95) - 1)], 4),
+        "max": round(values[-1], 4),
+    }
+
+
+async def run_cycle(name: str, servers: list[Server], concurrency: int, fleet: FakeFleet, sampler: Sampler) -> dict:
+    """Опросить все серверы одной задачей и дождаться записи очереди."""
+    func = TASKS[name]
+    semaphore = asyncio.Semaphore(concurrency)
+    durations: list[float] = []
+    counts = {"ok": 0, "errors": 0, "unavailable": 0, "rows": 0}
+
+    async def poll(server: Server):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                result = await func(server)
+            except ServerUnavailableError:
+                counts["unavailable"] += 1
+                return
+            durations.append(time.perf_counter() - started)
+            counts["errors" if result.get("errors") else "ok"] += 1
+            counts["rows"] += result.get("queued", 0)
+
+    fleet.reset_peaks()
+    sampler.reset()
+    written_before = ingest_buffer.metrics["written"]
+    queries_before = fleet.queries
+    pool = local_db.get_pool()
+    peak_local = pool.get_size() - pool.get_idle_size()
+
+    async def watch_local_pool():
+        nonlocal peak_local
+        while True:
+            peak_local = max(peak_local, pool.get_size() - pool.get_idle_size())
+            await asyncio.sleep(sampler.interval)
+
+    watcher = asyncio.create_task(watch_local_pool())
+    started = time.perf_counter()
+    await asyncio.gather(*(poll(s) for s in servers))
+    cycle = time.perf_counter() - started
+    await ingest_buffer.flush()
+    total = time.perf_counter() - started
+    watcher.cancel()
+    await asyncio.gather(watcher, return_exceptions=True)
+
+    report = {
+        "task": name,
+        "servers": len(servers),
+        **counts,
+        "rows_written": ingest_buffer.metrics["written"] - written_before,
+        "remote_queries": fleet.queries - queries_before,
+        "cycle_seconds": round(cycle, 3),
+        "drain_seconds": round(total - cycle, 3),
+        "server_seconds": _percentiles(durations),
+        "peak_threads": sampler.peak_threads,
+        "peak_remote_connections": fleet.peak_connections,
+        "peak_ssh_commands": fleet.peak_ssh,
+        "peak_local_connections": peak_local,
+        "peak_rss_mb": round(sampler.peak_rss_mb, 1),
+        "max_loop_lag_ms": round(sampler.max_loop_lag * 1000, 1),
+    }
+    logger.info(
+        f"  {name:<8} цикл {cycle:8.2f} с  дозапись {total - cycle:6.2f} с  "
+        f"ok {counts['ok']}  ошибок {counts['errors']}  недоступно {counts['unavailable']}  "
+        f"потоков {sampler.peak_threads}  соединений {fleet.peak_connections}  RSS {sampler.peak_rss_mb:.0f} МБ"
+    )
+    return report
+
+
+async def cleanup():
+    pattern = SERVER_PREFIX + "%"
+    async with local_db.get_pool().acquire() as conn:
+        for table in series.SERIES_TABLES:
+            await conn.execute(
+                f"DELETE FROM {table} WHERE series_id IN (SELECT id FROM series WHERE server_name LIKE $1)", pattern,
+            )
+        for table in ("db_sizes", "db_info"):
+            await conn.execute(f"DELETE FROM {table} WHERE server_name LIKE $1", pattern)
+
+
+async def bench(args) -> dict:
+    await local_db.init_pool()
+    fleet = FakeFleet(args)
+    # Фейковый драйвер вместо asyncpg и paramiko
+    remote_pool.get_pool = fleet.get_pool
+    ssh_pool.exec_command = fleet.exec_command
+
+    servers = [
+        Server(
+            name=f"{SERVER_PREFIX}{i:04d}", host=f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}", port=5432,
+            user="bench", password="bench", ssh_user="bench", ssh_password="bench",
+        )
+        for i in range(args.servers)
+    ]
+    tasks = args.tasks.split(",")
+    logger.info("=" * 60)
+    logger.info(
+        f"Парк: {args.servers} серверов × {args.databases} БД, задержка {args.latency_ms}±{args.jitter_ms} мс, "
+        f"отказы {args.failure_rate:.1%}, SSH {args.ssh_latency_ms} мс, параллельность {args.concurrency}"
+    )
+    logger.info("=" * 60)
+
+    sampler = Sampler()
+    sampler.start()
+    flusher = asyncio.create_task(ingest_buffer.run())
+    rss_start = _rss_mb()
+    cycles = []
+    try:
+        for cycle in range(args.cycles):
+            for name in tasks:
+                cycles.append({"cycle": cycle + 1, **await run_cycle(name, servers, args.concurrency, fleet, sampler)})
+    finally:
+        flusher.cancel()
+        await asyncio.gather(flusher, return_exceptions=True)
+        await sampler.stop()
+        if not args.keep:
+            await cleanup()
+        await local_db.close_pool()
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "params": {
+            "servers": args.servers,
+            "databases": args.databases,
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "failure_rate": args.failure_rate,
+            "ssh_latency_ms": args.ssh_latency_ms,
+            "ssh_failure_rate": args.ssh_failure_rate,
+            "concurrency": args.concurrency,
+            "cycles": args.cycles,
+            "tasks": tasks,
+        },
+        "rss_start_mb": round(rss_start, 1),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "results": cycles,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон коллектора на симулированном парке")
+    parser.add_argument("--servers", type=int, default=500, help="Количество серверов")
+    parser.add_argument("--databases", type=int, default=100, help="Количество БД на сервер")
+    parser.add_argument("--latency-ms", type=float, default=5, help="Задержка запроса к серверу, мс")
+    parser.add_argument("--jitter-ms", type=float, default=2, help="Разброс задержки (±), мс")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Доля отказов подключения (0..1)")
+    parser.add_argument("--ssh-latency-ms", type=float, default=20, help="Задержка SSH df, мс")
+    parser.add_argument("--ssh-failure-rate", type=float, default=0.0, help="Доля отказов SSH (0..1)")
+    parser.add_argument("--concurrency", type=int, default=COLLECTOR_MAX_CONCURRENCY, help="Одновременных опросов")
+    parser.add_argument("--cycles", type=int, default=1, help="Сколько раз прогнать каждую задачу")
+    parser.add_argument("--tasks", default="db_info,stats,sizes", help="Задачи через запятую: db_info,stats,sizes")
+    parser.add_argument("--output", help="Файл для JSON-отчёта (по умолчанию stdout)")
+    parser.add_argument("--keep", action="store_true", help="Не удалять данные bench_fleet_* из pam_stats")
+    parser.add_argument("--verbose", action="store_true", help="Логи коллектора по каждому серверу")
+    args = parser.parse_args()
+    unknown = set(args.tasks.split(",")) - TASKS.keys()
+    if unknown:
+        parser.error(f"неизвестные задачи: {', '.join(sorted(unknown))}")
+    if not args.verbose:
+        logging.getLogger("app").setLevel(logging.WARNING)
+
+    report = asyncio.run(bench(args))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        logger.info(f"Отчёт: {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк записи сэмплов коллектора в statistics: построчный INSERT против COPY.
+
+Генерирует синтетический цикл сбора (N серверов × M баз) и пишет его в
+локальную pam_stats двумя способами. Каждый прогон выполняется в транзакции,
+которая откатывается — реальные данные не меняются (остаются только ряды
+series для bench_srv_*: они создаются заранее, вне замеров).
+
+Использование:
+    cd /home/pgmonitor/pg_activity_monitor/backend
+    source venv/bin/activate
+    python scripts/bench_ingest.py [--servers 50] [--databases 80] [--repeat 3]
+"""
+import sys
+import os
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+
+# Добавляем путь к backend
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import local_db
+from app.collector.ingest import build_stats_records, to_series_rows, write_stats_records
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+_INSERT_STATS_ROW = """
+    INSERT INTO statistics (series_id, ts, numbackends, xact_commit)
+    VALUES ($1, $2, $3, $4)
+"""
+
+
+def make_cycle(servers: int, databases: int) -> list[list[tuple]]:
+    """Синтетический цикл: список пакетов записей, по одному на сервер."""
+    now = datetime.now(timezone.utc)
+    batches = []
+    for s in range(servers):
+        rows = [
+            {"datname": f"db_{d:03d}", "numbackends": d % 17, "xact_commit": 1_000_000 + d * 31}
+            for d in range(databases)
+        ]
+        batches.append(build_stats_records(f"bench_srv_{s:03d}", now, rows))
+    return batches
+
+
+async def run_per_row(conn, batches: list[list[tuple]]) -> int:
+    """Старый путь: один INSERT (и один round trip) на каждую БД."""
+    inserted = 0
+    for batch in batches:
+        for row in await to_series_rows(conn, batch):
+            await conn.execute(_INSERT_STATS_ROW, *row)
+            inserted += 1
+    return inserted
+
+
+async def run_copy_per_server(conn, batches: list[list[tuple]]) -> int:
+    """Новый путь: один COPY на сервер."""
+    inserted = 0
+    for batch in batches:
+        n, _errors = await write_stats_records(conn, batch)
+        inserted += n
+    return inserted
+
+
+async def run_copy_per_cycle(conn, batches: list[list[tuple]]) -> int:
+    """Новый путь: один COPY на весь цикл."""
+    records = [r for batch in batches for r in batch]
+    n, _errors = await write_stats_records(conn, records)
+    return n
+
+
+async def measure(pool, name: str, func, batches, repeat: int) -> dict:
+    """Прогнать вариант repeat раз, каждый раз с откатом транзакции."""
+    timings = []
+    rows = 0
+    for _ in range(repeat):
+        async with pool.acquire() as conn:
+            tr = conn.transaction()
+            await tr.start()
+            try:
+                started = time.perf_counter()
+                rows = await func(conn, batches)
+                timings.append(time.perf_counter() - started)
+            finally:
+                await tr.rollback()
+    best = min(timings)
+    return {"name": name, "rows": rows, "best_s": best, "rows_per_s": rows / best if best else 0}
+
+
+async def bench(args):
+    await local_db.init_pool()
+    pool = local_db.get_pool()
+    batches = make_cycle(args.servers, args.databases)
+    # Ряды series создаются вне откатываемых транзакций замеров
+    async with pool.acquire() as conn:
+        for batch in batches:
+            await to_series_rows(conn, batch)
+
+    logger.info("=" * 60)
+    logger.info(f"Цикл: {args.servers} серверов × {args.databases} БД = {args.servers * args.databases} строк")
+    logger.info("=" * 60)
+
+    results = [
+        await measure(pool, "INSERT построчно", run_per_row, batches, args.repeat),
+        await measure(pool, "COPY на сервер", run_copy_per_server, batches, args.repeat),
+        await measure(pool, "COPY на цикл", run_copy_per_cycle, batches, args.repeat),
+    ]
+    baseline = results[0]["best_s"]
+    for r in results:
+        speedup = baseline / r["best_s"] if r["best_s"] else 0
+        logger.info(
+            f"  {r['name']:<18} {r['best_s'] * 1000:9.1f} мс  "
+            f"{r['rows_per_s']:10.0f} строк/с  x{speedup:.1f}"
+        )
+
+    await local_db.close_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк записи statistics: INSERT vs COPY")
+    parser.add_argument("--servers", type=int, default=50, help="Количество серверов в цикле")
+    parser.add_argument("--databases", type=int, default=80, help="Количество БД на сервер")
+    parser.add_argument("--repeat", type=int, default=3, help="Повторов каждого варианта (берётся лучший)")
+    args = parser.parse_args()
+
+    asyncio.run(bench(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк задержки проверки статуса сервера (connect_to_server) при сетевой задержке.
+
+Между клиентом и PostgreSQL поднимается TCP-прокси, добавляющий задержку
+--delay-ms в каждую сторону (RTT = 2 × delay). Сравниваются:
+  * старая проверка: SELECT 1 при выдаче из пула + BEGIN + SET statement_timeout
+    + 4 отдельных запроса + COMMIT;
+  * новая проверка: probe_postgres — один составной запрос в autocommit.
+
+Использование:
+    cd /home/pgmonitor/pg_activity_monitor/backend
+    source venv/bin/activate
+    python scripts/bench_probe.py --host 127.0.0.1 --port 5432 --user pam --password pam \\
+        [--delay-ms 20] [--iterations 30]
+"""
+import sys
+import os
+import argparse
+import asyncio
+import logging
+import statistics
+import threading
+import time
+from datetime import datetime, timezone
+
+# Добавляем путь к backend
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psycopg2
+
+from app.models import Server
+from app.database.pool import db_pool
+from app.services.server import probe_postgres
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+
+# --------------------------------------------------------------------------- #
+#  TCP-прокси с задержкой
+# --------------------------------------------------------------------------- #
+
+async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, delay: float):
+    """Пересылать данные с задержкой delay, сохраняя порядок."""
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def sender():
+        while True:
+            due, data = await queue.get()
+            if data is None:
+                break
+            await asyncio.sleep(max(0.0, due - loop.time()))
+            writer.write(data)
+            await writer.drain()
+        writer.close()
+
+    task = asyncio.create_task(sender())
+    try:
+        while data := await reader.read(65536):
+            queue.put_nowait((loop.time() + delay, data))
+    except ConnectionError:
+        pass
+    queue.put_nowait((0, None))
+    await task
+
+
+def start_delay_proxy(target_host: str, target_port: int, delay: float) -> int:
+    """Запустить прокси в отдельном потоке, вернуть его локальный порт."""
+    ready = threading.Event()
+    port_box = {}
+
+    async def handle(client_reader, client_writer):
+        server_reader, server_writer = await asyncio.open_connection(target_host, target_port)
+        await asyncio.gather(
+            _pipe(client_reader, server_writer, delay),
+            _pipe(server_reader, client_writer, delay),
+            return_exceptions=True,
+        )
+
+    async def serve():
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port_box["port"] = server.sockets[0].getsockname()[1]
+        ready.set()
+        async with server:
+            await server.serve_forever()
+
+    threading.Thread(target=asyncio.run, args=(serve(),), daemon=True).start()
+    ready.wait()
+    return port_box["port"]
+
+
+# --------------------------------------------------------------------------- #
+#  Варианты проверки
+# --------------------------------------------------------------------------- #
+
+def legacy_probe(conn) -> dict:
+    """Проверка в том виде, как она выполнялась до объединения запросов."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1")  # ping из DatabasePool.get_connection
+        cur.fetchone()
+    with conn.cursor() as cur:
+        cur.execute("SET statement_timeout = 5000;")
+        cur.execute("SHOW server_version;")
+        version = cur.fetchone()[0]
+        cur.execute("SELECT state, COUNT(*) FROM pg_stat_activity GROUP BY state;")
+        connections = dict(cur.fetchall())
+        cur.execute("SELECT pg_postmaster_start_time();")
+        start_time_pg = cur.fetchone()[0]
+        cur.execute("SHOW data_directory;")
+        data_dir = cur.fetchone()[0]
+    conn.commit()
+    uptime = (datetime.now(timezone.utc) - start_time_pg).total_seconds() / 3600
+    return {"version": version, "connections": connections, "uptime_hours": uptime, "data_dir": data_dir}
+
+
+def measure(name: str, func, iterations: int) -> dict:
+    func()  # прогрев: установка соединения не входит в замер
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "name": name,
+        "p50_ms": statistics.median(timings),
+        "p95_ms": timings[max(0, int(len(timings) * 0.95) - 1)],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк проверки статуса сервера при сетевой задержке")
+    parser.add_argument("--host", default="127.0.0.1", help="Хост PostgreSQL")
+    parser.add_argument("--port", type=int, default=5432, help="Порт PostgreSQL")
+    parser.add_argument("--user", default="postgres")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--delay-ms", type=float, default=20, help="Задержка в каждую сторону, мс")
+    parser.add_argument("--iterations", type=int, default=30)
+    args = parser.parse_args()
+
+    proxy_port = start_delay_proxy(args.host, args.port, args.delay_ms / 1000)
+    server = Server(
+        name="bench", host="127.0.0.1", port=proxy_port,
+        user=args.user, password=args.password, ssh_user="", ssh_password="",
+    )
+    legacy_conn = psycopg2.connect(
+        host="127.0.0.1", port=proxy_port, user=args.user, password=args.password, dbname="postgres",
+    )
+
+    logger.info("=" * 60)
+    logger.info(f"Задержка прокси: {args.delay_ms} мс в каждую сторону (RTT {args.delay_ms * 2} мс)")
+    logger.info("=" * 60)
+    results = [
+        measure("старая (8 round trip)", lambda: legacy_probe(legacy_conn), args.iterations),
+        measure("probe_postgres", lambda: probe_postgres(server), args.iterations),
+    ]
+    rtt = args.delay_ms * 2
+    for r in results:
+        logger.info(
+            f"  {r['name']:<22} p50 {r['p50_ms']:7.1f} мс  p95 {r['p95_ms']:7.1f} мс  "
+            f"≈ {r['p50_ms'] / rtt:.1f} RTT"
+        )
+
+    legacy_conn.close()
+    db_pool.close_all()
+
+
+if __name__ == "__main__":
+    main()
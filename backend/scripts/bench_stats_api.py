@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк stats API на истории в pam_stats (см. scripts/gen_history.py).
+
+Вызывает обработчики GET /api/server/{name}/stats,
+GET /api/server/{name}/timeline и GET /api/server/{name}/db/{db}/stats
+напрямую (без HTTP и JWT) для
+диапазонов 1 день, 14 дней, 90 дней и 1 год и считает p50/p95. Каждый
+SQL-запрос обработчика перехватывается и повторяется как
+EXPLAIN (ANALYZE, BUFFERS): в отчёте видно, сколько партиций читается и
+какие индексы используются.
+
+Сгенерированных серверов нет в таблице servers: реестр серверов подменяется,
+а удалённый сервер считается недоступным (список БД берётся из db_info) —
+в замер входят только запросы к локальной БД.
+
+Использование:
+    cd /home/pgmonitor/pg_activity_monitor/backend
+    source venv/bin/activate
+    python scripts/bench_stats_api.py [--prefix gen_srv_] [--iterations 20] [--ranges 1d,14d,90d,1y] \\
+        [--output stats_api.json]
+"""
+import sys
+import os
+import argparse
+import asyncio
+import json
+import logging
+import re
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+# Добавляем путь к backend
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.api import stats as stats_api
+from app.database import local_db
+from app.database.remote_pool import remote_pool
+from app.models import Server
+from app.services.server_health import ServerUnavailableError
+from app.services.server_registry import server_registry
+
+logging.basicConfig(
+    stream=sys.stderr,
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+RANGES = {"1d": 1, "14d": 14, "90d": 90, "1y": 365}
+
+_PARTITION_RE = re.compile(r"on (\w+?_\d{4}_\d{2})\b")
+_INDEX_RE = re.compile(r"(?:Index (?:Only )?Scan(?: Backward)? using|Bitmap Index Scan on) (\w+)")
+_SEQ_RE = re.compile(r"Seq Scan on (\w+)")
+_EXEC_RE = re.compile(r"Execution Time: ([\d.]+) ms")
+
+
+class RecordingPool:
+    """Обёртка пула pam_stats: запоминает запросы обработчика для EXPLAIN."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.queries: list[tuple[str, tuple]] | None = None
+
+    def _record(self, query: str, args: tuple):
+        if self.queries is not None:
+            self.queries.append((query, args))
+
+    async def fetch(self, query: str, *args, **kwargs):
+        self._record(query, args)
+        return await self.pool.fetch(query, *args, **kwargs)
+
+    async def fetchrow(self, query: str, *args, **kwargs):
+        self._record(query, args)
+        return await self.pool.fetchrow(query, *args, **kwargs)
+
+    async def fetchval(self, query: str, *args, **kwargs):
+        self._record(query, args)
+        return await self.pool.fetchval(query, *args, **kwargs)
+
+    def acquire(self):
+        return self.pool.acquire()
+
+
+def _stub_remote(servers: set[str]):
+    """Реестр знает сгенерированные серверы, удалённый сервер «недоступен»."""
+    real_get, real_get_info = server_registry.get, server_registry.get_info
+
+    async def get(name: str):
+        if name in servers:
+            return Server(name=name, host="bench.invalid", port=5432, user="bench", password="", ssh_user="bench", ssh_password="")
+        return await real_get(name)
+
+    async def get_info(name: str):
+        return await get(name) if name in servers else await real_get_info(name)
+
+    async def fetch(server, *args, **kwargs):
+        raise ServerUnavailableError(server.name, "pg", 0)
+
+    server_registry.get, server_registry.get_info = get, get_info
+    remote_pool.fetch = fetch
+
+
+def _summarize_plan(lines: list[str]) -> dict:
+    text = "\n".join(lines)
+    execution = _EXEC_RE.search(text)
+    return {
+        "execution_ms": float(execution.group(1)) if execution else None,
+        "partitions": sorted(set(_PARTITION_RE.findall(text))),
+        "indexes": sorted(set(_INDEX_RE.findall(text))),
+        "seq_scans": sorted(set(_SEQ_RE.findall(text))),
+        "plan": lines,
+    }
+
+
+async def explain(pool, queries: list[tuple[str, tuple]]) -> list[dict]:
+    plans = []
+    async with pool.acquire() as conn:
+        for query, args in queries:
+            rows = await conn.fetch("EXPLAIN (ANALYZE, BUFFERS) " + query.strip().rstrip(";"), *args)
+            plans.append({"sql": " ".join(query.split()), **_summarize_plan([r[0] for r in rows])})
+    return plans
+
+
+def _percentiles(timings: list[float]) -> dict:
+    timings = sorted(timings)
+    return {
+        "p50_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(timings[max(0, int(len(timings) * 0.95) - 1)], 2),
+        "max_ms": round(timings[-1], 2),
+    }
+
+
+async def measure(recorder: RecordingPool, name: str, call, iterations: int) -> dict:
+    """Прогрев с записью запросов, затем iterations замеров и EXPLAIN записанных запросов."""
+    recorder.queries = []
+    result = await call(0)
+    queries, recorder.queries = recorder.queries, None
+    timings = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        await call(i + 1)
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        "endpoint": name,
+        **_percentiles(timings),
+        "aggregation": result.get("aggregation"),
+        "points": len(result.get("connection_timeline") or result.get("timeline") or []),
+        "queries": await explain(recorder.pool, queries),
+    }
+
+
+async def bench(args) -> dict:
+    await local_db.init_pool()
+    pool = local_db.get_pool()
+    servers = [
+        r["server_name"]
+        for r in await pool.fetch(
+            "SELECT DISTINCT server_name FROM db_info WHERE server_name LIKE $1 ORDER BY 1", args.prefix + "%",
+        )
+    ]
+    if not servers:
+        raise SystemExit(f"Нет серверов {args.prefix}*: сначала запустите scripts/gen_history.py")
+    db_name = args.database
+
+    _stub_remote(set(servers))
+    recorder = RecordingPool(pool)
+    stats_api.get_pool = lambda: recorder
+
+    end = datetime.now(timezone.utc)
+    logger.info("=" * 60)
+    logger.info(f"Серверов: {len(servers)}, БД для /db/{{db}}/stats: {db_name}, замеров: {args.iterations}")
+    logger.info("=" * 60)
+
+    results = []
+    for label in args.ranges.split(","):
+        start = end - timedelta(days=RANGES[label])
+        start_date, end_date = start.isoformat(), end.isoformat()
+
+        async def server_stats(i: int):
+            # Серверы по кругу: замер не сводится к одному и тому же закэшированному набору страниц
+            return await stats_api.get_server_stats_details(
+                servers[i % len(servers)], start_date=start_date, end_date=end_date, current_user=None,
+            )
+
+        async def server_timeline(i: int):
+            return await stats_api.get_server_timeline(
+                servers[i % len(servers)], start_date=start_date, end_date=end_date, current_user=None,
+            )
+
+        async def db_stats(i: int):
+            return await stats_api.get_database_stats_details(
+                servers[i % len(servers)], db_name, start_date=start_date, end_date=end_date, current_user=None,
+            )
+
+        for name, call in (
+            ("/server/{name}/stats", server_stats),
+            ("/server/{name}/timeline", server_timeline),
+            ("/server/{name}/db/{db}/stats", db_stats),
+        ):
+            r = {"range": label, **await measure(recorder, name, call, args.iterations)}
+            results.append(r)
+            partitions = max((len(q["partitions"]) for q in r["queries"]), default=0)
+            logger.info(
+                f"  {label:<4} {name:<28} p50 {r['p50_ms']:8.1f} мс  p95 {r['p95_ms']:8.1f} мс  "
+                f"{r['aggregation']:<6} точек {r['points']:<6} партиций ≤{partitions}"
+            )
+
+    await local_db.close_pool()
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "params": {
+            "prefix": args.prefix, "servers": len(servers), "database": db_name,
+            "iterations": args.iterations, "ranges": args.ranges.split(","),
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк stats API: p50/p95 и планы запросов")
+    parser.add_argument("--prefix", default="gen_srv_", help="Префикс сгенерированных серверов")
+    parser.add_argument("--database", default="db_000", help="БД для /server/{name}/db/{db}/stats")
+    parser.add_argument("--iterations", type=int, default=20, help="Замеров на эндпоинт и диапазон")
+    parser.add_argument("--ranges", default=",".join(RANGES), help=f"Диапазоны через запятую: {','.join(RANGES)}")
+    parser.add_argument("--output", help="Файл для JSON-отчёта (по умолчанию stdout)")
+    args = parser.parse_args()
+    unknown = set(args.ranges.split(",")) - RANGES.keys()
+    if unknown:
+        parser.error(f"неизвестные диапазоны: {', '.join(sorted(unknown))}")
+
+    report = asyncio.run(bench(args))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        logger.info(f"Отчёт: {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Проверка очистки истории удалённых и пересозданных БД (tasks.sync_server_db_info).
+
+Для тестового сервера в локальную pam_stats пишутся сэмплы двух БД
+(statistics, агрегаты, db_sizes, latest_sample), ChangeFilter запоминает их
+последние значения. Затем синхронизация db_info видит одну БД пересозданной
+(новый OID), другую — удалённой. Список БД удалённого сервера подменяется,
+подключение к нему не нужно.
+
+Проверка не проходит (код выхода 1), если после синхронизации у этих БД
+остались строки в statistics, агрегатах, db_sizes или latest_sample или
+если ChangeFilter помнит их сэмплы (тогда первый сэмпл пересозданной БД,
+равный последнему сэмплу старой, был бы пропущен). Данные тестового
+сервера удаляются в конце.
+
+Использование:
+    cd /home/pgmonitor/pg_activity_monitor/backend
+    source venv/bin/activate
+    python scripts/check_db_info_sync.py [--server db-info-check]
+"""
+import sys
+import os
+import argparse
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+# Добавляем путь к backend
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.basicConfig(
+    stream=sys.stderr,
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+_RECREATED = "recreated_db"
+_DELETED = "deleted_db"
+
+
+async def _counts(conn, server_name: str, datnames: list[str]) -> dict:
+    """Число строк БД сервера в каждой таблице истории."""
+    counts = {}
+    for table in ("statistics", "statistics_hourly", "statistics_daily"):
+        counts[table] = await conn.fetchval(
+            f"SELECT COUNT(*) FROM {table} WHERE series_id IN "
+            f"(SELECT id FROM series WHERE server_name = $1 AND datname = ANY($2::text[]))",
+            server_name, datnames,
+        )
+    for table in ("db_sizes", "latest_sample"):
+        counts[table] = await conn.fetchval(
+            f"SELECT COUNT(*) FROM {table} WHERE server_name = $1 AND datname = ANY($2::text[])",
+            server_name, datnames,
+        )
+    return counts
+
+
+async def check(server_name: str) -> bool:
+    from app.models import Server
+    from app.collector import tasks
+    from app.collector.ingest import ingest_buffer, build_stats_records, build_size_records, _copy_records
+    from app.collector.ingest import STATS_COLUMNS, SIZES_COLUMNS
+    from app.database import local_db
+
+    await local_db.init_pool()
+    server = Server(name=server_name, host="127.0.0.1", port=5432, user="check", password="", ssh_user="", ssh_password="")
+    remote = [
+        {"datname": _RECREATED, "oid": 1001, "creation_time": None},
+        {"datname": _DELETED, "oid": 1002, "creation_time": None},
+    ]
+
+    async def fetch_remote(_server):
+        return remote
+
+    tasks._fetch_remote_databases = fetch_remote
+    changes = ingest_buffer.changes
+    passed = True
+    try:
+        await local_db.delete_server_data(server_name)
+        await tasks.sync_server_db_info(server)
+
+        ts = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(hours=2)
+        rows = [{"datname": name, "numbackends": 3, "xact_commit": 100} for name in (_RECREATED, _DELETED)]
+        stats = build_stats_records(server_name, ts, rows)
+        sizes = build_size_records(server_name, ts, [{"datname": r["datname"], "db_size": 1 << 20} for r in rows])
+        async with local_db.get_pool().acquire() as conn:
+            await _copy_records(conn, "statistics", STATS_COLUMNS, stats)
+            await _copy_records(conn, "db_sizes", SIZES_COLUMNS, sizes)
+            before = await _counts(conn, server_name, [_RECREATED, _DELETED])
+        changes.split("statistics", stats)
+        logger.info(f"До синхронизации: {before}")
+
+        # Та же БД под новым OID, вторая удалена
+        remote = [{"datname": _RECREATED, "oid": 2001, "creation_time": None}]
+        result = await tasks.sync_server_db_info(server)
+        logger.info(f"Синхронизация: {result}")
+        if result["recreated"] != 1 or result["deleted"] != 1 or result["errors"]:
+            logger.error("Ожидалась одна пересозданная и одна удалённая БД")
+            passed = False
+
+        async with local_db.get_pool().acquire() as conn:
+            after = await _counts(conn, server_name, [_RECREATED, _DELETED])
+            oid = await conn.fetchval(
+                "SELECT oid FROM db_info WHERE server_name = $1 AND datname = $2", server_name, _RECREATED,
+            )
+        logger.info(f"После синхронизации: {after}")
+        leftovers = {table: n for table, n in after.items() if n}
+        if leftovers:
+            logger.error(f"Осталась история старых БД: {leftovers}")
+            passed = False
+        if oid != 2001:
+            logger.error(f"OID пересозданной БД в db_info: {oid}, ожидался 2001")
+            passed = False
+        remembered = [key for key in changes._last if key[1] == server_name]
+        if remembered:
+            logger.error(f"ChangeFilter помнит сэмплы старых БД: {remembered}")
+            passed = False
+    finally:
+        await local_db.delete_server_data(server_name)
+        changes.forget(server_name, [_RECREATED, _DELETED])
+        changes.pending_epochs = [e for e in changes.pending_epochs if e[1] != server_name]
+        await local_db.close_pool()
+
+    logger.info("Проверка пройдена" if passed else "Проверка не пройдена")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка очистки истории удалённых и пересозданных БД")
+    parser.add_argument("--server", default="db-info-check", help="Имя тестового сервера в pam_stats")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(check(args.server)) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Проверка, что обработчики API не блокируют event loop на медленном сервере.
+
+Поднимается «чёрная дыра» — TCP-порт на 127.0.0.2, который принимает
+подключения (backlog ядра), но никогда не отвечает: так выглядит зависший
+PostgreSQL или sshd. Обработчики, обращающиеся к удалённому серверу,
+вызываются против неё одновременно под сторожем event loop в строгом
+режиме (app/loop_watchdog.py):
+
+    проверка доступности при добавлении сервера, список серверов,
+    test-pg, test-ssh, активность сервера (pg_stat_activity).
+
+Проверка не проходит (код выхода 1), если loop был заблокирован дольше
+--max-block-ms или вызов не уложился в свой дедлайн (с запасом --slack).
+Дедлайны уменьшены до --deadline секунд (REMOTE_*_DEADLINE), чтобы
+проверка шла секунды. --self-test добавляет заведомо блокирующий вызов
+(SSHKeyManager.test_ssh_connection прямо в корутине) — сторож должен его
+поймать, и проверка должна завершиться ошибкой.
+
+Локальная pam_stats не нужна: реестр серверов подменяется.
+
+Использование:
+    cd /home/pgmonitor/pg_activity_monitor/backend
+    source venv/bin/activate
+    python scripts/check_loop_blocking.py [--max-block-ms 50] [--deadline 2] [--self-test] \\
+        [--output loop.json]
+"""
+import sys
+import os
+import argparse
+import asyncio
+import json
+import logging
+import socket
+import time
+
+# Добавляем путь к backend
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.basicConfig(
+    stream=sys.stderr,
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+# Адрес loopback, который не отсекается проверкой хоста (localhost/127.0.0.1)
+_BLACKHOLE_HOST = "127.0.0.2"
+_SERVER_NAME = "loop-check"
+
+
+def _blackhole() -> socket.socket:
+    """Порт, подключения к которому устанавливаются, но остаются без ответа."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind((_BLACKHOLE_HOST, 0))
+    sock.listen(128)
+    return sock
+
+
+def _configure(deadline: int):
+    """Короткие дедлайны — до импорта app.config."""
+    for name in ("REMOTE_QUERY_DEADLINE", "REMOTE_CONNECT_DEADLINE", "REMOTE_STATUS_DEADLINE", "REMOTE_SSH_DEADLINE"):
+        os.environ[name] = str(deadline)
+
+
+async def _timed(name: str, deadline: float, call) -> dict:
+    """Выполнить обработчик; результат или ошибка не важны — только время."""
+    started = time.perf_counter()
+    try:
+        result = await call
+        outcome = "ok"
+        if isinstance(result, dict):
+            outcome = str(result.get("message") or result.get("status") or result)[:80]
+        elif isinstance(result, list):
+            outcome = ", ".join(str(r.get("status")) for r in result)
+        elif isinstance(result, bool):
+            outcome = f"reachable={result}"
+    except Exception as e:
+        outcome = f"{type(e).__name__}: {getattr(e, 'detail', e)}"[:80]
+    return {"call": name, "seconds": round(time.perf_counter() - started, 2), "deadline": deadline, "outcome": outcome}
+
+
+async def check(args) -> dict:
+    from app.models import Server
+    from app.config import REMOTE_CONNECT_DEADLINE, REMOTE_QUERY_DEADLINE, REMOTE_STATUS_DEADLINE, REMOTE_SSH_DEADLINE
+    from app.api import servers as servers_api, stats as stats_api
+    from app.services import remote_access
+    from app.services.ssh_key_manager import SSHKeyManager
+    from app.services.server_registry import server_registry
+    from app.loop_watchdog import LoopWatchdog
+
+    hole = _blackhole()
+    port = hole.getsockname()[1]
+    server = Server(
+        name=_SERVER_NAME, host=_BLACKHOLE_HOST, port=port, user="check", password="check",
+        ssh_user="check", ssh_password="check", ssh_port=port,
+    )
+
+    async def get(name: str):
+        return server if name == _SERVER_NAME else None
+
+    async def list_servers(names=None):
+        return [server]
+
+    server_registry.get = server_registry.get_info = get
+    server_registry.list_servers = list_servers
+
+    calls = [
+        ("add_server: host_reachable", REMOTE_CONNECT_DEADLINE, remote_access.host_reachable(server.host, server.port)),
+        ("GET /servers", REMOTE_STATUS_DEADLINE, servers_api.get_servers(current_user=None)),
+        ("POST /servers/{name}/test-pg", REMOTE_STATUS_DEADLINE, servers_api.test_pg_connection(_SERVER_NAME, current_user=None)),
+        ("POST /servers/{name}/test-ssh", REMOTE_SSH_DEADLINE, servers_api.test_ssh_connection(_SERVER_NAME, current_user=None)),
+        ("GET /server_stats/{name}", REMOTE_QUERY_DEADLINE, stats_api.get_server_stats(_SERVER_NAME, current_user=None)),
+    ]
+    if args.self_test:
+        async def blocking():
+            return SSHKeyManager.test_ssh_connection(
+                host=server.host, port=server.ssh_port, username="check", password="check",
+            )
+        calls.append(("self-test: блокирующий SSH в корутине", 0, blocking()))
+
+    watchdog = LoopWatchdog(args.max_block_ms, strict=True)
+    watchdog.start()
+    logger.info("=" * 60)
+    logger.info(f"Чёрная дыра {_BLACKHOLE_HOST}:{port}, вызовов: {len(calls)}, порог блокировки {args.max_block_ms} мс")
+    logger.info("=" * 60)
+    try:
+        results = await asyncio.gather(*(_timed(name, deadline, call) for name, deadline, call in calls))
+    finally:
+        await watchdog.stop()
+
+    late = [r for r in results if r["deadline"] and r["seconds"] > r["deadline"] + args.slack]
+    for r in results:
+        mark = "ДОЛГО" if r in late else "ok"
+        logger.info(f"  {r['call']:<44} {r['seconds']:6.2f} с (дедлайн {r['deadline']} с) {mark}  {r['outcome']}")
+    for v in watchdog.violations:
+        logger.error(f"  Блокировка loop {v['blocked_ms']} мс:\n{v['stack'] or '(стек не снят)'}")
+
+    passed = not watchdog.violations and not late
+    logger.info(
+        f"{'OK' if passed else 'FAIL'}: блокировок loop > {args.max_block_ms} мс: {len(watchdog.violations)}, "
+        f"вызовов сверх дедлайна: {len(late)}"
+    )
+    # Потоки с брошенными по дедлайну вызовами получат разрыв соединения и завершатся
+    hole.close()
+    remote_access.shutdown()
+    return {
+        "passed": passed,
+        "max_block_ms": args.max_block_ms,
+        "calls": results,
+        "violations": watchdog.violations,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка блокировки event loop обработчиками API")
+    parser.add_argument("--max-block-ms", type=int, default=50, help="Допустимая блокировка event loop, мс")
+    parser.add_argument("--deadline", type=int, default=2, help="Дедлайн удалённых вызовов на время проверки, с")
+    parser.add_argument("--slack", type=float, default=1.0, help="Запас сверх дедлайна, с")
+    parser.add_argument("--self-test", action="store_true", help="Добавить заведомо блокирующий вызов")
+    parser.add_argument("--output", help="Файл для JSON-отчёта")
+    args = parser.parse_args()
+
+    _configure(args.deadline)
+    report = asyncio.run(check(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(json.dumps(report, ensure_ascii=False, indent=2) + "\n")
+        logger.info(f"Отчёт: {args.output}")
+    sys.exit(0 if report["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
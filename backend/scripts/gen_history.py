@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Генератор синтетической истории в локальной pam_stats.
+
+Заполняет statistics, server_stats, db_sizes и db_info для N серверов × M баз за
+--months месяцев с интервалами коллектора (collect_interval и
+size_update_interval из настроек). Партиции за прошлые месяцы создаются
+через ensure_partitions. Ряды похожи на настоящие: суточный и недельный
+ритм подключений с шумом, монотонный xact_commit, растущие размеры баз и
+убывающее свободное место на диске. Часовые и суточные агрегаты
+(statistics_hourly/statistics_daily) и последние значения (latest_sample)
+пересчитываются по каждому серверу.
+
+Серверы называются <prefix>NNN; их прежние данные перед генерацией
+удаляются. В таблицу servers они не добавляются — коллектор их не
+опрашивает (для замеров API см. scripts/bench_stats_api.py).
+
+Использование:
+    cd /home/pgmonitor/pg_activity_monitor/backend
+    source venv/bin/activate
+    python scripts/gen_history.py [--servers 10] [--databases 20] [--months 12] [--prefix gen_srv_]
+"""
+import sys
+import os
+import argparse
+import asyncio
+import logging
+import math
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+# Добавляем путь к backend
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import local_db, latest, rollups, series
+from app.database.repositories import settings_repo
+from app.config import COLLECT_INTERVAL, SIZE_UPDATE_INTERVAL
+from app.collector.ingest import STORED_COLUMNS, to_series_rows
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+GB = 1024 ** 3
+
+
+def _month_starts(start: datetime, end: datetime) -> list[datetime]:
+    """Границы месяцев в [start, end): генерация и COPY идут по месяцу на сервер."""
+    bounds = [start]
+    dt = datetime(start.year, start.month, 1, tzinfo=timezone.utc)
+    while True:
+        dt = datetime(dt.year + dt.month // 12, dt.month % 12 + 1, 1, tzinfo=timezone.utc)
+        if dt >= end:
+            break
+        bounds.append(dt)
+    bounds.append(end)
+    return bounds
+
+
+class ServerHistory:
+    """Состояние рядов одного сервера между месяцами."""
+
+    def __init__(self, name: str, databases: int, start: datetime, rng: random.Random):
+        self.name = name
+        self.rng = rng
+        self.dbs = [f"db_{d:03d}" for d in range(databases)]
+        # Базовая нагрузка и объём на БД: несколько «тяжёлых» баз, остальные небольшие
+        self.backends = [rng.choice((2, 3, 5, 8, 40)) * rng.uniform(0.5, 1.5) for _ in self.dbs]
+        self.commit_rate = [b * rng.uniform(0.5, 4) for b in self.backends]  # транзакций/с в пике
+        self.commits = [rng.randrange(10 ** 6, 10 ** 8) for _ in self.dbs]
+        self.sizes = [rng.uniform(0.05, 50) * GB for _ in self.dbs]
+        self.growth = [s * rng.uniform(0.2, 1.5) / (365 * 86400) for s in self.sizes]  # байт/с
+        self.disk_total = 2 * 1024 * GB
+        self.started_at = start - timedelta(days=rng.randrange(1, 90))
+        self.phase = rng.uniform(0, COLLECT_INTERVAL)  # серверы опрашиваются не одновременно
+        self.start = start
+
+    def _activity(self, ts: datetime) -> float:
+        """Суточный ритм с пиком в 14:00 и провалом в выходные."""
+        hour = ts.hour + ts.minute / 60
+        daily = 0.55 + 0.45 * math.cos((hour - 14) / 24 * 2 * math.pi)
+        return daily * (0.35 if ts.weekday() >= 5 else 1.0)
+
+    def _timestamps(self, start: datetime, end: datetime, interval: int):
+        epoch = self.start.timestamp() + self.phase
+        t = epoch + math.ceil((start.timestamp() - epoch) / interval) * interval
+        stop = end.timestamp()
+        while t < stop:
+            yield datetime.fromtimestamp(t, timezone.utc)
+            t += interval
+
+    def stats_records(self, start: datetime, end: datetime, interval: int) -> tuple[list[tuple], list[tuple]]:
+        """Записи statistics и server_stats (строка сервера на цикл)."""
+        rng, records, server_records = self.rng, [], []
+        for ts in self._timestamps(start, end, interval):
+            activity = self._activity(ts)
+            elapsed = (ts - self.start).total_seconds()
+            used = sum(s + g * elapsed for s, g in zip(self.sizes, self.growth))
+            disk_free = max(0, int(self.disk_total * 0.9 - used * 1.3))
+            connections = 0
+            for i, datname in enumerate(self.dbs):
+                backends = max(0, round(self.backends[i] * activity * rng.uniform(0.7, 1.3)))
+                self.commits[i] += int(self.commit_rate[i] * activity * interval * rng.uniform(0.8, 1.2))
+                records.append((self.name, ts, datname, backends, self.commits[i]))
+                connections += backends
+            server_records.append((self.name, ts, disk_free, self.disk_total, connections, self.started_at, "16.4"))
+        return records, server_records
+
+    def size_records(self, start: datetime, end: datetime, interval: int) -> list[tuple]:
+        records = []
+        for ts in self._timestamps(start, end, interval):
+            elapsed = (ts - self.start).total_seconds()
+            for i, datname in enumerate(self.dbs):
+                size = self.sizes[i] + self.growth[i] * elapsed
+                records.append((self.name, ts, datname, int(size * self.rng.uniform(0.999, 1.001))))
+        return records
+
+
+async def generate(args):
+    await local_db.init_pool()
+    pool = local_db.get_pool()
+    interval = args.interval or await settings_repo.get_int_setting("collect_interval", COLLECT_INTERVAL)
+    size_interval = args.size_interval or await settings_repo.get_int_setting("size_update_interval", SIZE_UPDATE_INTERVAL)
+
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(days=round(args.months * 365 / 12))
+    await local_db.ensure_partitions(since=start)
+
+    logger.info("=" * 60)
+    logger.info(
+        f"История: {args.servers} серверов × {args.databases} БД, {start:%Y-%m-%d} — {end:%Y-%m-%d}, "
+        f"интервал {interval} с, размеры {size_interval} с"
+    )
+    logger.info("=" * 60)
+
+    async with pool.acquire() as conn:
+        pattern = args.prefix + "%"
+        for table in (*series.SERIES_TABLES, "server_stats", "db_sizes", "db_info", "latest_sample"):
+            where = "server_name LIKE $1"
+            if table in series.SERIES_TABLES:
+                where = f"series_id IN (SELECT id FROM series WHERE {where})"
+            deleted = await conn.execute(f"DELETE FROM {table} WHERE {where}", pattern)
+            logger.info(f"  {table}: удалены прежние данные ({deleted})")
+
+    rng = random.Random(args.seed)
+    months = _month_starts(start, end)
+    totals = {"statistics": 0, "server_stats": 0, "db_sizes": 0}
+    started = time.perf_counter()
+    for n in range(args.servers):
+        server = ServerHistory(f"{args.prefix}{n:03d}", args.databases, start, rng)
+        async with pool.acquire() as conn:
+            await conn.executemany(
+                """
+                INSERT INTO db_info (server_name, datname, oid, creation_time, first_seen, last_seen)
+                VALUES ($1, $2, $3, $4, $5, now())
+                """,
+                [
+                    (server.name, datname, 16384 + i, start - timedelta(days=rng.randrange(1, 2000)), start)
+                    for i, datname in enumerate(server.dbs)
+                ],
+            )
+            for month_start, month_end in zip(months, months[1:]):
+                stats, server_stats = server.stats_records(month_start, month_end, interval)
+                for table, records in (
+                    ("statistics", stats),
+                    ("server_stats", server_stats),
+                    ("db_sizes", server.size_records(month_start, month_end, size_interval)),
+                ):
+                    rows = await to_series_rows(conn, records) if table == "statistics" else records
+                    await conn.copy_records_to_table(table, records=rows, columns=STORED_COLUMNS[table])
+                    totals[table] += len(records)
+            # COPY идёт мимо ingest — агрегаты и последние значения строятся одним пересчётом
+            await rollups.rebuild(conn, start, end, server.name)
+            await latest.rebuild(conn, server.name)
+        logger.info(
+            f"  {server.name}: готово, всего statistics {totals['statistics']:,}, db_sizes {totals['db_sizes']:,} "
+            f"({time.perf_counter() - started:.0f} с)"
+        )
+
+    logger.info("ANALYZE statistics, агрегатов, server_stats, db_sizes, db_info")
+    async with pool.acquire() as conn:
+        for table in ("statistics", *rollups.ROLLUP_TABLES, "server_stats", "db_sizes", "db_info"):
+            await conn.execute(f"ANALYZE {table}")
+
+    elapsed = time.perf_counter() - started
+    rows = sum(totals.values())
+    logger.info(f"Готово: {rows:,} строк за {elapsed:.0f} с ({rows / elapsed:,.0f} строк/с)")
+    await local_db.close_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Синтетическая история в pam_stats")
+    parser.add_argument("--servers", type=int, default=10, help="Количество серверов")
+    parser.add_argument("--databases", type=int, default=20, help="Количество БД на сервер")
+    parser.add_argument("--months", type=int, default=12, help="Глубина истории, месяцев")
+    parser.add_argument("--interval", type=int, help="Интервал statistics, с (по умолчанию collect_interval)")
+    parser.add_argument("--size-interval", type=int, help="Интервал db_sizes, с (по умолчанию size_update_interval)")
+    parser.add_argument("--prefix", default="gen_srv_", help="Префикс имён серверов")
+    parser.add_argument("--seed", type=int, default=1, help="Seed генератора (воспроизводимые данные)")
+    args = parser.parse_args()
+
+    asyncio.run(generate(args))
+
+
+if __name__ == "__main__":
+    main()
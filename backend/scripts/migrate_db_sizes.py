@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Перенос исторических размеров БД из statistics.db_size в таблицу db_sizes.
+
+До появления db_sizes коллектор размеров делал UPDATE statistics SET db_size
+для всех строк с NULL, поэтому один замер повторялся в каждой строке до
+следующего. Скрипт переносит только точки изменения размера (первую строку
+каждой серии одинаковых значений) — по месяцу за транзакцию.
+
+Переносятся только строки старше первого замера, уже записанного в db_sizes
+новым коллектором, поэтому повторный запуск ничего не дублирует. Если db_sizes
+ещё нет (backend новой версии не запускался), скрипт создаёт её сам.
+
+Выполняется до scripts/migrate_series.py: после перевода на series_id колонки
+statistics.db_size больше нет. Backend и коллектор со старым форматом таблиц не
+стартуют, поэтому скрипт открывает собственный пул, без инициализации схемы.
+
+Использование:
+    cd /home/pgmonitor/pg_activity_monitor/backend
+    source venv/bin/activate
+    python scripts/migrate_db_sizes.py [--dry-run]
+"""
+import sys
+import os
+import argparse
+import asyncio
+import logging
+
+# Добавляем путь к backend
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncpg
+
+from app.config import LOCAL_DB_DSN
+from app.database import local_db
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+_MIGRATE_MONTH = """
+    INSERT INTO db_sizes (server_name, ts, datname, db_size)
+    SELECT server_name, ts, datname, db_size
+    FROM (
+        SELECT server_name, ts, datname, db_size,
+               lag(db_size) OVER (PARTITION BY server_name, datname ORDER BY ts) AS prev_size
+        FROM {partition}
+        WHERE db_size IS NOT NULL AND ($1::timestamptz IS NULL OR ts < $1)
+    ) s
+    WHERE prev_size IS DISTINCT FROM db_size;
+"""
+
+
+async def migrate(args):
+    pool = await asyncpg.create_pool(LOCAL_DB_DSN, min_size=1, max_size=2)
+    total = 0
+    try:
+        async with pool.acquire() as conn:
+            has_db_size = await conn.fetchval("""
+                SELECT EXISTS (
+                    SELECT 1 FROM information_schema.columns
+                    WHERE table_name = 'statistics' AND column_name = 'db_size'
+                );
+            """)
+            if not has_db_size:
+                logger.info("В statistics нет колонки db_size — переносить нечего")
+                return
+            if not args.dry_run:
+                # На базе, где backend новой версии ещё не запускался, db_sizes нет
+                await local_db.create_series_tables(conn)
+            # Граница: всё, что новее, уже пишет коллектор в db_sizes
+            boundary = None
+            if await conn.fetchval("SELECT to_regclass('db_sizes') IS NOT NULL;"):
+                boundary = await conn.fetchval("SELECT MIN(ts) FROM db_sizes;")
+            partitions = [
+                row["relname"]
+                for row in await conn.fetch("""
+                    SELECT relname FROM pg_class
+                    WHERE relname ~ '^statistics_\\d{4}_\\d{2}$' AND relkind = 'r'
+                    ORDER BY relname;
+                """)
+            ]
+        logger.info(f"Партиций statistics: {len(partitions)}, граница переноса: {boundary or 'нет'}")
+
+        for partition in partitions:
+            _, year, month = partition.split("_")
+            async with pool.acquire() as conn:
+                if args.dry_run:
+                    count = await conn.fetchval(
+                        f"SELECT COUNT(*) FROM {partition} WHERE db_size IS NOT NULL "
+                        f"AND ($1::timestamptz IS NULL OR ts < $1)",
+                        boundary,
+                    )
+                    logger.info(f"  [DRY-RUN] {partition}: строк с db_size: {count}")
+                    continue
+                async with conn.transaction():
+                    await local_db.ensure_partition(conn, "db_sizes", int(year), int(month))
+                    tag = await conn.execute(_MIGRATE_MONTH.format(partition=partition), boundary)
+                inserted = int(tag.split()[-1])
+                total += inserted
+                logger.info(f"  {partition}: перенесено {inserted} замеров")
+    finally:
+        await pool.close()
+
+    logger.info(f"Готово: перенесено {total} замеров размеров")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Перенос statistics.db_size в db_sizes")
+    parser.add_argument("--dry-run", action="store_true", help="Только подсчёт, без записи")
+    args = parser.parse_args()
+
+    asyncio.run(migrate(args))
+
+
+if __name__ == "__main__":
+    main()
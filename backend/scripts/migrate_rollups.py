@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Заполнение часовых и суточных агрегатов (statistics_hourly/statistics_daily)
+из уже накопленной statistics.
+
+Новые строки коллектор сливает в агрегаты сам; скрипт нужен один раз после
+обновления — для истории, записанной до появления агрегатов. Пересчёт идёт
+по месяцу за транзакцию (по партициям statistics) и заменяет агрегаты за
+месяц целиком, поэтому повторный запуск безопасен: им же можно исправить
+агрегаты, если сырые данные правились вручную. В режиме хранения только
+изменений (change_only_heartbeat) пропущенные сэмплы восстанавливаются так же,
+как при чтении, — с параметрами режима, действовавшими при записи.
+
+Использование:
+    cd /home/pgmonitor/pg_activity_monitor/backend
+    source venv/bin/activate
+    python scripts/migrate_rollups.py [--server NAME] [--since 2025-01-01]
+"""
+import sys
+import os
+import argparse
+import asyncio
+import logging
+from datetime import datetime, timezone
+
+# Добавляем путь к backend
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import local_db, rollups
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+
+async def migrate(args):
+    await local_db.init_pool()
+    pool = local_db.get_pool()
+    since = datetime.fromisoformat(args.since).replace(tzinfo=timezone.utc) if args.since else None
+    total = 0
+    try:
+        async with pool.acquire() as conn:
+            partitions = [
+                row["relname"]
+                for row in await conn.fetch("""
+                    SELECT relname FROM pg_class
+                    WHERE relname ~ '^statistics_\\d{4}_\\d{2}$' AND relkind = 'r'
+                    ORDER BY relname;
+                """)
+            ]
+        logger.info(f"Партиций statistics: {len(partitions)}, сервер: {args.server or 'все'}")
+
+        for partition in partitions:
+            _, year, month = partition.split("_")
+            start = datetime(int(year), int(month), 1, tzinfo=timezone.utc)
+            end = datetime(start.year + start.month // 12, start.month % 12 + 1, 1, tzinfo=timezone.utc)
+            if since and end <= since:
+                continue
+            async with pool.acquire() as conn:
+                await local_db.ensure_partition(conn, "statistics_hourly", start.year, start.month)
+                buckets = await rollups.rebuild(conn, max(start, since or start), end, args.server)
+            total += buckets
+            logger.info(f"  {partition}: часовых бакетов {buckets}")
+    finally:
+        await local_db.close_pool()
+
+    logger.info(f"Готово: часовых бакетов {total}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Заполнение агрегатов statistics_hourly/statistics_daily")
+    parser.add_argument("--server", help="Только этот сервер")
+    parser.add_argument("--since", help="Начиная с даты (YYYY-MM-DD, UTC)")
+    args = parser.parse_args()
+
+    asyncio.run(migrate(args))
+
+
+if __name__ == "__main__":
+    main()
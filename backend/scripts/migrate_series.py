@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Перевод statistics и агрегатов (statistics_hourly/statistics_daily) на series_id.
+
+В прежнем формате каждая строка хранила server_name и datname, а индексы
+statistics строились по этим строкам. Теперь пара (server_name, datname) —
+строка словаря series, а сэмплы и агрегаты хранят её целочисленный id.
+
+Порядок:
+  1. старые таблицы, их партиции и индексы переименовываются в *_legacy;
+  2. создаётся новая схема (init_pool) и партиции под старые месячные партиции;
+  3. каждая старая партиция копируется одной транзакцией (ряды series
+     создаются по ходу) и удаляется; диск сервера из строк statistics
+     переносится в server_stats — строка на (сервер, ts);
+  4. последние значения рядов (latest_sample) строятся заново.
+Прерванную миграцию можно запустить повторно: она продолжит с оставшихся
+*_legacy партиций.
+
+Перед запуском остановите backend и коллектор (pgmon-backend, коллектор):
+со старыми таблицами они не стартуют. Если в statistics ещё есть db_size, не
+перенесённые в db_sizes, сначала выполните scripts/migrate_db_sizes.py.
+
+Использование:
+    cd /home/pgmonitor/pg_activity_monitor/backend
+    source venv/bin/activate
+    python scripts/migrate_series.py [--dry-run]
+"""
+import sys
+import os
+import argparse
+import asyncio
+import logging
+import re
+
+# Добавляем путь к backend
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncpg
+
+from app.config import LOCAL_DB_DSN
+from app.database import local_db, latest
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+TABLES = ("statistics", "statistics_hourly", "statistics_daily")
+SUFFIX = "_legacy"
+
+# Колонки новой таблицы кроме series_id — одноимённые в старой
+_COLUMNS = {
+    "statistics": ("ts", "numbackends", "xact_commit"),
+    "statistics_hourly": (
+        "bucket", "samples", "sum_backends", "min_backends", "max_backends",
+        "sum_xact_commit", "last_ts", "last_backends", "last_xact_commit",
+    ),
+}
+_COLUMNS["statistics_daily"] = _COLUMNS["statistics_hourly"]
+
+# Диск сервера повторялся в строке каждой БД — в server_stats одна строка на (сервер, ts)
+_COPY_DISK = """
+    INSERT INTO server_stats (server_name, ts, disk_free, disk_total)
+    SELECT DISTINCT ON (server_name, ts) server_name, ts, disk_free, disk_total
+    FROM {name}
+    WHERE disk_free IS NOT NULL OR disk_total IS NOT NULL
+    ORDER BY server_name, ts, disk_free IS NULL
+"""
+
+_MONTH_RE = re.compile(r"_(\d{4})_(\d{2})" + SUFFIX + "$")
+
+
+async def _legacy_tables(conn) -> list[str]:
+    """Таблицы в старом формате (с колонкой server_name) под прежними именами."""
+    return [
+        row["table_name"]
+        for row in await conn.fetch(
+            """
+            SELECT table_name FROM information_schema.columns
+            WHERE table_schema = current_schema() AND column_name = 'server_name'
+              AND table_name = ANY($1::text[])
+            """,
+            list(TABLES),
+        )
+    ]
+
+
+async def _rename_legacy(conn, tables: list[str]):
+    """Переименовать таблицы, их партиции и все индексы в *_legacy одной транзакцией."""
+    async with conn.transaction():
+        for table in tables:
+            relations = [table] + [
+                row["relname"]
+                for row in await conn.fetch(
+                    "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                    "WHERE i.inhparent = $1::regclass",
+                    table,
+                )
+            ]
+            indexes = [
+                row["relname"]
+                for row in await conn.fetch(
+                    "SELECT c.relname FROM pg_index x JOIN pg_class c ON c.oid = x.indexrelid "
+                    "WHERE x.indrelid = ANY(SELECT oid FROM pg_class WHERE relname = ANY($1::text[]))",
+                    relations,
+                )
+            ]
+            # Индексы (и ограничения PK) иначе заняли бы имена индексов новой схемы
+            for index in indexes:
+                await conn.execute(f"ALTER INDEX {index} RENAME TO {index[:63 - len(SUFFIX)]}{SUFFIX}")
+            for relation in relations:
+                await conn.execute(f"ALTER TABLE {relation} RENAME TO {relation}{SUFFIX}")
+            logger.info(f"  {table}: переименовано таблиц {len(relations)}, индексов {len(indexes)}")
+
+
+async def _legacy_parts(conn) -> list[tuple[str, str]]:
+    """(старая таблица с данными, новая таблица): партиции и непартиционированные таблицы."""
+    rows = await conn.fetch(
+        "SELECT relname FROM pg_class WHERE relname LIKE '%' || $1 AND relkind = 'r' ORDER BY relname",
+        SUFFIX,
+    )
+    parts = []
+    for row in rows:
+        name = row["relname"]
+        base = _MONTH_RE.sub("", name).removesuffix(SUFFIX)
+        if base in TABLES:
+            parts.append((name, base))
+    return parts
+
+
+async def migrate(args):
+    conn = await asyncpg.connect(LOCAL_DB_DSN)
+    try:
+        legacy = await _legacy_tables(conn)
+        if not args.dry_run:
+            # На базе, где backend новой версии ещё не запускался, целевых таблиц нет
+            await local_db.create_series_tables(conn)
+        if legacy and "statistics" in legacy:
+            boundary = None
+            if await conn.fetchval("SELECT to_regclass('db_sizes') IS NOT NULL"):
+                boundary = await conn.fetchval("SELECT MIN(ts) FROM db_sizes")
+            unmigrated = await conn.fetchval("""
+                SELECT EXISTS (
+                    SELECT 1 FROM statistics
+                    WHERE db_size IS NOT NULL AND ($1::timestamptz IS NULL OR ts < $1)
+                )
+            """, boundary)
+            if unmigrated:
+                logger.error("В statistics есть db_size, не перенесённые в db_sizes: выполните scripts/migrate_db_sizes.py")
+                return
+        if args.dry_run:
+            logger.info(f"[DRY-RUN] Таблиц в старом формате: {', '.join(legacy) or 'нет'}")
+            for table in legacy:
+                logger.info(f"  [DRY-RUN] {table}: {await conn.fetchval(f'SELECT COUNT(*) FROM {table}')} строк")
+            for name, _ in await _legacy_parts(conn):
+                logger.info(f"  [DRY-RUN] {name}: {await conn.fetchval(f'SELECT COUNT(*) FROM {name}')} строк")
+            return
+        if legacy:
+            logger.info(f"Переименование в *{SUFFIX}: {', '.join(legacy)}")
+            await _rename_legacy(conn, legacy)
+        parts = await _legacy_parts(conn)
+    finally:
+        await conn.close()
+
+    if not parts:
+        logger.info("Таблицы уже в формате series_id, переносить нечего")
+        return
+
+    # Новая схема и партиции под каждую старую месячную партицию
+    await local_db.init_pool()
+    pool = local_db.get_pool()
+    total = 0
+    try:
+        async with pool.acquire() as conn:
+            for name, table in parts:
+                month = _MONTH_RE.search(name)
+                if month:
+                    await local_db.ensure_partition(conn, table, int(month.group(1)), int(month.group(2)))
+                    if table == "statistics":
+                        await local_db.ensure_partition(conn, "server_stats", int(month.group(1)), int(month.group(2)))
+
+        for name, table in parts:
+            columns = _COLUMNS[table]
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    await conn.execute(
+                        f"INSERT INTO series (server_name, datname) SELECT DISTINCT server_name, datname FROM {name} "
+                        f"ON CONFLICT (server_name, datname) DO NOTHING"
+                    )
+                    tag = await conn.execute(f"""
+                        INSERT INTO {table} (series_id, {', '.join(columns)})
+                        SELECT r.id, {', '.join('s.' + c for c in columns)}
+                        FROM {name} s
+                        JOIN series r ON r.server_name = s.server_name AND r.datname = s.datname
+                    """)
+                    if table == "statistics" and _MONTH_RE.search(name):
+                        await conn.execute(_COPY_DISK.format(name=name))
+                    await conn.execute(f"DROP TABLE {name}")
+            copied = int(tag.split()[-1])
+            total += copied
+            logger.info(f"  {name} → {table}: {copied} строк")
+
+        async with pool.acquire() as conn:
+            for table in TABLES:
+                await conn.execute(f"DROP TABLE IF EXISTS {table}{SUFFIX}")
+                await conn.execute(f"ANALYZE {table}")
+            await conn.execute("ANALYZE server_stats")
+            series_count = await conn.fetchval("SELECT COUNT(*) FROM series")
+            # Таблица создана init_pool до переноса — заполняется по перенесённым рядам
+            await latest.rebuild(conn)
+    finally:
+        await local_db.close_pool()
+
+    logger.info(f"Готово: перенесено {total} строк, рядов series: {series_count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Перевод statistics и агрегатов на series_id")
+    parser.add_argument("--dry-run", action="store_true", help="Только подсчёт, без изменений")
+    args = parser.parse_args()
+
+    asyncio.run(migrate(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -26,6 +26,7 @@ import asyncpg
 from app.config import LOCAL_DB_DSN
 from app.services.server import load_servers
 from app.database.pool import db_pool
+from app.collector.ingest import write_stats_records, write_size_records, write_server_records
 
 logging.basicConfig(
     level=logging.INFO,
@@ -78,21 +79,27 @@ async def write_to_local(
         return
 
     async with pool.acquire() as conn:
-        # Записываем statistics батчами
+        # Записываем statistics и db_sizes батчами (через ingest — с агрегатами и series_id)
         inserted = 0
         for i in range(0, len(stats_rows), BATCH_SIZE):
             batch = stats_rows[i:i + BATCH_SIZE]
-            # Формируем данные для copy
-            records = [
-                (server_name, row[0], row[1], row[2], row[3], row[4], row[5], None)
+            n, errors = await write_stats_records(conn, [
+                (server_name, row[0], row[1], row[2], row[3])
                 for row in batch
-            ]
-            await conn.executemany("""
-                INSERT INTO statistics (server_name, ts, datname, numbackends, xact_commit, db_size, disk_free, disk_total)
-                VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
-                ON CONFLICT DO NOTHING;
-            """, records)
-            inserted += len(batch)
+            ])
+            await write_size_records(conn, [
+                (server_name, row[0], row[1], row[4])
+                for row in batch if row[4] is not None
+            ])
+            # Свободное место одно на сервер — строка server_stats на ts
+            disk = {row[0]: row[5] for row in batch if row[5] is not None}
+            await write_server_records(conn, [
+                (server_name, ts, disk_free, None, None, None, None)
+                for ts, disk_free in disk.items()
+            ])
+            for error in errors[:5]:
+                logger.warning(f"  {error}")
+            inserted += n
 
         logger.info(f"  statistics: вставлено {inserted} записей")
 
@@ -128,37 +135,10 @@ async def migrate(args):
     import app.database.local_db as local_db_mod
     local_db_mod._pool = pool
     await local_db_mod._init_schema()
-    await local_db_mod.ensure_partitions()
 
-    # Создаём партиции для старых данных (до 12 месяцев назад)
+    # Партиции для старых данных (до 12 месяцев назад)
     now = datetime.now(timezone.utc)
-    async with pool.acquire() as conn:
-        for months_back in range(1, 13):
-            dt = datetime(now.year, now.month, 1, tzinfo=timezone.utc)
-            # Отматываем на months_back месяцев
-            for _ in range(months_back):
-                if dt.month == 1:
-                    dt = datetime(dt.year - 1, 12, 1, tzinfo=timezone.utc)
-                else:
-                    dt = datetime(dt.year, dt.month - 1, 1, tzinfo=timezone.utc)
-
-            part_name = f"statistics_{dt.year}_{dt.month:02d}"
-            year, month = dt.year, dt.month
-            start = datetime(year, month, 1, tzinfo=timezone.utc)
-            if month == 12:
-                end = datetime(year + 1, 1, 1, tzinfo=timezone.utc)
-            else:
-                end = datetime(year, month + 1, 1, tzinfo=timezone.utc)
-
-            exists = await conn.fetchval(
-                "SELECT EXISTS(SELECT 1 FROM pg_class WHERE relname = $1)", part_name
-            )
-            if not exists:
-                await conn.execute(f"""
-                    CREATE TABLE {part_name} PARTITION OF statistics
-                    FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}');
-                """)
-                logger.info(f"Создана партиция {part_name}")
+    await local_db_mod.ensure_partitions(since=datetime(now.year - 1, now.month, 1, tzinfo=timezone.utc))
 
     # Загружаем серверы
     servers = load_servers()
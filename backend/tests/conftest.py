@@ -0,0 +1,46 @@
+# tests/conftest.py
+"""
+Общие настройки тестов.
+
+app.config при импорте требует SECRET_KEY и ENCRYPTION_KEY — тестам хватает
+заглушек. Тесты с PostgreSQL (фикстура pg) берут DSN из PAM_TEST_DSN и
+пропускаются, если он не задан или БД недоступна; каждый тест работает во
+временной схеме, которая удаляется после него.
+"""
+import asyncio
+import os
+import uuid
+
+import pytest
+
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("ENCRYPTION_KEY", "test-encryption-key")
+
+import asyncpg  # noqa: E402
+
+
+@pytest.fixture
+def pg():
+    """
+    Выполнить async-функцию fn(conn) на соединении с PAM_TEST_DSN, в
+    отдельной схеме (search_path). Возвращает результат fn.
+    """
+    dsn = os.environ.get("PAM_TEST_DSN")
+    if not dsn:
+        pytest.skip("PAM_TEST_DSN не задан")
+
+    async def _run(fn):
+        try:
+            conn = await asyncpg.connect(dsn)
+        except (OSError, asyncpg.PostgresError) as e:
+            pytest.skip(f"PostgreSQL недоступна: {e}")
+        schema = f"pam_test_{uuid.uuid4().hex[:12]}"
+        try:
+            await conn.execute(f"CREATE SCHEMA {schema}")
+            await conn.execute(f"SET search_path TO {schema}")
+            return await fn(conn)
+        finally:
+            await conn.execute(f"DROP SCHEMA {schema} CASCADE")
+            await conn.close()
+
+    return lambda fn: asyncio.run(_run(fn))
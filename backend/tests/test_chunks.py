@@ -0,0 +1,55 @@
+# tests/test_chunks.py
+"""Кодек чанков сырых сэмплов (app/database/chunks.py): encode → decode без потерь."""
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.database import chunks
+
+T0 = datetime(2026, 3, 2, tzinfo=timezone.utc)
+
+
+def test_round_trip_irregular_intervals():
+    rng = random.Random(1)
+    rows, ts, xact = [], T0, 10 ** 6
+    for _ in range(500):
+        # Интервал сбора с дрожанием до микросекунд и редкими пропусками циклов
+        ts += timedelta(seconds=600 * rng.choice((1, 1, 1, 2)), microseconds=rng.randint(-900_000, 900_000))
+        xact += rng.randint(0, 5000)
+        rows.append((ts, rng.randint(0, 300), xact))
+    assert chunks.decode(chunks.encode(rows)) == rows
+
+
+def test_round_trip_nulls():
+    rows = [
+        (T0, 5, None),
+        (T0 + timedelta(seconds=600), None, None),
+        (T0 + timedelta(seconds=1200), 7, None),
+    ]
+    assert chunks.decode(chunks.encode(rows)) == rows
+
+
+@pytest.mark.parametrize("rows", [
+    [],
+    [(T0, 0, 0)],
+    # Большие значения и уменьшение счётчика (сброс статистики) — отрицательные разности
+    [(T0, 2 ** 31 - 1, 2 ** 62), (T0 + timedelta(microseconds=1), 0, 3)],
+    # Время до epoch
+    [(datetime(1969, 12, 31, 23, 59, tzinfo=timezone.utc), 1, 1), (T0, 2, 2)],
+])
+def test_round_trip_edge_cases(rows):
+    assert chunks.decode(chunks.encode(rows)) == rows
+
+
+def test_compact():
+    rows = [(T0 + timedelta(seconds=600 * i), 3, 1000 + i) for i in range(1000)]
+    # Регулярная сетка и медленный счётчик — около трёх байт на сэмпл
+    assert len(chunks.encode(rows)) < 4 * len(rows)
+
+
+def test_unknown_version():
+    data = bytearray(chunks.encode([(T0, 1, 1)]))
+    data[0] = 99
+    with pytest.raises(ValueError):
+        chunks.decode(bytes(data))
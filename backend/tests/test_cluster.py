@@ -0,0 +1,50 @@
+# tests/test_cluster.py
+"""Кольцо consistent hashing коллекторов (app/collector/cluster.py)."""
+from collections import Counter
+
+from app.collector.cluster import HashRing
+
+KEYS = [f"server-{i:05d}" for i in range(6000)]
+
+
+def _owners(nodes: list[str]) -> dict[str, str]:
+    ring = HashRing(nodes)
+    return {key: ring.owner(key) for key in KEYS}
+
+
+def test_empty_ring():
+    assert HashRing([]).owner("server-1") is None
+
+
+def test_single_node():
+    assert set(_owners(["a:1"]).values()) == {"a:1"}
+
+
+def test_owner_does_not_depend_on_node_order():
+    assert _owners(["a:1", "b:2", "c:3"]) == _owners(["c:3", "a:1", "b:2"])
+
+
+def test_distribution():
+    nodes = [f"node-{i}:100" for i in range(4)]
+    counts = Counter(_owners(nodes).values())
+    assert set(counts) == set(nodes)
+    # 64 виртуальные точки на узел: доля каждого узла — в пределах ±40% от средней
+    fair = len(KEYS) / len(nodes)
+    assert all(0.6 * fair < n < 1.4 * fair for n in counts.values()), counts
+
+
+def test_adding_node_moves_only_its_share():
+    before = _owners(["a:1", "b:2", "c:3"])
+    after = _owners(["a:1", "b:2", "c:3", "d:4"])
+    moved = [key for key in KEYS if before[key] != after[key]]
+    # Серверы переезжают только на новый узел, и примерно четверть
+    assert all(after[key] == "d:4" for key in moved)
+    assert 0.1 < len(moved) / len(KEYS) < 0.4
+
+
+def test_removing_node_moves_only_its_servers():
+    before = _owners(["a:1", "b:2", "c:3"])
+    after = _owners(["a:1", "c:3"])
+    for key in KEYS:
+        if before[key] != "b:2":
+            assert after[key] == before[key]
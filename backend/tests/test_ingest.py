@@ -0,0 +1,169 @@
+# tests/test_ingest.py
+"""
+ChangeFilter и очередь IngestBuffer (app/collector/ingest.py) без БД:
+пропуск неизменившихся сэмплов и порядок отбрасывания при переполнении.
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.collector import ingest
+from app.collector.ingest import SKIPPED, ChangeFilter, IngestBuffer, build_stats_records
+from app.services.settings_cache import settings_cache
+
+T0 = datetime(2026, 3, 2, 12, 0, tzinfo=timezone.utc)
+
+
+def cycle(k: int, **values: int) -> list[tuple]:
+    """Записи statistics цикла k (600 с) сервера srv: datname → numbackends."""
+    rows = [{"datname": name, "numbackends": n, "xact_commit": 0} for name, n in values.items()]
+    return build_stats_records("srv", T0 + timedelta(seconds=600 * k), rows)
+
+
+def names(records: list[tuple]) -> list[str]:
+    return [r[2] for r in records]
+
+
+@pytest.fixture
+def change_only(monkeypatch):
+    """Режим хранения только изменений: интервал 600 с, heartbeat 3 (строка действует 1500 с)."""
+    monkeypatch.setitem(settings_cache.values, "collect_interval", "600")
+    monkeypatch.setitem(settings_cache.values, "change_only_heartbeat", "3")
+
+
+def test_mode_off_stores_everything(monkeypatch):
+    monkeypatch.setitem(settings_cache.values, "change_only_heartbeat", "0")
+    f = ChangeFilter()
+    f.split("statistics", cycle(0, a=1))
+    stored, skipped = f.split("statistics", cycle(1, a=1))
+    assert names(stored) == ["a"] and skipped == []
+    # Эпоха с выключенным режимом
+    assert f.pending_epochs == [("statistics", "srv", T0, 0, 0)]
+
+
+def test_skips_unchanged(change_only):
+    f = ChangeFilter()
+    stored, skipped = f.split("statistics", cycle(0, a=1, b=1))
+    assert names(stored) == ["a", "b"] and skipped == []
+    stored, skipped = f.split("statistics", cycle(1, a=1, b=2))
+    assert names(stored) == ["b"] and names(skipped) == ["a"]
+    assert f.pending_epochs == [("statistics", "srv", T0, 600, 3)]
+
+
+def test_cycle_keeps_one_stored_row(change_only):
+    f = ChangeFilter()
+    f.split("statistics", cycle(0, a=1, b=1))
+    f.split("statistics", cycle(1, a=1, b=2))
+    # Всё без изменений — пишется ряд, дольше всех не записанный (a)
+    stored, skipped = f.split("statistics", cycle(2, a=1, b=2))
+    assert names(stored) == ["a"] and names(skipped) == ["b"]
+
+
+def test_heartbeat(change_only):
+    f = ChangeFilter()
+    f.split("statistics", cycle(0, a=1, b=1))
+    f.split("statistics", cycle(1, a=1, b=2))
+    f.split("statistics", cycle(2, a=1, b=2))
+    # b записан в цикле 1: в цикле 4 прошло 1800 с > 1500 с
+    stored, skipped = f.split("statistics", cycle(4, a=1, b=2))
+    assert names(stored) == ["b"] and names(skipped) == ["a"]
+
+
+def test_compares_with_last_queued_row(change_only):
+    f = ChangeFilter()
+    f.split("statistics", cycle(0, a=1, b=0))
+    f.split("statistics", cycle(1, a=2, b=0))
+    # a вернулся к 1: сравнение с поставленной в очередь 2, а не с 1
+    stored, _ = f.split("statistics", cycle(2, a=1, b=0))
+    assert "a" in names(stored)
+
+
+def test_discard_and_forget(change_only):
+    f = ChangeFilter()
+    first = cycle(0, a=1, b=1)
+    f.split("statistics", first)
+    # Строка a потеряна — не основание пропуска
+    f.discard([("statistics", first[0])])
+    stored, skipped = f.split("statistics", cycle(1, a=1, b=1))
+    assert names(stored) == ["a"] and names(skipped) == ["b"]
+    f.forget("srv", ["b"])
+    stored, skipped = f.split("statistics", cycle(2, a=1, b=1))
+    assert names(stored) == ["b"] and names(skipped) == ["a"]
+
+
+def test_mode_change_starts_epoch(change_only, monkeypatch):
+    f = ChangeFilter()
+    f.split("statistics", cycle(0, a=1, b=1))
+    monkeypatch.setitem(settings_cache.values, "change_only_heartbeat", "4")
+    # Первый цикл с новыми параметрами пишется целиком
+    stored, skipped = f.split("statistics", cycle(1, a=1, b=1))
+    assert names(stored) == ["a", "b"] and skipped == []
+    assert f.pending_epochs[-1] == ("statistics", "srv", T0 + timedelta(seconds=600), 600, 4)
+
+
+def test_db_sizes_skip_without_forced_row(monkeypatch):
+    monkeypatch.setitem(settings_cache.values, "size_update_interval", "1800")
+    monkeypatch.setitem(settings_cache.values, "change_only_heartbeat", "3")
+    f = ChangeFilter()
+    sizes = [("srv", T0, "a", 100)]
+    assert f.split("db_sizes", sizes) == (sizes, [])
+    later = [("srv", T0 + timedelta(seconds=1800), "a", 100)]
+    assert f.split("db_sizes", later) == ([], later)
+
+
+def _queue(policy: str, cycles: list[list[tuple]], max_records: int) -> IngestBuffer:
+    async def scenario():
+        buf = IngestBuffer(max_records=max_records, batch_size=100, drop_policy=policy, spool=None)
+        for records in cycles:
+            await buf.put("statistics", records)
+        return buf
+    return asyncio.run(scenario())
+
+
+@pytest.fixture
+def no_wait(monkeypatch):
+    """Переполненная очередь отбрасывает строки сразу, без ожидания места."""
+    monkeypatch.setattr(ingest, "INGEST_PUT_TIMEOUT", 0)
+    monkeypatch.setitem(settings_cache.values, "change_only_heartbeat", "0")
+
+
+def _contents(buf: IngestBuffer) -> list[tuple[str, int, str]]:
+    return [(table, int((r[1] - T0).total_seconds()) // 600, r[2]) for table, r in buf._queue]
+
+
+def test_drop_oldest(no_wait):
+    buf = _queue("drop_oldest", [cycle(k, a=k, b=k) for k in range(3)], max_records=5)
+    assert _contents(buf) == [
+        ("statistics", 0, "b"), ("statistics", 1, "a"), ("statistics", 1, "b"),
+        ("statistics", 2, "a"), ("statistics", 2, "b"),
+    ]
+    assert buf.metrics["dropped"] == 1
+
+
+def test_drop_newest(no_wait):
+    buf = _queue("drop_newest", [cycle(k, a=k, b=k) for k in range(3)], max_records=5)
+    assert _contents(buf) == [
+        ("statistics", 0, "a"), ("statistics", 0, "b"), ("statistics", 1, "a"),
+        ("statistics", 1, "b"), ("statistics", 2, "a"),
+    ]
+    assert buf.metrics["dropped"] == 1
+
+
+def test_cycle_larger_than_queue(no_wait):
+    oldest = _queue("drop_oldest", [cycle(0, a=0, b=0, c=0)], max_records=2)
+    assert [name for _, _, name in _contents(oldest)] == ["b", "c"]
+    newest = _queue("drop_newest", [cycle(0, a=0, b=0, c=0)], max_records=2)
+    assert [name for _, _, name in _contents(newest)] == ["a", "b"]
+
+
+def test_evicted_row_promotes_next_skipped(no_wait, change_only):
+    # Цикл 0 пишется целиком, в циклах 1–2 a не меняется и пропускается
+    cycles = [cycle(0, a=1, b=0), cycle(1, a=1, b=1), cycle(2, a=1, b=2)]
+    buf = _queue("drop_oldest", cycles, max_records=5)
+    # Отброшена записываемая строка a цикла 0 — пропущенный за ней сэмпл a
+    # (цикл 1) становится записываемым, следующий опирается уже на него
+    assert _contents(buf) == [
+        ("statistics", 0, "b"), ("statistics", 1, "b"), ("statistics", 1, "a"),
+        ("statistics", 2, "b"), (SKIPPED, 2, "a"),
+    ]
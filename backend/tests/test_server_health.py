@@ -0,0 +1,95 @@
+# tests/test_server_health.py
+"""Переходы circuit breaker (app/services/server_health.py): closed → open → half_open → closed/open."""
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import server_health
+from app.services.server_health import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, ServerUnavailableError
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Управляемое время модуля; разброс паузы отключён (uniform → 1.0)."""
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(server_health, "time", SimpleNamespace(monotonic=lambda: now.value))
+    monkeypatch.setattr(server_health, "random", SimpleNamespace(uniform=lambda a, b: 1.0))
+    return now
+
+
+def _open(breaker: CircuitBreaker, name: str = "srv"):
+    for _ in range(server_health.BREAKER_FAILURE_THRESHOLD):
+        breaker.record_failure(name, "connection refused")
+
+
+def test_opens_after_threshold(clock):
+    b = CircuitBreaker("pg")
+    for _ in range(server_health.BREAKER_FAILURE_THRESHOLD - 1):
+        b.record_failure("srv", "timeout")
+        assert b.allow("srv")
+    b.record_failure("srv", "timeout")
+    assert b.snapshot("srv")["state"] == OPEN
+    assert not b.allow("srv")
+    assert b.retry_in("srv") == server_health.BREAKER_BASE_BACKOFF
+    with pytest.raises(ServerUnavailableError):
+        b.check("srv")
+    assert b.open_names() == ["srv"]
+
+
+def test_success_resets_failure_count(clock):
+    b = CircuitBreaker("pg")
+    for _ in range(server_health.BREAKER_FAILURE_THRESHOLD - 1):
+        b.record_failure("srv", "timeout")
+    b.record_success("srv")
+    b.record_failure("srv", "timeout")
+    assert b.snapshot("srv")["state"] == CLOSED
+
+
+def test_half_open_single_probe(clock):
+    b = CircuitBreaker("pg")
+    _open(b)
+    clock.value += server_health.BREAKER_BASE_BACKOFF
+    assert b.allow("srv")
+    assert b.snapshot("srv")["state"] == HALF_OPEN
+    # Пока идёт проба, остальные обращения отклоняются
+    assert not b.allow("srv")
+    # Зависшая проба заменяется новой
+    clock.value += server_health.BREAKER_PROBE_TIMEOUT
+    assert b.allow("srv")
+
+
+def test_probe_success_closes(clock):
+    b = CircuitBreaker("pg")
+    _open(b)
+    clock.value += server_health.BREAKER_BASE_BACKOFF
+    assert b.allow("srv")
+    b.record_success("srv")
+    assert b.snapshot("srv") == {"state": CLOSED, "failures": 0, "retry_in": None, "last_error": None}
+    assert b.open_names() == []
+
+
+def test_probe_failure_doubles_backoff(clock):
+    b = CircuitBreaker("pg")
+    _open(b)
+    backoff = server_health.BREAKER_BASE_BACKOFF
+    while backoff < server_health.BREAKER_MAX_BACKOFF:
+        clock.value += backoff
+        assert b.allow("srv")
+        b.record_failure("srv", "timeout")
+        backoff = min(backoff * 2, server_health.BREAKER_MAX_BACKOFF)
+        assert b.snapshot("srv")["state"] == OPEN
+        assert b.retry_in("srv") == backoff
+    # Потолок паузы
+    clock.value += backoff
+    b.allow("srv")
+    b.record_failure("srv", "timeout")
+    assert b.retry_in("srv") == server_health.BREAKER_MAX_BACKOFF
+
+
+def test_servers_are_independent(clock):
+    b = CircuitBreaker("ssh")
+    _open(b, "down")
+    assert not b.allow("down")
+    assert b.allow("up")
+    b.reset("down")
+    assert b.allow("down")
@@ -0,0 +1,111 @@
+# tests/test_spool.py
+"""Кадры сегментов спула (app/collector/spool.py): контрольная сумма, оборванный хвост, загрузка."""
+import asyncio
+from datetime import datetime, timezone
+
+from app.collector import spool
+from app.collector.spool import SampleSpool, encode_frame, read_segment
+
+TS = datetime(2026, 3, 2, 12, 0, 0, 123456, tzinfo=timezone.utc)
+
+STATS = [("srv", TS, "db1", 3, 100), ("srv", TS, "db2", None, 200)]
+SERVER = [("srv", TS, 10, 20, 5, None, "16.2")]
+
+
+def _segment(tmp_path, *frames: bytes):
+    path = tmp_path / "0001.seg"
+    path.write_bytes(b"".join(frames))
+    return path
+
+
+def test_round_trip(tmp_path):
+    path = _segment(tmp_path, encode_frame("statistics", STATS), encode_frame("server_stats", SERVER))
+    frames, damaged = read_segment(path)
+    assert frames == [("statistics", STATS), ("server_stats", SERVER)]
+    assert not damaged
+
+
+def test_empty_segment(tmp_path):
+    assert read_segment(_segment(tmp_path)) == ([], False)
+
+
+def test_truncated_tail(tmp_path):
+    second = encode_frame("server_stats", SERVER)
+    for cut in (1, spool._FRAME.size, len(second) - 1):
+        path = _segment(tmp_path, encode_frame("statistics", STATS), second[:cut])
+        frames, damaged = read_segment(path)
+        assert frames == [("statistics", STATS)]
+        assert damaged
+
+
+def test_crc_mismatch_stops_reading(tmp_path):
+    second = bytearray(encode_frame("server_stats", SERVER))
+    second[-2] ^= 0x01
+    third = encode_frame("statistics", STATS)
+    path = _segment(tmp_path, encode_frame("statistics", STATS), bytes(second), third)
+    frames, damaged = read_segment(path)
+    # Кадры после повреждённого не читаются: граница следующего кадра ненадёжна
+    assert frames == [("statistics", STATS)]
+    assert damaged
+
+
+def test_bad_magic(tmp_path):
+    frames, damaged = read_segment(_segment(tmp_path, b"XXXX" + encode_frame("statistics", STATS)[4:]))
+    assert frames == []
+    assert damaged
+
+
+def test_append_and_replay(tmp_path):
+    loaded = []
+
+    async def load(frames):
+        loaded.extend(frames)
+        return sum(len(records) for _, records in frames), 0
+
+    async def scenario():
+        s = SampleSpool(tmp_path, max_bytes=1 << 20, segment_bytes=1 << 20)
+        assert await s.append([("statistics", r) for r in STATS] + [("server_stats", SERVER[0])])
+        assert s.has_pending()
+        inserted = await s.replay(load)
+        return s, inserted
+
+    s, inserted = asyncio.run(scenario())
+    assert inserted == 3
+    assert sorted(loaded) == sorted([("statistics", STATS), ("server_stats", SERVER)])
+    # Загруженный сегмент удалён
+    assert not s.has_pending()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_replay_damaged_segment(tmp_path):
+    path = _segment(tmp_path, encode_frame("statistics", STATS), encode_frame("server_stats", SERVER)[:-3])
+    loaded = []
+
+    async def load(frames):
+        loaded.extend(frames)
+        return len(frames), 0
+
+    s = SampleSpool(tmp_path)
+    asyncio.run(s.replay(load))
+    # Целые кадры загружены, сегмент отложен для разбора
+    assert loaded == [("statistics", STATS)]
+    assert not path.exists()
+    assert path.with_suffix(".bad").exists()
+    assert s.metrics["bad_segments"] == 1
+
+
+def test_replay_keeps_segment_on_load_error(tmp_path):
+    path = _segment(tmp_path, encode_frame("statistics", STATS))
+
+    async def load(frames):
+        raise OSError("pam_stats недоступна")
+
+    async def scenario():
+        try:
+            await SampleSpool(tmp_path).replay(load)
+        except OSError:
+            return True
+        return False
+
+    assert asyncio.run(scenario())
+    assert path.exists()
@@ -0,0 +1,152 @@
+# tests/test_steps.py
+"""
+Восстановление рядов режима хранения только изменений (app/database/steps.py)
+на PostgreSQL: граница эпох, обрыв ряда после span и смена параметров режима.
+
+Сервер srv опрашивается каждые 600 с (циклы T0 + k·600 с). Ряд b пишется в
+каждом цикле и задаёт сетку точек; у ряда a записаны только отдельные сэмплы,
+остальные точки восстанавливаются. С heartbeat 3 записанная строка действует
+600 · 2.5 = 1500 с — два следующих цикла.
+"""
+from datetime import datetime, timedelta, timezone
+
+from app.database import local_db, steps
+from app.database.series import SERVER_SERIES
+
+T0 = datetime(2026, 3, 2, 12, 0, tzinfo=timezone.utc)
+INTERVAL = 600
+
+_SCHEMA = """
+    CREATE TABLE statistics (
+        ts          timestamptz NOT NULL,
+        series_id   integer     NOT NULL,
+        numbackends integer,
+        xact_commit bigint
+    );
+    CREATE TABLE change_only_epochs (
+        sample_table     text        NOT NULL,
+        server_name      text        NOT NULL,
+        since            timestamptz NOT NULL,
+        collect_interval integer     NOT NULL,
+        heartbeat        integer     NOT NULL,
+        PRIMARY KEY (sample_table, server_name, since)
+    );
+"""
+
+
+def cycle(k: float) -> datetime:
+    return T0 + timedelta(seconds=k * INTERVAL)
+
+
+async def _prepare(conn, a_rows: dict[datetime, int], grid: list[datetime], epochs: list[tuple]):
+    """Схема, ряды srv/a (a_rows: ts → numbackends) и srv/b (в каждой точке grid), эпохи."""
+    await local_db.create_series_tables(conn)
+    await conn.execute(_SCHEMA)
+    ids = dict(await conn.fetch(
+        "INSERT INTO series (server_name, datname) VALUES ('srv', 'a'), ('srv', 'b') RETURNING datname, id"
+    ))
+    rows = [(ids["a"], ts, value, 0) for ts, value in a_rows.items()]
+    rows += [(ids["b"], ts, 0, 0) for ts in grid]
+    await conn.executemany(
+        "INSERT INTO statistics (series_id, ts, numbackends, xact_commit) VALUES ($1, $2, $3, $4)", rows,
+    )
+    await steps.record_epochs(conn, [("statistics", "srv", *epoch) for epoch in epochs])
+
+
+async def _restored(conn, start: datetime, end: datetime) -> dict[datetime, int]:
+    """Восстановленный ряд a за [start, end]: ts → numbackends (как читает api/stats.py)."""
+    lookback = await steps.max_span(conn, "statistics", "srv", start, end)
+    source = steps.source("statistics", SERVER_SERIES, "$2", "$3", lookback, grid_where=SERVER_SERIES)
+    rows = await conn.fetch(
+        f"""
+        SELECT s.ts, s.numbackends FROM {source}
+        JOIN series r ON r.id = s.series_id
+        WHERE r.datname = 'a' AND s.ts >= $2 AND s.ts <= $3
+        ORDER BY s.ts
+        """,
+        "srv", start, end,
+    )
+    return {row["ts"]: row["numbackends"] for row in rows}
+
+
+def test_span_formula():
+    assert steps.span(None) == timedelta(0)
+    assert steps.span((INTERVAL, 3)) == timedelta(seconds=1500)
+    assert steps.span((60, 10)) == timedelta(seconds=570)
+
+
+def test_heartbeat_gap(pg):
+    """Строка действует span после записи: дальше ряд обрывается (БД удалена, сбор прекращён)."""
+    async def scenario(conn):
+        grid = [cycle(k) for k in range(6)]
+        await _prepare(conn, {cycle(0): 7}, grid, [(T0 - timedelta(days=1), INTERVAL, 3)])
+        whole = await _restored(conn, T0, cycle(5))
+        # Период начинается после записанной строки — она находится с запасом max_span
+        later = await _restored(conn, cycle(1), cycle(5))
+        return whole, later
+
+    whole, later = pg(scenario)
+    assert whole == {cycle(0): 7, cycle(1): 7, cycle(2): 7}
+    assert later == {cycle(1): 7, cycle(2): 7}
+
+
+def test_span_boundary_inclusive(pg):
+    """Точка ровно через span после строки ещё получает её значение, следующая — нет."""
+    async def scenario(conn):
+        grid = [T0, T0 + timedelta(seconds=1500), T0 + timedelta(seconds=1501)]
+        await _prepare(conn, {T0: 4}, grid, [(T0 - timedelta(days=1), INTERVAL, 3)])
+        return await _restored(conn, T0, cycle(5))
+
+    assert pg(scenario) == {T0: 4, T0 + timedelta(seconds=1500): 4}
+
+
+def test_epoch_boundary(pg):
+    """
+    span строки — из эпохи её ts: строка, записанная до выключения режима,
+    действует и в циклах после него; строка после выключения — только в своём.
+    """
+    async def scenario(conn):
+        grid = [cycle(k) for k in range(12)]
+        a_rows = {cycle(0): 1, cycle(5): 2, cycle(8): 3}
+        epochs = [(T0 - timedelta(days=1), INTERVAL, 3), (cycle(6), INTERVAL, 0)]
+        await _prepare(conn, a_rows, grid, epochs)
+        restored = await _restored(conn, T0, cycle(11))
+        # Период целиком после выключения: запас только на строки, действующие в нём
+        lookback_off = await steps.max_span(conn, "statistics", "srv", cycle(9), cycle(11))
+        lookback_edge = await steps.max_span(conn, "statistics", "srv", cycle(7), cycle(11))
+        return restored, lookback_off, lookback_edge
+
+    restored, lookback_off, lookback_edge = pg(scenario)
+    assert restored == {
+        cycle(0): 1, cycle(1): 1, cycle(2): 1,
+        cycle(5): 2, cycle(6): 2, cycle(7): 2,
+        cycle(8): 3,
+    }
+    assert lookback_off == timedelta(0)
+    assert lookback_edge == timedelta(seconds=1500)
+
+
+def test_parameter_change(pg):
+    """
+    Смена интервала и heartbeat — новая эпоха со своим span; параметры с тем
+    же span эпоху не создают. Записанная ранее история читается по старым.
+    """
+    async def scenario(conn):
+        # После cycle(4) сбор раз в 60 с с heartbeat 10: span 570 с
+        fast = [cycle(4) + timedelta(seconds=60 * k) for k in range(1, 21)]
+        grid = [cycle(k) for k in range(5)] + fast
+        a_rows = {cycle(0): 1, fast[0]: 2}
+        epochs = [(T0 - timedelta(days=1), INTERVAL, 3), (fast[0], 60, 10)]
+        await _prepare(conn, a_rows, grid, epochs)
+        # 1000 с · (2 − 0.5) = 1500 с — тот же span, что у первой эпохи
+        await steps.record_epochs(conn, [("statistics", "srv", cycle(1), 1000, 2)])
+        epoch_rows = await conn.fetchval("SELECT count(*) FROM change_only_epochs")
+        restored = await _restored(conn, T0, fast[-1])
+        return fast, epoch_rows, restored
+
+    fast, epoch_rows, restored = pg(scenario)
+    assert epoch_rows == 2
+    expected = {cycle(0): 1, cycle(1): 1, cycle(2): 1}
+    # 570 с от fast[0] — точки fast[0]..fast[9] (через 0..540 с)
+    expected.update({ts: 2 for ts in fast[:10]})
+    assert restored == expected
@@ -49,6 +49,7 @@ function ServerDetails() {
   const navigate = useNavigate();
   const [serverData, setServerData] = useState(null);
   const [stats, setStats] = useState(null);
+  const [serverTimeline, setServerTimeline] = useState(null);
   const [error, setError] = useState(null);
   const hideDeleted = true;
   const [showNoConnections, setShowNoConnections] = useState(false);
@@ -69,8 +70,10 @@ function ServerDetails() {
   const [criteriaChanged, setCriteriaChanged] = useState(false);
   const connectionsChartRef = useRef(null);
   const sizeChartRef = useRef(null);
+  const diskChartRef = useRef(null);
   const connectionsCanvasRef = useRef(null);
   const sizeCanvasRef = useRef(null);
+  const diskCanvasRef = useRef(null);
   const isMounted = useRef(true);
 
   const userRole = localStorage.getItem(LS_USER_ROLE) || 'viewer';
@@ -180,15 +183,21 @@ function ServerDetails() {
   const fetchData = useCallback(async () => {
     setIsLoading(true);
     try {
-      const [serversRes, statsRes] = await Promise.all([
+      const period = { start_date: startDate.toISOString(), end_date: endDate.toISOString() };
+      // Таймлайн нужен только графику диска — его ошибка не скрывает страницу
+      const [serversRes, statsRes, timelineRes] = await Promise.allSettled([
         api.get('/servers'),
-        api.get(`/server/${name}/stats`, { params: { start_date: startDate.toISOString(), end_date: endDate.toISOString() } }),
+        api.get(`/server/${name}/stats`, { params: period }),
+        api.get(`/server/${name}/timeline`, { params: period }),
       ]);
-      const server = serversRes.data.find(s => s.name === name);
+      if (serversRes.status === 'rejected') throw serversRes.reason;
+      if (statsRes.status === 'rejected') throw statsRes.reason;
+      const server = serversRes.value.data.find(s => s.name === name);
       if (!server) throw new Error(`Сервер ${name} не найден`);
       if (isMounted.current) {
         setServerData(server);
-        setStats(statsRes.data);
+        setStats(statsRes.value.data);
+        setServerTimeline(timelineRes.status === 'fulfilled' ? timelineRes.value.data.timeline : null);
         setError(null);
       }
     } catch (err) {
@@ -206,11 +215,13 @@ function ServerDetails() {
 
   // --- Charts ---
   useEffect(() => {
-    if (!stats || !connectionsCanvasRef.current || !sizeCanvasRef.current) return;
+    if (!stats || !connectionsCanvasRef.current || !sizeCanvasRef.current || !diskCanvasRef.current) return;
     connectionsChartRef.current?.destroy();
     sizeChartRef.current?.destroy();
+    diskChartRef.current?.destroy();
     connectionsChartRef.current = null;
     sizeChartRef.current = null;
+    diskChartRef.current = null;
 
     const timeline = getAggregatedTimeline();
     const rangeDays = Math.max(1, Math.round((endDate - startDate) / 86400000));
@@ -227,9 +238,16 @@ function ServerDetails() {
       options: chartOptions('ГБ', { days: rangeDays }),
       plugins: [gradientPlugin],
     });
+    const disk = (serverTimeline || []).filter(d => d.disk_free_gb != null);
+    diskChartRef.current = new ChartJS(diskCanvasRef.current.getContext('2d'), {
+      type: 'line',
+      data: { datasets: [makeDataset('Свободно (ГБ)', disk.map(d => ({ x: new Date(d.ts), y: d.disk_free_gb })), CHART_COLORS.disk)] },
+      options: chartOptions('ГБ', { days: rangeDays }),
+      plugins: [gradientPlugin],
+    });
 
-    return () => { connectionsChartRef.current?.destroy(); sizeChartRef.current?.destroy(); };
-  }, [stats, activeTab, name, getAggregatedTimeline, startDate, endDate]);
+    return () => { connectionsChartRef.current?.destroy(); sizeChartRef.current?.destroy(); diskChartRef.current?.destroy(); };
+  }, [stats, serverTimeline, activeTab, name, getAggregatedTimeline, startDate, endDate]);
 
   // --- Sorting, filtering, pagination ---
   const handleSort = (col) => {
@@ -456,6 +474,10 @@ function ServerDetails() {
           <CardHeader><CardTitle className="text-sm">Размер баз данных</CardTitle></CardHeader>
           <CardContent><canvas ref={sizeCanvasRef} /></CardContent>
         </Card>
+        <Card>
+          <CardHeader><CardTitle className="text-sm">Свободное место на диске</CardTitle></CardHeader>
+          <CardContent><canvas ref={diskCanvasRef} /></CardContent>
+        </Card>
       </div>
 
       {/* Database filters */}
@@ -23,7 +23,11 @@ const SETTING_GROUPS = [
     title: 'Хранение данных',
     icon: Database,
     fields: [
-      { key: 'retention_months', label: 'Статистика', unit: 'мес', min: 1, max: 120, default: '12' },
+      { key: 'raw_retention_days', label: 'Статистика: сырые сэмплы', unit: 'дней', min: 7, max: 3650, default: '90' },
+      { key: 'hourly_retention_months', label: 'Статистика: часовые агрегаты', unit: 'мес', min: 1, max: 120, default: '12' },
+      { key: 'daily_retention_months', label: 'Статистика: суточные агрегаты', unit: 'мес', min: 1, max: 120, default: '60' },
+      { key: 'chunk_after_days', label: 'Статистика: сжатие закрытых месяцев (0 — выкл.)', unit: 'дней', min: 0, max: 3650, default: '7' },
+      { key: 'change_only_heartbeat', label: 'Статистика: только изменения, heartbeat (0 — выкл.)', unit: 'интервалов', min: 0, max: 1000, default: '0' },
       { key: 'audit_retention_days', label: 'Аудит', unit: 'дней', min: 7, max: 3650, default: '90' },
       { key: 'logs_retention_days', label: 'Логи', unit: 'дней', min: 7, max: 3650, default: '30' },
     ],
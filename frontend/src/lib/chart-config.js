@@ -22,6 +22,7 @@ export function getChartColors() {
     size: makeChartColor('--chart-5'),
     commits: makeChartColor('--chart-4'),
     sizeGb: makeChartColor('--chart-5'),
+    disk: makeChartColor('--chart-2'),
   };
 }
 
@@ -31,6 +32,7 @@ export const CHART_COLORS = {
   get size() { return getChartColors().size; },
   get commits() { return getChartColors().commits; },
   get sizeGb() { return getChartColors().sizeGb; },
+  get disk() { return getChartColors().disk; },
 };
 
 export function getTimeUnit(days) {